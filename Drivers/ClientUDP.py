@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import datetime
 import json
+import selectors
 import socket
 import threading
 import time
+from collections import deque
 from dataclasses import dataclass
 from typing import Callable, Optional
 
@@ -40,8 +42,16 @@ class UdpClient:
     - Optionally binds to a specific local IP (e.g., interface wlan0).
     - Runs either in blocking mode (listen_forever) or background thread (start/stop).
     - Calls an optional callback with (text, addr) for each received message.
+    - wait_mode="select" (default) blocks on a selector until a datagram arrives or
+      stop() wakes it; wait_mode="poll" keeps the legacy non-blocking loop.
     """
 
+    # Tope de espera del selector cuando no hay recv_timeout_sec: el stop_event puede
+    # fijarse desde fuera (p.ej. PCR) sin pasar por stop(), que es quien despierta.
+    SELECT_MAX_WAIT_S = 0.25
+    # Máximo de datagramas drenados por despertar (evita quedarse atrapado en ráfagas).
+    DRAIN_MAX = 64
+
     def __init__(
         self,
         port: int = 5005,
@@ -58,6 +68,7 @@ class UdpClient:
         prefixCol="",
         auto_stop_after_sec: Optional[float] = None,
         on_timeout: Optional[Callable[[], None]] = None,
+        wait_mode: str = "select",
     ):
         """
         :param port: UDP port to bind.
@@ -68,7 +79,13 @@ class UdpClient:
         :param recv_timeout_sec: Optional socket timeout (seconds). None => blocking.
         :param on_message: Optional callback called for each message: (text, addr).
         :param parse_float: If True, tries to parse payload as float and prints it.
+        :param wait_mode: "select" blocks until a datagram or a stop wake-up arrives and
+            keeps only the newest pending datagram; "poll" is the legacy loop that
+            sleeps 0.5 ms on BlockingIOError.
         """
+        if wait_mode not in ("select", "poll"):
+            raise ValueError(f"Unsupported wait_mode: {wait_mode}")
+        self.wait_mode = wait_mode
         self.port = port
         self.buffer_size = buffer_size
         self.allow_broadcast = allow_broadcast
@@ -84,6 +101,9 @@ class UdpClient:
             self.filename = f"data_temps-{timestamp}.csv"
             # self.initial_file(self.filename, prefixcolum=prefixCol)
         self._sock = None
+        # Par de sockets para despertar al selector desde stop() (modo "select").
+        self._wake_r = None
+        self._wake_w = None
         self._thread = None
         self._stop_evt = threading.Event() if stop_event is None else stop_event
         self._latest_text = None
@@ -117,8 +137,9 @@ class UdpClient:
         # ⚠️ IMPORTANTE: Modo no bloqueante para leer el paquete más reciente
         sock.setblocking(False)
 
-        # Timeout opcional (afecta solo llamadas blocking, pero lo dejamos)
-        if self.recv_timeout_sec is not None:
+        # Timeout opcional (afecta solo llamadas blocking, pero lo dejamos). En modo
+        # "select" el socket queda no bloqueante: la espera la hace el selector.
+        if self.recv_timeout_sec is not None and self.wait_mode == "poll":
             sock.settimeout(self.recv_timeout_sec)
             print(f"[UdpClient] Socket timeout set to {self.recv_timeout_sec}s")
 
@@ -128,12 +149,39 @@ class UdpClient:
 
         return sock
 
+    def _open_wake_pair(self):
+        if self.wait_mode != "select" or self._wake_r is not None:
+            return
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+    def _wake(self):
+        """Despierta al selector (no-op en modo poll o si ya se cerró)."""
+        if self._wake_w is None:
+            return
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass  # buffer lleno = ya hay un despertar pendiente
+
+    def _close_wake_pair(self):
+        for s in (self._wake_r, self._wake_w):
+            if s is not None:
+                try:
+                    s.close()
+                except Exception:
+                    pass
+        self._wake_r = None
+        self._wake_w = None
+
     def start(self):
         """Start listening in a background thread."""
         if self._thread and self._thread.is_alive():
             return  # already running
         self._stop_evt.clear()
         self._sock = self._create_socket()  # pyrefly: ignore
+        self._open_wake_pair()
 
         self._thread = threading.Thread(target=self._run_loop, daemon=True)  # pyrefly: ignore
         self._thread.start()  # pyrefly: ignore
@@ -142,6 +190,7 @@ class UdpClient:
     def stop(self):
         """Stop the background thread and close the socket."""
         self._stop_evt.set()
+        self._wake()
         if self._sock:
             try:
                 # Send a dummy packet to unblock recvfrom if needed (optional)
@@ -152,13 +201,18 @@ class UdpClient:
             self._sock = None
 
         if self._thread:
-            self._thread.join(timeout=2.0)
+            # stop() puede llegar desde el propio hilo receptor (callback que se
+            # desuscribe del hub): join sobre sí mismo lanzaría RuntimeError.
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
             self._thread = None
+        self._close_wake_pair()
         print("[UdpClient] Stopped.")
 
     def stop_testing(self):
         """Stop the background thread and close the socket."""
         self._stop_evt.set()
+        self._wake()
         if self._sock:
             try:
                 # Send a dummy packet to unblock recvfrom if needed (optional)
@@ -171,6 +225,7 @@ class UdpClient:
         if self._thread:
             # self._thread.join(timeout=2.0)
             self._thread = None
+        self._close_wake_pair()
         print("[UdpClient] Stopped.")
 
     def listen_forever(self):
@@ -179,6 +234,7 @@ class UdpClient:
         Useful for simple scripts.
         """
         self._sock = self._create_socket()  # pyrefly: ignore
+        self._open_wake_pair()
         print(f"[UdpClient] Listening on {self.local_ip or '0.0.0.0'}:{self.port} (blocking)")
         try:
             self._run_loop()
@@ -188,63 +244,105 @@ class UdpClient:
             except Exception:
                 pass
             self._sock = None
+            self._close_wake_pair()
 
     def _run_loop(self):
         assert self._sock is not None, "Socket must be created before running loop."
+        if self.wait_mode == "select":
+            self._run_loop_select()
+        else:
+            self._run_loop_poll()
+
+    def _auto_stop_due(self, start_time) -> bool:
+        """True (y dispara on_timeout si nunca llegó nada) al vencer auto_stop_after_sec."""
+        if (
+            self.auto_stop_after_sec is None
+            or (time.time() - start_time) < self.auto_stop_after_sec
+        ):
+            return False
+        if not self._msg_received and self.on_timeout:
+            try:
+                self.on_timeout()
+            except Exception as e:
+                print(f"[UdpClient] on_timeout error: {e}")
+        self._stop_evt.set()
+        return True
+
+    def _run_loop_select(self):
+        """Espera en un selector (epoll en Linux) hasta que llega un datagrama o stop()
+        escribe en el par de despertar: sin polling, el hilo no consume CPU en reposo.
+        Al despertar drena lo pendiente y procesa solo el datagrama de temperatura más
+        reciente (misma intención que el SO_RCVBUF chico: el dato viejo no sirve)."""
+        sock = self._sock
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ, "data")  # pyrefly: ignore
+        if self._wake_r is not None:
+            sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+        wait_s = (
+            self.recv_timeout_sec if self.recv_timeout_sec is not None else self.SELECT_MAX_WAIT_S
+        )
         start_time = time.time()
+        try:
+            # `self._sock is sock`: si stop() y un start() nuevo ocurren mientras este
+            # hilo aún espera, el hilo viejo sale en vez de seguir con un socket cerrado.
+            while not self._stop_evt.is_set() and self._sock is sock:
+                if self._auto_stop_due(start_time):
+                    break
+                timeout = wait_s
+                if self.auto_stop_after_sec is not None:
+                    remaining = self.auto_stop_after_sec - (time.time() - start_time)
+                    timeout = max(0.0, min(timeout, remaining))
+                try:
+                    events = sel.select(timeout)
+                except (OSError, ValueError):
+                    break  # socket cerrado por stop()
+                if not events:
+                    self.count_timeout += 1
+                    continue
+                for key, _mask in events:
+                    if key.data == "wake":
+                        try:
+                            key.fileobj.recv(64)  # pyrefly: ignore
+                        except OSError:
+                            pass
+                        continue
+                    self._on_readable(sock)
+        finally:
+            try:
+                sel.close()
+            except Exception:
+                pass
 
-        while not self._stop_evt.is_set():
-            if (
-                self.auto_stop_after_sec is not None
-                and (time.time() - start_time) >= self.auto_stop_after_sec
-            ):
-                if not self._msg_received and self.on_timeout:
-                    try:
-                        self.on_timeout()
-                    except Exception as e:
-                        print(f"[UdpClient] on_timeout error: {e}")
-                self._stop_evt.set()
-                break
+    def _on_readable(self, sock):
+        """Socket listo para leer: procesa solo el datagrama de temperatura más nuevo."""
+        newest = self._drain_newest(sock)
+        if newest is not None:
+            self._handle_datagram(*newest)
+
+    def _drain_newest(self, sock):
+        """Lee todo lo pendiente (hasta DRAIN_MAX) y devuelve el último (data, addr) que
+        trae temperatura, o None. Los intermedios se descartan como haría el kernel."""
+        newest = None
+        for _ in range(self.DRAIN_MAX):
             try:
-                data, addr = self._sock.recvfrom(self.buffer_size)
-                text = data.decode(errors="replace")
+                data, addr = sock.recvfrom(self.buffer_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break  # cerrado entre select y recvfrom
+            if b"UDP" in data:
+                newest = (data, addr)
+        return newest
 
-                if "UDP" not in text:
-                    continue
+    def _run_loop_poll(self):
+        start_time = time.time()
 
-                payload = text.split("UDP:", 1)[-1]
-                temps = payload.split(":")
-                # Los tres campos del disco: IR ambiente, IR objeto y termocupla.
-                # Cualquiera puede venir como "None"/"NS": se reenvían todos y el
-                # consumidor (según su selector) elige cuál usar.
-                t_amb = _parse_temp(temps[0]) if len(temps) > 0 else None
-                t_obj = _parse_temp(temps[1]) if len(temps) > 1 else None
-                t_tc = _parse_temp(temps[2]) if len(temps) > 2 else None
-
-                now = time.time()
-                self.status_disc = True
-                self.count_timeout = 0
-                self._latest_addr = addr[0]
-                self._msg_received = True
-                # Mantener el último valor válido por campo (no pisar con None).
-                for i, val in enumerate((t_amb, t_obj, t_tc)):
-                    if val is not None:
-                        self.data_temps[i] = val
-                # print(data, addr)
-                with self.latest_lock:
-                    # latest_temp sigue siendo la termocupla (compat con lectores
-                    # directos); si no llegó, se conserva la muestra anterior.
-                    if t_tc is not None:
-                        self.latest_temp = TempSample(value=t_tc, ts=now)
-                if self.on_message:
-                    try:
-                        self.on_message(
-                            text,
-                            (addr[0],),
-                            [t_amb, t_obj, t_tc, now],
-                        )
-                    except Exception as e:
-                        print(f"[UdpClient] on_message error: {e}")
+        while not self._stop_evt.is_set():
+            if self._auto_stop_due(start_time):
+                break
+            try:
+                data, addr = self._sock.recvfrom(self.buffer_size)  # pyrefly: ignore
+                self._handle_datagram(data, addr)
 
             except BlockingIOError:
                 time.sleep(0.0005)
@@ -265,6 +363,50 @@ class UdpClient:
                 print("str error: ", str(e))
                 time.sleep(0.0005)
 
+    @staticmethod
+    def _parse_temps(text: str) -> list:
+        """``...UDP:t_amb:t_obj:t_tc`` -> [t_amb, t_obj, t_tc] (None por campo ausente)."""
+        payload = text.split("UDP:", 1)[-1]
+        temps = payload.split(":")
+        # Los tres campos del disco: IR ambiente, IR objeto y termocupla.
+        # Cualquiera puede venir como "None"/"NS": se reenvían todos y el
+        # consumidor (según su selector) elige cuál usar.
+        return [_parse_temp(temps[i]) if len(temps) > i else None for i in range(3)]
+
+    def _update_state(self, temps: list, addr, now: float):
+        self.status_disc = True
+        self.count_timeout = 0
+        self._latest_addr = addr[0]
+        self._msg_received = True
+        # Mantener el último valor válido por campo (no pisar con None).
+        for i, val in enumerate(temps):
+            if val is not None:
+                self.data_temps[i] = val
+        with self.latest_lock:
+            # latest_temp sigue siendo la termocupla (compat con lectores
+            # directos); si no llegó, se conserva la muestra anterior.
+            if temps[2] is not None:
+                self.latest_temp = TempSample(value=temps[2], ts=now)
+
+    def _handle_datagram(self, data: bytes, addr):
+        text = data.decode(errors="replace")
+
+        if "UDP" not in text:
+            return
+
+        temps = self._parse_temps(text)
+        now = time.time()
+        self._update_state(temps, addr, now)
+        if self.on_message:
+            try:
+                self.on_message(
+                    text,
+                    (addr[0],),
+                    [*temps, now],
+                )
+            except Exception as e:
+                print(f"[UdpClient] on_message error: {e}")
+
     def initial_file(self, filename=None, prefixcolum=""):
         if secrets.get("environment", "") == "dev":
             return
@@ -308,6 +450,306 @@ class UdpClient:
     def get_status_disc(self):
         return self.status_disc
 
+@dataclass
+class UdpFrame:
+    """Datagrama del puerto 5005 ya clasificado y parseado (una sola vez) por el hub.
+
+    kind: "temp" (``UDP:t_amb:t_obj:t_tc``) o "emstat" (``EMSTAT:{...}``).
+    text: para "temp" el datagrama completo; para "emstat" desde el marcador
+    ``EMSTAT:`` (tolera prefijos basura), listo para ``_emstat_msgs``.
+    temps: [t_amb, t_obj, t_tc] solo en "temp".
+    """
+
+    kind: str
+    text: str
+    addr: str
+    ts: float
+    temps: Optional[list] = None
+
+
+class UdpSubscription:
+    """Buzón acotado de un consumidor del hub.
+
+    Ring buffer (deque con maxlen): si el consumidor no drena a tiempo se pisa el
+    frame más viejo y se cuenta en ``dropped``. Con ``on_frame`` el hub entrega en su
+    propio hilo (semántica del antiguo on_message de UdpClient); sin él, el
+    consumidor drena con ``drain()`` / ``get()``. ``notify()`` (opcional) se llama
+    en el hilo del hub tras cada push sin drenar: lo usa el tap EMSTAT para
+    despertar al loop del EmstatEngine (docs/emstat_async_engine.md).
+    """
+
+    def __init__(
+        self,
+        hub,
+        kinds,
+        maxlen: int,
+        on_frame: Optional[Callable[[UdpFrame], None]],
+        notify: Optional[Callable[[], None]] = None,
+    ):
+        self.hub = hub
+        self.kinds = frozenset(kinds)
+        self.on_frame = on_frame
+        self.notify = notify
+        self._ring = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.delivered = 0
+        self.dropped = 0
+
+    def push(self, frame: UdpFrame):
+        with self._cond:
+            if len(self._ring) == self._ring.maxlen:
+                self.dropped += 1
+            self._ring.append(frame)
+            self.delivered += 1
+            self._cond.notify()
+        if self.on_frame is not None:
+            for f in self.drain():
+                try:
+                    self.on_frame(f)
+                except Exception as e:
+                    print(f"[UdpHub] on_frame error: {e}")
+        elif self.notify is not None:
+            try:
+                self.notify()
+            except Exception as e:
+                print(f"[UdpHub] notify error: {e}")
+
+    def drain(self, max_items: Optional[int] = None) -> list:
+        """Saca hasta max_items frames (todos si None), del más viejo al más nuevo."""
+        with self._cond:
+            n = len(self._ring) if max_items is None else min(max_items, len(self._ring))
+            return [self._ring.popleft() for _ in range(n)]
+
+    def get(self, timeout: Optional[float] = None) -> Optional[UdpFrame]:
+        """Espera un frame hasta timeout; None si no llegó ninguno."""
+        with self._cond:
+            if not self._ring and not self._cond.wait_for(lambda: self._ring, timeout):
+                return None
+            return self._ring.popleft()
+
+    def clear(self):
+        with self._cond:
+            self._ring.clear()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class UdpBroadcastHub(UdpClient):
+    """
+    Socket UDP único del proceso para el puerto 5005 (ver docs/udp_bus_5005.md).
+    - Hace bind una sola vez y reparte a todos los consumidores (PCR, Quick Control,
+      Temperatura, test de conexión y el tap EMSTAT de EventPlotter).
+    - Clasifica y parsea cada datagrama una sola vez (UdpFrame).
+    - Cada suscriptor recibe por su UdpSubscription (ring acotado con contador de
+      descartes); arranca con el primer suscriptor y se detiene con el último.
+    - A diferencia de UdpClient procesa TODOS los datagramas pendientes: el tap
+      EMSTAT no puede perder paquetes, así que el RCVBUF es grande.
+    """
+
+    RCVBUF = 1 << 20
+
+    def __init__(self, port: int = 5005, local_ip: str = ""):
+        super().__init__(
+            port=port, buffer_size=2048, local_ip=local_ip, save_data=False, wait_mode="select"
+        )
+        self._subs: tuple = ()
+        self._subs_lock = threading.Lock()
+        self.frame_counts = {"temp": 0, "emstat": 0, "other": 0}
+
+    def _create_socket(self):
+        sock = super()._create_socket()
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RCVBUF)
+        except OSError:
+            pass
+        return sock
+
+    def subscribe(
+        self,
+        kinds=("temp",),
+        maxlen: int = 1,
+        on_frame: Optional[Callable[[UdpFrame], None]] = None,
+        notify: Optional[Callable[[], None]] = None,
+    ) -> UdpSubscription:
+        """Registra un consumidor. Lanza OSError si el bind del primer suscriptor falla."""
+        sub = UdpSubscription(self, kinds, maxlen, on_frame, notify)
+        with self._subs_lock:
+            self._subs = self._subs + (sub,)
+            if not (self._thread and self._thread.is_alive()):
+                try:
+                    self.start()
+                except OSError:
+                    self._subs = tuple(x for x in self._subs if x is not sub)
+                    raise
+        return sub
+
+    def unsubscribe(self, sub: UdpSubscription):
+        with self._subs_lock:
+            if sub not in self._subs:
+                return
+            self._subs = tuple(x for x in self._subs if x is not sub)
+            if self._subs:
+                return
+            # Último suscriptor: se suelta el socket bajo el lock (un subscribe
+            # concurrente verá el hub detenido y lo relanza), pero el join va afuera
+            # para no bloquear a un callback del hub que esté desuscribiéndose.
+            self._stop_evt.set()
+            self._wake()
+            sock, self._sock = self._sock, None
+            th, self._thread = self._thread, None
+        try:
+            if sock is not None:
+                sock.close()
+        except Exception:
+            pass
+        if th is not None and th is not threading.current_thread():
+            th.join(timeout=2.0)
+        print(f"[UdpHub] :{self.port} idle, socket released.")
+
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def _on_readable(self, sock):
+        for _ in range(self.DRAIN_MAX):
+            try:
+                data, addr = sock.recvfrom(self.buffer_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            self._handle_datagram(data, addr)
+
+    def _handle_datagram(self, data: bytes, addr):
+        text = data.decode("utf-8", errors="replace")
+        now = time.time()
+        idx = text.find("EMSTAT:")
+        if idx >= 0:
+            frame = UdpFrame("emstat", text[idx:].strip(), addr[0], now)
+        elif "UDP" in text:
+            temps = self._parse_temps(text)
+            self._update_state(temps, addr, now)
+            frame = UdpFrame("temp", text, addr[0], now, temps)
+        else:
+            self.frame_counts["other"] += 1  # beacon (CD_DISCOVERY:...) / ruido
+            return
+        self.frame_counts[frame.kind] += 1
+        # Snapshot inmutable: un callback puede desuscribirse durante el reparto.
+        for sub in self._subs:
+            if frame.kind in sub.kinds:
+                sub.push(frame)
+
+
+_HUBS: dict = {}
+_HUBS_LOCK = threading.Lock()
+
+
+def get_udp_hub(port: int = 5005) -> UdpBroadcastHub:
+    """Hub compartido del proceso para ``port`` (se crea en el primer uso)."""
+    with _HUBS_LOCK:
+        hub = _HUBS.get(port)
+        if hub is None:
+            hub = _HUBS[port] = UdpBroadcastHub(port=port)
+        return hub
+
+
+class SharedUdpClient:
+    """
+    Reemplazo de UdpClient para los consumidores de temperatura: misma API
+    (start/stop/stop_testing, on_message(text, (addr,), [t_amb, t_obj, t_tc, ts]),
+    auto_stop_after_sec/on_timeout), pero sin socket propio: se suscribe al hub.
+    El callback corre en el hilo del hub, igual que antes en el de UdpClient.
+    """
+
+    def __init__(
+        self,
+        port: int = 5005,
+        on_message: Callable[[str, tuple, list], None] | None = None,
+        stop_event=None,
+        auto_stop_after_sec: Optional[float] = None,
+        on_timeout: Optional[Callable[[], None]] = None,
+    ):
+        self.port = port
+        self.on_message = on_message
+        self.auto_stop_after_sec = auto_stop_after_sec
+        self.on_timeout = on_timeout
+        self._stop_evt = threading.Event() if stop_event is None else stop_event
+        self._sub: Optional[UdpSubscription] = None
+        self._timer: Optional[threading.Timer] = None
+        self._msg_received = False
+        self._latest_addr = None
+        self.data_temps = [20.0, 20.0, 20.0]
+        self.status_disc = False
+        self.latest_temp = None
+        self.latest_lock = threading.Lock()
+
+    def start(self):
+        if self._sub is not None:
+            return  # already running
+        self._stop_evt.clear()
+        self._msg_received = False
+        self._sub = get_udp_hub(self.port).subscribe(
+            kinds=("temp",), maxlen=1, on_frame=self._on_frame
+        )
+        if self.auto_stop_after_sec is not None:
+            self._timer = threading.Timer(self.auto_stop_after_sec, self._on_auto_stop)
+            self._timer.daemon = True
+            self._timer.start()
+        print(f"[SharedUdpClient] Subscribed to :{self.port}")
+
+    def stop(self):
+        self._stop_evt.set()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        sub, self._sub = self._sub, None
+        if sub is not None:
+            sub.close()
+            print("[SharedUdpClient] Stopped.")
+
+    # Con el hub no hay hilo propio que esperar: ambos cierres son equivalentes.
+    stop_testing = stop
+
+    def _on_auto_stop(self):
+        self._timer = None
+        if self._sub is None:
+            return
+        if not self._msg_received and self.on_timeout:
+            try:
+                self.on_timeout()
+            except Exception as e:
+                print(f"[SharedUdpClient] on_timeout error: {e}")
+        self.stop()
+
+    def _on_frame(self, frame: UdpFrame):
+        if self._stop_evt.is_set():
+            return
+        temps = frame.temps or [None, None, None]
+        self.status_disc = True
+        self._msg_received = True
+        self._latest_addr = frame.addr
+        for i, val in enumerate(temps):
+            if val is not None:
+                self.data_temps[i] = val
+        with self.latest_lock:
+            if temps[2] is not None:
+                self.latest_temp = TempSample(value=temps[2], ts=frame.ts)
+        if self.on_message:
+            try:
+                self.on_message(frame.text, (frame.addr,), [*temps, frame.ts])
+            except Exception as e:
+                print(f"[SharedUdpClient] on_message error: {e}")
+
+    # ---- Convenience getters ----
+    def latest_addr(self):
+        return self._latest_addr
+
+    def latest_temps(self):
+        return self.data_temps
+
+    def get_status_disc(self):
+        return self.status_disc
+
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""Actuador del LED calefactor: el lazo de control solo fija un duty (0..1).
+
+Antes el PI modulaba el pin desde su propio hilo de Python: write(True),
+time.sleep(on_time), write(False), sleep(resto). El duty real dependía del GIL y
+del scheduler, y la pre-rampa feed-forward giraba sin dormir. Aquí la modulación la
+hace un backend:
+  - "lgpio":    tx_pwm de lgpio (temporizado por el hilo en C de la librería, sin
+                GIL; sirve en cualquier GPIO, también en el Pi 5).
+  - "pigpio":   PWM por DMA del daemon pigpiod (requiere `sudo pigpiod`; no hay
+                pigpiod para el Pi 5).
+  - "software": hilo dedicado sobre GPIOPin (libgpiod) con deadlines absolutos.
+                No depende de nada más que lo que ya usa la app, pero con el GIL
+                disputado su jitter de periodo no es mejor que el del lazo previo:
+                make_heater solo cae a él si se pide (heater_software_fallback).
+  - "fake":     el mismo hilo software sobre un RecordingPin que anota cada flanco
+                con su instante, para medir jitter sin hardware (test/bench).
+Ver docs/heater_pwm.md.
+"""
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 19:30 $"
+
+HEATER_BACKENDS = ("software", "lgpio", "pigpio", "fake")
+
+
+def _clamp_duty(duty):
+    return max(0.0, min(1.0, float(duty)))
+
+
+class HeaterActuator(ABC):
+    """Interfaz común. period: periodo PWM en s (el WINDOW del PI de la fase).
+    set_duty es abstracto: un backend que no lo implementa falla al construirse, no
+    en el primer tick del lazo."""
+
+    backend = "none"
+
+    def __init__(self, period=0.1):
+        self.duty = 0.0
+        self.period = float(period)
+
+    @abstractmethod
+    def set_duty(self, duty, period=None):
+        """Fija el duty (0..1) y, si viene, el periodo PWM en s."""
+
+    def on(self):
+        self.set_duty(1.0)
+
+    def off(self):
+        self.set_duty(0.0)
+
+    def close(self):
+        self.off()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RecordingPin:
+    """Pin falso con la interfaz de GPIOPin que usa el heater (write/close).
+
+    edges: lista de (t, nivel) por cada cambio de nivel, con time.perf_counter().
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.level = False
+        self.edges = []
+
+    def set_output(self, initial_high=False, **_kw):
+        self.level = bool(initial_high)
+        return self
+
+    def write(self, value):
+        value = bool(value)
+        if value != self.level:
+            self.edges.append((self._clock(), value))
+        self.level = value
+
+    def close(self):
+        self.level = False
+
+
+class SoftwarePwmHeater(HeaterActuator):
+    """PWM en un hilo propio sobre un pin con write(bool).
+
+    Cada ciclo arranca en un deadline absoluto (start + k·period) y la bajada llega
+    duty·period después de la subida: el trabajo del lazo de control ya no se suma
+    al periodo ni desplaza los flancos. set_duty despierta al hilo (Condition): un off() corta en
+    el acto aunque el ciclo esté en su tramo ON; otros cambios de duty se aplican al
+    inicio del ciclo siguiente, como en un PWM por hardware. duty 0 / 1 dejan el
+    nivel fijo sin conmutar. Si el hilo se atrasa más de un periodo (GIL, carga),
+    se re-sincroniza en vez de recuperar ciclos en ráfaga.
+
+    Límite: los flancos los pone Python. Con el GIL disputado cada despertar llega
+    hasta un intervalo de conmutación tarde (~5 ms): el exceso de ON de una bajada
+    tardía se descuenta del ciclo siguiente (el duty medio se conserva), pero el
+    error de periodo por ciclo no baja del que tenía el lazo inline. Para eso están
+    lgpio y pigpio (docs/heater_pwm.md)."""
+
+    backend = "software"
+
+    def __init__(self, pin, period=0.1):
+        super().__init__(period)
+        self._pin = pin
+        self._level = False
+        self._pin.write(False)
+        self._cv = threading.Condition()
+        self._stop = False
+        self._idle = True  # nivel fijo (duty 0 o 1): esperando un duty nuevo
+        self._thread = threading.Thread(target=self._run, name="heater-pwm", daemon=True)
+        self._thread.start()
+
+    def set_duty(self, duty, period=None):
+        with self._cv:
+            duty = _clamp_duty(duty)
+            # Solo se despierta al hilo si tiene que actuar ya (corte a 0, o salir
+            # del nivel fijo). En PWM el duty nuevo se toma al inicio del ciclo:
+            # despertarlo en cada tick del lazo solo le agrega disputas por el GIL.
+            wake = self._idle or (duty <= 0.0 < self.duty)
+            self.duty = duty
+            if period is not None and period > 0:
+                self.period = float(period)
+            if wake:
+                self._cv.notify()
+
+    def _write(self, level):
+        if level != self._level:
+            self._pin.write(level)
+            self._level = level
+
+    def _wait_until(self, deadline):
+        """Duerme hasta deadline (con el lock tomado). False si hay que cortar el
+        ciclo: stop o duty llevado a 0."""
+        while True:
+            if self._stop or self.duty <= 0.0:
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self._cv.wait(remaining)
+
+    def _run(self):
+        next_start = time.monotonic()
+        debt = 0.0  # s en alto de más acumulados por bajadas tardías
+        with self._cv:
+            while not self._stop:
+                duty, period = self.duty, self.period
+                if duty <= 0.0 or duty >= 1.0:
+                    self._write(duty >= 1.0)
+                    self._idle = True
+                    self._cv.wait()
+                    self._idle = False
+                    next_start = time.monotonic()
+                    debt = 0.0
+                    continue
+                now = time.monotonic()
+                if now - next_start > period:
+                    next_start = now
+                start = next_start
+                self._write(True)
+                rise = time.monotonic()
+                # La bajada se cuenta desde la subida real, menos lo que los ciclos
+                # anteriores quedaron en alto de más por despertar tarde: el exceso
+                # se descuenta del ON siguiente y el duty medio no se sesga arriba.
+                target = duty * period
+                on_time = max(0.0, target - debt)
+                if not self._wait_until(rise + on_time):
+                    self._write(False)
+                    debt = 0.0
+                    continue
+                self._write(False)
+                debt = min(target, max(0.0, debt + time.monotonic() - rise - target))
+                next_start = start + period
+                self._wait_until(next_start)
+            self._write(False)
+
+    def close(self):
+        with self._cv:
+            self._stop = True
+            self.duty = 0.0
+            self._cv.notify()
+        self._thread.join(timeout=max(1.0, 2 * self.period))
+        try:
+            self._pin.write(False)
+            self._pin.close()
+        except Exception as e:
+            print(f"error closing heater pin: {e}")
+
+
+class LgpioPwmHeater(HeaterActuator):
+    """tx_pwm de lgpio: la librería temporiza los flancos en su hilo en C."""
+
+    backend = "lgpio"
+
+    def __init__(self, gpio, chip="/dev/gpiochip0", period=0.1):
+        import lgpio  # pyrefly: ignore
+
+        super().__init__(period)
+        self._lg = lgpio
+        self._gpio = int(gpio)
+        self._h = lgpio.gpiochip_open(int(str(chip).rstrip("/").split("gpiochip")[-1]))
+        lgpio.gpio_claim_output(self._h, self._gpio, 0)
+        self._applied = None
+
+    def set_duty(self, duty, period=None):
+        self.duty = _clamp_duty(duty)
+        if period is not None and period > 0:
+            self.period = float(period)
+        state = (self.duty, self.period) if 0.0 < self.duty < 1.0 else (self.duty,)
+        if state == self._applied:
+            return  # tx_pwm reinicia el ciclo: no re-emitir el mismo PWM
+        lg = self._lg
+        if 0.0 < self.duty < 1.0:
+            lg.tx_pwm(self._h, self._gpio, 1.0 / self.period, self.duty * 100.0)
+        else:
+            lg.tx_pwm(self._h, self._gpio, 0, 0)
+            lg.gpio_write(self._h, self._gpio, 1 if self.duty >= 1.0 else 0)
+        self._applied = state
+
+    def close(self):
+        try:
+            self._lg.tx_pwm(self._h, self._gpio, 0, 0)
+            self._lg.gpio_write(self._h, self._gpio, 0)
+            self._lg.gpio_free(self._h, self._gpio)
+            self._lg.gpiochip_close(self._h)
+        except Exception as e:
+            print(f"error closing lgpio heater: {e}")
+
+
+class PigpioPwmHeater(HeaterActuator):
+    """PWM de pigpio (DMA, vía el daemon pigpiod). pigpio solo admite un juego
+    discreto de frecuencias: set_PWM_frequency devuelve la que eligió."""
+
+    backend = "pigpio"
+    RANGE = 1000
+
+    def __init__(self, gpio, period=0.1):
+        import pigpio  # pyrefly: ignore
+
+        super().__init__(period)
+        self._pi = pigpio.pi()
+        if not self._pi.connected:
+            raise RuntimeError("pigpiod no está corriendo")
+        self._gpio = int(gpio)
+        self._pi.set_mode(self._gpio, pigpio.OUTPUT)
+        self._pi.set_PWM_range(self._gpio, self.RANGE)
+        self._pi.set_PWM_dutycycle(self._gpio, 0)
+        self._freq = None
+
+    def set_duty(self, duty, period=None):
+        self.duty = _clamp_duty(duty)
+        if period is not None and period > 0:
+            self.period = float(period)
+        freq = int(round(1.0 / self.period))
+        if freq != self._freq:
+            self._pi.set_PWM_frequency(self._gpio, freq)
+            self._freq = freq
+        self._pi.set_PWM_dutycycle(self._gpio, int(round(self.duty * self.RANGE)))
+
+    def close(self):
+        try:
+            self._pi.set_PWM_dutycycle(self._gpio, 0)
+            self._pi.write(self._gpio, 0)
+            self._pi.stop()
+        except Exception as e:
+            print(f"error closing pigpio heater: {e}")
+
+
+class GatedHeater(HeaterActuator):
+    """Envuelve otro actuador y lo fuerza a 0 mientras el gate está cerrado.
+
+    El lazo sigue fijando su duty (se guarda y se re-aplica al abrir el gate), así
+    que un PI que ve bajar la temperatura compensa en los tramos abiertos. Lo
+    cierra LightGatePin mientras el LED de fluorescencia está encendido, para que
+    la luz del calefactor no entre al fotodetector (docs/pcr_fluor_overlap.md)."""
+
+    def __init__(self, heater):
+        super().__init__(heater.period)
+        self.inner = heater
+        self.backend = heater.backend
+        self.duty = heater.duty
+        self.gated = False
+        self._lock = threading.Lock()
+
+    def set_duty(self, duty, period=None):
+        with self._lock:
+            self.duty = _clamp_duty(duty)
+            if period is not None and period > 0:
+                self.period = float(period)
+            self.inner.set_duty(0.0 if self.gated else self.duty, period)
+
+    def gate(self, closed):
+        with self._lock:
+            closed = bool(closed)
+            if closed == self.gated:
+                return
+            self.gated = closed
+            self.inner.set_duty(0.0 if closed else self.duty)
+
+    def close(self):
+        self.inner.close()
+
+
+class LightGatePin:
+    """Pin con write(bool) que además cierra el gate de un GatedHeater mientras
+    está en alto (el LED de excitación)."""
+
+    def __init__(self, pin, heater):
+        self.pin = pin
+        self.heater = heater
+
+    @property
+    def level(self):
+        return self.pin.level
+
+    def write(self, value):
+        # El calefactor se apaga antes de encender el LED y vuelve después de
+        # apagarlo: ninguna muestra iluminada lo ve encendido.
+        if value:
+            self.heater.gate(True)
+            self.pin.write(True)
+        else:
+            self.pin.write(False)
+            self.heater.gate(False)
+
+    def close(self):
+        self.pin.write(False)
+        self.heater.gate(False)
+
+
+def make_heater(gpio, chip="/dev/gpiochip0", backend="software", period=0.1,
+                consumer="led-heating", fallback=False):
+    """Crea el actuador del backend pedido. Si no se puede (librería ausente,
+    pigpiod caído, línea ocupada) lanza RuntimeError, salvo con fallback=True: ahí
+    avisa y usa el PWM software sobre libgpiod, que bajo carga no temporiza mejor
+    que el lazo inline (docs/heater_pwm.md)."""
+    if backend == "fake":
+        return SoftwarePwmHeater(RecordingPin(), period)
+    try:
+        if backend == "lgpio":
+            return LgpioPwmHeater(gpio, chip=chip, period=period)
+        if backend == "pigpio":
+            return PigpioPwmHeater(gpio, period=period)
+    except Exception as e:
+        if not fallback:
+            raise RuntimeError(
+                f"Heater backend '{backend}' unavailable ({e}); set heater_backend to "
+                "'software' or enable heater_software_fallback"
+            ) from e
+        print(f"WARNING: heater backend '{backend}' unavailable ({e}); using software "
+              "PWM (period jitter under load, see docs/heater_pwm.md)")
+    from Drivers.DriverGPIO import GPIOPin
+
+    pin = GPIOPin(gpio, chip=chip, consumer=consumer, active_low=False)
+    pin.set_output(initial_high=False)
+    return SoftwarePwmHeater(pin, period)
+
+
+def pwm_jitter(edges, period, duty):
+    """Error de temporización de un tren PWM grabado por RecordingPin.
+
+    Devuelve dict con, en ms: error medio/p95/máx del periodo (subida a subida) y
+    del tramo ON (subida a bajada), más el duty medido. None si hay < 2 ciclos."""
+    rises = [t for t, lv in edges if lv]
+    falls = [t for t, lv in edges if not lv]
+    if len(rises) < 3:
+        return None
+    periods = [b - a for a, b in zip(rises, rises[1:])]
+    ons = []
+    for r in rises[:-1]:  # el último ciclo puede estar cortado por close()/off()
+        i = bisect.bisect_right(falls, r)
+        if i < len(falls):
+            ons.append(falls[i] - r)
+
+    def stats(values, target):
+        err = sorted(abs(v - target) * 1e3 for v in values)
+        return (
+            sum(err) / len(err),
+            err[min(len(err) - 1, int(0.95 * len(err)))],
+            err[-1],
+        )
+
+    p_mean, p_95, p_max = stats(periods, period)
+    o_mean, o_95, o_max = stats(ons, duty * period)
+    return {
+        "period_err_mean_ms": p_mean,
+        "period_err_p95_ms": p_95,
+        "period_err_max_ms": p_max,
+        "on_err_mean_ms": o_mean,
+        "on_err_p95_ms": o_95,
+        "on_err_max_ms": o_max,
+        "duty": sum(ons) / sum(periods),
+    }
@@ -6,6 +6,7 @@ import gpiod  # pyrefly: ignore
 import serial
 from gpiod.line import Direction, Value  # pyrefly: ignore
 
+from Drivers.StepperTelemetry import StatTracker
 from templates.constants import serial_port_encoder
 
 __author__ = "Edisson A. Naula"
@@ -25,6 +26,8 @@ def spinMotorRPM_ramped(
     time_exp=None,
     stop_func=None,  # función opcional; True => detener
     stop_event=None,
+    home: bool = True,  # False: sin go_zero; el paro se confirma por STAT
+    running: bool = False,  # True: el motor ya gira (pre-spin); no repite MODO:1
 ):
     """
     Gira el motor a 'setpoint_rpm' con rampa trapezoidal ejecutada EN EL
@@ -34,6 +37,12 @@ def spinMotorRPM_ramped(
     (|rpm|/accel), NO por telemetría, para que una pérdida de UART no deje el
     frenado a medias (la rampa host-side se descartó por esa razón).
     Al final regresa el disco a la marca de cero (go_zero) como siempre.
+    Con home=False no hay go_zero: el paro se confirma con la telemetría STAT
+    (wait_stopped), acotada por el mismo tiempo calculado si la UART calla, y el
+    homing queda para quien llama (drv.home / drv.wait_homed; ver
+    docs/pcr_deferred_homing.md).
+    Con running=True el giro ya lo arrancó quien llama (el pre-spin del PCR,
+    docs/pcr_prespin.md): solo se espera la condición de paro.
 
     direction: "CW" o "CCW"
     setpoint_rpm: objetivo en RPM (positivo; la dirección fija el signo)
@@ -58,8 +67,9 @@ def spinMotorRPM_ramped(
     if ts <= 0:
         ts = 0.1  # fallback
 
-    drv.set_init_vals(pos_deg=0.0, rpm=0.0)
-    drv.run_rpm(target, accel)  # un solo comando: la rampa corre en el Pico
+    if not running:
+        drv.set_init_vals(pos_deg=0.0, rpm=0.0)
+        drv.run_rpm(target, accel)  # un solo comando: la rampa corre en el Pico
     start_time = time.perf_counter()
     while not stop_event.is_set():
         if stop_func is not None and stop_func():
@@ -70,6 +80,20 @@ def spinMotorRPM_ramped(
             break
         time.sleep(ts)
 
+    if not home:
+        t_stop = time.time()
+        if soft_stop:
+            drv.stop()
+            bound = abs(target) / accel + 0.5 if accel > 0 else 0.5
+        else:
+            drv.stop_hard()
+            bound = 0.5
+        if not drv.wait_stopped(bound, since=t_stop):
+            print("[spinMotorRPM_ramped] no STAT confirmation of the stop; continuing.")
+        status = drv.get_status()
+        print(f"Stopped (no homing)--> pos: {status.get('pos_deg'):.2f}°, rpm: {status.get('rpm'):.2f}")
+        return True
+
     if soft_stop:
         drv.stop()  # STOP:0 => el firmware frena en rampa
         if accel > 0:
@@ -247,12 +271,9 @@ class DriverStepperSys:
         self._last_ack = None  # último ACK completo (str)
         self._last_mode = "STOP"
 
-        self._stat_lock = threading.Lock()
-        self._last_status = {
-            "pos_deg": 0.0,
-            "rpm": 0.0,
-            "ts": time.time(),
-        }
+        # Último STAT + esperas por telemetría (Drivers/StepperTelemetry.py)
+        self._stat = StatTracker()
+        self._home_t = None  # time.time() del último home() sin confirmar
 
         self._running = True
         self._rx_thread = threading.Thread(target=self._reader_loop, daemon=False)
@@ -282,7 +303,7 @@ class DriverStepperSys:
 
     def set_init_vals(self, pos_deg=0.0, rpm=0.0):
         """Inicializa el estado interno (útil para sincronizar al arrancar)."""
-        self._last_status.update({"pos_deg": pos_deg, "rpm": rpm, "ts": time.time()})
+        self._stat.reset(pos_deg, rpm)
 
     # --------------------- Comunicación UART ---------------------
     def _send_line(self, s: str):
@@ -304,8 +325,7 @@ class DriverStepperSys:
                 _, pos_s, rpm_s = line.split(":")
                 pos = float(pos_s)
                 rpm = float(rpm_s)
-                with self._stat_lock:
-                    self._last_status.update({"pos_deg": pos, "rpm": rpm, "ts": time.time()})
+                self._stat.update(pos, rpm)
                 # print("Estado actualizado:", self._last_status)
             except Exception:
                 pass
@@ -427,6 +447,36 @@ class DriverStepperSys:
         self._cmd_mode(6, rpm, 0)
         return True
 
+    def home(self, rpm: float = 50.0) -> bool:
+        """go_zero sin esperar; wait_homed() confirma la llegada por STAT."""
+        self._home_t = time.time()
+        return self.go_zero(rpm)
+
+    @property
+    def home_pending(self) -> bool:
+        return self._home_t is not None
+
+    def wait_stopped(self, timeout: float, since: float | None = None, stop_event=None) -> bool:
+        """True cuando dos STAT posteriores a since reportan |rpm| ~ 0."""
+        return self._stat.wait_quiet(timeout, quiet_s=0.1, since=since, stop_event=stop_event)
+
+    def wait_spun_up(self, rpm: float, timeout: float, since: float | None = None, stop_event=None):
+        """ts del primer STAT posterior a since con |rpm| >= rpm, o None."""
+        return self._stat.wait_rpm(abs(rpm), timeout, since=since, stop_event=stop_event)
+
+    def wait_homed(self, timeout: float = 15.0, quiet_s: float = 1.0, stop_event=None) -> bool:
+        """Espera el fin del último home(): motor quieto durante quiet_s según los
+        STAT posteriores al comando. quiet_s cubre el arranque del homing en el
+        Pico (como las tres lecturas en cero cada 0.5 s de spinMotorRPM_ramped).
+        Sin home() pendiente devuelve True en el acto. Si vence el timeout el
+        homing se da por perdido (el del Pico expira a los 5 s)."""
+        if self._home_t is None:
+            return True
+        ok = self._stat.wait_quiet(timeout, quiet_s=quiet_s, since=self._home_t, stop_event=stop_event)
+        if ok or stop_event is None or not stop_event.is_set():
+            self._home_t = None
+        return ok
+
     def run_sweep(self, angle: float, speed_hz: float):
         if speed_hz <= 0.0:
             self._cmd_stop()
@@ -449,18 +499,18 @@ class DriverStepperSys:
         Devuelve un snapshot del último 'STAT' recibido:
         {'pos_deg': float, 'rpm': float, 'ts': epoch_seg}
         """
-        with self._stat_lock:
-            # position with -sign after 180 degrees and + before 180
-            if self._last_status["pos_deg"] % 360 > 180:
-                pos = self._last_status["pos_deg"] % 360 - 360
-            else:
-                pos = self._last_status["pos_deg"] % 360
-            data_out = {
-                "pos_deg": pos,
-                "rpm": self._last_status["rpm"],
-                "ts": self._last_status["ts"],
-            }
-            return data_out
+        last = self._stat.snapshot()
+        # position with -sign after 180 degrees and + before 180
+        if last["pos_deg"] % 360 > 180:
+            pos = last["pos_deg"] % 360 - 360
+        else:
+            pos = last["pos_deg"] % 360
+        data_out = {
+            "pos_deg": pos,
+            "rpm": last["rpm"],
+            "ts": last["ts"],
+        }
+        return data_out
 
     def close(self):
         """Cierra UART y libera recursos GPIO."""
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Event loop asyncio del transporte EmStat, compartido por el proceso.
+
+Cada corrida de EventPlotter tenía su hilo EmstatProcessor (además del lector del
+RelayLink, docs/emstat_tcp_link.md). El procesador sondeaba la cola TCP y el ring
+UDP con get_nowait en ráfagas de 256 y dormía 10 ms sin datos: hasta 10 ms de
+latencia por mensaje y un hilo más compitiendo por el GIL por cada frame cacheado
+(CV/SWV/EIS/CA). EmstatEngine corre UN event loop en un hilo daemon
+(get_emstat_engine()):
+  - la sesión TCP del RelayLink son streams asyncio del loop (lector, heartbeat y
+    reconexión son tareas).
+  - el procesador de cada corrida es una tarea que espera un asyncio.Event: la
+    despiertan la línea TCP (en el loop) y el tap UDP (hilo del hub 5005, que se
+    queda porque lo comparten los lectores de temperatura) con un Wakeup.
+  - los watchdogs son loop.call_later.
+Ver docs/emstat_async_engine.md.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Callable
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:30 $"
+
+
+class Wakeup:
+    """Despertador coalescente hacia el loop: set() desde cualquier hilo agenda UN
+    callback(); las llamadas que llegan antes de que corra se funden en esa."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, callback: Callable[[], None]):
+        self._loop = loop
+        self._callback = callback
+        self._pending = False
+        self._lock = threading.Lock()
+        self.calls = 0  # callbacks agendados (ráfagas, no frames)
+
+    def set(self):
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+            self.calls += 1
+        try:
+            self._loop.call_soon_threadsafe(self._fire)
+        except RuntimeError:  # loop cerrado (salida del proceso)
+            pass
+
+    def _fire(self):
+        with self._lock:
+            self._pending = False
+        self._callback()
+
+
+class EmstatEngine:
+    """Un event loop asyncio en un hilo de fondo, con puentes sync -> loop."""
+
+    def __init__(self, name: str = "EmstatEngine"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._ready = threading.Event()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Agenda una corrutina en el loop; devuelve un Future de concurrent."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Corre la corrutina en el loop y espera su resultado (no desde el loop)."""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("EmstatEngine.run() called from the engine loop")
+        return self.submit(coro).result(timeout)
+
+    def call(self, fn: Callable, *args, timeout: float = 5.0):
+        """Llama fn(*args) en el loop y devuelve su resultado; directo si ya se está
+        en el loop (stop() puede venir de una tarea del motor)."""
+        if self.in_loop():
+            return fn(*args)
+        fut = concurrent.futures.Future()
+
+        def _call():
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+        self.loop.call_soon_threadsafe(_call)
+        return fut.result(timeout)
+
+    def call_soon(self, fn: Callable, *args):
+        """Agenda fn(*args) en el loop sin esperar (thread-safe)."""
+        if self.in_loop():
+            self.loop.call_soon(fn, *args)
+        else:
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def wakeup(self, callback: Callable[[], None]) -> Wakeup:
+        return Wakeup(self.loop, callback)
+
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_emstat_engine() -> EmstatEngine:
+    """Motor compartido del proceso (se arranca con el primer uso)."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = EmstatEngine().start()
+        return _ENGINE
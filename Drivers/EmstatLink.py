@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""Conexión TCP de control compartida con el relay Wemos (puerto 5006).
+
+EventPlotter.start abría un socket nuevo por corrida y lo cerraba en stop: cada
+corrida pagaba el connect y el Wemos, que tiene un solo slot de cliente, reciclaba
+el cliente viejo (tcp_client_dropped / tcp_new_client en los wemos_dbg). RelayLink
+mantiene UNA sesión por (ip, puerto) en el proceso (get_relay_link), compartida
+por los frames CV/SWV/EIS/CA:
+  - un BufferedProtocol en el loop del EmstatEngine (docs/emstat_async_engine.md)
+    recibe directo en el buffer de un LineFramer (docs/emstat_line_reader.md) y
+    entrega cada línea a la corrida dueña de la sesión; fuera de corrida se
+    descartan sin decodificar (hello, FORWARDED, rezagos de la corrida anterior).
+  - heartbeat {"cmd":"PING","type":"keepalive"} cuando no se envió nada en
+    heartbeat_s: el Wemos renueva su idle timeout y el Pico contesta el PING por
+    UDP (pong), sin mensajes EMSTAT que una corrida pudiera tomar por un error.
+  - reconexión con backoff exponencial tras una caída; la corrida en curso recibe
+    on_eof y sigue por el tap UDP, como con el cierre del Wemos.
+  - open_run(): corridas con run_id propio. El Pico no conoce el id (no lo
+    devuelve en los mensajes), así que la multiplexación es por turnos: una sola
+    corrida es dueña de la sesión a la vez, igual que el Pico corre un
+    experimento a la vez.
+Con persistent=False conecta en open_run y cierra al liberar la corrida: el
+comportamiento previo. Ver docs/emstat_tcp_link.md.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from Drivers.EmstatEngine import EmstatEngine, get_emstat_engine
+from Drivers.EmstatUtils import LineFramer
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:10 $"
+
+HEARTBEAT_LINE = b'{"cmd":"PING","type":"keepalive"}\n'
+# Línea más larga aceptada del relay (tamaño del LineFramer): una sesión que la
+# excede se descarta, como con LineBufferedSocketReader.
+LINE_LIMIT = 65536
+
+
+class _RelayProtocol(asyncio.BufferedProtocol):
+    """Sesión del RelayLink: el transporte recibe directo en el LineFramer."""
+
+    def __init__(self, link):
+        self._link = link
+        self._framer = LineFramer(LINE_LIMIT)
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self._framer.get_buffer()  # RuntimeError si una línea no cabe: cierra
+
+    def buffer_updated(self, nbytes):
+        block = self._framer.feed_block(nbytes)
+        if block is not None:
+            self._link._on_block(self.transport, block)
+
+    def eof_received(self):
+        return False  # cierra el transporte -> connection_lost
+
+    def connection_lost(self, exc):
+        self._link._drop(self.transport, "EOF" if exc is None else f"error: {exc}")
+
+
+class RelayRun:
+    """Turno de una corrida sobre la sesión del RelayLink.
+
+    on_line(line) corre en el loop del EmstatEngine con cada línea recibida
+    mientras la corrida es dueña de la sesión; on_eof() una vez si la sesión se
+    cae. Ninguno de los dos debe bloquear."""
+
+    def __init__(self, link, run_id, on_line, on_eof, reused, open_s):
+        self._link = link
+        self.run_id = run_id
+        self.on_line = on_line
+        self.on_eof = on_eof
+        self.reused = reused  # la sesión ya estaba abierta (sin connect)
+        self.open_s = open_s  # latencia de open_run
+        self.lines = 0
+        self.closed = False
+
+    def send(self, obj):
+        self.send_raw((json.dumps(obj) + "\n").encode())
+
+    def send_raw(self, data: bytes):
+        """Envía una línea por la sesión; OSError si la sesión ya no existe."""
+        self._link.send_line(data)
+
+    def close(self):
+        self._link.release(self)
+
+
+class RelayLink:
+    """Sesión TCP de control con el Wemos, compartida entre corridas.
+
+    El estado vive en el loop del EmstatEngine; los métodos públicos son
+    thread-safe y se pueden llamar también desde el loop."""
+
+    def __init__(
+        self,
+        ip: str,
+        port: int = 5006,
+        heartbeat_s: float = 60.0,
+        connect_timeout: float = 3.0,
+        backoff_s: tuple = (0.5, 8.0),
+        persistent: bool = True,
+        engine: Optional[EmstatEngine] = None,
+    ):
+        self.ip = ip
+        self.port = port
+        self.heartbeat_s = float(heartbeat_s)
+        self.connect_timeout = float(connect_timeout)
+        self.backoff_s = backoff_s
+        self.persistent = persistent
+        self._engine = engine or get_emstat_engine()
+        self._transport: Optional[asyncio.Transport] = None
+        self._run: Optional[RelayRun] = None
+        self._next_id = 0
+        self._last_tx = 0.0
+        self._closed = False
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # Un solo connect a la vez (open_run y la reconexión): el Wemos tiene un
+        # slot de cliente y un segundo socket huérfano se lo quitaría a la corrida.
+        self._connect_lock = asyncio.Lock()
+        self.stats = {"connects": 0, "reconnects": 0, "heartbeats": 0, "drops": 0, "idle_lines": 0}
+
+    @property
+    def connected(self) -> bool:
+        return self._transport is not None
+
+    # ---------------------------
+    # Sesión (corre en el loop)
+    # ---------------------------
+    async def _connect(self):
+        """Abre la sesión si no hay una. True si conectó esta llamada; False si otra
+        ya la había abierto (open_run esperando a la reconexión en curso)."""
+        async with self._connect_lock:
+            if self._transport is not None:
+                return False
+            transport = await self._create_connection()
+            if self._transport is not None:
+                # Defensa: nunca dos sesiones. La perdedora se cierra (su
+                # connection_lost no toca la actual: _drop compara el transporte).
+                transport.close()
+                return False
+            self._install(transport)
+            return True
+
+    async def _create_connection(self):
+        loop = self._engine.loop
+        try:
+            transport, _proto = await asyncio.wait_for(
+                loop.create_connection(lambda: _RelayProtocol(self), self.ip, self.port),
+                self.connect_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise OSError(f"connect to {self.ip}:{self.port} timed out") from None
+        return transport
+
+    def _install(self, transport):
+        loop = self._engine.loop
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._closed = False
+        self._transport = transport
+        self._last_tx = time.monotonic()
+        self.stats["connects"] += 1
+        if self._heartbeat_task is None:
+            self._heartbeat_task = loop.create_task(self._heartbeat())
+
+    def _on_block(self, transport, block):
+        """Líneas completas de un recv (bytes separados por '\n'); se decodifican
+        solo si hay corrida dueña."""
+        if transport is not self._transport:
+            return
+        run = self._run
+        if run is None:
+            self.stats["idle_lines"] += block.count(b"\n") + 1
+            return
+        for line in block.decode("utf-8", errors="replace").split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            run.lines += 1
+            run.on_line(line)
+            if self._run is not run:  # on_line liberó la corrida
+                break
+
+    async def _heartbeat(self):
+        while self.persistent or self._transport is not None:
+            wait = self._last_tx + self.heartbeat_s - time.monotonic()
+            if wait > 0.0:
+                await asyncio.sleep(wait)
+                continue
+            if self._transport is None:
+                await asyncio.sleep(self.heartbeat_s)
+                continue
+            try:
+                self._write(HEARTBEAT_LINE)
+                self.stats["heartbeats"] += 1
+            except OSError:
+                pass  # _write ya cerró la sesión
+        self._heartbeat_task = None
+
+    async def _reconnect(self):
+        delay = self.backoff_s[0]
+        try:
+            while self.persistent and not self._closed and self._transport is None:
+                # Backoff también antes del primer intento: un relay que acepta y
+                # corta en el acto no arma un bucle connect/EOF.
+                await asyncio.sleep(delay)
+                if self._transport is not None or self._closed:
+                    break
+                try:
+                    if await self._connect():
+                        self.stats["reconnects"] += 1
+                except OSError as e:
+                    if delay == self.backoff_s[0]:
+                        print(f"[RelayLink] reconnect to {self.ip}:{self.port} failed ({e}); retrying")
+                    delay = min(delay * 2.0, self.backoff_s[1])
+        finally:
+            self._reconnect_task = None
+
+    def _drop(self, transport, reason, quiet=False):
+        """Cierra la sesión `transport` (si sigue siendo la actual) y avisa a la corrida."""
+        if transport is None or self._transport is not transport:
+            return
+        self._transport = None
+        run, self._run = self._run, None
+        self.stats["drops"] += 1
+        transport.close()
+        if not quiet:
+            print(f"[RelayLink] {self.ip}:{self.port} closed ({reason})")
+        if run is not None and run.on_eof is not None:
+            run.on_eof()
+        if self.persistent and not self._closed and self._reconnect_task is None:
+            self._reconnect_task = self._engine.loop.create_task(self._reconnect())
+
+    def _write(self, data: bytes):
+        transport = self._transport
+        if transport is None or transport.is_closing():
+            raise OSError("relay link not connected")
+        try:
+            transport.write(data)
+        except OSError:
+            self._drop(transport, "send error")
+            raise
+        self._last_tx = time.monotonic()
+
+    def send_line(self, data: bytes):
+        self._engine.call(self._write, data)
+
+    # ---------------------------
+    # Corridas
+    # ---------------------------
+    async def _open_run(self, on_line, on_eof):
+        t0 = time.perf_counter()
+        # Si la reconexión está dentro de su connect, _connect espera su lock y
+        # reusa la sesión que abrió en vez de abrir una segunda.
+        reused = not await self._connect()
+        prev, self._run = self._run, None
+        self._next_id += 1
+        run = RelayRun(self, self._next_id, on_line, on_eof, reused, 0.0)
+        self._run = run
+        if prev is not None:
+            print(f"[RelayLink] run {prev.run_id} preempted by run {run.run_id}")
+            if prev.on_eof is not None:
+                prev.on_eof()
+        run.open_s = time.perf_counter() - t0
+        return run
+
+    def open_run(
+        self, on_line: Callable[[str], None], on_eof: Optional[Callable[[], None]] = None
+    ) -> RelayRun:
+        """Toma la sesión para una corrida (conecta si hace falta; OSError si no se
+        puede). Una corrida previa sin liberar pierde la sesión (on_eof), como
+        cuando un cliente nuevo desplazaba al viejo en el Wemos."""
+        # Hasta dos connects: el de la reconexión en curso (se espera) y el propio.
+        return self._engine.run(self._open_run(on_line, on_eof), 2 * self.connect_timeout + 1.0)
+
+    def _release(self, run: RelayRun):
+        run.closed = True
+        if self._run is not run:
+            return
+        self._run = None
+        if not self.persistent and self._transport is not None:
+            self._drop(self._transport, "run released", quiet=True)
+
+    def release(self, run: RelayRun):
+        """Fin de la corrida: la sesión queda libre (o se cierra si no es persistente)."""
+        self._engine.call(self._release, run)
+
+    def _close(self):
+        self._closed = True
+        for name in ("_reconnect_task", "_heartbeat_task"):
+            task = getattr(self, name)
+            setattr(self, name, None)
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+        if self._transport is not None:
+            self._drop(self._transport, "closed", quiet=True)
+
+    def close(self):
+        self._engine.call(self._close)
+
+
+_LINKS: dict = {}
+_LINKS_LOCK = threading.Lock()
+
+
+def get_relay_link(ip: str, port: int = 5006, persistent: bool = True) -> RelayLink:
+    """Sesión compartida del proceso para (ip, port); fija el modo persistente."""
+    with _LINKS_LOCK:
+        link = _LINKS.get((ip, port))
+        if link is None:
+            link = _LINKS[(ip, port)] = RelayLink(ip, port, persistent=persistent)
+        link.persistent = persistent
+        return link
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Recuperación selectiva (NACK) de mensajes EMSTAT perdidos.
+
+El merge TCP+UDP (docs/emstat_live_merge.md) solo rellena un hueco si el otro
+transporte trajo ese seq; lo que se pierde en ambos (_print_coverage: "perdidos
+por AMBOS") queda fuera del dataset. Con "rtx" en el payload, el Pico (DiscPCB
+v2.0) guarda los últimos emstat_data en un ring por seq y reenvía los que el host
+le pide con {"cmd":"NACK","r":[[lo,hi],...]} como
+EMSTAT:{"type":"emstat_rtx","seq":N,"msg":"<payload original>"}; los que ya no
+están en el ring vuelven en {"type":"emstat_rtx_miss","seqs":[...]}.
+
+NackTracker lleva la cuenta del lado del host: qué seq faltan, desde cuándo y
+cuántas veces se pidieron. Un hueco se pide tras hold_s (da tiempo al UDP, que
+puede llegar después que el TCP), se repite cada retry_s y se abandona tras
+max_tries o un emstat_rtx_miss. Tras el terminal de la corrida (end()) los huecos
+de la cola se piden sin esperar. Ver docs/emstat_nack.md.
+"""
+import time
+
+from Drivers.EmstatRunStore import SEQ_MAX_JUMP
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:50 $"
+
+# Tope de rangos por NACK: la línea de comando cabe holgada en el rx_buffer (4096 B)
+# del Pico; lo que no entra sale en el siguiente tick.
+NACK_MAX_RANGES = 16
+# Tope de seq por NACK: igual a RTX_MAX_PER_NACK del firmware, que no reenvía más
+# por pedido (una ráfaga mayor desborda el RX del Wemos).
+NACK_MAX_SEQS = 16
+
+
+def seq_ranges(seqs, max_ranges=NACK_MAX_RANGES, max_seqs=NACK_MAX_SEQS):
+    """Seqs ordenados -> [[lo, hi], ...] contiguos (inclusive), hasta max_ranges
+    rangos y max_seqs seq en total."""
+    out = []
+    for n, s in enumerate(seqs):
+        if n == max_seqs:
+            break
+        if out and s == out[-1][1] + 1:
+            out[-1][1] = s
+        elif len(out) == max_ranges:
+            break
+        else:
+            out.append([s, s])
+    return out
+
+
+class NackTracker:
+    """Huecos de seq de la corrida en curso (cualquier transporte)."""
+
+    def __init__(self, hold_s=0.25, retry_s=0.5, max_tries=3, clock=time.monotonic):
+        self.hold_s = float(hold_s)
+        self.retry_s = float(retry_s)
+        self.max_tries = int(max_tries)
+        self._clock = clock
+        self.reset()
+
+    def reset(self):
+        self._hi = 0  # emstat_start lleva seq 0: los datos arrancan en 1
+        self._gaps = {}  # seq -> [visto_faltar, intentos, último_nack]
+        self._ended = False
+        self.stats = {"gaps": 0, "nacked": 0, "recovered": 0, "given_up": 0, "rejected": 0}
+
+    def observe(self, seq):
+        """Llegó el mensaje `seq` (original o retransmitido, cualquier transporte)."""
+        if seq > self._hi:
+            if seq - self._hi > SEQ_MAX_JUMP:
+                # Seq corrupto o ajeno: abriría un hueco por cada seq intermedio.
+                self.stats["rejected"] += 1
+                return
+            if seq > self._hi + 1:
+                now = self._clock()
+                for s in range(self._hi + 1, seq):
+                    self._gaps[s] = [now, 0, 0.0]
+                self.stats["gaps"] += seq - self._hi - 1
+            self._hi = seq
+            return
+        gap = self._gaps.pop(seq, None)
+        if gap is not None and gap[1]:
+            self.stats["recovered"] += 1
+
+    def end(self, seq):
+        """Terminal de la corrida con su seq: todo lo anterior ya debió llegar."""
+        self.observe(seq)
+        self._ended = True
+
+    def give_up(self, seqs):
+        """El Pico ya no tiene estos seq (emstat_rtx_miss)."""
+        for s in seqs:
+            if self._gaps.pop(s, None) is not None:
+                self.stats["given_up"] += 1
+
+    def pending(self):
+        return len(self._gaps)
+
+    def due(self):
+        """Rangos a pedir ahora. Marca el intento; abandona los agotados."""
+        now = self._clock()
+        hold = 0.0 if self._ended else self.hold_s
+        ask = []
+        for s, gap in list(self._gaps.items()):
+            first, tries, last = gap
+            if tries == 0:
+                if now - first < hold:
+                    continue
+            elif now - last < self.retry_s:
+                continue
+            if tries >= self.max_tries:
+                del self._gaps[s]
+                self.stats["given_up"] += 1
+                continue
+            ask.append(s)
+        ask.sort()
+        ranges = seq_ranges(ask)
+        for lo, hi in ranges:
+            for s in range(lo, hi + 1):
+                gap = self._gaps[s]
+                gap[1] += 1
+                gap[2] = now
+                self.stats["nacked"] += 1
+        return ranges
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""Almacenamiento columnar de corridas EmStat (reemplaza las listas de dicts).
+
+- EmstatRunStore: filas BATCH_DTYPE + run/source en un array estructurado que
+  crece por duplicación (append O(1) amortizado). Es lo que se guarda en CSV y
+  siembra las pestañas de análisis.
+- SeqMergeBuffer: unión TCP+UDP de la corrida en curso indexada por seq, primer
+  transporte que trae un seq gana. Reconcilia en vivo: decide qué filas entran ya
+  al dataset (las del primario y los rellenos de sus huecos) y al cerrar solo quedan
+  los huecos de la cola.
+- XYLineBuffer: x/y (+seq) de una traza del plot en vivo; entrega vistas (sin
+  copia) de los últimos max_points a matplotlib e inserta rellenos en su lugar.
+Ver docs/emstat_run_store.md y docs/emstat_live_merge.md.
+"""
+import numpy as np
+
+from Drivers.EmstatUtils import BATCH_DTYPE, BATCH_PHASES
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 14:10 $"
+
+# "rtx": filas retransmitidas por el Pico a pedido del host (docs/emstat_nack.md).
+SOURCES = ("tcp", "udp", "rtx")
+STORE_DTYPE = np.dtype(BATCH_DTYPE.descr + [("run", np.int32), ("source", np.int8)])
+# Salto máximo de seq sobre el mayor visto: el seq llega de la red (UDP broadcast o
+# JSON) y dimensiona el buffer del merge; un datagrama corrupto o ajeno con seq ~1e9
+# pediría GB de filas. 65536 paquetes cubren de sobra una ráfaga perdida real.
+SEQ_MAX_JUMP = 65536
+_FLOAT_COLS = tuple(n for n in BATCH_DTYPE.names if BATCH_DTYPE[n].kind == "f")
+
+
+def rows_from_events(events):
+    """Eventos "data" del camino escalar (feed_raw/feed_parsed) -> filas BATCH_DTYPE,
+    con las mismas convenciones que feed_many (NaN = ausente, status OR, -1)."""
+    out = np.zeros(len(events), dtype=BATCH_DTYPE)
+    for name in _FLOAT_COLS:
+        out[name] = np.nan
+    out["status"] = -1
+    out["current_range"] = -1
+    out["seq"] = -1
+    for i, ev in enumerate(events):
+        row = out[i : i + 1]
+        for name in _FLOAT_COLS:
+            if name in ev:
+                row[name] = ev[name]
+        for name in ("seq", "cycle", "direction"):
+            if ev.get(name) is not None:
+                row[name] = ev[name]
+        status = ev.get("status") or []
+        if status:
+            acc = 0
+            for v in status:
+                acc |= v
+            row["status"] = acc
+        ranges = ev.get("current_range") or []
+        if ranges:
+            row["current_range"] = ranges[0]
+        phase = ev.get("phase", "")
+        if phase in BATCH_PHASES:
+            row["phase"] = BATCH_PHASES.index(phase)
+    return out
+
+
+class _Growable:
+    """Array 1-D con capacidad que se duplica; self._buf[:self._n] son los datos."""
+
+    def __init__(self, dtype, capacity=1024):
+        self._buf = np.empty(capacity, dtype=dtype)
+        self._n = 0
+        self._capacity0 = capacity
+
+    def __len__(self):
+        return self._n
+
+    def _reserve(self, n):
+        if n > len(self._buf):
+            cap = len(self._buf)
+            while cap < n:
+                cap *= 2
+            buf = np.empty(cap, dtype=self._buf.dtype)
+            buf[: self._n] = self._buf[: self._n]
+            self._buf = buf
+
+    def clear(self):
+        """Vacía y devuelve la memoria de corridas largas (vuelve a la capacidad inicial)."""
+        self._n = 0
+        if len(self._buf) > self._capacity0:
+            self._buf = np.empty(self._capacity0, dtype=self._buf.dtype)
+
+
+class EmstatRunStore(_Growable):
+    """Dataset de todas las corridas retenidas (transporte elegido o merge final)."""
+
+    def __init__(self, capacity=4096):
+        super().__init__(STORE_DTYPE, capacity)
+
+    def append(self, rows, run, source):
+        """Agrega filas BATCH_DTYPE (o STORE_DTYPE) etiquetadas con run/source."""
+        k = len(rows)
+        if not k:
+            return
+        self._reserve(self._n + k)
+        dst = self._buf[self._n : self._n + k]
+        for name in BATCH_DTYPE.names:
+            dst[name] = rows[name]
+        dst["run"] = run
+        dst["source"] = SOURCES.index(source) if isinstance(source, str) else source
+        self._n += k
+
+    def insert_sorted(self, start, rows):
+        """Coloca rows (STORE_DTYPE, ordenadas por seq) en la porción [start:] que se
+        mantiene ordenada por seq. Lo normal es anexar; un relleno que cae atrás solo
+        desplaza la cola que quedó después de él (O(distancia), no O(n))."""
+        k = len(rows)
+        if not k:
+            return
+        tail = self._buf[start : self._n]
+        first = rows["seq"][0]
+        if first < 0 or not len(tail) or first > tail["seq"][-1]:
+            self._reserve(self._n + k)
+            self._buf[self._n : self._n + k] = rows
+            self._n += k
+            return
+        # Los seq de la corrida son únicos: a lo sumo (último - first) filas quedan
+        # después del relleno, así que basta buscar en esa ventana de la cola (el
+        # campo seq es una vista con stride; searchsorted lo copiaría entero).
+        w = min(len(tail), int(tail["seq"][-1] - first) + 1)
+        pos = np.searchsorted(tail["seq"][-w:], rows["seq"]) + (len(tail) - w)
+        p0 = start + int(pos[0])
+        merged = np.insert(self._buf[p0 : self._n], pos - pos[0], rows)
+        self._reserve(self._n + k)
+        self._buf[p0 : self._n + k] = merged
+        self._n += k
+
+    def replace_from(self, start, rows):
+        """Reemplaza todo desde start (p.ej. la corrida actual) por rows (STORE_DTYPE)."""
+        start = min(start, self._n)
+        self._reserve(start + len(rows))
+        self._buf[start : start + len(rows)] = rows
+        self._n = start + len(rows)
+
+    def rows(self, start=0):
+        """Vista (sin copia) de las filas desde start. Válida hasta el próximo append."""
+        return self._buf[start : self._n]
+
+    def has_values(self, name):
+        """True si alguna fila trae la magnitud (columna float no-NaN, o phase != "")."""
+        col = self._buf[: self._n][name]
+        if col.dtype.kind == "f":
+            return bool((~np.isnan(col)).any())
+        return bool((col != 0).any())
+
+    def nbytes(self):
+        return self._buf.nbytes
+
+
+class SeqMergeBuffer:
+    """Unión por seq de ambos transportes para la corrida en curso (first wins), con
+    reconciliación en vivo contra el transporte primario (el que se grafica).
+
+    Los seq son contiguos por corrida, así que las filas viven en un array indexado
+    por seq (slot = seq) con bitmaps de presencia (_have) y de colocadas (_placed):
+    la unión ordenada es slots[_have], sin ordenar. add() devuelve las filas que
+    deben entrar YA al dataset/plot:
+      - primario: sus filas nuevas, más lo que el otro transporte trajo para los seq
+        que el primario acaba de saltear (huecos detrás de su cabeza, _hi);
+      - otro transporte: solo rellenos de huecos que el primario ya dejó atrás; lo
+        que viene adelantado espera a que el primario pase (o no) por ese seq.
+    flush() entrega lo pendiente al cerrar (huecos de la cola) y release() suelta el
+    primario cuando su transporte se cierra antes de tiempo (TCP cortado por el
+    Wemos): desde ahí el otro transporte se coloca directo."""
+
+    def __init__(self, capacity=4096, primary="tcp"):
+        self._capacity0 = capacity
+        self.primary = primary
+        self.clear()
+
+    def clear(self, primary=None):
+        if primary is not None:
+            self.primary = primary
+        self._slots = np.empty(self._capacity0, dtype=STORE_DTYPE)
+        self._have = np.zeros(self._capacity0, dtype=bool)
+        self._placed = np.zeros(self._capacity0, dtype=bool)
+        self._primary_seen = np.zeros(self._capacity0, dtype=bool)
+        self._n = 0
+        self._hi = -1  # mayor seq visto por el primario
+        self._top = 0  # mayor seq guardado (cualquier transporte)
+        self.rejected = 0  # filas descartadas por seq fuera de rango (SEQ_MAX_JUMP)
+        self.released = False
+
+    def __len__(self):
+        return self._n
+
+    def _grow(self, top):
+        if top <= len(self._have):
+            return
+        cap = max(top, 2 * len(self._have))
+        slots = np.empty(cap, dtype=STORE_DTYPE)
+        slots[: len(self._slots)] = self._slots
+        self._slots = slots
+        for name in ("_have", "_placed", "_primary_seen"):
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=bool)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, rows, source):
+        """Agrega las filas cuyo seq aún no se vio (seq < 0 se ignora, como antes un
+        evento sin seq) y retorna, ordenadas por seq, las que hay que colocar ya. Un
+        seq más de SEQ_MAX_JUMP por encima del mayor guardado también se ignora (y se
+        cuenta en rejected): no es de esta corrida."""
+        seq = rows["seq"]
+        valid = seq >= 0
+        far = valid & (seq > self._top + SEQ_MAX_JUMP)
+        if far.any():
+            self.rejected += int(far.sum())
+            valid &= ~far
+        if not valid.any():
+            return self._slots[:0]
+        top = int(seq[valid].max())
+        self._grow(top + 1)
+        self._top = max(self._top, top)
+        keep = valid & ~self._have[np.where(valid, seq, 0)]
+        # Duplicados dentro del mismo lote: gana la primera aparición. (Un lote en
+        # orden estricto -- el caso normal -- no puede traerlos.)
+        idx = np.flatnonzero(keep)
+        if len(idx) > 1 and not (np.diff(seq[idx]) > 0).all():
+            _, first = np.unique(seq[idx], return_index=True)
+            idx = idx[np.sort(first)]
+        new = seq[idx]
+        if len(idx):
+            slots = self._slots
+            for name in BATCH_DTYPE.names:
+                slots[name][new] = rows[name][idx]
+            slots["source"][new] = SOURCES.index(source)
+            self._have[new] = True
+            self._n += len(idx)
+        if source == self.primary:
+            self._primary_seen[seq[valid]] = True
+            hi = top
+            lo = self._hi + 1
+            place = new[new < lo]  # llegada tardía del primario (UDP reordena)
+            if hi >= lo:
+                # Todo lo presente y sin colocar en el tramo que el primario acaba de
+                # cubrir: sus filas nuevas y lo que el otro trajo por adelantado.
+                span = np.flatnonzero(self._have[lo : hi + 1] & ~self._placed[lo : hi + 1])
+                place = np.concatenate((place, span + lo))
+                self._hi = hi
+        elif self.released:
+            place = new
+        else:
+            place = new[new <= self._hi]
+        return self._take(np.sort(place))
+
+    def _take(self, place):
+        place = place[~self._placed[place]]
+        self._placed[place] = True
+        return self._slots[place]
+
+    def recovered(self):
+        """Cuántos seq de la unión no trajo el primario (rellenados por el otro)."""
+        return int((self._have & ~self._primary_seen).sum())
+
+    def flush(self):
+        """Filas aún sin colocar (el otro transporte las trajo y el primario nunca
+        llegó a ese seq: huecos de la cola). Ordenadas por seq."""
+        return self._take(np.flatnonzero(self._have & ~self._placed))
+
+    def release(self):
+        """El primario no traerá más datos: coloca lo pendiente y desde aquí el otro
+        transporte se coloca directo."""
+        self.released = True
+        return self.flush()
+
+    def union(self):
+        """Copia de la unión ordenada por seq (slots presentes; no requiere ordenar)."""
+        return self._slots[np.flatnonzero(self._have)]
+
+    def fill_context(self, rows, interp=()):
+        """Contexto de filas que llegan fuera de orden (retransmisiones): cycle y
+        direction del vecino presente de menor seq (o del mayor, si no hay). Las
+        columnas de interp (p.ej. t_s sintetizado de CA) se interpolan por seq entre
+        ambos vecinos; sin los dos quedan en NaN."""
+        have = np.flatnonzero(self._have)
+        slots = self._slots
+        for i, seq in enumerate(rows["seq"].tolist()):
+            k = int(np.searchsorted(have, seq))
+            prev = int(have[k - 1]) if k > 0 else None
+            if k < len(have) and have[k] == seq:
+                k += 1
+            nxt = int(have[k]) if k < len(have) else None
+            ref = prev if prev is not None else nxt
+            if ref is None:
+                continue
+            for name in ("cycle", "direction"):
+                rows[name][i] = slots[name][ref]
+            for name in interp:
+                val = np.nan
+                if prev is not None and nxt is not None:
+                    a, b = slots[name][prev], slots[name][nxt]
+                    val = a + (b - a) * (seq - prev) / (nxt - prev)
+                rows[name][i] = val
+        return rows
+
+
+class XYLineBuffer:
+    """x/y de una traza del plot en vivo. Sustituye al par de deque(maxlen). Guarda
+    también el seq de cada punto para insertar en su lugar los rellenos que llegan
+    tarde por el otro transporte."""
+
+    def __init__(self, max_points, capacity=1024):
+        self.max_points = max_points
+        self._x = _Growable(np.float64, capacity)
+        self._y = _Growable(np.float64, capacity)
+        self._s = _Growable(np.int64, capacity)
+
+    def __len__(self):
+        return len(self._x)
+
+    def append(self, xs, ys, seqs=None):
+        """Agrega puntos (ordenados por seq). Si alguno cae antes del último punto,
+        se insertan en su lugar desplazando solo la cola posterior."""
+        k = len(xs)
+        if not k:
+            return
+        if seqs is None:
+            seqs = np.full(k, -1, dtype=np.int64)
+        n = len(self._x)
+        # Sin tope, el buffer crecería con toda la corrida aunque solo se dibujen los
+        # últimos max_points: compacta cuando el excedente supera el tope.
+        if self.max_points and n > 2 * self.max_points:
+            keep = self.max_points
+            for g in (self._x, self._y, self._s):
+                g._buf[:keep] = g._buf[n - keep : n]
+                g._n = keep
+            n = keep
+        cur = self._s._buf[:n]
+        if seqs[0] < 0 or not n or seqs[0] > cur[-1]:
+            p0, pos = n, None
+        else:
+            pos = np.searchsorted(cur, seqs)
+            p0 = int(pos[0])
+        for g, vals in ((self._x, xs), (self._y, ys), (self._s, seqs)):
+            g._reserve(n + k)
+            if pos is None:
+                g._buf[n : n + k] = vals
+            else:
+                g._buf[p0 : n + k] = np.insert(g._buf[p0:n], pos - p0, vals)
+            g._n = n + k
+
+    def view(self):
+        """(xs, ys) de los últimos max_points, como vistas del buffer."""
+        n = len(self._x)
+        lo = max(0, n - self.max_points) if self.max_points else 0
+        return self._x._buf[lo:n], self._y._buf[lo:n]
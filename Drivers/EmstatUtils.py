@@ -1,7 +1,12 @@
+import binascii
 import json
 import math
 import os
 import re
+import struct
+from itertools import groupby
+
+import numpy as np
 
 # ------function utilities------------
 def construct_header_experiment(
@@ -396,6 +401,37 @@ def construct_ca_script(
     return script
 
 
+# Tablas para el decodificador por lotes (EmstatStreamParser.feed_many)
+_HEX_LUT = np.full(256, -1, dtype=np.int64)
+for _i, _c in enumerate(b"0123456789ABCDEF"):
+    _HEX_LUT[_c] = _i
+for _i, _c in enumerate(b"abcdef"):
+    _HEX_LUT[_c] = 10 + _i
+
+# Columnas de feed_many. Las magnitudes ausentes en el paquete quedan en NaN (el
+# camino escalar simplemente no pone la clave). phase: índice en BATCH_PHASES.
+BATCH_DTYPE = np.dtype(
+    [
+        ("seq", np.int64),
+        ("cycle", np.int32),
+        ("direction", np.int8),
+        ("E_V", np.float64),
+        ("I_A", np.float64),
+        ("I_A_F", np.float64),
+        ("I_A_R", np.float64),
+        ("freq_Hz", np.float64),
+        ("Z_real", np.float64),
+        ("Z_imag", np.float64),
+        ("Z_mod", np.float64),
+        ("t_s", np.float64),
+        ("status", np.int32),
+        ("current_range", np.int32),
+        ("phase", np.int8),
+    ]
+)
+BATCH_PHASES = ("", "pretreatment", "sweep")
+
+
 class EmstatStreamParser:
     """
     Parser general de streams EmStat (CV, SWV, EIS, etc.)
@@ -444,6 +480,11 @@ class EmstatStreamParser:
         "G": 1e9,
         "T": 1e12,
     }
+    # UNIT_MAP indexado por byte (unidad desconocida -> 1, como UNIT_MAP.get(u, 1))
+    _UNIT_LUT = np.ones(256)
+    for _u, _scale in UNIT_MAP.items():
+        _UNIT_LUT[ord(_u)] = _scale
+    del _u, _scale
     # Tabla 5 del manual MethodSCRIPT: ID de técnica de medición (marcador M<hex>).
     # 0x06 y 0x0C no están definidos en la tabla.
     TECHNIQUE_IDS = {
@@ -560,6 +601,57 @@ class EmstatStreamParser:
         # ruido o mensajes no relevantes
         return {"type": "unknown", "raw": raw}
 
+    def feed_parsed(self, parsed):
+        """Procesa un paquete 'P' ya parseado (misma estructura que _parse_packet),
+        p.ej. el que decodifica decode_binary_frame. Aplica el mismo contexto que
+        feed_raw (cycle/direction, tiempo CA, fase SWV) y retorna el mismo dict."""
+        return self._handle_parsed(parsed)
+
+    def feed_many(self, lines, seqs=None):
+        """Versión por lotes de feed_raw para un bloque drenado de líneas crudas.
+
+        Retorna (data, events):
+          - data: array estructurado BATCH_DTYPE con una fila por evento "data" que
+            daría feed_raw, en orden. Magnitudes ausentes = NaN; status = OR de los
+            status del paquete y current_range = el primero (-1 si no traen).
+          - events: dicts de feed_raw para el resto de las líneas (marcadores,
+            errores, unknown) con "row" = filas de data emitidas antes del evento.
+        seqs (opcional, alineado con lines) llena la columna seq (-1 si no hay).
+
+        Las P-lines consecutivas (mismo contexto) se decodifican con NumPy por
+        plantilla de longitud; las que no encajan pasan por _parse_packet. El
+        resultado es idéntico al de feed_raw línea a línea (ver
+        test/bench_emstat_feed_many.py).
+        """
+        lines = [str(ln).strip() for ln in lines]
+        seq_arr = (
+            np.full(len(lines), -1, dtype=np.int64)
+            if seqs is None
+            else np.asarray([-1 if s is None else s for s in seqs], dtype=np.int64)
+        )
+        chunks = []
+        events = []
+        nrows = 0
+        pos = 0
+        for is_pkt, grp in groupby(lines, key=lambda ln: ln.startswith("P")):
+            block = list(grp)
+            start, pos = pos, pos + len(block)
+            if is_pkt:
+                chunk = self._handle_block(block, seq_arr[start:pos])
+                if len(chunk):
+                    chunks.append(chunk)
+                    nrows += len(chunk)
+                continue
+            for k, ln in enumerate(block):
+                ev = self.feed_raw(ln)
+                if ev:
+                    ev["row"] = nrows
+                    if seq_arr[start + k] >= 0:
+                        ev["seq"] = int(seq_arr[start + k])
+                    events.append(ev)
+        data = np.concatenate(chunks) if chunks else np.empty(0, dtype=BATCH_DTYPE)
+        return data, events
+
     # ------------------------------------------------------------------
     # Clasificador
     # ------------------------------------------------------------------
@@ -595,6 +687,9 @@ class EmstatStreamParser:
         parsed = self._parse_packet(raw)
         if parsed is None:
             return None
+        return self._handle_parsed(parsed)
+
+    def _handle_parsed(self, parsed):
         decoded = self._decode(parsed)
 
         decoded.update(
@@ -701,6 +796,169 @@ class EmstatStreamParser:
         except Exception:
             return None
 
+    # ------------------------------------------------------------------
+    # Decodificación por lotes (feed_many)
+    # ------------------------------------------------------------------
+    def _handle_block(self, block, seqs):
+        """P-lines consecutivas (contexto constante) -> filas BATCH_DTYPE, aplicando
+        las mismas reglas de contexto que _handle_parsed."""
+        n = len(block)
+        out = np.zeros(n, dtype=BATCH_DTYPE)
+        for name in ("E_V", "I_A", "I_A_F", "I_A_R", "freq_Hz", "Z_real", "Z_imag", "Z_mod", "t_s"):
+            out[name] = np.nan
+        out["status"] = -1
+        out["current_range"] = -1
+        out["seq"] = seqs
+        ok = np.zeros(n, dtype=bool)
+
+        lens = np.fromiter(map(len, block), dtype=np.int64, count=n)
+        for L in np.unique(lens):
+            idx = np.flatnonzero(lens == L)
+            done = self._decode_template(block, idx, int(L), out)
+            ok[idx[done]] = True
+            # Las filas que no encajan en la plantilla van por el camino escalar.
+            for i in idx[~done]:
+                parsed = self._parse_packet(block[i])
+                if parsed is None:
+                    continue
+                ok[i] = True
+                for name, val in self._decode(parsed).items():
+                    out[name][i] = val
+                st, rg = parsed["status"], parsed["current_range"]
+                if st:
+                    acc = 0
+                    for v in st:
+                        acc |= v
+                    out["status"][i] = acc
+                if rg:
+                    out["current_range"][i] = rg[0]
+
+        out = out[ok]  # _parse_packet None -> feed_raw no emite nada
+        k = len(out)
+        out["cycle"] = self.context["cycle"]
+        out["direction"] = self.context["direction"]
+
+        if self.experiment == "eis":
+            out = out[~(np.isnan(out["Z_real"]) & np.isnan(out["Z_imag"]))]
+        if self.experiment == "ca":
+            if not self._ca_main_started:
+                return out[:0]
+            ti = self.ca_t_interval or 0.0
+            out["t_s"] = (self._ca_index + np.arange(k, dtype=np.int64)) * ti
+            self._ca_index += k
+        if self.experiment == "sqwv":
+            sweep = ~np.isnan(out["I_A_F"]) | ~np.isnan(out["I_A_R"])
+            out["phase"] = np.where(sweep, 2, 1)
+        if self.experiment == "eis" and self.eis_group_by_potential:
+            sel = np.flatnonzero(~np.isnan(out["E_V"]))
+            if len(sel):
+                e = out["E_V"][sel]
+                changed = np.empty(len(e), dtype=bool)
+                changed[0] = self._eis_last_e is not None and e[0] != self._eis_last_e
+                changed[1:] = e[1:] != e[:-1]
+                out["cycle"][sel] = self._eis_spectrum + np.cumsum(changed)
+                self._eis_spectrum += int(changed.sum())
+                self._eis_last_e = float(e[-1])
+        return out
+
+    def _decode_template(self, block, idx, L, out):
+        """Decodifica las filas idx (todas de longitud L) con la plantilla de la
+        primera: misma posición de separadores, nombres de variable e ids de
+        metadata. Retorna la máscara de filas resueltas (el resto -> escalar)."""
+        done = np.zeros(len(idx), dtype=bool)
+        try:
+            buf = np.frombuffer(
+                "".join(block[i] for i in idx).encode("ascii"), dtype=np.uint8
+            ).reshape(len(idx), L)
+        except UnicodeEncodeError:
+            return done
+        tmpl = block[idx[0]]
+        specs = []  # (nombre, cols_hex, col_unidad | None)
+        fixed = []  # columnas que deben coincidir con la plantilla
+        status_cols, range_cols = [], []
+        seen = set()
+        off = 1
+        for body in tmpl[1:].split(";"):
+            parts = body.split(",")
+            head = parts[0]
+            if len(head) < 3:
+                return done  # valor vacío: _parse_packet lo descarta
+            key_base = head[:2]
+            fixed += [off, off + 1]
+            if len(head) >= 10:
+                hex_cols, unit_col = list(range(off + 2, off + 9)), off + 9
+            else:
+                hex_cols, unit_col = list(range(off + 2, off + len(head))), None
+            key = key_base
+            counter = 1
+            while key in seen:
+                key = f"{key_base}_{counter}"
+                counter += 1
+            seen.add(key)
+            specs.append((key, hex_cols, unit_col))
+            moff = off + len(head) + 1
+            for meta in parts[1:]:
+                if meta:
+                    fixed.append(moff)
+                    cols = list(range(moff + 1, moff + len(meta)))
+                    if meta[0] == "1":
+                        status_cols.append(cols)
+                    elif meta[0] == "2":
+                        range_cols.append(cols)
+                moff += len(meta) + 1
+            off += len(body) + 1
+
+        seps = (buf == ord(";")) | (buf == ord(","))
+        match = (seps == seps[0]).all(axis=1)
+        if fixed:
+            match &= (buf[:, fixed] == buf[0, fixed]).all(axis=1)
+
+        def hex_cols_to_int(cols):
+            if not cols:
+                return np.zeros(len(idx), dtype=np.int64), np.ones(len(idx), dtype=bool)
+            nib = _HEX_LUT[buf[:, cols]]
+            valid = (nib >= 0).all(axis=1)
+            weights = np.int64(16) ** np.arange(len(cols) - 1, -1, -1, dtype=np.int64)
+            return (np.where(nib < 0, 0, nib) * weights).sum(axis=1), valid
+
+        values = {}
+        for key, hex_cols, unit_col in specs:
+            raw, valid = hex_cols_to_int(hex_cols)
+            match &= valid
+            if unit_col is None:
+                scale = np.ones(len(idx))
+            else:
+                scale = self._UNIT_LUT[buf[:, unit_col]]
+            values[key] = (raw - 0x8000000, scale)
+
+        status = np.full(len(idx), -1, dtype=np.int64)
+        for cols in status_cols:
+            v, valid = hex_cols_to_int(cols)
+            match &= valid
+            status = np.where(status < 0, v, status | v)
+        rng = np.full(len(idx), -1, dtype=np.int64)
+        for cols in range_cols[:1]:
+            rng, valid = hex_cols_to_int(cols)
+            match &= valid
+        for cols in range_cols[1:]:
+            match &= hex_cols_to_int(cols)[1]
+
+        rows = idx[match]
+        schema = self.FIELD_MAP[self.experiment]
+        for key, (name, _scale) in schema.items():
+            if key in values:
+                raw, scale = values[key]
+                out[name][rows] = raw[match].astype(np.float64) * scale[match]
+        if self.experiment == "eis":
+            zi = out["Z_imag"][rows]
+            out["Z_imag"][rows] = -zi
+            if "cd" in values and "cc" in values:
+                zr = out["Z_real"][rows]
+                out["Z_mod"][rows] = np.sqrt(zr**2 + zi**2)
+        out["status"][rows] = status[match]
+        out["current_range"][rows] = rng[match]
+        return match
+
     # ------------------------------------------------------------------
     # Decodificador por experimento
     # ------------------------------------------------------------------
@@ -776,42 +1034,301 @@ def decode_methodscript_error(raw):
     return out
 
 
+# ----------------------------------------------------------------------
+# Trama binaria compacta del relay EmStat (formato "b1")
+# ----------------------------------------------------------------------
+# Opcional y negociada en el payload de inicio ({"fmt": "b1"}); el Pico la confirma
+# en emstat_start. Sustituye el JSON de cada emstat_data por
+#     EMSTAT:#<base64(trama)>
+# El Wemos reenvía líneas de texto (readStringUntil/String), así que la trama viaja
+# en base64 para no romper el framing por '\n' ni los String con bytes 0. El '#' no
+# puede iniciar un JSON: el host distingue ambos formatos por el primer carácter.
+#
+# Trama (little-endian):
+#   u16 len   bytes que siguen a este campo
+#   u32 seq   mismo contador que el "seq" del JSON
+#   u8  kind  1 = paquete de medición 'P', 2 = línea de texto (marcadores *, -, C, M, e!)
+#   kind 1:  u8 n + n x {2s var, u32 (raw28 << 4 | unidad), u8 status, u16 range}
+#            status 0xFF / range 0xFFFF = metadata ausente
+#   kind 2:  la línea en ASCII
+#
+# Cualquier paquete que no encaje exacto (unidad fuera de tabla, metadata repetida,
+# hex inválido) se manda como JSON: el codec nunca cambia el resultado del parser.
+#
+# Tramas coalescidas (opcional, {"batch": N} en el payload; docs/emstat_batch_frames.md):
+# el Pico junta varios emstat_data en una línea. En JSON,
+#     EMSTAT:{"type":"emstat_batch","seq":base,"raw":[...]}   (paquete i -> seq base+i)
+# y en b1 las tramas van concatenadas en un solo '#<base64>' (cada una con su seq).
+# IMPORTANTE: encode_binary_frame vive duplicada en DiscPCB/emstat_wifi_v2.0.py
+# (Pico). Cualquier cambio aquí debe replicarse allá y flashearse.
+BIN_PREFIX = "#"
+BIN_KIND_PACKET = 1
+BIN_KIND_TEXT = 2
+BIN_UNITS = " afpnumkMGT"
+_BIN_HDR = struct.Struct("<HIB")
+_BIN_FIELD = struct.Struct("<2sIBH")
+_BIN_NO_STATUS = 0xFF
+_BIN_NO_RANGE = 0xFFFF
+
+
+def _pack_packet_fields(line: str):
+    """'P...' -> bytes del cuerpo kind 1, o None si el paquete no es representable."""
+    bodies = line[1:].split(";")
+    out = bytearray([len(bodies)])
+    for body in bodies:
+        parts = body.split(",")
+        head = parts[0]
+        var = head[:2]
+        if len(var) != 2 or not var.isascii():
+            return None
+        if len(head) >= 10:
+            raw_val, unit = head[2:9], head[9]
+        else:
+            raw_val, unit = head[2:], " "
+        uidx = BIN_UNITS.find(unit)
+        if uidx < 0 or not raw_val:
+            return None
+        raw28 = int(raw_val, 16)
+        status, rng = _BIN_NO_STATUS, _BIN_NO_RANGE
+        for meta in parts[1:]:
+            if not meta:
+                continue
+            mid, mval = meta[0], meta[1:]
+            if mid == "1":
+                if status != _BIN_NO_STATUS:
+                    return None
+                status = int(mval, 16)
+                if status >= _BIN_NO_STATUS:
+                    return None
+            elif mid == "2":
+                if rng != _BIN_NO_RANGE:
+                    return None
+                rng = int(mval, 16)
+                if rng >= _BIN_NO_RANGE:
+                    return None
+        out += _BIN_FIELD.pack(var.encode("ascii"), (raw28 << 4) | uidx, status, rng)
+    return bytes(out)
+
+
+def _binary_frame(seq: int, line: str):
+    """Línea cruda del EmStat -> bytes de la trama (sin base64) o None."""
+    line = line.strip()
+    try:
+        if line.startswith("P"):
+            kind, body = BIN_KIND_PACKET, _pack_packet_fields(line)
+        else:
+            kind, body = BIN_KIND_TEXT, line.encode("ascii")
+    except (ValueError, UnicodeEncodeError, struct.error):
+        return None
+    if body is None:
+        return None
+    return _BIN_HDR.pack(_BIN_HDR.size - 2 + len(body), seq, kind) + body
+
+
+def encode_binary_frame(seq: int, line: str):
+    """Línea cruda del EmStat -> 'EMSTAT:'-payload '#<base64>' o None (usar JSON).
+
+    Referencia del encoder del Pico; la usa el test de conformidad."""
+    frame = _binary_frame(seq, line)
+    if frame is None:
+        return None
+    return BIN_PREFIX + binascii.b2a_base64(frame, newline=False).decode("ascii")
+
+
+def encode_binary_batch(seq: int, lines):
+    """Trama coalescida b1: las tramas de lines (seq, seq+1, ...) concatenadas en un
+    solo '#<base64>'. None si alguna no encaja (el Pico la manda sola, en JSON).
+
+    Referencia de _flush_batch del Pico; la usa el test de conformidad."""
+    frames = []
+    for i, line in enumerate(lines):
+        frame = _binary_frame(seq + i, line)
+        if frame is None:
+            return None
+        frames.append(frame)
+    return BIN_PREFIX + binascii.b2a_base64(b"".join(frames), newline=False).decode("ascii")
+
+
+def decode_binary_frame(seg: str):
+    """'#<base64>' -> mensaje equivalente al JSON emstat_data, o None si está corrupto.
+
+    kind 1 trae "pkt" (estructura de EmstatStreamParser._parse_packet, lista para
+    feed_parsed) en vez de "raw"; kind 2 trae "raw" como el JSON."""
+    msgs = decode_binary_frames(seg)
+    if msgs is None or len(msgs) != 1:
+        return None
+    return msgs[0]
+
+
+def decode_binary_frames(seg: str):
+    """'#<base64>' con una o más tramas concatenadas (coalescida b1) -> lista de
+    mensajes emstat_data en orden, o None si alguna no cuadra (se descarta entera)."""
+    try:
+        buf = binascii.a2b_base64(seg[1:])
+    except (binascii.Error, ValueError):
+        return None
+    # a2b_base64 ignora basura tras el padding: la longitud del texto debe cuadrar.
+    if len(seg) - 1 != 4 * ((len(buf) + 2) // 3):
+        return None
+    mv = memoryview(buf)
+    msgs = []
+    off = 0
+    while off < len(mv):
+        if len(mv) - off < _BIN_HDR.size:
+            return None
+        length = _BIN_HDR.unpack_from(mv, off)[0]
+        end = off + 2 + length
+        if length < _BIN_HDR.size - 2 or end > len(mv):
+            return None
+        msg = _decode_frame(mv[off:end])
+        if msg is None:
+            return None
+        msgs.append(msg)
+        off = end
+    return msgs or None
+
+
+def _decode_frame(mv):
+    """Una trama (memoryview con el largo ya validado) -> mensaje o None."""
+    _, seq, kind = _BIN_HDR.unpack_from(mv, 0)
+    off = _BIN_HDR.size
+    if kind == BIN_KIND_TEXT:
+        raw = bytes(mv[off:]).decode("ascii", errors="replace")
+        return {"type": "emstat_data", "seq": seq, "raw": raw}
+    if kind != BIN_KIND_PACKET or len(mv) <= off:
+        return None
+    n = mv[off]
+    off += 1
+    if len(mv) - off != n * _BIN_FIELD.size:
+        return None
+    fields = {}
+    statuses = []
+    ranges = []
+    for var, packed, status, rng in _BIN_FIELD.iter_unpack(mv[off:]):
+        key_base = var.decode("ascii", errors="replace")
+        raw28 = packed >> 4
+        if status != _BIN_NO_STATUS:
+            statuses.append(status)
+        if rng != _BIN_NO_RANGE:
+            ranges.append(rng)
+        key = key_base
+        counter = 1
+        while key in fields:
+            key = f"{key_base}_{counter}"
+            counter += 1
+        fields[key] = {
+            "value": raw28 - 0x8000000,
+            "unit": BIN_UNITS[packed & 0xF] if (packed & 0xF) < len(BIN_UNITS) else " ",
+            "value_hex": f"{raw28:07X}",
+        }
+    pkt = {"fields": fields, "status": statuses, "current_range": ranges}
+    return {"type": "emstat_data", "seq": seq, "pkt": pkt}
+
+
+def unpack_emstat_batch(msg):
+    """emstat_batch -> (raws, seqs) listos para EmstatStreamParser.feed_many: el
+    paquete i lleva seq base + i. None si la trama no cuadra."""
+    raws = msg.get("raw")
+    base = msg.get("seq")
+    if not isinstance(raws, list) or not isinstance(base, int):
+        return None
+    if not all(isinstance(r, str) for r in raws):
+        return None
+    return raws, list(range(base, base + len(raws)))
+
+
+# ------lectura de líneas del stream TCP------------
+# El relay manda una línea por mensaje EMSTAT. Con el enlace a tasa alta un solo
+# recv trae decenas de líneas, y el lector previo hacía por cada una un find, un
+# slice, un del buffer[:nl+1] y un decode. LineFramer recibe con recv_into en un
+# buffer preasignado, ubica el último '\n' por offset, copia una sola vez el bloque
+# de líneas completas y lo parte en C; lo que queda a medias pasa al inicio una
+# vez por recv. Las líneas salen como bytes: se decodifican solo si alguien las
+# usa (y entonces el bloque entero de una vez). Ver docs/emstat_line_reader.md.
+class LineFramer:
+    """Buffer de recepción preasignado que parte el stream en líneas.
+
+    get_buffer() da la parte libre (memoryview) para recv_into / BufferedProtocol;
+    feed(n) registra n bytes recibidos y devuelve las líneas completas como bytes,
+    sin el '\n' (feed_block: el bloque sin partir, o None). Una línea más larga
+    que el buffer es un RuntimeError."""
+
+    def __init__(self, size=65536):
+        self.buf = bytearray(size)
+        self._mv = memoryview(self.buf)
+        self._start = 0  # inicio de la línea a medias
+        self._end = 0  # fin de los datos recibidos
+        self._scan = 0  # los '\n' antes de aquí ya se buscaron
+
+    def pending(self):
+        """Bytes de la línea a medias."""
+        return self._end - self._start
+
+    def get_buffer(self):
+        if self._end == len(self.buf):
+            raise RuntimeError("RX buffer overflow: line longer than the buffer")
+        return self._mv[self._end :]
+
+    def feed_block(self, n):
+        """Registra n bytes; devuelve las líneas completas como un solo bloque de
+        bytes separado por '\n' (sin el último), o None si no se completó ninguna."""
+        mv = self._mv
+        end = self._end + n
+        start = self._start
+        last = self.buf.rfind(b"\n", self._scan, end)
+        if last < 0:
+            self._end = self._scan = end
+            return None
+        block = mv[start:last].tobytes()
+        start = last + 1
+        if start == end:
+            start = end = 0
+        else:
+            # Compactación única: la línea a medias pasa al inicio del buffer.
+            rest = end - start
+            mv[:rest] = mv[start:end]
+            start, end = 0, rest
+        self._start, self._end, self._scan = start, end, end
+        return block
+
+    def feed(self, n):
+        block = self.feed_block(n)
+        return [] if block is None else block.split(b"\n")
+
+
 class LineBufferedSocketReader:
+    """Líneas de un socket bloqueante/listo para leer, con recv_into sobre un
+    LineFramer de max_buffer bytes."""
+
     def __init__(self, sock, encoding="utf-8", max_buffer=65536):
         self.sock = sock
         self.encoding = encoding
-        self.buffer = bytearray()
         self.max_buffer = max_buffer
+        self.framer = LineFramer(max_buffer)
 
-    def read_lines(self):
+    def _recv(self):
+        free = self.framer.get_buffer()  # protección contra runaway buffer
         try:
-            data = self.sock.recv(4096)
+            return self.sock.recv_into(free)
         except Exception:
-            return None
-        if not data:
-            return None  # conexión cerrada
-
-        self.buffer.extend(data)
-
-        # protección contra runaway buffer
-        if len(self.buffer) > self.max_buffer:
-            raise RuntimeError("RX buffer overflow: receiver too slow")
-
-        lines = []
-        while True:
-            nl = self.buffer.find(b"\n")
-            if nl == -1:
-                break
-
-            line = self.buffer[:nl]
-            del self.buffer[: nl + 1]
+            return 0
 
-            try:
-                lines.append(line.decode(self.encoding, errors="replace").strip())
-            except Exception:
-                continue
+    def read_raw_lines(self):
+        """Líneas completas como bytes (sin decodificar), [] si aún no hay ninguna
+        o None si la conexión se cerró. RuntimeError si una línea no cabe."""
+        n = self._recv()
+        if not n:
+            return None  # conexión cerrada
+        return self.framer.feed(n)
 
-        return lines
+    def read_lines(self):
+        n = self._recv()
+        if not n:
+            return None  # conexión cerrada
+        block = self.framer.feed_block(n)
+        if block is None:
+            return []
+        return [line.strip() for line in block.decode(self.encoding, errors="replace").split("\n")]
 
 
 # class LineBufferedSocketReader:
@@ -15,6 +15,7 @@ class PIDController:
         ts: float | None = None,
         aw_tracking_time: float
         | None = 0.1,  # Tt: constante de seguimiento (s). None -> deshabilitar
+        integral_limit: float | None = None,  # |∫e dt| máximo. None -> sin límite
     ):
         """PID controller con anti-windup por Back-Calculation (seguimiento del actuador).
         :param kp: Proportional gain.
@@ -31,6 +32,8 @@ class PIDController:
         :type ts: float | None, optional
         :param aw_tracking_time: Tt (s). Anti-windup tracking constant. If None, disables anti-windup. Typical values: ~ts to 10*ts. Smaller values ​​result in stronger correction., defaults to 0.1
         :type aw_tracking_time: float | None, optional
+        :param integral_limit: Clamp of the error integral (before multiplying by ki), as the I_MAX of the PCR loop. None disables it., defaults to None
+        :type integral_limit: float | None, optional
         """
         self.kp = kp
         self.ki = ki
@@ -39,6 +42,7 @@ class PIDController:
         self.output_limits = output_limits
         self.fixed_dt = ts
         self.aw_tracking_time = aw_tracking_time
+        self.integral_limit = integral_limit
 
         self._integral = 0.0  # Estado del integrador I (antes de multiplicar por ki)
         self._last_error: float | None = None
@@ -78,6 +82,9 @@ class PIDController:
         # Paso 1: integrar el error normalmente
         if dt > 0:
             self._integral += error * dt
+            if self.integral_limit is not None:
+                lim = self.integral_limit
+                self._integral = max(-lim, min(lim, self._integral))
 
         # i preliminar y salida sin limitar
         i_pre = self.ki * self._integral
@@ -120,6 +127,17 @@ class PIDController:
 
         return output
 
+    def skip(self, current_time: float | None = None) -> None:
+        """Paso sin medición confiable (p. ej. temperatura vieja): avanza el reloj
+        sin integrar, para que el siguiente compute no integre el hueco entero."""
+        self._last_time = perf_counter() if current_time is None else current_time
+
+    def reset(self) -> None:
+        """Olvida integrador y derivada (cambio de fase / setpoint)."""
+        self._integral = 0.0
+        self._last_error = None
+        self._last_time = None
+
 
 if __name__ == "__main__":
     pid = PIDController(
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""Auto-tuning del control térmico de PCR (ganancias PI y ff_frac por fase).
+
+El bloque pidControllerRPM de settings.json se afinaba a prueba y error. Aquí:
+  1. step_test: escalón de duty sobre el heater leyendo la temperatura por el
+     mismo camino que el lazo (UDP + EMA). Corta por seguridad en t_max.
+  2. fit_fopdt: ajusta ganancia K (°C por unidad de duty), constante de tiempo
+     tau y tiempo muerto L (que incluye los retrasos de sensor, broadcast y EMA)
+     por mínimos cuadrados; sirve aunque el escalón no llegue al estado estable.
+  3. tune_phase: para cada rampa (denat, high, ext) barre el tiempo de lazo
+     cerrado de la regla SIMC y el ff_frac, simula rampa + hold con el MISMO
+     PhaseControlLoop y fuzzy_gains que la app (sobre ThermalPlant en tiempo
+     virtual, miles de veces más rápido que real) y elige el par que minimiza el
+     tiempo hasta quedar asentado con el sobreimpulso bajo el límite.
+  4. apply_settings: escribe la propuesta con write_settings_to_file.
+
+    python -m Drivers.PcrAutoTune [--sim] [--write] [--max-overshoot 0.5]
+
+Ver docs/pcr_autotune.md.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from Drivers.PcrControlLoop import (
+    PhaseControlLoop,
+    PlantModel,
+    PredictiveRamp,
+    fuzzy_gains,
+    fuzzy_max_age,
+    load_phase_pid,
+)
+from Drivers.VirtualDisc import SimHeater, ThermalPlant
+from templates.utils import get_setting, write_settings_to_file
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 22:10 $"
+
+SAMPLE_PERIOD = 0.08  # cadencia del broadcast del disco
+TOLERANCE = 0.5  # tolerancia de _reach_temperature_pi
+# Tiempo de lazo cerrado SIMC como múltiplo del tiempo muerto identificado.
+TC_FACTORS = (0.5, 1.0, 2.0, 4.0)
+FF_FRACS = (0.0, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+# Espera máxima por el primer datagrama de temperatura antes del escalón.
+FIRST_SAMPLE_TIMEOUT_S = 10.0
+
+
+def fit_fopdt(t, temp, duty, t_step):
+    """Ajusta un FOPDT a la respuesta a un escalón de 0 a `duty` aplicado en t_step.
+
+    Rejilla sobre (L, tau); para cada par K sale en forma cerrada (el modelo es
+    lineal en K). Devuelve (PlantModel, rms del residuo en °C)."""
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(temp, dtype=float)
+    before = y[t < t_step]
+    y0 = float(before.mean()) if before.size else float(y[0])
+    after = t >= t_step
+    ta, dy = t[after] - t_step, y[after] - y0
+    span = max(ta[-1], 1.0)
+    best = None
+    for dead in np.linspace(0.0, min(10.0, span / 3), 101):
+        x = np.clip(ta - dead, 0.0, None)
+        for tau in np.geomspace(1.0, 500.0, 120):
+            phi = duty * (1.0 - np.exp(-x / tau))
+            den = float(phi @ phi)
+            if den <= 0.0:
+                continue
+            k = float(phi @ dy) / den
+            sse = float(((dy - k * phi) ** 2).sum())
+            if best is None or sse < best[0]:
+                best = (sse, k, tau, dead)
+    sse, k, tau, dead = best
+    return PlantModel(k, tau, dead, y0), math.sqrt(sse / len(dy))
+
+
+def step_test(heater, read_sample, stop_event, duty=0.5, baseline_s=5.0, max_s=300.0,
+              t_max=97.0, settle_slope=0.01):
+    """Escalón de duty sobre el heater real (o el virtual).
+
+    Registra (t, temp) cada SAMPLE_PERIOD: baseline_s con el heater apagado, luego
+    `duty` hasta que la pendiente del último minuto baje de settle_slope °C/s,
+    pase max_s o la temperatura llegue a t_max (corte de seguridad). El heater
+    queda apagado al salir. Devuelve (t, temp, t_step)."""
+    ts, temps = [], []
+    t0 = time.monotonic()
+    heater.off()
+    t_step = None
+    try:
+        while not stop_event.is_set():
+            now = time.monotonic() - t0
+            temp, _age = read_sample()
+            ts.append(now)
+            temps.append(temp)
+            if t_step is None and now >= baseline_s:
+                t_step = now
+                heater.set_duty(duty)
+            if t_step is not None:
+                if temp >= t_max or now - t_step >= max_s:
+                    break
+                k = int(60.0 / SAMPLE_PERIOD)
+                if now - t_step > 60.0 and len(temps) > k:
+                    if (temps[-1] - temps[-k]) / (ts[-1] - ts[-k]) < settle_slope:
+                        break
+            stop_event.wait(SAMPLE_PERIOD)
+    finally:
+        heater.off()
+    return ts, temps, t_step
+
+
+def simc_pi(model, tc):
+    """PI por la regla SIMC (Skogestad): kp en duty/°C, ki en duty/(°C·s)."""
+    kp = model.tau / (model.gain * (tc + model.dead_time))
+    ti = min(model.tau, 4.0 * (tc + model.dead_time))
+    return kp, kp / ti
+
+
+class _VirtualTime:
+    """Reloj y stop_event de tiempo virtual: wait(dt) avanza el reloj."""
+
+    def __init__(self):
+        self.t = 0.0
+        self._set = False
+
+    def now(self):
+        return self.t
+
+    def wait(self, timeout=None):
+        self.t += float(timeout or 0.0)
+        return self._set
+
+    def is_set(self):
+        return self._set
+
+    def set(self):
+        self._set = True
+
+
+def simulate_phase(model, reach_params, hold_params, start_temp, setpoint, hold_s=15.0,
+                   band=TOLERANCE, hold_max_age=0.1, predictive_model=None):
+    """Rampa (feed-forward + PhaseControlLoop) y hold sobre el modelo, en tiempo virtual.
+
+    Aplica la misma política de muestra vieja que la app: fuzzy_max_age con los
+    MAX_AGE_MIN/MAX de reach_params en la rampa y hold_max_age (ts) en el hold,
+    contra la edad de la última muestra de la cadencia de 80 ms.
+    predictive_model: si se da, la rampa es PredictiveRamp con ese modelo (puede
+    diferir de `model`, la planta simulada, para medir el efecto del error de
+    identificación) en vez de feed-forward + PI.
+    Devuelve (t_asentado, sobreimpulso, t_rampa): t_asentado es el instante desde
+    el que la temperatura queda dentro de ±band hasta el fin del hold."""
+    vt = _VirtualTime()
+    plant = ThermalPlant(
+        t_amb=model.t_amb, gain=model.gain, tau=model.tau, dead_time=model.dead_time,
+        tc_tau=1e-3, noise=0.0, clock=vt.now,
+    )
+    plant.temp = plant.temp_tc = float(start_temp)
+    heater = SimHeater(plant)
+    trace = []
+    last = {"k": -1, "temp": float(start_temp)}
+
+    def read_sample():
+        k = int(vt.t / SAMPLE_PERIOD)
+        if k != last["k"]:
+            last["k"] = k
+            last["temp"] = plant.read()[2]
+            trace.append((vt.t, last["temp"]))
+        return last["temp"], vt.t - k * SAMPLE_PERIOD
+
+    age_lo = reach_params.get("MAX_AGE_MIN", 0.02)
+    age_hi = reach_params.get("MAX_AGE_MAX", 0.2)
+    ff = reach_params.get("FF_FRAC", 0.0) if predictive_model is None else 0.0
+    while ff > 0.0 and vt.t < 600.0:
+        temp, age = read_sample()
+        if temp >= setpoint * ff:
+            break
+        if age > fuzzy_max_age(setpoint - temp, age_lo, age_hi):
+            heater.off()
+        else:
+            heater.on()
+        vt.wait(0.01)
+    if predictive_model is None:
+        ramp = PhaseControlLoop(
+            heater, reach_params, vt, read_sample,
+            max_age=lambda e: fuzzy_max_age(e, age_lo, age_hi), gains=fuzzy_gains, clock=vt.now,
+        )
+    else:
+        ramp = PredictiveRamp(
+            heater, predictive_model, reach_params, vt, read_sample,
+            max_age=age_hi, clock=vt.now, duty_before=0.0,
+        )
+    ramp.run(setpoint, lambda temp, t: abs(setpoint - temp) <= band or t > 600.0)
+    t_ramp = vt.t
+    PhaseControlLoop(
+        heater, hold_params, vt, read_sample, max_age=lambda _e: hold_max_age,
+        gains=fuzzy_gains, clock=vt.now,
+    ).run(setpoint, lambda _temp, t: t > hold_s)
+    settled = 0.0
+    rising = start_temp < setpoint
+    over = 0.0
+    for t, v in trace:
+        if abs(v - setpoint) > band:
+            settled = t
+        over = max(over, (v - setpoint) if rising else (setpoint - v))
+    return settled, over, t_ramp
+
+
+def _phase_params(kp, ki, model, setpoint, window, ff=0.0, ages=(0.02, 0.2)):
+    # La integral debe poder sostener el duty de régimen: ki·imax >= 1.5·u_ss.
+    imax = 1.5 * model.steady_duty(setpoint) / ki if ki > 0 else 0.5
+    return {"KP": kp, "KI": ki, "I_MAX": imax, "TEMP_BAND": 0.02, "WINDOW": window,
+            "FF_FRAC": ff, "MAX_AGE_MIN": ages[0], "MAX_AGE_MAX": ages[1]}
+
+
+def tune_phase(model, start_temp, setpoint, max_overshoot=0.5, hold_s=15.0, window=0.05,
+               ages=(0.02, 0.2), hold_max_age=0.1):
+    """Mejor (tc, ff_frac) para una rampa + hold. ages: (m_age_min, m_age_max) de
+    la rampa; hold_max_age: umbral del hold (ts). Devuelve dict con reach, hold,
+    settle_s, overshoot y el factor tc elegido."""
+    best = None
+    for f_rc in TC_FACTORS:
+        kp, ki = simc_pi(model, f_rc * max(model.dead_time, SAMPLE_PERIOD))
+        hold = _phase_params(kp, ki, model, setpoint, window)
+        for ff in FF_FRACS if setpoint > start_temp else (0.0,):
+            reach = _phase_params(kp, ki, model, setpoint, window, ff, ages)
+            settle, over, _ramp = simulate_phase(
+                model, reach, hold, start_temp, setpoint, hold_s, hold_max_age=hold_max_age
+            )
+            key = (over > max_overshoot, settle if over <= max_overshoot else over)
+            if best is None or key < best[0]:
+                best = (key, {"reach": reach, "hold": hold, "settle_s": settle,
+                              "overshoot": over, "tc": f_rc})
+    return best[1]
+
+
+def evaluate_current(model, phase, hold_phase, start_temp, setpoint, hold_s=15.0, ts=0.1):
+    """Misma métrica con las ganancias actuales de settings.json (para comparar)."""
+    settle, over, _ramp = simulate_phase(
+        model, load_phase_pid(phase, ts), load_phase_pid(hold_phase, ts), start_temp,
+        setpoint, hold_s, hold_max_age=ts,
+    )
+    return settle, over
+
+
+def propose_settings(model, recipe, max_overshoot=0.5, hold_s=15.0):
+    """Propuesta para pidControllerRPM a partir del modelo y una receta PCR
+    (dict de templates/pcr_projects con números). Devuelve (claves, reporte)."""
+    phases = (
+        # (rampa, hold, desde, hasta)
+        ("denat", "h_denat", model.t_amb, recipe["denat_temp"]),
+        ("high", "h_high", recipe["ext_temp"], recipe["high_temp"]),
+        ("ext", "h_ext", recipe["low_temp"], recipe["ext_temp"]),
+    )
+    ts = float(get_setting("pidControllerRPM.ts_pcr", 0.1))
+    keys, report = {}, []
+    for phase, hold_phase, start, sp in phases:
+        cur = load_phase_pid(phase, ts)
+        res = tune_phase(
+            model, start, sp, max_overshoot, hold_s,
+            ages=(cur["MAX_AGE_MIN"], cur["MAX_AGE_MAX"]), hold_max_age=ts,
+        )
+        r, h = res["reach"], res["hold"]
+        keys.update({
+            f"KP_{phase}": round(r["KP"], 4), f"KI_{phase}": round(r["KI"], 4),
+            f"imax_{phase}": round(r["I_MAX"], 3), f"ff_frac_{phase}": r["FF_FRAC"],
+            f"KP_{hold_phase}": round(h["KP"], 4), f"KI_{hold_phase}": round(h["KI"], 4),
+            f"imax_{hold_phase}": round(h["I_MAX"], 3),
+        })
+        before = evaluate_current(model, phase, hold_phase, start, sp, hold_s, ts)
+        report.append((phase, start, sp, before, (res["settle_s"], res["overshoot"])))
+    # El hold bajo llega enfriando (sin rampa de heater): mismas reglas, sin ff.
+    kp, ki = simc_pi(model, 2.0 * max(model.dead_time, SAMPLE_PERIOD))
+    h = _phase_params(kp, ki, model, recipe["low_temp"], 0.05)
+    keys.update({"KP_h_low": round(kp, 4), "KI_h_low": round(ki, 4),
+                 "imax_h_low": round(h["I_MAX"], 3)})
+    return keys, report
+
+
+def apply_settings(keys, model=None):
+    """Mezcla la propuesta en pidControllerRPM y la escribe (escritor atómico).
+    model: PlantModel identificado, se guarda como "pcr_plant_model" (lo usa la
+    rampa predictiva)."""
+    pid = get_setting("pidControllerRPM", {})
+    pid.update(keys)
+    new = {"pidControllerRPM": pid}
+    if model is not None:
+        new["pcr_plant_model"] = {k: round(v, 4) for k, v in model.to_dict().items()}
+    return write_settings_to_file(new)
+
+
+def _recipe():
+    from templates import pcr_projects as pcrp
+
+    values = pcrp.get_project(pcrp.get_last_used() or pcrp.DEFAULT_PROJECT_NAME)
+    return {k: float(v) for k, v in (values or pcrp.default_project()).items()}
+
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="PCR heater auto-tune")
+    ap.add_argument("--sim", action="store_true", help="use the virtual disc")
+    ap.add_argument("--write", action="store_true", help="write the proposal to settings.json")
+    ap.add_argument("--duty", type=float, default=0.5)
+    ap.add_argument("--max-overshoot", type=float, default=0.5)
+    args = ap.parse_args()
+
+    from Drivers.ClientUDP import UdpClient
+
+    stop = threading.Event()
+    state = {"temp": None, "ts": 0.0}
+
+    def on_message(_text, _addr, temps):
+        if temps[2] is None:
+            return
+        prev = state["temp"]
+        state["temp"] = temps[2] if prev is None else 0.3 * temps[2] + 0.7 * prev
+        state["ts"] = temps[3]
+
+    disc = None
+    if args.sim:
+        from Drivers.VirtualDisc import VirtualDisc
+
+        disc = VirtualDisc().start()
+        heater = disc.heater
+    else:
+        from Drivers.DriverHeater import make_heater
+        from templates.constants import chip_rasp, led_heatin_pin
+
+        heater = make_heater(led_heatin_pin, chip=chip_rasp,
+                             backend=get_setting("heater_backend", "lgpio"),
+                             consumer="led-heating-autotune",
+                             fallback=get_setting("heater_software_fallback", False))
+    client = UdpClient(port=5005, on_message=on_message, save_data=False)
+    client.start()
+    try:
+        deadline = time.monotonic() + FIRST_SAMPLE_TIMEOUT_S
+        while state["temp"] is None:
+            if time.monotonic() >= deadline:
+                raise SystemExit(
+                    f"No thermocouple reading on UDP :5005 within {FIRST_SAMPLE_TIMEOUT_S:g} s: "
+                    "is the disc powered and on this network? (--sim uses the virtual disc)"
+                )
+            time.sleep(0.05)
+        print(f"Step test: duty {args.duty:.2f} from {state['temp']:.1f} °C")
+        t, temp, t_step = step_test(
+            heater, lambda: (state["temp"], time.time() - state["ts"]), stop, duty=args.duty
+        )
+    finally:
+        heater.close()
+        client.stop()
+        if disc is not None:
+            disc.close()
+    model, rms = fit_fopdt(t, temp, args.duty, t_step)
+    print(f"{model} (fit rms {rms:.3f} °C)")
+    keys, report = propose_settings(model, _recipe(), args.max_overshoot)
+    print(f"{'phase':<7}{'from':>7}{'to':>7}{'settle now s':>14}{'over now':>10}"
+          f"{'settle new s':>14}{'over new':>10}")
+    for phase, start, sp, (s0, o0), (s1, o1) in report:
+        print(f"{phase:<7}{start:>7.1f}{sp:>7.1f}{s0:>14.2f}{o0:>10.2f}{s1:>14.2f}{o1:>10.2f}")
+    for k, v in keys.items():
+        print(f"  {k}: {v}")
+    if args.write:
+        ok = apply_settings(keys, model)
+        print("settings.json updated" if ok else "settings.json NOT updated")
+
+
+if __name__ == "__main__":
+    main()
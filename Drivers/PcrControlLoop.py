@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""Lazo de control térmico de PCR a tasa fija (deadlines monotónicos).
+
+hold_temperature y _reach_temperature_pi implementaban el PI a mano: integraban
+`error * WINDOW` aunque la iteración real durara WINDOW + cálculo + latencia de los
+sleeps, y cada ventana se corría un poco. Aquí:
+  - DeadlineClock despierta en t0 + k·period (time.monotonic), no "period después
+    de terminar"; si una iteración se pasa de su ventana cuenta un overrun y salta
+    a la próxima ventana futura en vez de recuperar en ráfaga.
+  - PhaseControlLoop corre PIDController.compute con el dt REAL de cada iteración
+    (integral limitada = I_MAX de la fase) y deja enchufar por fase las ganancias,
+    el gain scheduling (fuzzy_gains) y la política de muestra vieja
+    (fuzzy_max_age / umbral fijo del hold).
+  - ControlStats resume la fase: iteraciones, overruns, atraso y dt reales.
+  - PredictiveRamp: rampa de tiempo mínimo sobre el modelo identificado
+    (PlantModel): potencia plena hasta que la predicción dice que lo ya aplicado
+    lleva al setpoint, luego el duty de régimen (docs/pcr_predictive_ramp.md).
+  - load_phase_pid: los parámetros de una fase desde pidControllerRPM. Es el único
+    mapeo de claves y defaults; lo usan la app, el auto-tuner y los bancos.
+Ver docs/pcr_control_loop.md.
+"""
+import math
+import time
+from collections import deque
+
+from Drivers.PIDController import PIDController
+from templates.utils import get_setting
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 20:30 $"
+
+
+def load_phase_pid(phase, ts):
+    """Parámetros de la fase `phase` (denat, high, ext, h_denat, h_high, h_low,
+    h_ext) desde pidControllerRPM de settings.json. ts: periodo del lazo (ts_pcr).
+
+    Se lee en cada llamada para que una edición de ganancias durante el
+    experimento tome efecto (snapshot cacheado: solo se re-parsea si el archivo
+    cambió)."""
+    pid = get_setting("pidControllerRPM", {})
+    return {
+        "KP": pid.get(f"KP_{phase}", 0.15),
+        "KI": pid.get(f"KI_{phase}", 0.5),
+        "I_MAX": pid.get(f"imax_{phase}", 0.5),
+        "TEMP_BAND": pid.get(f"tband_{phase}", 0.05),
+        "WINDOW": pid.get(f"win_{phase}", ts * 0.9),
+        "MAX_AGE": pid.get(f"m_age_{phase}", 0.09),
+        # Límites de la edad-máxima dinámica (fuzzy) usada solo en la rampa.
+        # m_age_max cae al viejo m_age_<phase> si no hay clave nueva.
+        "MAX_AGE_MIN": pid.get(f"m_age_min_{phase}", 0.02),
+        "MAX_AGE_MAX": pid.get(f"m_age_max_{phase}", pid.get(f"m_age_{phase}", 0.2)),
+        # Fracción del setpoint hasta la que se hace feed-forward a potencia
+        # plena antes de entregar el control al PI. 0.0 = sin pre-rampa.
+        "FF_FRAC": pid.get(f"ff_frac_{phase}", 0.0),
+    }
+
+
+def fuzzy_gains(error: float, base_kp: float, base_ki: float) -> tuple:
+    """Escala KP/KI dinámicamente según la magnitud del error (fuzzy gain scheduling).
+
+    Tres zonas con interpolación lineal para transiciones suaves:
+      |e| >= 15°C  → agresivo (kp×2.0, ki×0.2): rampas largas sin windup
+      5 <= |e| < 15 → intermedio: transición suave
+      |e| < 5°C    → preciso  (kp×0.5, ki×1.3): regulación cerca del setpoint
+
+    Los factores de escala operan sobre las ganancias base leídas de settings.json,
+    por lo que el punto de operación nominal sigue siendo configurable allí.
+    """
+    abs_error = abs(error)
+    if abs_error >= 5.0:
+        kp_s, ki_s = 2.0, 0.2
+    elif abs_error >= 2.0:
+        t = (abs_error - 5.0) / 10.0  # 0..1 de 3°C a 7°C
+        kp_s = 1.0 + t * 1.0  # 1.0 → 2.0
+        ki_s = 1.0 - t * 0.8  # 0.2 → 1.0
+    else:
+        t = abs_error / 5.0  # 0..1 de 0°C a 3°C
+        kp_s = 0.5 + t * 0.5  # 0.5 → 1.0
+        ki_s = 1.3 - t * 0.3  # 1.0 → 1.3
+    return base_kp * kp_s, base_ki * ki_s
+
+
+def fuzzy_max_age(error: float, m_age_min: float, m_age_max: float) -> float:
+    """Escala dinámicamente la edad máxima de temperatura confiable (freshness).
+
+    Reutiliza los mismos umbrales de |error| que `fuzzy_gains` (2°C y 5°C):
+      |e| >= 5°C   → m_age_max (plano): rampa dura, tolera lecturas UDP añejas
+      2 <= |e| < 5 → interpolación lineal m_age_min → m_age_max
+      |e| < 2°C    → m_age_min (plano): cerca del setpoint, exige frescura
+
+    Monótona: mayor error ⇒ mayor m_age. Solo se usa en la rampa (reach);
+    el hold conserva su umbral estricto. Los límites vienen de settings.json
+    por fase (m_age_min_<phase> / m_age_max_<phase>).
+    """
+    abs_error = abs(error)
+    if abs_error >= 5.0:
+        return m_age_max
+    if abs_error < 2.0:
+        return m_age_min
+    t = (abs_error - 2.0) / 3.0  # 0..1 de 2°C a 5°C
+    return m_age_min + t * (m_age_max - m_age_min)
+
+
+class ControlStats:
+    """Temporización real de una fase del lazo."""
+
+    def __init__(self, period):
+        self.period = period
+        self.iterations = 0
+        self.overruns = 0  # ventanas perdidas (iteración más larga que period)
+        self.stale = 0  # iteraciones con la temperatura vieja (heater apagado)
+        self.late_max = 0.0  # mayor atraso del despertar respecto del deadline (s)
+        self._late_sum = 0.0
+        self.dt_min = float("inf")
+        self.dt_max = 0.0
+        self._dt_sum = 0.0
+        self._dt_n = 0
+
+    def add_dt(self, dt):
+        self._dt_n += 1
+        self._dt_sum += dt
+        self.dt_min = min(self.dt_min, dt)
+        self.dt_max = max(self.dt_max, dt)
+
+    def add_late(self, late):
+        self._late_sum += late
+        self.late_max = max(self.late_max, late)
+
+    @property
+    def dt_mean(self):
+        return self._dt_sum / self._dt_n if self._dt_n else 0.0
+
+    @property
+    def late_mean(self):
+        return self._late_sum / self.iterations if self.iterations else 0.0
+
+    def summary(self):
+        if not self._dt_n:
+            return f"it: {self.iterations}-overruns: {self.overruns}"
+        return (
+            f"it: {self.iterations}-overruns: {self.overruns}-stale: {self.stale}"
+            f"-dt: {self.dt_mean * 1e3:.1f} ms [{self.dt_min * 1e3:.1f}, "
+            f"{self.dt_max * 1e3:.1f}]-late_max: {self.late_max * 1e3:.1f} ms"
+        )
+
+
+class DeadlineClock:
+    """Ticks a tasa fija sobre time.monotonic.
+
+    wait() duerme hasta el próximo deadline (stop_event.wait: un paro corta en el
+    acto) y devuelve el instante real de despertar, o None si se pidió paro. Si al
+    llegar ya pasó más de una ventana, se cuentan los deadlines perdidos como
+    overruns y se re-ancla al próximo futuro: no hay ráfaga de iteraciones
+    atrasadas que le exijan al heater lo que ya no se puede entregar."""
+
+    def __init__(self, period, stop_event, stats=None, clock=time.monotonic):
+        self.period = float(period)
+        self.stop_event = stop_event
+        self.stats = stats if stats is not None else ControlStats(self.period)
+        self._clock = clock
+        self._next = None
+
+    def start(self):
+        self._next = self._clock()
+        return self._next
+
+    def wait(self):
+        if self._next is None:
+            self.start()
+        self._next += self.period
+        now = self._clock()
+        if now > self._next + self.period:
+            missed = int((now - self._next) / self.period)
+            self.stats.overruns += missed
+            self._next += missed * self.period
+        remaining = self._next - now
+        if remaining > 0 and self.stop_event.wait(remaining):
+            return None
+        if self.stop_event.is_set():
+            return None
+        now = self._clock()
+        self.stats.add_late(max(0.0, now - self._next))
+        return now
+
+
+class PhaseControlLoop:
+    """PI de una fase (alcance u hold) sobre un HeaterActuator.
+
+    params: dict de load_phase_pid (KP, KI, I_MAX, TEMP_BAND, WINDOW, ...).
+    read_sample(): (temperatura, edad en s) de la última muestra.
+    max_age(error): edad máxima confiable (hold: umbral fijo; rampa: fuzzy).
+    gains(error, kp, ki): gain scheduling; None = ganancias fijas.
+    Conserva la semántica del PI manual: dentro de TEMP_BAND la potencia es 0 y
+    con la muestra vieja el heater se apaga sin integrar."""
+
+    def __init__(self, heater, params, stop_event, read_sample, max_age, gains=None,
+                 clock=time.monotonic):
+        self.heater = heater
+        self.period = float(params["WINDOW"])
+        self.base_kp = params["KP"]
+        self.base_ki = params["KI"]
+        self.temp_band = params["TEMP_BAND"]
+        self.read_sample = read_sample
+        self.max_age = max_age
+        self.gains = gains
+        self.stop_event = stop_event
+        self.stats = ControlStats(self.period)
+        self.pid = PIDController(
+            self.base_kp,
+            self.base_ki,
+            0.0,
+            output_limits=(0.0, 1.0),
+            ts=None,
+            aw_tracking_time=None,
+            integral_limit=params["I_MAX"],
+        )
+        self._clock = clock
+
+    def run(self, setpoint, done):
+        """Regula hacia setpoint hasta done(temp, t_fase) o paro.
+
+        done recibe la temperatura y los segundos desde el inicio de la fase.
+        Devuelve las ControlStats de la fase."""
+        pid = self.pid
+        pid.setpoint = setpoint
+        ticker = DeadlineClock(self.period, self.stop_event, self.stats, self._clock)
+        t0 = ticker.start()
+        now = t0
+        prev = None
+        while not self.stop_event.is_set():
+            temp, age = self.read_sample()
+            if done(temp, now - t0):
+                break
+            self.stats.iterations += 1
+            if prev is not None:
+                self.stats.add_dt(now - prev)
+            prev = now
+            error = setpoint - temp
+            if age > self.max_age(error):
+                # Temperatura vieja → no confiar: apagar y no integrar el hueco.
+                self.stats.stale += 1
+                self.heater.off()
+                pid.skip(now)
+            else:
+                if self.gains is not None:
+                    pid.kp, pid.ki = self.gains(error, self.base_kp, self.base_ki)
+                power = pid.compute(temp, now)
+                if abs(error) < self.temp_band:
+                    power = 0.0
+                self.heater.set_duty(power, period=self.period)
+            now = ticker.wait()
+            if now is None:
+                break
+        return self.stats
+
+
+class PlantModel:
+    """FOPDT del disco: T_ss = t_amb + gain·duty, constante tau, retraso dead_time.
+
+    dead_time es el total que ve el lazo (LED, termocupla, broadcast y EMA). Lo
+    identifica Drivers/PcrAutoTune.py y se guarda en settings.json como
+    "pcr_plant_model"."""
+
+    def __init__(self, gain, tau, dead_time, t_amb):
+        self.gain = float(gain)
+        self.tau = float(tau)
+        self.dead_time = float(dead_time)
+        self.t_amb = float(t_amb)
+
+    def steady_duty(self, temp):
+        return max(0.0, min(1.0, (temp - self.t_amb) / self.gain))
+
+    def to_dict(self):
+        return {"gain": self.gain, "tau": self.tau, "dead_time": self.dead_time,
+                "t_amb": self.t_amb}
+
+    @classmethod
+    def from_dict(cls, data):
+        """PlantModel o None si el dict no trae un modelo válido."""
+        try:
+            model = cls(data["gain"], data["tau"], data["dead_time"], data["t_amb"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        return model if model.gain > 0 and model.tau > 0 and model.dead_time >= 0 else None
+
+    def __repr__(self):
+        return (
+            f"PlantModel(gain={self.gain:.1f} °C, tau={self.tau:.1f} s, "
+            f"dead_time={self.dead_time:.2f} s, t_amb={self.t_amb:.1f} °C)"
+        )
+
+
+class PredictiveRamp:
+    """Rampa de tiempo mínimo hacia setpoint sobre un PlantModel.
+
+    Cada POLL_S predice la temperatura que verá el sensor cuando llegue el efecto
+    de lo aplicado ahora: parte de la última muestra (que refleja la planta de
+    hace age + dead_time) y la propaga con el historial de duty ya aplicado.
+    Potencia plena (o apagado, si hay que bajar) mientras esa predicción no llega
+    al setpoint; al llegar aplica el duty de régimen y lo que queda "en el tubo"
+    lleva la planta justo al setpoint, sin el frenado temprano del PI.
+    La latencia de la muestra (age) se mide en cada iteración, no se supone: por
+    eso no hace falta el fuzzy_max_age de la rampa PI y max_age es un umbral fijo
+    (m_age_max de la fase) por encima del cual el heater se apaga.
+    params solo aporta WINDOW (periodo del PWM)."""
+
+    POLL_S = 0.01
+    COAST_DEAD_TIMES = 2.0  # espera tras cada corte, en múltiplos de dead_time
+
+    def __init__(self, heater, model, params, stop_event, read_sample, max_age,
+                 clock=time.monotonic, duty_before=None):
+        self.heater = heater
+        self.model = model
+        self.params = params
+        self.stop_event = stop_event
+        self.read_sample = read_sample
+        self.max_age = max_age
+        self._clock = clock
+        self.stats = ControlStats(self.POLL_S)
+        self.switch_time = None  # s desde el inicio al soltar la potencia plena
+        # Historial de duty (t, duty) aún "en el tubo"; duty_before es lo que se
+        # aplicaba antes de la rampa (None = el duty actual del heater).
+        if duty_before is None:
+            duty_before = getattr(heater, "duty", 0.0)
+        self._hist = deque([(-math.inf, float(duty_before))])
+
+    def _set(self, duty, now):
+        self.heater.set_duty(duty, period=self.params["WINDOW"])
+        if duty != self._hist[-1][1]:
+            self._hist.append((now, duty))
+
+    def _duty_at(self, t):
+        duty = self._hist[0][1]
+        for t_i, d in self._hist:
+            if t_i > t:
+                break
+            duty = d
+        return duty
+
+    def predict(self, temp, age, now):
+        """Temperatura medida en now + dead_time si desde ahora no cambia el duty."""
+        m = self.model
+        t_in = now - age - m.dead_time  # entrada que refleja la muestra
+        while len(self._hist) > 1 and self._hist[1][0] <= t_in:
+            self._hist.popleft()
+        cuts = [t_in] + [t_i for t_i, _d in self._hist if t_in < t_i < now] + [now]
+        y = temp
+        for a, b in zip(cuts, cuts[1:]):
+            y_inf = m.t_amb + m.gain * self._duty_at(a)
+            y = y_inf + (y - y_inf) * math.exp(-(b - a) / m.tau)
+        return y
+
+    def run(self, setpoint, done, band=0.5):
+        """Rampa hasta done(temp, t_fase) o paro. Devuelve las ControlStats.
+
+        Tras cada corte se espera COAST_DEAD_TIMES·dead_time con u_ss: lo aplicado
+        aún no se ve en la medida. Si después la predicción queda a más de band del
+        setpoint (error de modelo), se repite el empuje desde la medida nueva."""
+        ticker = DeadlineClock(self.POLL_S, self.stop_event, self.stats, self._clock)
+        t0 = ticker.start()
+        now = t0
+        u_ss = self.model.steady_duty(setpoint)
+        coast_end = None  # fin de la espera con u_ss; None = empujando
+        rising = None  # sentido del empuje en curso (None = por decidir)
+        while True:
+            temp, age = self.read_sample()
+            if done(temp, now - t0):
+                return self.stats
+            self.stats.iterations += 1
+            if coast_end is not None and now < coast_end:
+                pass
+            elif age > self.max_age:
+                self.stats.stale += 1
+                if coast_end is None:
+                    self._set(0.0, now)
+            else:
+                pred = self.predict(temp, age, now)
+                if coast_end is not None and abs(setpoint - pred) > band:
+                    coast_end, rising = None, None
+                if coast_end is None:
+                    if rising is None:
+                        rising = pred < setpoint
+                    if (pred >= setpoint) if rising else (pred <= setpoint):
+                        if self.switch_time is None:
+                            self.switch_time = now - t0
+                        self._set(u_ss, now)
+                        coast_end = now + self.COAST_DEAD_TIMES * self.model.dead_time
+                    else:
+                        self._set(1.0 if rising else 0.0, now)
+            now = ticker.wait()
+            if now is None:
+                return self.stats
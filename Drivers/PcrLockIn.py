@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Detección sincrónica (lock-in) de la fluorescencia del PCR.
+
+PCRFrame._read_fluorescence tomaba una sola ventana OFF/ON/OFF por ciclo (0.5 +
+2.0 + 0.5 s) con una conversión I²C bloqueante cada 0.1 s (averages=4 a 64 SPS):
+~30 muestras en 3 s y una resta de medias que se come entera la deriva lenta
+(luz ambiente, offset del TIA que se calienta con el disco).
+Aquí el ADS1115 queda en modo continuo (hasta 860 SPS) sobre el canal del
+fotodetector y cada lectura es solo el registro de conversión. El LED de
+excitación (pin_pcr) se modula en onda cuadrada a `freq` y cada muestra se
+guarda con la referencia (luz ON/OFF) en un SampleRing de NumPy. demodulate()
+promedia cada semiperiodo descartando `settle_s` tras cada flanco y resta a cada
+ON la media de los OFF vecinos: es el lock-in con referencia cuadrada y cancela
+cualquier deriva lineal dentro de un periodo. A 5 Hz un semiperiodo de 100 ms
+integra un número entero de ciclos de red de 50 y de 60 Hz.
+Ver docs/pcr_lockin.md.
+"""
+import math
+import time
+
+import numpy as np
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 01:10 $"
+
+
+class SampleRing:
+    """Buffer circular preasignado de (t, v, ref).
+
+    Un solo escritor (el hilo que adquiere). Al llenarse pisa lo más viejo;
+    arrays() devuelve las muestras en orden cronológico (vistas si no dio la
+    vuelta, copias si dio)."""
+
+    def __init__(self, capacity):
+        self.capacity = max(1, int(capacity))
+        self.t = np.empty(self.capacity, dtype=np.float64)
+        self.v = np.empty(self.capacity, dtype=np.float64)
+        self.ref = np.empty(self.capacity, dtype=np.int8)
+        self.count = 0  # muestras escritas desde clear()
+
+    def clear(self):
+        self.count = 0
+
+    def append(self, t, v, ref):
+        i = self.count % self.capacity
+        self.t[i] = t
+        self.v[i] = v
+        self.ref[i] = ref
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def arrays(self):
+        n = len(self)
+        if self.count <= self.capacity:
+            return self.t[:n], self.v[:n], self.ref[:n]
+        i = self.count % self.capacity
+        return (
+            np.roll(self.t, -i),
+            np.roll(self.v, -i),
+            np.roll(self.ref, -i),
+        )
+
+
+def demodulate(t, v, ref, settle_s=0.0):
+    """(delta, stderr, n) del lock-in con referencia cuadrada.
+
+    Agrupa las muestras en semiperiodos (tramos de ref constante), descarta las
+    que caen a menos de settle_s del inicio de su tramo y promedia el resto. Cada
+    tramo ON con media válida da d = on - media(OFF vecinos); delta es la media de
+    los d y stderr su error estándar (nan con un solo ON). Sin ningún par ON/OFF
+    válido devuelve (0.0, nan, 0)."""
+    t = np.asarray(t, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    ref = np.asarray(ref)
+    if t.size == 0:
+        return 0.0, math.nan, 0
+    starts = np.r_[0, np.flatnonzero(np.diff(ref)) + 1]
+    lengths = np.diff(np.r_[starts, t.size])
+    seg = np.repeat(np.arange(starts.size), lengths)
+    keep = (t - t[starts][seg]) >= settle_s
+    counts = np.bincount(seg[keep], minlength=starts.size)
+    sums = np.bincount(seg[keep], weights=v[keep], minlength=starts.size)
+    means = np.full(starts.size, np.nan)
+    ok = counts > 0
+    means[ok] = sums[ok] / counts[ok]
+    seg_on = ref[starts] != 0
+
+    diffs = []
+    for k in np.flatnonzero(seg_on & ok):
+        neigh = [means[j] for j in (k - 1, k + 1) if 0 <= j < starts.size and not seg_on[j] and ok[j]]
+        if neigh:
+            diffs.append(means[k] - sum(neigh) / len(neigh))
+    if not diffs:
+        return 0.0, math.nan, 0
+    d = np.asarray(diffs)
+    stderr = float(d.std(ddof=1) / math.sqrt(d.size)) if d.size > 1 else math.nan
+    return float(d.mean()), stderr, int(d.size)
+
+
+class LockInReader:
+    """Adquiere con el LED modulado y demodula.
+
+    ads: Ads1115Reader (o VirtualAds) con start_stream/read_stream/stop_stream.
+    led_pin: pin con write(bool) (pin_pcr). La corrida son `periods` periodos de
+    `freq` Hz entre dos semiperiodos OFF: OFF, ON, OFF, ..., ON, OFF, así todo
+    ON tiene un OFF a cada lado. Las muestras se pacean a 1/sps (leer más rápido
+    que el ADC solo repite la última conversión). settle_s nunca baja de dos
+    conversiones: la del flanco mezcla los dos niveles."""
+
+    def __init__(
+        self,
+        ads,
+        led_pin,
+        freq=5.0,
+        duration=1.5,
+        sps=860,
+        use_diff=False,
+        settle_s=0.003,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.ads = ads
+        self.led_pin = led_pin
+        self.freq = float(freq)
+        self.sps = int(sps)
+        self.use_diff = bool(use_diff)
+        self.periods = max(1, int(round(float(duration) * self.freq)))
+        self.settle_s = max(float(settle_s), 2.0 / self.sps)
+        self._clock = clock
+        self._sleep = sleep
+        self.ring = SampleRing(int(self.total_s * self.sps * 1.2) + 16)
+
+    @property
+    def half_s(self):
+        return 0.5 / self.freq
+
+    @property
+    def total_s(self):
+        """Duración de la adquisición: 2·periods + 1 semiperiodos."""
+        return (2 * self.periods + 1) * self.half_s
+
+    def acquire(self, stop_event=None):
+        """Llena self.ring (t relativo al arranque, v, ref). True si se abortó.
+        Deja el LED apagado pase lo que pase."""
+        ring = self.ring
+        ring.clear()
+        dt = 1.0 / self.sps
+        n_half = 2 * self.periods + 1
+        pair = (0, 1) if self.use_diff else (0, None)
+        self.ads.start_stream(*pair, sps=self.sps)
+        try:
+            level = 0
+            self.led_pin.write(False)
+            t0 = self._clock()
+            next_t = t0
+            while True:
+                now = self._clock()
+                half = int((now - t0) / self.half_s)
+                if half >= n_half:
+                    return False
+                want = half % 2
+                if want != level:
+                    # Flanco en el semiperiodo que toca (no se acumula el retraso).
+                    level = want
+                    self.led_pin.write(bool(level))
+                    if stop_event is not None and stop_event.is_set():
+                        return True
+                ring.append(now - t0, self.ads.read_stream(), level)
+                next_t += dt
+                wait = next_t - self._clock()
+                if wait > 0:
+                    self._sleep(wait)
+                elif wait < -dt:
+                    next_t = self._clock()  # atrasado: no ráfagas para recuperar
+        finally:
+            self.led_pin.write(False)
+            self.ads.stop_stream()
+
+    def demodulate(self):
+        t, v, ref = self.ring.arrays()
+        return demodulate(t, v, ref, self.settle_s)
+
+    def samples(self):
+        """Serie cruda [(t_rel, light_on, voltage)] para data_photodetector_series."""
+        t, v, ref = self.ring.arrays()
+        return list(zip(t.tolist(), ref.tolist(), v.tolist()))
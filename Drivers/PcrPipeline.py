@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Lectura de fluorescencia solapada con la cola del hold de extensión.
+
+Cada ciclo del PCR hacía, uno detrás del otro: hold de extensión, sleep de
+FLUOR_PRE_SLEEP_S y _read_fluorescence completa (3.5 s con la ventana, 2.2 s con
+el lock-in). La muestra ya está a la temperatura de extensión durante el hold, así
+que la lectura puede correr en un hilo aparte mientras el PI sigue sosteniendo
+la temperatura, y terminar junto con el hold:
+  - overlap_plan(hold_s, read_s): cuánto dura el hold (nunca menos que la lectura,
+    para que la muestra no se enfríe leyendo) y cuándo arranca la lectura.
+  - TailRead: hilo que espera ese retraso (cortable por el stop_event) y lee.
+Con "fluor_gate_heater" el calefactor se apaga mientras el LED de excitación está
+encendido (GatedHeater / LightGatePin de Drivers/DriverHeater.py).
+Ver docs/pcr_fluor_overlap.md.
+
+PreSpin hace lo mismo con el giro de enfriamiento: lo arranca durante la cola del
+hold high para que el disco llegue a la RPM justo cuando el hold termina
+(docs/pcr_prespin.md).
+"""
+import threading
+import time
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 02:05 $"
+
+# La lectura termina este margen antes que el hold: el join no espera al hilo
+# con el heater ya apagado.
+TAIL_MARGIN_S = 0.1
+
+
+def overlap_plan(hold_s, read_s, margin_s=TAIL_MARGIN_S):
+    """(duración del hold, retraso de la lectura desde el inicio del hold)."""
+    hold_s = max(0.0, float(hold_s))
+    read_s = max(0.0, float(read_s))
+    total = max(hold_s, read_s + margin_s)
+    return total, total - read_s - margin_s
+
+
+def overlap_extra_s(hold_s, read_s, margin_s=TAIL_MARGIN_S):
+    """Tiempo que la lectura solapada suma al hold (0 si cabe en él)."""
+    total, _delay = overlap_plan(hold_s, read_s, margin_s)
+    return total - max(0.0, float(hold_s))
+
+
+class TailRead:
+    """Corre read() en un hilo después de delay_s.
+
+    Si stop_event se pone durante la espera, read() se llama igual: las lecturas
+    del PCR revisan el mismo evento y cortan solas, como la lectura secuencial
+    tras un paro. join() devuelve el resultado o relanza la excepción del hilo."""
+
+    def __init__(self, read, stop_event=None, name="pcr-fluor-read"):
+        self._read = read
+        self._stop = stop_event
+        self._name = name
+        self._thread = None
+        self._result = None
+        self._error = None
+
+    def start(self, delay_s):
+        self._thread = threading.Thread(
+            target=self._run, args=(max(0.0, delay_s),), name=self._name, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self, delay_s):
+        try:
+            if delay_s > 0.0:
+                if self._stop is not None:
+                    self._stop.wait(delay_s)
+                else:
+                    time.sleep(delay_s)
+            self._result = self._read()
+        except Exception as e:
+            self._error = e
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class PreSpin:
+    """Llama command() en un hilo después de delay_s, salvo cancel() o stop_event.
+
+    Después del comando, confirm(t_cmd) puede bloquear esperando la telemetría
+    (el STAT de la RPM): el hilo sigue aunque el hold ya haya terminado. cancel()
+    corta la espera y devuelve True si el comando ya salió (el motor gira)."""
+
+    def __init__(self, command, confirm=None, stop_event=None, name="pcr-prespin"):
+        self._command = command
+        self._confirm = confirm
+        self._stop = stop_event
+        self._name = name
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.t_cmd = None
+        self.error = None
+
+    def start(self, delay_s):
+        self._thread = threading.Thread(
+            target=self._run, args=(max(0.0, delay_s),), name=self._name, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self, delay_s):
+        deadline = time.monotonic() + delay_s
+        while not self._cancel.is_set():
+            if self._stop is not None and self._stop.is_set():
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0.0:
+                break
+            self._cancel.wait(remaining)
+        try:
+            with self._lock:
+                if self._cancel.is_set():
+                    return
+                self.t_cmd = time.time()
+                self._command()
+            if self._confirm is not None:
+                self._confirm(self.t_cmd)
+        except Exception as e:
+            self.error = e
+
+    def cancel(self):
+        """Cancela si aún no arrancó; True si el comando ya salió."""
+        self._cancel.set()
+        with self._lock:
+            return self.t_cmd is not None
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,707 @@
+# -*- coding: utf-8 -*-
+"""Secuencia del experimento PCR, sin Tk: desnaturalización, ciclos y extensión final.
+
+PCRFrame.experiment_pcr arma el hardware (cliente UDP, motor, heater, pin del LED)
+y le entrega la corrida a PcrRunner. El banco test/bench_pcr_sim.py corre la misma
+clase contra el disco virtual, así que sus cifras de asentamiento, enfriamiento y
+tiempo total miden el código de la app y no una copia.
+
+PcrRunner no crea hardware ni lee la temperatura por su cuenta:
+  - source: objeto con temp y temp_ts (última medida), temp_estimator y
+    temp_monitor. Lo actualiza el callback UDP (PCRFrame o el banco).
+  - heater, led_pin, ads, motor: los fija quien arma el hardware antes de run().
+  - stop_event corta la corrida; motor_stop_event, el giro del motor.
+  - on_fluorescence(delta, serie): cada lectura, para el plot por ciclo.
+El progreso (fase, ciclos, duración media, log de enfriamiento) queda en
+atributos que la UI lee para el estado y la estimación del tiempo restante.
+"""
+import time
+
+from Drivers.DriverHeater import GatedHeater, LightGatePin
+from Drivers.PcrControlLoop import (
+    PhaseControlLoop,
+    PlantModel,
+    PredictiveRamp,
+    fuzzy_gains,
+    fuzzy_max_age,
+    load_phase_pid,
+)
+from Drivers.PcrLockIn import LockInReader
+from Drivers.PcrPipeline import PreSpin, TailRead, overlap_extra_s, overlap_plan
+from Drivers.StepperTelemetry import SpinUpModel
+from templates.utils import get_setting, get_setting_bool, get_setting_float, get_setting_int
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 05:00 $"
+
+# Duración de la lectura de fluorescencia (fuente única de verdad).
+# Usadas como defaults de read_fluorescence, en los sleeps previos a cada
+# lectura y en la estimación de tiempo restante del experimento.
+FLUOR_PRE_SLEEP_S = 0.5  # espera tras el hold de extensión, antes de muestrear
+FLUOR_BASELINE_S = 0.5  # ventana de línea base (luz OFF)
+FLUOR_LIGHT_S = 2.0  # ventana de excitación (luz ON)
+FLUOR_POST_S = 0.5  # ventana de decaimiento (luz OFF)
+# Tiempo total que consume una lectura completa (sleep previo + 3 ventanas).
+# Con "photoreceptor.lockin" la lectura dura lo que LockInReader.total_s
+# (fluor_window_s); ver docs/pcr_lockin.md. Con "fluor_overlap" la lectura
+# corre en la cola del hold de extensión y solo suma lo que no cabe en él
+# (fluor_extra_s); ver docs/pcr_fluor_overlap.md.
+FLUOR_READ_TOTAL_S = FLUOR_PRE_SLEEP_S + FLUOR_BASELINE_S + FLUOR_LIGHT_S + FLUOR_POST_S
+
+# Tolerancia de las rampas (alcance del setpoint) y del enfriamiento.
+REACH_TOLERANCE = 0.5
+# El giro de enfriamiento corta a cool_target + COOL_SPIN_MARGIN: la inercia
+# térmica baja el resto con el disco frenando.
+COOL_SPIN_MARGIN = 9.5
+# Techo de RPM del giro de enfriamiento (mismo que spinMotorRPM_ramped recibe).
+COOL_MAX_RPM = 900.0
+
+
+def skip_phase(t):
+    """True si una fase debe omitirse: su tiempo es <= 0 (o no numérico).
+
+    Cuando una fase se omite se salta tanto la rampa de alcance como el hold,
+    para no calentar hacia un setpoint que luego no se sostiene.
+    """
+    try:
+        return float(t) <= 0
+    except (TypeError, ValueError):
+        return False
+
+
+class PcrRunner:
+    """Una corrida PCR sobre hardware ya armado. Ver el docstring del módulo."""
+
+    def __init__(self, source, stop_event=None, motor_stop_event=None, on_fluorescence=None):
+        self.source = source
+        self.stop_event = stop_event
+        self.motor_stop_event = motor_stop_event
+        self.on_fluorescence = on_fluorescence
+        self.heater = None
+        self.led_pin = None
+        self.ads = None
+        self.motor = None
+        # spinMotorRPM_ramped se resuelve al primer giro (import lazy: el módulo del
+        # driver importa gpiod/serial y rompería el modo dev en Windows).
+        self.spin = None
+        # (instante, ciclo, fase) de cada cambio de fase: límites para las métricas.
+        self.phase_log = []
+        self.cycle_idx = -1
+        self.fase = "Initial"
+        self.total_cycles = 0
+        self.cycles_complete = 0
+        self.start_cycle_time = time.time()
+        self.time_end_cycle = time.time()
+        self.last_cycle_duration = 0.0
+        self.avg_cycle_duration = 0.0
+        # Marca del arranque de la extensión final (0.0 = aún no empieza; el reloj
+        # de pared nunca es 0). La estimación la usa para contar hacia abajo el
+        # segmento final en vez de caer al tiempo teórico ya agotado por el error
+        # acumulado entre ciclos.
+        self.start_final_ext_time = 0.0
+        # (ciclo, fin del hold high, temperatura de enfriamiento alcanzada, pre-spin)
+        # por ciclo: mide cuánto dura el enfriamiento (docs/pcr_prespin.md).
+        self.cooling_log = []
+        self.control_overruns = 0
+        self.spin_model = None
+        self.fluor_overlap = False
+        self.fluor_gate_heater = False
+        self.cool_home_deferred = False
+        self.cool_prespin = False
+        self.cool_prespin_lag_s = 0.2
+        self.lockin = None  # kwargs de LockInReader, o None (ventana OFF/ON/OFF)
+        self.fluor_window_s = FLUOR_READ_TOTAL_S - FLUOR_PRE_SLEEP_S
+        self.fluor_read_total_s = FLUOR_READ_TOTAL_S
+
+    @property
+    def fase(self):
+        return self._fase
+
+    @fase.setter
+    def fase(self, text):
+        self._fase = text
+        self.phase_log.append((time.time(), self.cycle_idx, text))
+
+    def configure(self):
+        """Lee de settings.json las opciones de la corrida (una vez, al inicio):
+        lectura solapada/gated, lock-in, homing diferido y pre-spin."""
+        self.fluor_overlap = get_setting_bool("fluor_overlap", False)
+        self.fluor_gate_heater = get_setting_bool("fluor_gate_heater", False)
+        self.cool_home_deferred = get_setting("cool_homing", "each") == "deferred"
+        self.cool_prespin = get_setting_bool("cool_prespin", False)
+        self.cool_prespin_lag_s = get_setting_float("cool_prespin_lag_s", 0.2)
+        self.lockin = None
+        if get_setting_bool("photoreceptor.lockin", False):
+            self.lockin = {
+                "freq": get_setting_float("photoreceptor.lockin_hz", 5.0),
+                "duration": get_setting_float("photoreceptor.lockin_s", 1.5),
+                "sps": get_setting_int("photoreceptor.lockin_sps", 860),
+                "use_diff": get_setting_bool("photoreceptor.use_diff", False),
+            }
+        self.refresh_fluor_window()
+        return self
+
+    def refresh_fluor_window(self):
+        # Duración de read_fluorescence, sin el sleep previo.
+        reader = self._make_lockin()
+        self.fluor_window_s = (
+            FLUOR_READ_TOTAL_S - FLUOR_PRE_SLEEP_S if reader is None else reader.total_s
+        )
+        self.fluor_read_total_s = FLUOR_PRE_SLEEP_S + self.fluor_window_s
+
+    def fluor_extra_s(self, hold_s):
+        # Lo que la lectura de fluorescencia suma tras un hold de hold_s.
+        if self.fluor_overlap and not skip_phase(hold_s):
+            return overlap_extra_s(hold_s, self.fluor_window_s)
+        return self.fluor_read_total_s
+
+    def theoretical_time_s(self, recipe):
+        """Duración teórica de la receta (holds ×1.2 por ciclo + lecturas)."""
+        r = recipe
+        cycles = int(r["cycles"])
+        return (
+            (r["time_high"] + r["time_low"] + r["ext_time"]) * 1.2 * cycles
+            + r["denat_time"]
+            + r["ext_time_final"]
+            + self.fluor_extra_s(r["ext_time"]) * cycles  # lectura de fluorescencia por ciclo
+            + self.fluor_extra_s(r["ext_time_final"])  # lectura de fluorescencia final
+        )
+
+    # ------------------------------------------------------------------ temperatura
+    def temp_sample(self):
+        """(temperatura estimada, edad en s) para el lazo de control.
+
+        Con Kalman la estimación se proyecta a ahora con la pendiente estimada (la
+        latencia del UDP queda compensada); la edad sigue siendo la de la última
+        medida, para la política de muestra vieja."""
+        now = time.time()
+        temp, _std = self.source.temp_estimator.estimate(now)
+        return temp, now - self.source.temp_ts
+
+    def temp_measured(self):
+        """(temperatura en la última medida, edad en s): PredictiveRamp proyecta
+        por su cuenta con el modelo de la planta."""
+        return self.source.temp, time.time() - self.source.temp_ts
+
+    # ------------------------------------------------------------------ control
+    def hold_temperature(
+        self,
+        temp_setpoint,
+        time_hold,
+        ts,
+        stop_func,
+        heater,
+        KI,
+        I_MAX,
+        KP_HOLD,
+        TEMP_BAND,
+        WINDOW,
+    ):
+        # PI a tasa fija sobre PIDController (ver docs/pcr_control_loop.md): una
+        # iteración por WINDOW en deadlines monotónicos, integrando el dt real.
+        # El heater modula con periodo WINDOW (un ciclo PWM por actualización).
+        # Ganancias difusas y banda muerta TEMP_BAND como antes; la temperatura
+        # más vieja que ts apaga el heater sin integrar.
+        loop = PhaseControlLoop(
+            heater,
+            {"KP": KP_HOLD, "KI": KI, "I_MAX": I_MAX, "TEMP_BAND": TEMP_BAND, "WINDOW": WINDOW},
+            stop_func,
+            self.temp_sample,
+            max_age=lambda _error: ts,
+            gains=fuzzy_gains,
+        )
+        stats = loop.run(temp_setpoint, lambda _temp, elapsed: elapsed > time_hold)
+        self.control_overruns += stats.overruns
+        print(f"[{self.fase}] control loop: {stats.summary()}")
+        return stats
+
+    def reach_temperature_pi(
+        self, setpoint, params, stop_event, break_if_below=False, tolerance=REACH_TOLERANCE
+    ):
+        # Rampa PI hacia setpoint con anti-windup y descarte de temperatura vieja.
+        # El heater debe estar pre-armado por el caller; este método fija el duty.
+        MAX_AGE_MIN = params["MAX_AGE_MIN"]
+        MAX_AGE_MAX = params["MAX_AGE_MAX"]
+        FF_FRAC = params.get("FF_FRAC", 0.0)
+        src = self.source
+
+        # ----- Pre-rampa feed-forward (mismo principio que la desnaturalización):
+        # calienta a potencia plena hasta FF_FRAC*setpoint y luego entrega el
+        # control al PI para asentar sin sobreimpulso. Se omite cuando venimos
+        # ya calientes (break_if_below, p. ej. ciclo 0 tras el hold de denat).
+        # A diferencia de la rampa de denaturación, aquí el blast también
+        # descarta temperatura vieja: si la lectura UDP envejece, apaga el
+        # heater y re-arma en cada lectura fresca para evitar runaway térmico.
+        if FF_FRAC > 0.0 and not break_if_below:
+            ceiling = setpoint * FF_FRAC
+            monitor = src.temp_monitor
+            while not stop_event.is_set():
+                seq = monitor.seq  # antes de leer temp: no perder un datagrama
+                if src.temp >= ceiling:
+                    break
+                age = time.time() - src.temp_ts
+                max_age = fuzzy_max_age(setpoint - src.temp, MAX_AGE_MIN, MAX_AGE_MAX)
+                if age > max_age:
+                    # Temperatura vieja → no confiar; corta hasta el próximo dato.
+                    self.heater.off()
+                    timeout = None
+                else:
+                    self.heater.on()
+                    timeout = max_age - age  # la muestra se vuelve vieja ahí
+                # Solo cambia algo con un datagrama nuevo o al envejecer la muestra:
+                # se duerme hasta lo primero, sin sondear.
+                monitor.wait_newer(seq, timeout, stop_event)
+
+        # PI a tasa fija hasta entrar en la tolerancia. La edad máxima confiable
+        # escala con el error (fuzzy_max_age): tolera lecturas añejas en la
+        # rampa dura y exige frescura cerca del setpoint.
+        loop = PhaseControlLoop(
+            self.heater,
+            params,
+            stop_event,
+            self.temp_sample,
+            max_age=lambda error: fuzzy_max_age(error, MAX_AGE_MIN, MAX_AGE_MAX),
+            gains=fuzzy_gains,
+        )
+        stats = loop.run(
+            setpoint,
+            lambda temp, _elapsed: abs(setpoint - temp) <= tolerance
+            or (break_if_below and temp < setpoint),
+        )
+        self.control_overruns += stats.overruns
+        print(f"[{self.fase}] control loop: {stats.summary()}")
+
+    def reach_temperature(
+        self, setpoint, params, stop_event, break_if_below=False, tolerance=REACH_TOLERANCE
+    ):
+        # Rampa de las fases high/ext según "ramp_strategy": "predictive" usa el
+        # modelo identificado por Drivers/PcrAutoTune.py ("pcr_plant_model");
+        # sin modelo válido (o con "pi") queda la rampa feed-forward + PI.
+        model = None
+        if get_setting("ramp_strategy", "pi") == "predictive":
+            model = PlantModel.from_dict(get_setting("pcr_plant_model", {}))
+            if model is None:
+                print("ramp_strategy 'predictive' without pcr_plant_model: using PI")
+        if model is None:
+            self.reach_temperature_pi(setpoint, params, stop_event, break_if_below, tolerance)
+            return
+        ramp = PredictiveRamp(
+            self.heater,
+            model,
+            params,
+            stop_event,
+            self.temp_measured,
+            max_age=params["MAX_AGE_MAX"],
+            # hold_phase deja el heater apagado; el on() del caller es de este instante.
+            duty_before=0.0,
+        )
+        stats = ramp.run(
+            setpoint,
+            lambda temp, _elapsed: abs(setpoint - temp) <= tolerance
+            or (break_if_below and temp < setpoint),
+            band=tolerance,
+        )
+        print(f"[{self.fase}] predictive ramp ({model}): {stats.summary()}")
+
+    def hold_phase(self, phase, setpoint, duration, ts, heater=None):
+        heater = self.heater if heater is None else heater
+        params = load_phase_pid(phase, ts)
+        self.hold_temperature(
+            setpoint,
+            duration,
+            ts,
+            self.stop_event,
+            heater,
+            params["KI"],
+            params["I_MAX"],
+            params["KP"],
+            params["TEMP_BAND"],
+            params["WINDOW"],
+        )
+        heater.off()
+
+    def hold_and_read(self, phase, setpoint, duration, ts):
+        # Hold con la lectura de fluorescencia en su cola (fluor_overlap): el PI
+        # sigue sosteniendo la temperatura mientras un TailRead lee, y el hold se
+        # estira si la lectura no cabe. Devuelve el delta, o None sin solape (solo
+        # hizo el hold; el caller lee después, con el sleep previo de siempre).
+        if not self.fluor_overlap:
+            self.hold_phase(phase, setpoint, duration, ts)
+            return None
+        hold_s, delay_s = overlap_plan(duration, self.fluor_window_s)
+        heater = self.heater
+        led_pin = self.led_pin
+        if self.fluor_gate_heater:
+            heater = GatedHeater(self.heater)
+            led_pin = LightGatePin(self.led_pin, heater)
+        read = TailRead(lambda: self.read_fluorescence(led_pin=led_pin), self.stop_event)
+        read.start(delay_s)
+        self.hold_phase(phase, setpoint, hold_s, ts, heater=heater)
+        return read.join()
+
+    # ------------------------------------------------------------------ motor
+    def _spin(self, *args, **kwargs):
+        if self.spin is None:
+            from Drivers.DriverStepperSys import spinMotorRPM_ramped
+
+            self.spin = spinMotorRPM_ramped
+        return self.spin(*args, **kwargs)
+
+    def start_prespin(self, time_high, rpm, direction):
+        # Pre-spin (cool_prespin): arranca el giro de enfriamiento lead_s antes
+        # del fin del hold high, para que el disco llegue a la RPM cuando el hold
+        # termina. El hilo confirma la RPM por STAT y actualiza el retraso medido
+        # del SpinUpModel. Devuelve el PreSpin o None si no aplica.
+        motor = self.motor
+        if not self.cool_prespin or motor is None or self.spin_model is None:
+            return None
+        target = (1 if direction.strip().upper() == "CW" else -1) * min(abs(rpm), COOL_MAX_RPM)
+        lead = self.spin_model.lead_s(target)
+        model = self.spin_model
+
+        def command():
+            motor.run_rpm(target, model.accel)
+
+        def confirm(t_cmd):
+            t_up = motor.wait_spun_up(
+                model.frac * target, lead + 2.0, since=t_cmd, stop_event=self.stop_event
+            )
+            if t_up is not None:
+                lag = model.observe(target, t_cmd, t_up)
+                print(f"[PCR] pre-spin: {abs(target):.0f} rpm confirmed, lag {lag:.2f} s "
+                      f"(model {model.lag_s:.2f} s)")
+
+        return PreSpin(command, confirm, self.stop_event).start(max(0.0, time_high - lead))
+
+    def log_cooling(self, idx, cool_target, t_high_end, prespun):
+        # Límites de fase del enfriamiento: fin del hold high -> cool_target + 0.5.
+        # Con y sin pre-spin, para comparar la duración ciclo a ciclo.
+        t_cooled = time.time()
+        self.cooling_log.append((idx, t_high_end, t_cooled, prespun))
+        print(f"[PCR] cycle {idx}: cooling to {cool_target} °C took {t_cooled - t_high_end:.2f} s"
+              f"{' (pre-spin)' if prespun else ''}")
+
+    def ensure_homed(self):
+        # Con cool_homing "deferred" el go_zero del enfriamiento quedó en curso:
+        # la lectura necesita el disco en la marca de cero y quieto. Normalmente
+        # ya terminó durante el hold low y vuelve en el acto.
+        motor = self.motor
+        if not self.cool_home_deferred or motor is None or not motor.home_pending:
+            return
+        if not motor.wait_homed(15.0, stop_event=self.stop_event):
+            print("[PCR] go_zero not confirmed by STAT before the fluorescence read.")
+        motor.stop()
+
+    # ------------------------------------------------------------------ fluorescencia
+    def _make_lockin(self, led_pin=None):
+        # LockInReader con los parámetros de "photoreceptor" leídos en configure(),
+        # o None si la lectura es la ventana OFF/ON/OFF de siempre.
+        if self.lockin is None:
+            return None
+        return LockInReader(self.ads, self.led_pin if led_pin is None else led_pin, **self.lockin)
+
+    def _emit_fluorescence(self, delta, series):
+        if self.on_fluorescence is not None:
+            self.on_fluorescence(delta, series)
+        return delta
+
+    def _read_fluorescence_lockin(self, reader):
+        # LED modulado + ADS en continuo, demodulado por semiperiodos
+        # (Drivers/PcrLockIn.py). Misma acumulación que la ventana OFF/ON/OFF.
+        reader.acquire(self.stop_event)
+        delta, stderr, periods = reader.demodulate()
+        print(
+            f"lock-in: {periods} periods at {reader.freq:g} Hz, "
+            f"{len(reader.ring)} samples, stderr {stderr:.6f} V"
+        )
+        return self._emit_fluorescence(delta, reader.samples())
+
+    def read_fluorescence(
+        self,
+        baseline_s=FLUOR_BASELINE_S,
+        light_s=FLUOR_LIGHT_S,
+        post_s=FLUOR_POST_S,
+        sample_dt=0.1,
+        averages=4,
+        led_pin=None,
+    ):
+        led_pin = self.led_pin if led_pin is None else led_pin
+        ads = self.ads
+        self.ensure_homed()
+        reader = self._make_lockin(led_pin)
+        if reader is not None:
+            return self._read_fluorescence_lockin(reader)
+        # Muestreo continuo del fotodetector mientras se modula la luz (led_pin):
+        #   baseline_s  -> luz OFF (línea base oscura)
+        #   light_s     -> luz ON  (excitación)
+        #   post_s      -> luz OFF (decaimiento)
+        # Devuelve el escalar
+        #   delta = media(ventana con luz) - media(ventana baseline)
+        # y lo entrega con la serie cruda a on_fluorescence. Soporta lectura
+        # diferencial.
+        use_diff = get_setting_bool("photoreceptor.use_diff", False)
+
+        # (t_rel, light_on, voltage) por muestra
+        samples = []
+
+        def read_one():
+            if use_diff:
+                return ads.read_voltage_diff(0, 1, averages=averages)
+            return ads.read_voltage(0, averages=averages)
+
+        def sample_window(duration, light_on, t0):
+            # Muestrea durante `duration` segundos a ~sample_dt, paceando por
+            # tiempo transcurrido. Devuelve True si se abortó (stop).
+            t_end = time.time() + duration
+            while time.time() < t_end:
+                if self.stop_event is not None and self.stop_event.is_set():
+                    return True
+                t_iter = time.time()
+                v = read_one()
+                samples.append((t_iter - t0, light_on, v))
+                elapsed = time.time() - t_iter
+                if elapsed < sample_dt:
+                    time.sleep(sample_dt - elapsed)
+            return False
+
+        t0 = time.time()
+        try:
+            led_pin.write(False)
+            aborted = sample_window(baseline_s, 0, t0)
+            if not aborted:
+                led_pin.write(True)
+                aborted = sample_window(light_s, 1, t0)
+            if not aborted:
+                led_pin.write(False)
+                sample_window(post_s, 0, t0)
+        finally:
+            led_pin.write(False)
+
+        baseline_vals = [v for (_, light_on, v) in samples if light_on == 0 and _ < baseline_s]
+        light_vals = [v for (_, light_on, v) in samples if light_on == 1]
+        mean_baseline = sum(baseline_vals) / len(baseline_vals) if baseline_vals else 0.0
+        mean_light = sum(light_vals) / len(light_vals) if light_vals else 0.0
+        return self._emit_fluorescence(mean_light - mean_baseline, samples)
+
+    # ------------------------------------------------------------------ secuencia
+    def run_cycle(
+        self,
+        idx,
+        high_temp,
+        low_temp,
+        time_high,
+        time_low,
+        rpm,
+        direction,
+        acceleration,
+        ts,
+        ext_time,
+        ext_temp,
+        denat_skipped=False,
+    ):
+        self.cycle_idx = idx
+        self.start_cycle_time = time.time()
+        src = self.source
+
+        # Siguiente fase activa tras el High: hacia ella enfría el giro del motor.
+        # Si Low se omite (time_low <= 0) se enfría hacia la extensión; si ambas
+        # se omiten no hay nada que enfriar (la próxima fase es calentamiento).
+        cool_target = (
+            low_temp
+            if not skip_phase(time_low)
+            else (ext_temp if not skip_phase(ext_time) else None)
+        )
+        prespin = None
+
+        # Reach High temp: feed-forward a potencia plena hasta ff_frac_high*setpoint
+        # y luego PI (tolerancia 0.5), o la rampa predictiva (ramp_strategy). En el
+        # ciclo 0 (break_if_below) se omite el blast porque venimos del hold de
+        # denaturación ya en temperatura, salvo que la desnaturalización se haya
+        # omitido (denat_skipped): en ese caso arrancamos en frío y hay que
+        # alcanzar High de verdad.
+        if not skip_phase(time_high):
+            self.fase = "Reach High temp"
+            self.heater.on()
+            self.reach_temperature(
+                high_temp,
+                load_phase_pid("high", ts),
+                self.stop_event,
+                break_if_below=(idx == 0 and not denat_skipped),
+            )
+            print(f"Temperature reached: {src.temp} °C")
+
+            # Hold High
+            self.fase = "Hold High temp"
+            print(f"Holding temperature for {time_high} seconds")
+            if cool_target is not None:
+                prespin = self.start_prespin(time_high, rpm, direction)
+            self.hold_phase("h_high", high_temp, time_high, ts)
+        else:
+            print("Skipping High phase: time <= 0")
+
+        # Cool down con giro del motor hacia la siguiente fase activa del ciclo.
+        # Con el pre-spin ya girando se entra igual: si no hace falta enfriar,
+        # stop_func corta en el acto y el giro termina (y hace homing) como siempre.
+        t_high_end = time.time()
+        prespun = prespin is not None and prespin.cancel()
+        if cool_target is not None and (prespun or src.temp > cool_target + REACH_TOLERANCE):
+            print(f"Cooling down to {cool_target} °C with motor spin")
+            self.fase = "Cooling"
+            self.motor_stop_event.clear()
+            self._spin(
+                direction,
+                rpm,
+                ts,
+                acceleration,
+                COOL_MAX_RPM,
+                True,
+                self.motor,
+                None,
+                stop_func=lambda: self.stop_event.is_set()
+                or src.temp <= cool_target
+                or src.temp < cool_target + COOL_SPIN_MARGIN,
+                stop_event=self.motor_stop_event,
+                home=not self.cool_home_deferred,
+                running=prespun,
+            )
+            if self.cool_home_deferred:
+                # Paro ya confirmado por STAT; el homing corre mientras el disco
+                # termina de enfriar y durante el hold low. ensure_homed lo espera
+                # antes de la lectura de fluorescencia.
+                self.motor.home(50)
+
+            print(src.temp, "cool target....dis")
+            # Antes: sleep(0.001) en bucle, mil despertares por segundo para un dato
+            # que cambia cada 80 ms. Ahora despierta cada datagrama.
+            src.temp_monitor.wait_for(
+                lambda: src.temp <= cool_target + REACH_TOLERANCE,
+                stop_event=self.stop_event,
+            )
+            print(f"Temperature reached: {src.temp} °C")
+            self.log_cooling(idx, cool_target, t_high_end, prespun)
+
+        # Hold Low
+        if not skip_phase(time_low):
+            self.fase = "LOW temp Hold"
+            print(f"Holding LOW temperature for {time_low} seconds")
+            self.hold_phase("h_low", low_temp, time_low, ts)
+        else:
+            print("Skipping Low phase: time <= 0")
+
+        # Reach Ext temp (PI o predictiva, tolerancia 0.5) + Hold Ext
+        if not skip_phase(ext_time):
+            self.fase = "Reach ext temp"
+            self.heater.on()
+            self.reach_temperature(
+                ext_temp,
+                load_phase_pid("ext", ts),
+                self.stop_event,
+                break_if_below=(idx == 0),
+            )
+            print(f"Temperature reached: {src.temp} °C")
+
+            # Hold Ext (con fluor_overlap, la lectura corre en su cola)
+            self.fase = "extension temp Hold "
+            print(f"Holding extension temperature for {ext_time} seconds")
+            v_fluo = self.hold_and_read("h_ext", ext_temp, ext_time, ts)
+            print(f"Hold ext complete, end of cycle {idx}")
+        else:
+            print("Skipping Extension phase: time <= 0")
+            v_fluo = None
+
+        # Lectura de fluorescencia
+        if v_fluo is None:
+            time.sleep(FLUOR_PRE_SLEEP_S)
+            self.fase = "Reading Fluorescence"
+            print("Reading fluorescence...")
+            v_fluo = self.read_fluorescence()
+        print(f"fluorescence delta voltage: {v_fluo}")
+        self.time_end_cycle = time.time()
+        # Estadísticas para la estimación del tiempo restante
+        self.last_cycle_duration = self.time_end_cycle - self.start_cycle_time
+        self.cycles_complete = idx + 1
+        self.avg_cycle_duration = (
+            self.avg_cycle_duration * (self.cycles_complete - 1) + self.last_cycle_duration
+        ) / self.cycles_complete
+
+    def run(self, recipe, ts, acceleration, direction="CW"):
+        """Desnaturalización, ciclos y extensión final + lectura de la receta
+        (dict con las claves de templates/pcr_projects.ENTRY_KEYS, ya numéricas).
+        El hardware (heater, led_pin, ads, motor) debe estar fijado."""
+        r = recipe
+        cycles = int(r["cycles"])
+        rpm = r["rpm_cooling"]
+        self.total_cycles = cycles
+        self.cycles_complete = 0
+        self.last_cycle_duration = 0.0
+        self.avg_cycle_duration = 0.0
+        self.start_final_ext_time = 0.0
+        self.cooling_log = []
+        self.spin_model = SpinUpModel(acceleration, self.cool_prespin_lag_s)
+        src = self.source
+
+        # ----- Denaturación: mismo principio que "Reach High temp":
+        # feed-forward a potencia plena hasta ff_frac_denat*setpoint y luego PI
+        # (ganancias difusas + anti-windup + descarte de temperatura vieja).
+        # Si denat_time <= 0 se omite por completo (arrancamos en frío); en ese
+        # caso el primer ciclo debe alcanzar High de verdad (denat_skipped).
+        denat_skipped = skip_phase(r["denat_time"])
+        if not denat_skipped:
+            self.fase = "Denaturation"
+            self.heater.on()
+            self.reach_temperature_pi(
+                r["denat_temp"],
+                load_phase_pid("denat", ts),
+                self.stop_event,
+                break_if_below=False,
+            )
+
+            # ----- Denaturation Hold
+            self.fase = "Denaturation Hold"
+            self.hold_phase("h_denat", r["denat_temp"], r["denat_time"], ts)
+            print(f"Denaturation complete, temperature: {src.temp} °C")
+        else:
+            print("Skipping Denaturation phase: time <= 0")
+
+        # ----- Ciclos PCR
+        for idx in range(cycles):
+            if self.stop_event.is_set():
+                break
+            print(f"start cycle {idx}")
+            self.run_cycle(
+                idx,
+                r["high_temp"],
+                r["low_temp"],
+                r["time_high"],
+                r["time_low"],
+                rpm,
+                direction,
+                acceleration,
+                ts,
+                r["ext_time"],
+                r["ext_temp"],
+                denat_skipped=denat_skipped,
+            )
+
+        # ----- Extensión final + lectura de fluorescencia (solo si no se detuvo).
+        # El hold final se omite si ext_time_final <= 0, pero la lectura de
+        # fluorescencia final SIEMPRE se realiza (la medición no se salta).
+        if self.stop_event.is_set():
+            return
+        print("PCR cycles complete, reading fluorescence")
+        self.cycle_idx = cycles
+        self.fase = "Extension"
+        # Ancla del cronómetro del segmento final (hold + lectura final).
+        # Se pone siempre, incluso si el hold se omite (ext_time_final<=0),
+        # para que la lectura final igual cuente hacia abajo.
+        self.start_final_ext_time = time.time()
+        v_fluo_final = None
+        if not skip_phase(r["ext_time_final"]):
+            v_fluo_final = self.hold_and_read("h_ext", r["ext_temp"], r["ext_time_final"], ts)
+        else:
+            print("Skipping Final Extension hold: time <= 0")
+        if v_fluo_final is None:
+            time.sleep(FLUOR_PRE_SLEEP_S)
+            v_fluo_final = self.read_fluorescence()
+        print(f"Final fluorescence delta voltage: {v_fluo_final}")
+        self.fase = "Final"
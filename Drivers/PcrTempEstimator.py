@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Estimación de la temperatura del PCR a partir del broadcast UDP del disco.
+
+update_displayed_temperature suavizaba el canal primario con un EMA fijo
+(alpha 0.3): ~0.2 s de retraso justo en las rampas, donde el PI más necesita el
+dato fresco, y con el primario caído solo quedaba sostener el último valor y
+marcar la muestra como vieja. Aquí el estimador es intercambiable
+("temp_estimator" en settings.json):
+  - EmaEstimator: el EMA de siempre (default).
+  - KalmanTempEstimator: filtro de Kalman sobre [T, dT/dt, sesgo del secundario].
+    Fusiona el primario (el canal que eligió el usuario, la referencia) y el
+    secundario del par con su propio ruido; el sesgo IR - termocupla se estima
+    en línea, así que con el primario caído el secundario sigue dando T. Cada
+    medida entra con su timestamp de recepción y estimate(now) la proyecta al
+    instante de uso: compensa la latencia del UDP con la pendiente estimada.
+Los dos exponen la misma interfaz: update(primario, secundario, t_rx) -> bool
+(hay dato fresco), temp/std (estimación en la última medida) y estimate(now).
+Ver docs/pcr_temp_estimator.md.
+"""
+import math
+import threading
+
+import numpy as np
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 23:40 $"
+
+# Desvío típico (°C) de cada canal del payload (0=IR ambiente, 1=IR objeto,
+# 2=termocupla): MLX90614 a 0.02 °C de resolución pero con ruido de ~0.1-0.2 °C
+# sobre el disco giratorio; MAX31855 cuantiza a 0.25 °C.
+SENSOR_STD = {0: 0.2, 1: 0.2, 2: 0.25}
+# Retraso (s) de cada canal respecto de la cámara: la termocupla es un bulbo con
+# constante de tiempo ~0.3 s (en una rampa, un retraso puro de ese tamaño); el IR
+# ve la superficie sin retraso apreciable.
+SENSOR_LAG = {0: 0.0, 1: 0.0, 2: 0.3}
+
+
+class EmaEstimator:
+    """EMA del canal primario; el secundario se suaviza aparte solo para mostrarlo."""
+
+    name = "ema"
+
+    def __init__(self, alpha=0.3, temp=20.0):
+        self.alpha = float(alpha)
+        self.temp = float(temp)
+        self.std = math.nan
+        self.rate = math.nan
+
+    def reset(self, temp):
+        self.temp = float(temp)
+
+    def update(self, primary, secondary, t_rx):
+        if primary is None:
+            return False
+        self.temp = self.alpha * primary + (1 - self.alpha) * self.temp
+        return True
+
+    def estimate(self, now=None):
+        """(temp, std) en now; el EMA no proyecta."""
+        return self.temp, self.std
+
+
+class KalmanTempEstimator:
+    """Kalman lineal de estado x = [T, dT/dt, b], con b = secundario - primario.
+
+    Modelo de velocidad constante con aceleración blanca (q_accel, (°C/s²)²·s):
+    las rampas del heater cambian de pendiente en décimas de segundo, así que
+    q_accel es grande y el filtro sigue la rampa sin el retraso del EMA. El sesgo
+    es un paseo aleatorio lento (q_bias). Las medidas fuera de gate_sigma
+    desvíos de la innovación se descartan (saltos de la termocupla, lecturas
+    sueltas del IR). Sin medidas la covarianza crece y `std` lo muestra.
+    lag_*: retraso del sensor; la medida se modela como T(t - lag) ≈ T - lag·dT/dt,
+    así la estimación es la de la cámara y no la del bulbo.
+
+    update corre en el hilo UDP y estimate en el del lazo de control: un lock
+    protege x, P y t, y estimate proyecta fuera de él sobre una copia."""
+
+    name = "kalman"
+
+    def __init__(self, std_primary=0.25, std_secondary=0.2, lag_primary=0.0, lag_secondary=0.0,
+                 q_accel=4.0, q_bias=1e-3, gate_sigma=5.0, temp=20.0):
+        self.r_p = float(std_primary) ** 2
+        self.r_s = float(std_secondary) ** 2
+        self.h_p = np.array([1.0, -float(lag_primary), 0.0])
+        self.h_s = np.array([1.0, -float(lag_secondary), 1.0])
+        self.q_accel = float(q_accel)
+        self.q_bias = float(q_bias)
+        self.gate2 = float(gate_sigma) ** 2
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self.reset(temp)
+
+    def reset(self, temp):
+        with self._lock:
+            self.x = np.array([float(temp), 0.0, 0.0])
+            self.P = np.diag([25.0, 4.0, 25.0])
+            self.t = None  # instante de la última medida
+            self._bias_init = False
+
+    @property
+    def temp(self):
+        with self._lock:
+            return float(self.x[0])
+
+    @property
+    def rate(self):
+        with self._lock:
+            return float(self.x[1])
+
+    @property
+    def bias(self):
+        with self._lock:
+            return float(self.x[2])
+
+    @property
+    def std(self):
+        with self._lock:
+            return math.sqrt(self.P[0, 0])
+
+    def _predict(self, x, P, dt):
+        F = np.array([[1.0, dt, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+        q = self.q_accel
+        Q = np.array([
+            [q * dt ** 3 / 3.0, q * dt ** 2 / 2.0, 0.0],
+            [q * dt ** 2 / 2.0, q * dt, 0.0],
+            [0.0, 0.0, self.q_bias * dt],
+        ])
+        return F @ x, F @ P @ F.T + Q
+
+    def _correct(self, z, h, r):
+        innov = z - h @ self.x
+        s = h @ self.P @ h + r
+        if innov * innov > self.gate2 * s:
+            self.rejected += 1
+            return False
+        k = self.P @ h / s
+        self.x = self.x + k * innov
+        self.P = self.P - np.outer(k, h @ self.P)
+        return True
+
+    def update(self, primary, secondary, t_rx):
+        if primary is None and secondary is None:
+            return False
+        with self._lock:
+            return self._update(primary, secondary, t_rx)
+
+    def _update(self, primary, secondary, t_rx):
+        if self.t is None:
+            self.x[0] = primary if primary is not None else secondary
+            self.t = t_rx
+        dt = t_rx - self.t
+        if dt > 0.0:
+            self.x, self.P = self._predict(self.x, self.P, dt)
+            self.t = t_rx
+        fresh = False
+        if primary is not None:
+            fresh = self._correct(primary, self.h_p, self.r_p)
+            if secondary is not None and not self._bias_init:
+                # Primer par completo: el sesgo arranca en la diferencia observada.
+                self.x[2] = secondary - self.h_s[:2] @ self.x[:2]
+                self.P[2, :] = self.P[:, 2] = 0.0
+                self.P[2, 2] = self.r_s + self.r_p
+                self._bias_init = True
+        if secondary is not None and self._bias_init:
+            # Con el primario caído el secundario alcanza si el sesgo ya se conoce.
+            fresh = self._correct(secondary, self.h_s, self.r_s) or fresh
+        return fresh
+
+    def estimate(self, now=None):
+        """(temp, std) proyectados a now (None = en la última medida)."""
+        with self._lock:
+            x, P, t = self.x.copy(), self.P.copy(), self.t
+        if now is None or t is None or now <= t:
+            return float(x[0]), math.sqrt(P[0, 0])
+        x, P = self._predict(x, P, now - t)
+        return float(x[0]), math.sqrt(P[0, 0])
+
+
+def make_estimator(kind="ema", primary_idx=2, secondary_idx=1, temp=20.0):
+    """Estimador por nombre ("ema" | "kalman"); desconocido → "ema"."""
+    if kind == "kalman":
+        return KalmanTempEstimator(
+            SENSOR_STD.get(primary_idx, 0.25),
+            SENSOR_STD.get(secondary_idx, 0.25),
+            SENSOR_LAG.get(primary_idx, 0.0),
+            SENSOR_LAG.get(secondary_idx, 0.0),
+            temp=temp,
+        )
+    return EmaEstimator(temp=temp)
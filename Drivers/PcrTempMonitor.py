@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Esperas del PCR despertadas por el hilo UDP, sin sondeo.
+
+El hilo del experimento esperaba la temperatura sondeando: el enfriamiento con
+`time.sleep(0.001)` (mil despertares por segundo para un dato que cambia cada
+80 ms), el start-gate cada 50 ms y la pre-rampa feed-forward cada 10 ms. En el
+Pi cada despertar disputa el GIL con el receptor UDP y con Tk.
+TempMonitor es una threading.Condition que update_displayed_temperature
+notifica en cada datagrama (publish). Los hilos bloquean sobre un predicado con
+timeout y se despiertan solo con una muestra nueva, al vencer el timeout o con
+interrupt() (paro del experimento). Ver docs/pcr_temp_monitor.md.
+"""
+import math
+import threading
+import time
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 00:30 $"
+
+
+class TempMonitor:
+    """Última temperatura publicada (temp, ts, seq) y esperas sobre ella.
+
+    Las esperas reciben un stop_event (el de la corrida, que cambia en cada una) y
+    vuelven False en cuanto está puesto. Quien lo pone llama a interrupt() para
+    despertarlas en el acto; STOP_CHECK_S acota la espera si nadie lo hace."""
+
+    STOP_CHECK_S = 0.5
+
+    def __init__(self, clock=time.time):
+        self._cond = threading.Condition()
+        self._clock = clock
+        self.temp = math.nan
+        self.ts = 0.0  # timestamp de la última muestra fresca (temp_ts)
+        self.seq = 0  # datagramas publicados
+
+    def publish(self, temp, ts):
+        with self._cond:
+            self.temp = temp
+            self.ts = ts
+            self.seq += 1
+            self._cond.notify_all()
+
+    def interrupt(self):
+        """Despierta a todos los que esperan (para que re-evalúen el stop_event)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_for(self, predicate, timeout=None, stop_event=None):
+        """Bloquea hasta predicate() verdadero. False si venció timeout o se pidió
+        paro. predicate no recibe argumentos: lee el estado que necesite (este
+        monitor o el de quien publica) y se evalúa con el lock tomado."""
+        deadline = None if timeout is None else self._clock() + timeout
+        with self._cond:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                if predicate():
+                    return True
+                wait_s = self.STOP_CHECK_S
+                if deadline is not None:
+                    remaining = deadline - self._clock()
+                    if remaining <= 0.0:
+                        return False
+                    wait_s = min(wait_s, remaining)
+                self._cond.wait(wait_s)
+
+    def wait_newer(self, seq, timeout=None, stop_event=None):
+        """Espera un datagrama posterior a seq (el self.seq leído antes)."""
+        return self.wait_for(lambda: self.seq > seq, timeout, stop_event)
+
+    def wait_temp_below(self, limit, timeout=None, stop_event=None):
+        return self.wait_for(lambda: self.temp <= limit, timeout, stop_event)
+
+    def wait_temp_above(self, limit, timeout=None, stop_event=None):
+        return self.wait_for(lambda: self.temp >= limit, timeout, stop_event)
@@ -256,6 +256,37 @@ class Ads1115Reader:
                 time.sleep(delay_s)
         return acc / averages
 
+    # --- Streaming continuo (lock-in de fluorescencia, Drivers/PcrLockIn.py) ---
+
+    def start_stream(self, p: Channel = 0, n: Optional[Channel] = None, sps: int = 860):
+        """
+        Deja el ADS convirtiendo sin pausa sobre un canal (n=None: single-ended AINp;
+        si no, diferencial AINp - AINn). La primera lectura escribe el mux y arranca
+        las conversiones; después read_stream() solo lee el registro de conversión
+        (una transacción I²C, sin esperar una conversión nueva).
+        Guarda SPS y modo previos para stop_stream().
+        """
+        self._stream_prev = (self._sps, self._mode)
+        self.set_sps(sps)
+        self.set_mode(single_shot=False)
+        self._stream_chan = self._get_channel_se(p) if n is None else self._get_channel_diff(p, n)
+        self._stream_chan.value
+        # La conversión en curso al cambiar el mux mezcla el canal anterior.
+        time.sleep(2.0 / self._sps)
+
+    def read_stream(self) -> float:
+        """Última conversión del canal de start_stream() en voltios (sin clamp)."""
+        return self._stream_chan.voltage
+
+    def stop_stream(self):
+        prev = getattr(self, "_stream_prev", None)
+        if prev is None:
+            return
+        self._stream_prev = None
+        self.set_sps(prev[0])
+        self._mode = prev[1]
+        self._ads.mode = self._mode
+
     # --- Añadir dentro de tu clase Ads1115Reader ---
 
     def check_diff_health(self, p: int = 0, n: int = 1, fsr: float | None = None, sps: int | None = None, samples: int = 20):
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Telemetría STAT del Pico del motor y esperas sobre ella.
+
+spinMotorRPM_ramped esperaba el fin de cada giro por tiempo: sleep de
+|rpm|/accel + 0.5 s tras el STOP:0 y, después del go_zero, get_status() cada
+0.5 s hasta tres lecturas en cero (timeout 15 s). Todo en el camino crítico del
+ciclo de PCR, aunque el Pico manda STAT:<pos>:<rpm> cada ~100 ms.
+StatTracker guarda el último STAT y una historia corta (ts, rpm), y notifica
+una threading.Condition por cada uno: wait_quiet() bloquea hasta que los STAT
+recibidos desde `since` muestren el motor quieto durante quiet_s, sin sondear.
+Lo usa DriverStepperSys (wait_stopped / wait_homed / wait_spun_up) y
+test/bench_pcr_sim.py. Ver docs/pcr_deferred_homing.md.
+
+SpinUpModel da la anticipación del pre-spin del enfriamiento: |rpm|/accel de la
+rampa del firmware más el retraso medido entre el MODO:1 y el STAT que confirma
+la RPM (UART, arranque de la StateMachine, periodo del STAT). Ver
+docs/pcr_prespin.md.
+"""
+import threading
+import time
+from collections import deque
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 02:40 $"
+
+# |rpm| por debajo del cual el motor se considera quieto (el Pico reporta la RPM
+# estimada con decimales; en reposo da 0.00).
+QUIET_RPM = 0.5
+
+
+class StatTracker:
+    """Último STAT (pos_deg, rpm, ts) + historia de (ts, rpm) para las esperas."""
+
+    def __init__(self, history=64, clock=time.time):
+        self._cond = threading.Condition()
+        self._clock = clock
+        self._hist = deque(maxlen=int(history))
+        self.status = {"pos_deg": 0.0, "rpm": 0.0, "ts": clock()}
+        self.seq = 0  # STAT recibidos
+
+    def reset(self, pos_deg=0.0, rpm=0.0):
+        """Estado inicial sin telemetría (set_init_vals): vacía la historia."""
+        with self._cond:
+            self.status = {"pos_deg": float(pos_deg), "rpm": float(rpm), "ts": self._clock()}
+            self._hist.clear()
+
+    def update(self, pos_deg, rpm, ts=None):
+        ts = self._clock() if ts is None else ts
+        with self._cond:
+            self.status = {"pos_deg": float(pos_deg), "rpm": float(rpm), "ts": ts}
+            self._hist.append((ts, float(rpm)))
+            self.seq += 1
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.status)
+
+    def _quiet_span(self, since, eps):
+        """(s, n): duración y cantidad de la racha final de STAT quietos con
+        ts >= since. El primer STAT de la racha cuenta desde su ts."""
+        first = last = None
+        n = 0
+        for ts, rpm in reversed(self._hist):
+            if ts < since or abs(rpm) > eps:
+                break
+            if last is None:
+                last = ts
+            first = ts
+            n += 1
+        if n == 0:
+            return 0.0, 0
+        return last - first, n
+
+    def wait_quiet(self, timeout, quiet_s=0.1, since=None, eps=QUIET_RPM, samples=2, stop_event=None):
+        """Espera STAT posteriores a since (default: ahora) con |rpm| <= eps durante
+        quiet_s y al menos `samples` seguidos. True si se confirmó; False si venció
+        timeout (UART caída, motor que no frena) o se puso stop_event."""
+        since = self._clock() if since is None else since
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                span, n = self._quiet_span(since, eps)
+                if n >= samples and span >= quiet_s:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    return False
+                self._cond.wait(min(remaining, 0.5))
+
+    def wait_rpm(self, level, timeout, since=None, stop_event=None):
+        """ts del primer STAT posterior a since con |rpm| >= level, o None si vence
+        timeout o se puso stop_event."""
+        since = self._clock() if since is None else since
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for ts, rpm in self._hist:
+                    if ts >= since and abs(rpm) >= level:
+                        return ts
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    return None
+                self._cond.wait(min(remaining, 0.5))
+
+
+class SpinUpModel:
+    """Anticipación del giro: la rampa del firmware más un retraso medido.
+
+    lead_s(rpm) = |rpm|/accel + lag_s. observe() actualiza lag_s (media móvil
+    exponencial) con cada arranque confirmado por STAT: el tiempo hasta
+    frac·|rpm| menos lo que la rampa ideal tarda en llegar ahí."""
+
+    def __init__(self, accel, lag_s=0.2, alpha=0.5, frac=0.9):
+        self.accel = abs(float(accel))
+        self.lag_s = max(0.0, float(lag_s))
+        self.alpha = float(alpha)
+        self.frac = float(frac)
+        self.samples = 0
+
+    def ramp_s(self, rpm, frac=1.0):
+        return frac * abs(rpm) / self.accel if self.accel > 0 else 0.0
+
+    def lead_s(self, rpm):
+        return self.ramp_s(rpm) + self.lag_s
+
+    def observe(self, rpm, t_cmd, t_reached):
+        """Registra un arranque (t_reached: STAT con frac·|rpm|); devuelve el
+        retraso medido."""
+        lag = max(0.0, t_reached - t_cmd - self.ramp_s(rpm, self.frac))
+        self.lag_s = lag if self.samples == 0 else (1.0 - self.alpha) * self.lag_s + self.alpha * lag
+        self.samples += 1
+        return lag
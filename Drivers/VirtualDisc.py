@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""Disco virtual: planta térmica simulada para correr PCR sin el hardware.
+
+Hasta ahora cada cambio de tuning del PCR necesitaba el disco real. Aquí:
+  - ThermalPlant: modelo de primer orden con tiempo muerto (FOPDT). El LED
+    calefactor aporta gain·duty (visto con dead_time de retraso) y el
+    enfriamiento crece con las RPM (convección forzada al girar el disco). Se
+    integra en forma exacta por tramos de entrada constante: no hay paso fijo
+    que afinar.
+  - VirtualStepper: el Pico del motor a pasos sobre un pseudo-tty. Acepta los
+    mismos MODO:/STOP:/VEL: que DriverStepperSys, responde ACK y manda STAT cada
+    100 ms; la rampa de RPM la aplica "el firmware", como en el Pico.
+  - VirtualDisc: junta los dos y emite `UDP:t_amb:t_obj:t_tc` a la cadencia del
+    firmware (80 ms) con jitter y pérdida configurables. `heater` es un
+    HeaterActuator (backend "sim") que alimenta el duty a la planta;
+    `fluorescence_pin` y `ads` (VirtualAds) reemplazan al LED de excitación y
+    al ADS1115 del fotodetector.
+PCRFrame.experiment_pcr lo usa con "pcr_simulator": true en settings.json y
+test/bench_pcr_sim.py corre una receta completa sin UI. Ver docs/virtual_disc.md.
+"""
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+import tty
+from collections import deque
+
+from Drivers.DriverHeater import HeaterActuator, RecordingPin
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 21:10 $"
+
+STEPS_PER_REV = 6400  # igual que Drivers/DriverStepperSys.py
+
+
+class ThermalPlant:
+    """FOPDT de la cámara del disco:
+
+        tau · dT/dt = -(T - t_amb)·(1 + k_rpm·|rpm|) + gain·u(t - dead_time)
+
+    u es el duty medio del LED (0..1; el PWM es mucho más rápido que tau). Con
+    los valores por defecto el disco sube ~5 °C/s desde ambiente a plena
+    potencia, sostiene 94 °C con duty ~0.35 y enfría ~5 °C/s girando a 700 RPM.
+    La termocupla sigue a T con un retraso de primer orden tc_tau; el IR de
+    objeto lee T con ruido y el IR de ambiente se entibia un poco con el disco.
+    """
+
+    def __init__(
+        self,
+        t_amb=25.0,
+        gain=200.0,
+        tau=40.0,
+        dead_time=0.6,
+        k_rpm=0.003,
+        tc_tau=0.3,
+        noise=0.05,
+        clock=time.monotonic,
+        seed=None,
+    ):
+        self.t_amb = float(t_amb)
+        self.gain = float(gain)
+        self.tau = float(tau)
+        self.dead_time = float(dead_time)
+        self.k_rpm = float(k_rpm)
+        self.tc_tau = float(tc_tau)
+        self.noise = float(noise)
+        self._clock = clock
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._t = clock()
+        self.temp = self.t_amb
+        self.temp_tc = self.t_amb
+        self.rpm = 0.0
+        self.duty = 0.0
+        # Cambios de duty (t, duty) aún dentro del tiempo muerto; el primero es el
+        # que ve la planta ahora.
+        self._duty_hist = deque([(self._t - self.dead_time, 0.0)])
+
+    def _delayed_duty(self, t):
+        """Duty que la planta ve en t (entrada de t - dead_time)."""
+        hist = self._duty_hist
+        while len(hist) > 1 and hist[1][0] + self.dead_time <= t:
+            hist.popleft()
+        return hist[0][1]
+
+    def _next_change(self, t):
+        hist = self._duty_hist
+        return hist[1][0] + self.dead_time if len(hist) > 1 else math.inf
+
+    def _advance(self, now):
+        t = self._t
+        while t < now:
+            u = self._delayed_duty(t)
+            t_next = min(now, self._next_change(t))
+            dt = t_next - t
+            rate = (1.0 + self.k_rpm * abs(self.rpm)) / self.tau
+            t_inf = self.t_amb + self.gain * u / (1.0 + self.k_rpm * abs(self.rpm))
+            self.temp = t_inf + (self.temp - t_inf) * math.exp(-rate * dt)
+            self.temp_tc += (self.temp - self.temp_tc) * (1.0 - math.exp(-dt / self.tc_tau))
+            t = t_next
+        self._t = max(self._t, now)
+
+    def set_duty(self, duty):
+        with self._lock:
+            now = self._clock()
+            self._advance(now)
+            duty = max(0.0, min(1.0, float(duty)))
+            if duty != self.duty:
+                self.duty = duty
+                self._duty_hist.append((now, duty))
+
+    def set_rpm(self, rpm):
+        with self._lock:
+            self._advance(self._clock())
+            self.rpm = float(rpm)
+
+    def read(self):
+        """(t_amb, t_obj, t_tc) como los manda el firmware del disco."""
+        with self._lock:
+            self._advance(self._clock())
+            gauss = self._rnd.gauss
+            t_amb = self.t_amb + 0.05 * (self.temp - self.t_amb) + gauss(0.0, self.noise)
+            return (
+                t_amb,
+                self.temp + gauss(0.0, self.noise),
+                self.temp_tc + gauss(0.0, self.noise),
+            )
+
+
+class SimHeater(HeaterActuator):
+    """HeaterActuator que fija el duty de una ThermalPlant."""
+
+    backend = "sim"
+
+    def __init__(self, plant, period=0.1):
+        super().__init__(period)
+        self._plant = plant
+
+    def set_duty(self, duty, period=None):
+        self.duty = max(0.0, min(1.0, float(duty)))
+        if period is not None and period > 0:
+            self.period = float(period)
+        self._plant.set_duty(self.duty)
+
+
+class VirtualStepper:
+    """Firmware del Pico del motor sobre un pseudo-tty.
+
+    tty_path es el extremo que abre DriverStepperSys (uart_port). Comandos:
+      MODO:1:<rpm>:<accel>  RPM continuas con rampa de accel RPM/s (0 = inmediato)
+      MODO:2:<hz>:0         Hz continuos
+      MODO:0:<deg>:0        movimiento relativo (posición instantánea)
+      MODO:6:<rpm>:0        go_zero: gira a <rpm> hasta la marca de cero y se detiene
+      STOP:0 / STOP:1       frenado con la última rampa / inmediato
+    Responde ACK:<modo>:<valor> y emite STAT:<pos_deg>:<rpm> cada stat_period.
+    on_rpm(rpm) se llama en cada tick (la planta enfría según las RPM)."""
+
+    def __init__(self, on_rpm=None, tick=0.02, stat_period=0.1):
+        self.on_rpm = on_rpm
+        self.tick = float(tick)
+        self.stat_period = float(stat_period)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # sin eco ni edición de línea, como una UART
+        os.set_blocking(self._master, False)
+        self.tty_path = os.ttyname(self._slave)
+        self.rpm = 0.0
+        self.pos_deg = 0.0
+        self.target_rpm = 0.0
+        self.accel = 0.0
+        self.homing = False
+        self.commands = []  # (t, línea) recibidas, para pruebas
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="virtual-stepper", daemon=True)
+            self._thread.start()
+        return self
+
+    def _send(self, line):
+        try:
+            os.write(self._master, (line + "\n").encode())
+        except (BlockingIOError, OSError):
+            pass  # nadie lee el tty: se pierde, como en la UART real
+
+    def _handle(self, line):
+        parts = line.strip().split(":")
+        if not parts or not parts[0]:
+            return
+        self.commands.append((time.monotonic(), line.strip()))
+        try:
+            vals = [float(p) for p in parts[1:]] + [0.0, 0.0, 0.0]
+        except ValueError:
+            return
+        cmd = parts[0]
+        self.homing = False
+        if cmd == "MODO":
+            mode = int(vals[0])
+            if mode == 1:
+                self.target_rpm, self.accel = vals[1], abs(vals[2])
+                if self.accel <= 0:
+                    self.rpm = self.target_rpm
+            elif mode == 2:
+                self.target_rpm = self.rpm = vals[1] * 60.0 / STEPS_PER_REV
+                self.accel = 0.0
+            elif mode == 0:
+                self.pos_deg += vals[1]
+            elif mode == 6:
+                self.accel = 0.0
+                if self.pos_deg % 360.0 == 0.0:
+                    self.target_rpm = self.rpm = 0.0
+                else:
+                    self.homing = True
+                    self.target_rpm = self.rpm = abs(vals[1]) or 50.0
+            else:
+                self.target_rpm = self.rpm = 0.0
+            self._send(f"ACK:{mode}:{vals[1]:.2f}")
+        elif cmd == "STOP":
+            self.target_rpm = 0.0
+            if int(vals[0]) == 1 or self.accel <= 0:
+                self.rpm = 0.0
+            self._send("ACK:STOP:0.00")
+        elif cmd == "VEL":
+            self._send(f"ACK:VEL:{vals[0]:.2f}")
+
+    def _step(self, dt):
+        if self.rpm != self.target_rpm:
+            if self.accel <= 0:
+                self.rpm = self.target_rpm
+            else:
+                delta = self.target_rpm - self.rpm
+                step = self.accel * dt
+                self.rpm = self.target_rpm if abs(delta) <= step else self.rpm + math.copysign(step, delta)
+        pos = self.pos_deg + self.rpm * 6.0 * dt
+        if self.homing and pos >= 360.0:
+            # Pasó por la marca de cero: se detiene ahí.
+            self.homing = False
+            self.target_rpm = self.rpm = 0.0
+            pos = 0.0
+        self.pos_deg = pos % 360.0
+        if self.on_rpm is not None:
+            self.on_rpm(self.rpm)
+
+    def _run(self):
+        buf = b""
+        last = time.monotonic()
+        next_stat = last
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], self.tick)
+            if ready:
+                try:
+                    buf += os.read(self._master, 1024)
+                except (BlockingIOError, OSError):
+                    pass
+                while b"\n" in buf:
+                    raw, buf = buf.split(b"\n", 1)
+                    self._handle(raw.decode("utf-8", errors="ignore"))
+            now = time.monotonic()
+            self._step(now - last)
+            last = now
+            if now >= next_stat:
+                self._send(f"STAT:{self.pos_deg:.2f}:{self.rpm:.2f}")
+                next_stat = now + self.stat_period
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class VirtualAds:
+    """Fotodetector simulado con la interfaz de Ads1115Reader que usa el PCR.
+
+    La señal sube solo con el LED de excitación encendido y crece en sigmoide
+    con cada lectura iluminada, como una curva de amplificación: un ciclo nuevo
+    es un encendido tras más de CYCLE_GAP_S apagado (el LED modulado del lock-in
+    no cuenta como ciclos). noise es el desvío por conversión a 64 SPS y escala
+    con sqrt(sps); drift (V/√s) es un paseo aleatorio de la línea base (luz
+    ambiente, offset del TIA) y mains (V) la captación de red a mains_hz. Una
+    lectura con averages=N son N conversiones de conv_s cada una (single-shot a
+    128 SPS): la captación de red se promedia sobre esos instantes, no se toma
+    en uno solo."""
+
+    CYCLE_GAP_S = 1.0
+
+    def __init__(
+        self,
+        led_pin,
+        baseline=0.05,
+        amplitude=0.4,
+        midpoint=20,
+        noise=0.002,
+        drift=0.0,
+        mains=0.0,
+        mains_hz=50.0,
+        conv_s=1.0 / 128.0,
+        seed=None,
+        clock=time.monotonic,
+    ):
+        self.led_pin = led_pin
+        self.baseline = float(baseline)
+        self.amplitude = float(amplitude)
+        self.midpoint = float(midpoint)
+        self.noise = float(noise)
+        self.drift = float(drift)
+        self.mains = float(mains)
+        self.mains_hz = float(mains_hz)
+        self.conv_s = float(conv_s)
+        self.sps = 64
+        self._clock = clock
+        self._rnd = random.Random(seed)
+        self._cycle = 0
+        self._was_on = False
+        self._t_on = -math.inf
+        self._offset = 0.0
+        self._t = None
+        self._stream = None
+
+    def _sample(self, ch_pos, averages):
+        now = self._clock()
+        if self._t is not None and self.drift > 0.0 and now > self._t:
+            self._offset += self._rnd.gauss(0.0, self.drift * math.sqrt(now - self._t))
+        self._t = now
+        on = bool(self.led_pin.level)
+        if on:
+            if not self._was_on and now - self._t_on > self.CYCLE_GAP_S:
+                self._cycle += 1
+            self._t_on = now
+        self._was_on = on
+        std = self.noise * math.sqrt(self.sps / 64.0) / math.sqrt(max(1, averages))
+        v = self.baseline + self._offset + self._rnd.gauss(0.0, std)
+        if self.mains > 0.0:
+            n = max(1, averages)
+            w = 2.0 * math.pi * self.mains_hz
+            v += self.mains * sum(math.sin(w * (now + i * self.conv_s)) for i in range(n)) / n
+        if on:
+            v += 0.02 + self.amplitude / (1.0 + math.exp(-(self._cycle - self.midpoint) / 2.0))
+        return v
+
+    def read_voltage(self, channel=0, averages=1):
+        return self._sample(channel, averages)
+
+    def read_voltage_diff(self, ch_pos=0, ch_neg=1, averages=1):
+        return self._sample(ch_pos, averages) - self.baseline
+
+    def start_stream(self, p=0, n=None, sps=860):
+        self._stream = (p, n, self.sps)
+        self.sps = int(sps)
+
+    def read_stream(self):
+        p, n, _sps = self._stream
+        v = self._sample(p, 1)
+        return v if n is None else v - self.baseline
+
+    def stop_stream(self):
+        if self._stream is not None:
+            self.sps = self._stream[2]
+            self._stream = None
+
+
+class VirtualDisc:
+    """Disco simulado: planta + heater + motor por pty + broadcast UDP.
+
+    host/port: destino de los datagramas (127.0.0.1:5005 llega al hub de la app
+    en la misma máquina). period/jitter en s: cadencia del firmware y desvío
+    estándar de cada envío; loss: probabilidad de perder un datagrama."""
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=5005,
+        period=0.08,
+        jitter=0.004,
+        loss=0.0,
+        seed=None,
+        **plant_kw,
+    ):
+        self.address = (host, int(port))
+        self.period = float(period)
+        self.jitter = float(jitter)
+        self.loss = float(loss)
+        self._rnd = random.Random(seed)
+        self.plant = ThermalPlant(seed=seed, **plant_kw)
+        self.heater = SimHeater(self.plant)
+        self.stepper = VirtualStepper(on_rpm=self.plant.set_rpm)
+        self.fluorescence_pin = RecordingPin()
+        self.ads = VirtualAds(self.fluorescence_pin, seed=seed)
+        self.sent = 0
+        self.dropped = 0
+        self._sock = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def tty_path(self):
+        return self.stepper.tty_path
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.stepper.start()
+        self._thread = threading.Thread(target=self._run, name="virtual-disc", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_send = time.monotonic()
+        while not self._stop.is_set():
+            # Deadline del firmware + jitter del envío (no se acumula).
+            next_send += self.period
+            delay = next_send + self._rnd.gauss(0.0, self.jitter) - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if self._rnd.random() < self.loss:
+                self.dropped += 1
+                continue
+            t_amb, t_obj, t_tc = self.plant.read()
+            try:
+                self._sock.sendto(f"UDP:{t_amb:.2f}:{t_obj:.2f}:{t_tc:.2f}".encode(), self.address)
+                self.sent += 1
+            except OSError as e:
+                print(f"[VirtualDisc] send error: {e}")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.heater.close()
+        self.stepper.close()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
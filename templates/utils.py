@@ -3,6 +3,8 @@ import copy
 import json
 import os
 import subprocess
+import tempfile
+import threading
 
 __author__ = "Edisson A. Naula"
 __date__ = "$ 08/10/2025  at 11:20 a.m. $"
@@ -62,9 +64,71 @@ DEFAULT_SETTINGS = {
         "ts_pcr": 0.1,
     },
     "ads_fsr": 0.256,
-    "photoreceptor": {"use_diff": 1.0},
+    "photoreceptor": {
+        "use_diff": 1.0,
+        # Fluorescencia del PCR por lock-in (LED modulado a lockin_hz, ADS1115 en
+        # continuo a lockin_sps durante ~lockin_s) en vez de la ventana OFF/ON/OFF;
+        # ver docs/pcr_lockin.md.
+        "lockin": False,
+        "lockin_hz": 5.0,
+        "lockin_s": 1.5,
+        "lockin_sps": 860,
+    },
     "windows_pcr": 1500.0,
     "temp_source": "thermocouple",
+    # Formato de los emstat_data del relay: "json" (legado) o "b1" (trama binaria
+    # compacta, requiere firmware DiscPCB >= v2.0; ver docs/emstat_binary_frames.md).
+    "emstat_relay_format": "json",
+    # Paquetes emstat_data por línea del relay: 0 = uno por línea (legado); N > 1 =
+    # tramas coalescidas de hasta N, requiere DiscPCB >= v2.0 (docs/emstat_batch_frames.md).
+    "emstat_relay_batch": 0,
+    # Sesión TCP de control con el Wemos (5006): false = una conexión por corrida
+    # (legado); true = una sesión persistente compartida por todas las corridas y
+    # frames, con heartbeat y reconexión (docs/emstat_tcp_link.md).
+    "emstat_tcp_pool": False,
+    # Retransmisión selectiva: el host pide al Pico (DiscPCB >= v2.0) los seq perdidos
+    # por TCP y UDP a la vez; false = solo el merge TCP+UDP (docs/emstat_nack.md).
+    "emstat_nack": False,
+    # Render del plot en vivo del EmStat: "blit" (solo líneas, decimadas al ancho en
+    # píxeles) o "full" (draw completo por tick); ver docs/emstat_live_render.md.
+    "emstat_plot_renderer": "blit",
+    # Backend del PWM del LED calefactor en PCR: "lgpio" (tx_pwm, sin GIL),
+    # "pigpio" (DMA, requiere pigpiod) o "software" (hilo sobre libgpiod). Si el
+    # elegido no se puede abrir el experimento no arranca; ver docs/heater_pwm.md.
+    "heater_backend": "lgpio",
+    # true = si heater_backend no abre, seguir con "software" (con aviso): el duty
+    # medio es correcto pero el jitter de periodo bajo carga es el del lazo inline.
+    "heater_software_fallback": False,
+    # Corre el PCR contra el disco virtual (planta térmica, motor y fotodetector
+    # simulados) en vez del hardware; ver docs/virtual_disc.md.
+    "pcr_simulator": False,
+    # Rampa de las fases high/ext en PCR: "pi" (feed-forward + PI) o "predictive"
+    # (PredictiveRamp sobre "pcr_plant_model"); ver docs/pcr_predictive_ramp.md.
+    "ramp_strategy": "pi",
+    # Modelo FOPDT del disco (gain, tau, dead_time, t_amb) que escribe
+    # Drivers/PcrAutoTune.py --write; vacío = sin identificar.
+    "pcr_plant_model": {},
+    # Estimador de la temperatura de control del PCR: "ema" (alpha 0.3 sobre el
+    # primario) o "kalman" (fusiona el par y proyecta a ahora); ver
+    # docs/pcr_temp_estimator.md.
+    "temp_estimator": "ema",
+    # Lectura de fluorescencia del PCR en la cola del hold de extensión (el PI
+    # sigue sosteniendo) en vez de después; con fluor_gate_heater el calefactor
+    # se apaga mientras el LED de excitación está encendido. Ver
+    # docs/pcr_fluor_overlap.md.
+    "fluor_overlap": False,
+    "fluor_gate_heater": False,
+    # Homing del disco tras cada giro de enfriamiento del PCR: "each" (go_zero y
+    # espera al final de cada giro) o "deferred" (paro confirmado por STAT, el
+    # go_zero corre durante el hold low y se espera antes de la lectura de
+    # fluorescencia); ver docs/pcr_deferred_homing.md.
+    "cool_homing": "each",
+    # Pre-spin del enfriamiento: el giro arranca durante la cola del hold high
+    # para llegar a rpm_cooling justo al terminar el hold (anticipación =
+    # rpm/acceleration_spin + retraso medido por STAT; cool_prespin_lag_s es el
+    # retraso inicial). Ver docs/pcr_prespin.md.
+    "cool_prespin": False,
+    "cool_prespin_lag_s": 0.2,
 }
 
 
@@ -201,28 +265,192 @@ def validar_flotante(valor: str | float, minimo: float, maximo: float) -> tuple[
         return False, "El valor ingresado no es un número decimal válido."
 
 
-def read_settings_from_file(file_path: str = "resources/settings.json") -> dict:
+# --- Caché de settings ---
+# read_settings_from_file estaba en caminos calientes (tick del plot PCR, cada fase
+# del PID, cada muestra del fotodetector) y abría y parseaba el JSON en cada
+# llamada. Ahora hay un snapshot por archivo en memoria; cada lectura solo hace un
+# os.stat y vuelve a parsear si cambió (mtime_ns, tamaño o inodo). Así una edición
+# de ganancias a media corrida (ConfigFrame o el archivo a mano) sigue tomando
+# efecto en la siguiente lectura. Ver docs/settings_cache.md.
+_settings_lock = threading.Lock()
+_settings_cache: dict = {}  # file_path -> (stat_key, dict parseado)
+_settings_subscribers: dict = {}  # file_path -> [callback(settings)]
+_settings_write_lock = threading.Lock()  # serializa leer-mezclar-escribir
+_MISSING = object()
+
+
+def _stat_key(file_path: str):
     try:
-        with open(file_path, "r") as file:
-            settings: dict = json.load(file)
-    except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
-        return {}
-    except json.JSONDecodeError:
-        print(f"Error: File '{file_path}' is not a valid JSON.")
-        return {}
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _json_copy(value):
+    """Copia profunda de un valor JSON (dict/list/escalares); ~3x más rápida que
+    copy.deepcopy, que no sabe que no hay objetos compartidos ni ciclos."""
+    if isinstance(value, dict):
+        return {k: _json_copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_copy(v) for v in value]
+    return value
+
+
+def _notify_settings(file_path: str, settings: dict) -> None:
+    for callback in list(_settings_subscribers.get(file_path, ())):
+        try:
+            callback(_json_copy(settings))
+        except Exception as e:
+            print(f"Error in settings subscriber {callback!r}: {e}")
+
+
+def _settings_snapshot(file_path: str) -> dict:
+    """Snapshot cacheado de ``file_path`` (NO mutar: es compartido).
+
+    Recarga solo si cambió la firma del archivo. Un JSON inválido (p. ej. leído a
+    medio escribir por un editor) se cachea como ``{}`` con su firma, así no se
+    reintenta ni se vuelve a imprimir el error hasta que el archivo cambie.
+    """
+    key = _stat_key(file_path)
+    with _settings_lock:
+        cached = _settings_cache.get(file_path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if key is None:
+            if cached is None or cached[0] is not None:
+                print(f"Error: File '{file_path}' not found.")
+            _settings_cache[file_path] = (None, {})
+            return {}
+        try:
+            with open(file_path, "r") as file:
+                settings = json.load(file)
+        except FileNotFoundError:
+            print(f"Error: File '{file_path}' not found.")
+            settings = {}
+        except json.JSONDecodeError:
+            print(f"Error: File '{file_path}' is not a valid JSON.")
+            settings = {}
+        changed = cached is not None and cached[1] != settings
+        _settings_cache[file_path] = (key, settings)
+    if changed:
+        _notify_settings(file_path, settings)
     return settings
 
 
-def write_settings_to_file(new_settings: dict, file_path="resources/settings.json") -> bool:
-    settings = read_settings_from_file(file_path)
-    settings.update(new_settings)
+def read_settings_from_file(file_path: str = "resources/settings.json") -> dict:
+    """Copia del contenido de ``file_path`` (cacheado, ver _settings_snapshot).
+
+    Devuelve una copia profunda: varios llamadores modifican el dict recibido. Para
+    leer una clave suelta en un camino caliente usar get_setting y afines, que no
+    copian el archivo entero.
+    """
+    return _json_copy(_settings_snapshot(file_path))
+
+
+def get_setting(key, default=None, file_path: str = "resources/settings.json"):
+    """Valor de ``key`` en el snapshot cacheado, o ``default`` si falta.
+
+    ``key`` admite rutas con punto para sub-dicts (``"photoreceptor.use_diff"``,
+    ``"pidControllerRPM.ts_pcr"``). Dicts y listas se devuelven copiados.
+    """
+    value = _settings_snapshot(file_path)
+    for part in str(key).split("."):
+        if not isinstance(value, dict):
+            return default
+        value = value.get(part, _MISSING)
+        if value is _MISSING:
+            return default
+    return _json_copy(value)
+
+
+def get_setting_float(key, default: float, file_path: str = "resources/settings.json") -> float:
+    """get_setting convertido a float; ``default`` si falta o no es numérico."""
     try:
-        with open(file_path, "w") as file:
-            json.dump(settings, file, indent=4)
-    except Exception as e:
-        print(f"Error writing to settings file '{file_path}': {e}")
-        return False
+        return float(get_setting(key, default, file_path))
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def get_setting_int(key, default: int, file_path: str = "resources/settings.json") -> int:
+    """get_setting convertido a int (acepta 1500.0 como lo guarda ConfigFrame)."""
+    try:
+        return int(float(get_setting(key, default, file_path)))
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def get_setting_bool(key, default: bool, file_path: str = "resources/settings.json") -> bool:
+    """get_setting como bool. ConfigFrame guarda los flags como float (1.0/0.0)."""
+    value = get_setting(key, default, file_path)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "1.0", "true", "yes", "on")
+    return bool(value)
+
+
+def subscribe_settings(callback, file_path: str = "resources/settings.json"):
+    """Registra ``callback(settings)`` para cuando cambie el contenido del archivo.
+
+    Se llama desde el hilo que detecta el cambio: una escritura con
+    write_settings_to_file o la primera lectura tras una edición externa. Si el
+    callback toca Tk, debe re-agendarse con ``after``. Devuelve una función que
+    cancela la suscripción.
+    """
+    with _settings_lock:
+        _settings_subscribers.setdefault(file_path, []).append(callback)
+
+    def unsubscribe():
+        with _settings_lock:
+            subs = _settings_subscribers.get(file_path, [])
+            if callback in subs:
+                subs.remove(callback)
+
+    return unsubscribe
+
+
+def _write_json_atomic(data: dict, file_path: str) -> None:
+    """Escribe ``data`` en un temporal del mismo directorio y lo renombra encima.
+
+    Un lector concurrente (otro hilo o el editor) ve el archivo viejo o el nuevo,
+    nunca uno truncado; un corte de luz a media escritura tampoco deja el JSON roto.
+    """
+    folder = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=folder)
+    try:
+        # mkstemp crea con 0600: se conservan los permisos del archivo reemplazado.
+        try:
+            os.chmod(tmp, os.stat(file_path).st_mode & 0o777)
+        except OSError:
+            pass
+        with os.fdopen(fd, "w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_settings_to_file(new_settings: dict, file_path="resources/settings.json") -> bool:
+    with _settings_write_lock:
+        settings = read_settings_from_file(file_path)
+        settings.update(new_settings)
+        try:
+            _write_json_atomic(settings, file_path)
+        except Exception as e:
+            print(f"Error writing to settings file '{file_path}': {e}")
+            return False
+        # Write-through: el snapshot pasa a ser lo recién escrito sin releerlo.
+        with _settings_lock:
+            cached = _settings_cache.get(file_path)
+            changed = cached is None or cached[1] != settings
+            _settings_cache[file_path] = (_stat_key(file_path), settings)
+    if changed:
+        _notify_settings(file_path, settings)
     return True
 
 
@@ -264,8 +492,7 @@ def seed_default_settings(file_path: str = "resources/settings.json") -> bool:
         changed = _merge_missing_defaults(settings, DEFAULT_SETTINGS)
     if changed:
         try:
-            with open(file_path, "w") as file:
-                json.dump(settings, file, indent=4)
+            _write_json_atomic(settings, file_path)
         except Exception as e:
             print(f"Error seeding settings file '{file_path}': {e}")
             return False
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Latencia línea -> procesador: hilos con sondeo de 10 ms vs el loop del EmstatEngine.
+
+Un emisor en 127.0.0.1 manda líneas EMSTAT a --rate Hz con su instante de envío.
+  - hilos: el camino previo de EventPlotter. Un hilo lector (select +
+    LineBufferedSocketReader) pone cada línea en una queue.Queue; el hilo
+    procesador la drena con get_nowait en ráfagas de 256 y duerme 10 ms sin datos.
+  - asyncio: RelayLink sobre el loop del motor. on_line agrega a un deque y pone un
+    asyncio.Event; el procesador es una tarea que espera el evento.
+Mide la latencia envío -> procesador, el CPU del proceso y los hilos vivos
+durante la corrida.
+
+    PYTHONPATH=. python test/bench_emstat_engine.py [--rate 50] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import queue
+import select
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+
+from Drivers.EmstatEngine import get_emstat_engine
+from Drivers.EmstatLink import RelayLink
+from Drivers.EmstatUtils import LineBufferedSocketReader
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:30 $"
+
+BENCH_PORT = 15007
+
+
+class PacedSender:
+    """Acepta un cliente y le manda `count` líneas EMSTAT cada 1/rate s."""
+
+    def __init__(self, port, rate, count):
+        self.rate = rate
+        self.count = count
+        self.srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.srv.bind(("127.0.0.1", port))
+        self.srv.listen(1)
+        self.go = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="PacedSender")
+        self._thread.start()
+
+    def _run(self):
+        client, _ = self.srv.accept()
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.go.wait()
+        t0 = time.perf_counter()
+        for k in range(self.count):
+            delay = t0 + k / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            msg = {"type": "emstat_data", "seq": k + 1, "t": time.perf_counter()}
+            client.sendall(("EMSTAT:" + json.dumps(msg) + "\n").encode())
+        time.sleep(0.2)
+        client.close()
+        self.srv.close()
+
+
+def handle(line, lat):
+    """Lo mínimo del procesador: parsear el JSON y anotar la latencia."""
+    msg = json.loads(line[len("EMSTAT:"):])
+    lat.append(time.perf_counter() - msg["t"])
+
+
+def run_threads(count, sender):
+    lat = []
+    q = queue.Queue(maxsize=20000)
+    stop = threading.Event()
+    sock = socket.create_connection(("127.0.0.1", BENCH_PORT))
+    reader = LineBufferedSocketReader(sock)
+
+    def tcp_reader():
+        while not stop.is_set():
+            ready, _, _ = select.select([sock], [], [], 0.5)
+            if not ready:
+                continue
+            lines = reader.read_lines()
+            if lines is None:
+                break
+            for line in lines:
+                q.put_nowait(line)
+
+    def processor():
+        while not stop.is_set():
+            got = []
+            for _ in range(256):
+                try:
+                    got.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            for line in got:
+                handle(line, lat)
+            if len(lat) >= count:
+                stop.set()
+            if not got:
+                time.sleep(0.01)
+
+    ths = [threading.Thread(target=tcp_reader, daemon=True), threading.Thread(target=processor, daemon=True)]
+    for th in ths:
+        th.start()
+    threads = threading.active_count()
+    sender.go.set()
+    ths[1].join()
+    stop.set()
+    sock.close()
+    return lat, threads
+
+
+def run_asyncio(count, sender):
+    lat = []
+    engine = get_emstat_engine()
+    lines = deque()
+    rx = asyncio.Event()
+    done = threading.Event()
+
+    def on_line(line):
+        lines.append(line)
+        rx.set()
+
+    async def processor():
+        while len(lat) < count:
+            rx.clear()
+            while lines:
+                handle(lines.popleft(), lat)
+            if len(lat) < count:
+                await rx.wait()
+        done.set()
+
+    link = RelayLink("127.0.0.1", BENCH_PORT, persistent=False)
+    run = link.open_run(on_line)
+    engine.submit(processor())
+    threads = threading.active_count()
+    sender.go.set()
+    done.wait()
+    run.close()
+    link.close()
+    return lat, threads
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=50.0)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    args = ap.parse_args()
+    count = int(args.rate * args.seconds)
+
+    print(f"{count} líneas a {args.rate:g} Hz")
+    print(f"{'modo':<10}{'mediana ms':>12}{'p95 ms':>9}{'máx ms':>9}{'CPU ms':>9}{'hilos':>7}")
+    for name, fn in (("hilos", run_threads), ("asyncio", run_asyncio)):
+        sender = PacedSender(BENCH_PORT, args.rate, count)
+        cpu0 = time.process_time()
+        lat, threads = fn(count, sender)
+        cpu = (time.process_time() - cpu0) * 1e3
+        ms = sorted(x * 1e3 for x in lat)
+        p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+        print(f"{name:<10}{statistics.median(ms):>12.2f}{p95:>9.2f}{ms[-1]:>9.2f}{cpu:>9.0f}{threads:>7}")
+        time.sleep(0.3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""feed_many (NumPy por lotes) vs feed_raw (línea a línea): conformidad y velocidad.
+
+1) Conformidad: por cada stream sintético (test/emstat_streams.py) y los casos
+   límite, compara fila por fila el array de feed_many contra los eventos "data"
+   de feed_raw (mismos floats bit a bit, NaN = clave ausente) y los marcadores.
+   El lote se corta en trozos de tamaño variable, como llega del drenado.
+2) Benchmark: 10k / 100k / 1M paquetes por experimento (CV, SWV, EIS).
+
+    PYTHONPATH=. python test/bench_emstat_feed_many.py [max_paquetes]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from Drivers.EmstatUtils import BATCH_DTYPE, BATCH_PHASES, EmstatStreamParser
+from emstat_streams import ca_stream, cv_stream, edge_lines, eis_edc_stream, eis_stream, swv_stream
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 12:40 $"
+
+FLOAT_COLS = [n for n in BATCH_DTYPE.names if BATCH_DTYPE[n].kind == "f"]
+
+
+def make_parser(exp, **kw):
+    return EmstatStreamParser(exp, ca_t_interval=0.1, ca_has_equil=(exp == "ca"), **kw)
+
+
+def scalar_rows(exp, lines, **kw):
+    parser = make_parser(exp, **kw)
+    rows, events = [], []
+    for seq, ln in enumerate(lines):
+        ev = parser.feed_raw(ln)
+        if not ev:
+            continue
+        if ev.get("type") == "data":
+            st, rg = ev["status"], ev["current_range"]
+            acc = 0
+            for v in st:
+                acc |= v
+            rows.append({**ev, "seq": seq, "status": acc if st else -1,
+                         "current_range": rg[0] if rg else -1})
+        elif not ln.startswith("P"):
+            events.append(ev)
+    return rows, events
+
+
+def batch_rows(exp, lines, rnd, **kw):
+    parser = make_parser(exp, **kw)
+    datas, events = [], []
+    i = 0
+    while i < len(lines):
+        n = rnd.randint(1, 300)  # drenados de tamaño variable
+        data, evs = parser.feed_many(lines[i:i + n], seqs=range(i, i + n))
+        datas.append(data)
+        events += evs
+        i += n
+    return np.concatenate(datas), events
+
+
+def same_float(a, b):
+    return (np.isnan(a) and np.isnan(b)) or (a == b and np.signbit(a) == np.signbit(b))
+
+
+def check(name, exp, lines, **kw):
+    rows, ev_s = scalar_rows(exp, lines, **kw)
+    data, ev_b = batch_rows(exp, lines, random.Random(0), **kw)
+    errors = []
+    if len(rows) != len(data):
+        errors.append(f"filas: escalar={len(rows)} lote={len(data)}")
+    for r, d in zip(rows, data):
+        for col in FLOAT_COLS:
+            if not same_float(float(r.get(col, np.nan)), float(d[col])):
+                errors.append(f"seq {r['seq']} {col}: {r.get(col)!r} != {d[col]!r}")
+        for col in ("seq", "cycle", "direction", "status", "current_range"):
+            if r[col] != d[col]:
+                errors.append(f"seq {r['seq']} {col}: {r[col]} != {d[col]}")
+        if r.get("phase", "") != BATCH_PHASES[d["phase"]]:
+            errors.append(f"seq {r['seq']} phase")
+    strip = [{k: v for k, v in e.items() if k not in ("row", "seq")} for e in ev_b]
+    if strip != ev_s:
+        errors.append("eventos de marcadores distintos")
+    print(f"  {name:<12}{len(lines):>7} líneas {len(data):>7} filas  "
+          f"{'OK' if not errors else 'FAIL'}")
+    for e in errors[:5]:
+        print(f"      {e}")
+    return not errors
+
+
+def bench(exp, gen, n_packets):
+    base = [ln for ln in gen() if ln.startswith("P")]
+    lines = (base * (n_packets // len(base) + 1))[:n_packets]
+    parser = make_parser(exp)
+    t0 = time.perf_counter()
+    for ln in lines:
+        parser.feed_raw(ln)
+    t_scalar = time.perf_counter() - t0
+    parser = make_parser(exp)
+    t0 = time.perf_counter()
+    for i in range(0, n_packets, 256):  # drenado típico del procesador (256)
+        parser.feed_many(lines[i:i + 256])
+    t_256 = time.perf_counter() - t0
+    parser = make_parser(exp)
+    t0 = time.perf_counter()
+    parser.feed_many(lines)
+    t_all = time.perf_counter() - t0
+    print(f"  {exp:<6}{n_packets:>9}{1e6 * t_scalar / n_packets:>11.2f}"
+          f"{1e6 * t_256 / n_packets:>11.2f}{1e6 * t_all / n_packets:>11.2f}"
+          f"{t_scalar / t_256:>9.1f}x{t_scalar / t_all:>8.1f}x")
+
+
+def main():
+    max_n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print("=" * 72)
+    print("Conformidad feed_many vs feed_raw")
+    ok = True
+    ok &= check("cv", "cv", cv_stream())
+    ok &= check("sqwv", "sqwv", swv_stream())
+    ok &= check("eis", "eis", eis_stream())
+    ok &= check("eis-edc", "eis", eis_edc_stream(), eis_group_by_potential=True)
+    ok &= check("ca", "ca", ca_stream())
+    for exp in ("cv", "sqwv", "eis", "ca"):
+        ok &= check(f"edge-{exp}", exp, edge_lines() + cv_stream(40) + edge_lines())
+    print("-" * 72)
+    print(f"  {'exp':<6}{'paquetes':>9}{'us/p raw':>11}{'us/p 256':>11}{'us/p todo':>11}"
+          f"{'x 256':>10}{'x todo':>9}")
+    for exp, gen in (("cv", cv_stream), ("sqwv", swv_stream), ("eis", eis_stream)):
+        n = 10_000
+        while n <= max_n:
+            bench(exp, gen, n)
+            n *= 10
+    print("=" * 72)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
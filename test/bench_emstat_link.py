@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Latencia de arranque de corridas EmStat: conexión por corrida vs RelayLink persistente.
+
+Un relay falso en 127.0.0.1 imita al sketch del Wemos (firmware/WemosD1Mini): un
+solo slot de cliente, un loop() cada --loop-ms que adopta al cliente nuevo con
+hasClient() (soltando al viejo), saluda con CD_TCP_READY, contesta FORWARDED a
+cada línea y, por cada payload, emite la corrida del "Pico": emstat_start,
+--points emstat_data y emstat_end. Cada corrida mide desde open_run hasta el
+FORWARDED de su payload (lo que EventPlotter espera antes de ver datos), y revisa
+que todas sus líneas sean de su propio payload. El loopback no tiene la RTT del
+WiFi: el connect acá cuesta ~0.1 ms, en el Wemos real es un ida y vuelta más.
+
+Al final, la carrera open_run / reconexión: el relay corta la sesión y open_run
+llega mientras la reconexión está dentro de un connect lento (--connect-ms). Debe
+quedar una sola sesión abierta en el relay.
+
+    PYTHONPATH=. python test/bench_emstat_link.py [--runs 50] [--loop-ms 5] [--points 200]
+"""
+import argparse
+import asyncio
+import json
+import select
+import socket
+import statistics
+import threading
+import time
+
+from Drivers.EmstatLink import RelayLink
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:20 $"
+
+BENCH_PORT = 15006  # no choca con el 5006 real
+
+
+class FakeWemos:
+    """Relay TCP de un solo cliente con el loop() del sketch."""
+
+    def __init__(self, port, loop_s, points):
+        self.loop_s = loop_s
+        self.points = points
+        self.srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.srv.bind(("127.0.0.1", port))
+        self.srv.listen(4)
+        self.srv.setblocking(False)
+        self.client = None
+        self.buf = b""
+        self.payloads = 0
+        self.events = {"tcp_new_client": 0, "tcp_client_dropped": 0, "keepalive": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="FakeWemos")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _send(self, line):
+        try:
+            self.client.sendall((line + "\n").encode())
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            # acceptTcpIfNeeded: el cliente nuevo en cola desplaza al viejo.
+            ready, _, _ = select.select([self.srv], [], [], 0)
+            if ready:
+                if self.client is not None:
+                    self.client.close()
+                self.client, _ = self.srv.accept()
+                self.client.setblocking(False)
+                self.buf = b""
+                self.events["tcp_new_client"] += 1
+                self._send('{"hello":"CD_TCP_READY"}')
+            # handleTcpRx
+            if self.client is not None:
+                try:
+                    data = self.client.recv(4096)
+                    if not data:
+                        self.client.close()
+                        self.client = None
+                        self.events["tcp_client_dropped"] += 1
+                    else:
+                        self.buf += data
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    self.client = None
+                while self.client is not None and b"\n" in self.buf:
+                    raw, self.buf = self.buf.split(b"\n", 1)
+                    line = raw.decode().strip()
+                    self._send('{"status":"FORWARDED","to":"UART_EMSTAT"}')
+                    if "keepalive" in line:
+                        self.events["keepalive"] += 1
+                        continue
+                    self._emit_run()
+            time.sleep(self.loop_s)
+
+    def _emit_run(self):
+        """Lo que el Pico devolvería por TCP para un payload: una corrida completa."""
+        self.payloads += 1
+        n = self.payloads
+        self._send("EMSTAT:" + json.dumps({"type": "emstat_start", "n": n, "seq": 0}))
+        for k in range(self.points):
+            self._send("EMSTAT:" + json.dumps({"type": "emstat_data", "n": n, "seq": k + 1}))
+        self._send("EMSTAT:" + json.dumps({"type": "emstat_end", "n": n, "seq": self.points + 1}))
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        if self.client is not None:
+            self.client.close()
+        self.srv.close()
+
+
+def run_case(persistent, runs, loop_s, points):
+    relay = FakeWemos(BENCH_PORT, loop_s, points).start()
+    link = RelayLink("127.0.0.1", BENCH_PORT, persistent=persistent)
+    starts, foreign, missing = [], 0, 0
+    try:
+        for idx in range(1, runs + 1):
+            acked, ended = threading.Event(), threading.Event()
+            got = {"data": 0, "foreign": 0}
+
+            def on_line(line, idx=idx, got=got, acked=acked, ended=ended):
+                if "FORWARDED" in line:
+                    acked.set()
+                    return
+                if not line.startswith("EMSTAT:"):
+                    return
+                msg = json.loads(line[len("EMSTAT:"):])
+                if msg["n"] != idx:
+                    got["foreign"] += 1
+                elif msg["type"] == "emstat_data":
+                    got["data"] += 1
+                elif msg["type"] == "emstat_end":
+                    ended.set()
+
+            t0 = time.perf_counter()
+            run = link.open_run(on_line)
+            run.send({"method": "cv", "ch": 0})
+            if not acked.wait(5.0):
+                raise RuntimeError(f"run {idx}: no FORWARDED")
+            starts.append(time.perf_counter() - t0)
+            ended.wait(5.0)
+            run.close()
+            foreign += got["foreign"]
+            missing += points - got["data"]
+    finally:
+        link.close()
+        time.sleep(0.05)
+        relay.close()
+    return starts, relay.events, foreign, missing
+
+
+class SlowConnectLink(RelayLink):
+    """RelayLink cuyo connect tarda delay_s (WiFi lento), para abrir la carrera."""
+
+    def __init__(self, *args, delay_s=0.3, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delay_s = delay_s
+
+    async def _create_connection(self):
+        await asyncio.sleep(self.delay_s)
+        return await super()._create_connection()
+
+
+def race_case(delay_s):
+    """open_run durante el connect de la reconexión: (aceptadas, abiertas al final)."""
+    srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    srv.bind(("127.0.0.1", BENCH_PORT))
+    srv.listen(4)
+    accepted = []
+
+    def accept():
+        while True:
+            try:
+                accepted.append(srv.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=accept, daemon=True).start()
+    backoff = 0.1
+    link = SlowConnectLink("127.0.0.1", BENCH_PORT, backoff_s=(backoff, 1.0), delay_s=delay_s)
+    try:
+        link.open_run(lambda _line: None).close()
+        accepted[0].close()  # el relay corta: arranca la reconexión
+        time.sleep(backoff + delay_s / 2)  # la reconexión está dentro del connect
+        run = link.open_run(lambda _line: None)
+        time.sleep(delay_s * 2)
+        alive = 0
+        for conn in accepted[1:]:
+            conn.setblocking(False)
+            try:
+                alive += conn.recv(1) != b""
+            except BlockingIOError:
+                alive += 1
+            except OSError:
+                pass
+        run.close()
+    finally:
+        link.close()
+        srv.close()
+        for conn in accepted:
+            conn.close()
+    return len(accepted), alive
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=50)
+    ap.add_argument("--loop-ms", type=float, default=5.0)
+    ap.add_argument("--points", type=int, default=200)
+    ap.add_argument("--connect-ms", type=float, default=300.0)
+    args = ap.parse_args()
+
+    print(f"{args.runs} corridas seguidas, loop del relay {args.loop_ms:g} ms, "
+          f"{args.points} puntos por corrida")
+    print(f"{'modo':<14}{'mediana ms':>12}{'p95 ms':>9}{'máx ms':>9}"
+          f"{'clientes nuevos':>17}{'caídas':>8}{'ajenas':>8}{'faltan':>8}")
+    for name, persistent in (("por corrida", False), ("persistente", True)):
+        starts, events, foreign, missing = run_case(
+            persistent, args.runs, args.loop_ms / 1e3, args.points
+        )
+        ms = sorted(s * 1e3 for s in starts)
+        p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+        print(f"{name:<14}{statistics.median(ms):>12.2f}{p95:>9.2f}{ms[-1]:>9.2f}"
+              f"{events['tcp_new_client']:>17}{events['tcp_client_dropped']:>8}"
+              f"{foreign:>8}{missing:>8}")
+    accepted, alive = race_case(args.connect_ms / 1e3)
+    print(f"carrera open_run/reconexión (connect {args.connect_ms:g} ms): "
+          f"{accepted} conexiones aceptadas, {alive} sesión(es) abiertas al final"
+          f"{'' if alive == 1 else '  <-- FALLA'}")
+
+
+if __name__ == "__main__":
+    main()
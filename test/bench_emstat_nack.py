@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Completitud del dataset EmStat con y sin NACK, en una simulación por eventos.
+
+El Pico manda --rate emstat_data por segundo durante --seconds. Cada línea se
+pierde para AMBOS transportes con --p-both (el Wemos perdió la línea del UART; se
+pierde en ráfagas de --burst líneas en promedio) y, además, por separado en TCP
+(--p-tcp) y en UDP (--p-udp). Latencias fijas: TCP 5 ms, UDP 8 ms.
+  - merge: el host solo une TCP+UDP (lo de hoy).
+  - nack: además corre NackTracker con el tick del EventPlotter (0.1 s) y pide
+    por TCP; el Pico atiende el NACK en su próximo poll (una línea del EmStat) desde
+    un ring de 256 y reenvía hasta 16 seq, que sufren las mismas pérdidas. Tras el
+    terminal la corrida espera hasta 1 s (rtx_grace_s).
+Reporta los seq que faltan al cerrar, los NACK enviados, las líneas reenviadas y
+cuánto se demoró el cierre tras el terminal.
+
+    PYTHONPATH=. python test/bench_emstat_nack.py [--rate 100] [--seconds 60]
+"""
+import argparse
+import heapq
+import random
+
+from Drivers.EmstatRecovery import NACK_MAX_SEQS, NackTracker
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 04:00 $"
+
+RING_N = 256
+TCP_S, UDP_S, NACK_S = 0.005, 0.008, 0.005
+TICK_S, GRACE_S = 0.1, 1.0
+
+
+class Channel:
+    """Pérdidas de una línea Pico -> host: ráfagas compartidas + independientes."""
+
+    def __init__(self, rng, p_both, burst, p_tcp, p_udp):
+        self.rng = rng
+        self.p_start = p_both / burst  # arranque de ráfaga (largo medio = burst)
+        self.p_end = 1.0 / burst
+        self.p_tcp = p_tcp
+        self.p_udp = p_udp
+        self.in_burst = False
+
+    def send(self):
+        """(llega_por_tcp, llega_por_udp) para la próxima línea."""
+        if self.in_burst:
+            self.in_burst = self.rng.random() >= self.p_end
+        else:
+            self.in_burst = self.rng.random() < self.p_start
+        if self.in_burst:
+            return False, False
+        return self.rng.random() >= self.p_tcp, self.rng.random() >= self.p_udp
+
+
+def simulate(args, use_nack, seed):
+    rng = random.Random(seed)
+    chan = Channel(rng, args.p_both, args.burst, args.p_tcp, args.p_udp)
+    count = int(args.rate * args.seconds)
+    period = 1.0 / args.rate
+    clock = [0.0]
+    nack = NackTracker(clock=lambda: clock[0])
+    ring = {}
+    seen = set()
+    events = []  # (t, orden, tipo, dato)
+    order = 0
+
+    def push(t, kind, data=None):
+        nonlocal order
+        order += 1
+        heapq.heappush(events, (t, order, kind, data))
+
+    def emit(t, seq):
+        tcp, udp = chan.send()
+        if tcp:
+            push(t + TCP_S, "rx", seq)
+        if udp:
+            push(t + UDP_S, "rx", seq)
+
+    pending_nacks = []  # rangos que esperan el próximo poll del Pico
+    stats = {"nacks": 0, "resent": 0, "close_s": 0.0}
+
+    def resend(t):
+        """_resend del firmware: hasta NACK_MAX_SEQS por NACK entre reenviados y
+        faltantes, cada rango recortado a RING_N; solo reenvía lo que sigue en el ring."""
+        for ranges in pending_nacks:
+            sent = miss = 0
+            for lo, hi in ranges:
+                for s in range(lo, min(hi, lo + RING_N - 1) + 1):
+                    if sent + miss >= NACK_MAX_SEQS:
+                        break
+                    if ring.get(s % RING_N) == s:
+                        emit(t, s)
+                        sent += 1
+                    else:
+                        miss += 1
+            stats["resent"] += sent
+        pending_nacks.clear()
+
+    for seq in range(1, count + 2):  # count datos + el terminal
+        push(seq * period, "pico", seq)
+    push(TICK_S, "tick")
+    end_seq = count + 1
+    t_end = close_at = None
+    while events:
+        t, _, kind, data = heapq.heappop(events)
+        clock[0] = t
+        if kind == "pico":
+            resend(t)  # poll_stop antes de cada línea: atiende los NACK llegados
+            ring[data % RING_N] = data
+            emit(t, data)
+        elif kind == "nack":
+            pending_nacks.append(data)
+            if t_end is not None:  # tras el terminal el Pico atiende en handle_command
+                push(t, "pico_idle")
+        elif kind == "pico_idle":
+            resend(t)
+        elif kind == "rx":
+            if data == end_seq:
+                if t_end is None:
+                    t_end = t
+                    if use_nack:
+                        nack.end(data)
+                        close_at = t + GRACE_S
+                    else:
+                        break
+                continue
+            seen.add(data)
+            if use_nack:
+                nack.observe(data)
+        elif kind == "tick" and use_nack:
+            ranges = nack.due()
+            if ranges:
+                stats["nacks"] += 1
+                push(t + NACK_S, "nack", ranges)
+            if close_at is not None and (not nack.pending() or t >= close_at):
+                stats["close_s"] = t - t_end
+                break
+            push(t + TICK_S, "tick")
+    missing = count - len(seen & set(range(1, count + 1)))
+    return missing, count, stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=100.0)
+    ap.add_argument("--seconds", type=float, default=60.0)
+    ap.add_argument("--p-both", type=float, default=0.005)
+    ap.add_argument("--burst", type=float, default=3.0)
+    ap.add_argument("--p-tcp", type=float, default=0.02)
+    ap.add_argument("--p-udp", type=float, default=0.05)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+    print(
+        f"{args.rate:g} Hz x {args.seconds:g} s, pérdida AMBOS={args.p_both:.1%} "
+        f"(ráfagas de ~{args.burst:g}), TCP={args.p_tcp:.1%}, UDP={args.p_udp:.1%}, {args.runs} corridas"
+    )
+    print(f"{'modo':<7}{'faltan':>9}{'% completo':>12}{'NACKs':>8}{'reenvíos':>10}{'cierre +s':>11}")
+    for name, use_nack in (("merge", False), ("nack", True)):
+        missing = total = nacks = resent = 0
+        close = []
+        for seed in range(args.runs):
+            m, n, st = simulate(args, use_nack, seed)
+            missing += m
+            total += n
+            nacks += st["nacks"]
+            resent += st["resent"]
+            close.append(st["close_s"])
+        print(
+            f"{name:<7}{missing / args.runs:>9.1f}{100 * (1 - missing / total):>12.3f}"
+            f"{nacks / args.runs:>8.1f}{resent / args.runs:>10.1f}{max(close):>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
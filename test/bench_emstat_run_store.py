@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""Memoria y tiempo: registro legado (lista de dicts + dict por seq + deques) vs
+almacenamiento columnar (EmstatRunStore + SeqMergeBuffer + XYLineBuffer).
+
+Simula una corrida CV de N puntos que llega por TCP (primario, con 1% de pérdida)
+y por UDP (completo), en lotes de 256 como los drena el procesador (alternando
+qué transporte llega primero), y mide:
+  - ingest: guardar la corrida en vivo (registro + merge + buffers de plot; el
+    columnar ya reconcilia en vivo, rellenando los huecos del TCP),
+  - merge: trabajo al cerrar (_reconcile_merge). Legado: ordenar la unión y
+    reconstruir las líneas. Columnar: solo los huecos de la cola,
+  - csv: generar las filas de Save,
+  - memoria retenida al final (tracemalloc, en una segunda pasada; incluye los
+    buffers de NumPy y los dicts/filas decodificados que quedan guardados).
+decode = feed_raw (legado) o feed_many (columnar) de ambos transportes; se mide
+aparte porque cada registro viene con su decodificador.
+
+    PYTHONPATH=. python test/bench_emstat_run_store.py [N ...]
+"""
+import io
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+from Drivers.EmstatRunStore import EmstatRunStore, SeqMergeBuffer, XYLineBuffer
+from Drivers.EmstatUtils import EmstatStreamParser
+from emstat_streams import cv_stream
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 15:30 $"
+
+BATCH = 256
+MAX_POINTS = 10000
+
+
+def make_packets(n):
+    base = [ln for ln in cv_stream(2000, 1) if ln.startswith("P")]
+    return (base * (n // len(base) + 1))[:n]
+
+
+def lost_mask(n, rate=0.01, seed=7):
+    rnd = random.Random(seed)
+    return np.array([rnd.random() < rate for _ in range(n)])
+
+
+def legacy(lines, lost, trace):
+    """Camino previo: un dict por evento en total_data y merged_by_seq, deques."""
+    if trace:
+        tracemalloc.start()
+    td = time.perf_counter()
+    events = {}
+    for src in ("tcp", "udp"):
+        parser = EmstatStreamParser("cv")
+        evs = []
+        for i, ln in enumerate(lines):
+            ev = parser.feed_raw(ln)
+            ev["seq"] = i + 1
+            ev["source"] = src
+            evs.append(ev)
+        events[src] = evs
+    t_dec = time.perf_counter() - td
+    events["tcp"] = [ev for ev, gone in zip(events["tcp"], lost.tolist()) if not gone]
+    t0 = time.perf_counter()
+    total_data, merged = [], {}
+    xs, ys = deque(maxlen=MAX_POINTS), deque(maxlen=MAX_POINTS)
+    for ev in events["tcp"]:
+        merged.setdefault(ev["seq"], ev)
+        ev["run"] = 1
+        total_data.append(ev)
+        xs.append(ev.get("E_V", 0.0))
+        ys.append(ev.get("I_A", 0.0))
+    for ev in events["udp"]:
+        merged.setdefault(ev["seq"], ev)
+    t1 = time.perf_counter()
+    ordered = [merged[s] for s in sorted(merged)]
+    for ev in ordered:
+        ev["run"] = 1
+    total_data[0:] = ordered
+    xs = deque((ev.get("E_V", 0.0) for ev in ordered), maxlen=MAX_POINTS)
+    ys = deque((ev.get("I_A", 0.0) for ev in ordered), maxlen=MAX_POINTS)
+    t2 = time.perf_counter()
+    out = io.StringIO()
+    for index, event in enumerate(total_data):
+        out.write(
+            f"{index}, {event.get('E_V')}, {event.get('I_A')},"
+            f" {event.get('cycle')}, {event.get('run', 1)}\n"
+        )
+    t3 = time.perf_counter()
+    # La corrida del otro transporte se retiene igual que antes (dicts en merged).
+    del events
+    mem = tracemalloc.get_traced_memory()[0] if trace else 0
+    tracemalloc.stop()
+    keep = (total_data, merged, xs, ys)
+    return t_dec, t1 - t0, t2 - t1, t3 - t2, mem, out.getvalue(), keep
+
+
+def columnar(lines, lost, trace):
+    seqs = np.arange(1, len(lines) + 1)
+    if trace:
+        tracemalloc.start()
+    td = time.perf_counter()
+    batches = {}
+    for src in ("tcp", "udp"):
+        parser = EmstatStreamParser("cv")
+        batches[src] = [
+            parser.feed_many(lines[i : i + BATCH], seqs[i : i + BATCH])[0]
+            for i in range(0, len(lines), BATCH)
+        ]
+    t_dec = time.perf_counter() - td
+    batches["tcp"] = [
+        rows[~lost[k * BATCH : k * BATCH + len(rows)]] for k, rows in enumerate(batches["tcp"])
+    ]
+    t0 = time.perf_counter()
+    store, merge, line = EmstatRunStore(), SeqMergeBuffer(), XYLineBuffer(MAX_POINTS)
+
+    def place(rows):  # EventPlotter._place_rows + _drain_points
+        rows["run"] = 1
+        store.insert_sorted(0, rows)
+        line.append(rows["E_V"], rows["I_A"], rows["seq"])
+
+    for k in range(len(batches["tcp"])):
+        order = ("tcp", "udp") if k % 2 else ("udp", "tcp")
+        for src in order:
+            place(merge.add(batches[src][k], src))
+    t1 = time.perf_counter()
+    place(merge.flush())
+    merge.clear()  # como _reconcile_merge: la unión ya vive en el store
+    t2 = time.perf_counter()
+    assert (np.diff(store.rows()["seq"]) > 0).all()
+    assert (line.view()[0] == store.rows()["E_V"][-MAX_POINTS:]).all()
+    rows = store.rows()
+    cols = [[f"{v}" for v in rows[k].tolist()] for k in ("E_V", "I_A", "cycle", "run")]
+    out = io.StringIO()
+    for index, values in enumerate(zip(*cols)):
+        out.write(f"{index}, " + ", ".join(values) + "\n")
+    t3 = time.perf_counter()
+    del batches, rows, cols
+    mem = tracemalloc.get_traced_memory()[0] if trace else 0
+    tracemalloc.stop()
+    keep = (store, merge, line)
+    return t_dec, t1 - t0, t2 - t1, t3 - t2, mem, out.getvalue(), keep
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100_000, 1_000_000]
+    print("=" * 78)
+    print(f"{'N':>9} {'camino':<9}{'decode s':>10}{'ingest s':>10}{'merge s':>9}{'csv s':>8}"
+          f"{'MB ret.':>9}{'B/punto':>9}")
+    for n in sizes:
+        lines, lost = make_packets(n), lost_mask(n)
+        res = {}
+        for name, fn in (("legado", legacy), ("columnar", columnar)):
+            # Tiempos sin tracemalloc (lo frena); la memoria en una segunda pasada.
+            td, ti, tm, tc, _, csv_text, keep = fn(lines, lost, trace=False)
+            res[name] = csv_text
+            del keep
+            mem = fn(lines, lost, trace=True)[4]
+            print(f"{n:>9} {name:<9}{td:>10.3f}{ti:>10.3f}{tm:>9.3f}{tc:>8.3f}"
+                  f"{mem / 1e6:>9.1f}{mem / n:>9.0f}")
+        print(f"{'':>9} CSV idéntico: {res['legado'] == res['columnar']}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Jitter del PWM del calefactor: modulación en el lazo PI (camino previo) vs el
+hilo de SoftwarePwmHeater, medidos sobre un RecordingPin (backend "fake").
+
+Camino previo: el propio lazo hace write(True), sleep(on), write(False),
+sleep(WINDOW - on) y entre ciclo y ciclo recalcula la potencia. Camino nuevo: el
+lazo solo llama set_duty() cada WINDOW y el hilo del heater pone los flancos en
+deadlines absolutos. Se mide sin carga y con un hilo que retiene el GIL en ráfagas
+(como el redibujado de matplotlib o el parseo en otros hilos de la app).
+
+Los backends lgpio/pigpio no se pueden medir aquí (temporizan fuera de Python):
+en el Pi se miden con un analizador lógico sobre el GPIO 25.
+
+    PYTHONPATH=. python test/bench_heater_pwm.py [segundos]
+"""
+import sys
+import threading
+import time
+
+from Drivers.DriverHeater import RecordingPin, SoftwarePwmHeater, pwm_jitter
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 19:50 $"
+
+WINDOW = 0.05  # win_h_high de resources/settings.json
+DUTY = 0.35
+
+
+def control_work():
+    """Lo que hace el PI entre ciclos (fuzzy gains, anti-windup): poco, pero en
+    Python."""
+    acc = 0.0
+    for k in range(200):
+        acc += (k % 7) * 1e-3
+    return acc
+
+
+def gil_load(stop, burst_s=0.004, pause_s=0.006):
+    """Retiene el GIL en ráfagas de burst_s (bytecode puro) cada pause_s."""
+    while not stop.is_set():
+        end = time.perf_counter() + burst_s
+        while time.perf_counter() < end:
+            sum(range(200))
+        time.sleep(pause_s)
+
+
+def run_inline(seconds):
+    pin = RecordingPin()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        control_work()
+        on_time = DUTY * WINDOW
+        pin.write(True)
+        time.sleep(on_time)
+        pin.write(False)
+        time.sleep(WINDOW - on_time)
+    return pin.edges
+
+
+def run_thread(seconds):
+    pin = RecordingPin()
+    heater = SoftwarePwmHeater(pin, WINDOW)
+    end = time.monotonic() + seconds
+    next_tick = time.monotonic()
+    while time.monotonic() < end:
+        control_work()
+        heater.set_duty(DUTY, period=WINDOW)
+        next_tick += WINDOW
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    heater.close()
+    return pin.edges
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print("=" * 92)
+    print(f"WINDOW {WINDOW * 1e3:.0f} ms, duty {DUTY:.2f}, {seconds:g} s por caso "
+          "(errores en ms)")
+    print(f"{'carga':<8}{'camino':<10}{'T med':>8}{'T p95':>8}{'T máx':>8}"
+          f"{'ON med':>8}{'ON p95':>8}{'ON máx':>8}{'duty':>8}{'ciclos/s':>10}")
+    for load in (False, True):
+        for name, fn in (("inline", run_inline), ("hilo", run_thread)):
+            stop = threading.Event()
+            loader = None
+            if load:
+                loader = threading.Thread(target=gil_load, args=(stop,), daemon=True)
+                loader.start()
+            edges = fn(seconds)
+            stop.set()
+            if loader is not None:
+                loader.join()
+            j = pwm_jitter(edges, WINDOW, DUTY)
+            cycles = sum(1 for _t, lv in edges if lv) / seconds
+            print(f"{'GIL' if load else 'ninguna':<8}{name:<10}"
+                  f"{j['period_err_mean_ms']:>8.3f}{j['period_err_p95_ms']:>8.3f}"
+                  f"{j['period_err_max_ms']:>8.3f}{j['on_err_mean_ms']:>8.3f}"
+                  f"{j['on_err_p95_ms']:>8.3f}{j['on_err_max_ms']:>8.3f}"
+                  f"{j['duty']:>8.3f}{cycles:>10.2f}")
+    print("=" * 92)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Throughput del lector de líneas TCP: recv + del buffer[:nl+1] vs LineFramer.
+
+Un hilo escribe por un socketpair --mb MB de líneas EMSTAT (JSON de ~--line-bytes
+bytes) tan rápido como puede; el lector las consume hasta el EOF. Casos:
+  - previo: el read_lines anterior (recv(4096), extend y del por línea).
+  - previo 64K: el mismo con recv(65536), lo que entrega el kernel a tasa alta.
+  - framer: LineBufferedSocketReader.read_lines (recv_into + decode por línea).
+  - framer bytes: read_raw_lines (sin decodificar).
+
+    PYTHONPATH=. python test/bench_line_reader.py [--mb 64] [--line-bytes 90]
+"""
+import argparse
+import json
+import socket
+import threading
+import time
+
+from Drivers.EmstatUtils import LineBufferedSocketReader
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 03:40 $"
+
+
+class LegacyReader:
+    """Copia del LineBufferedSocketReader previo (para comparar)."""
+
+    def __init__(self, sock, recv_size=4096, max_buffer=1 << 20):
+        self.sock = sock
+        self.recv_size = recv_size
+        self.buffer = bytearray()
+        self.max_buffer = max_buffer
+
+    def read_lines(self):
+        data = self.sock.recv(self.recv_size)
+        if not data:
+            return None
+        self.buffer.extend(data)
+        if len(self.buffer) > self.max_buffer:
+            raise RuntimeError("RX buffer overflow: receiver too slow")
+        lines = []
+        while True:
+            nl = self.buffer.find(b"\n")
+            if nl == -1:
+                break
+            line = self.buffer[:nl]
+            del self.buffer[: nl + 1]
+            lines.append(line.decode("utf-8", errors="replace").strip())
+        return lines
+
+
+def make_blob(mb, line_bytes):
+    msg = {"type": "emstat_data", "seq": 0, "raw": ""}
+    pad = max(0, line_bytes - len("EMSTAT:" + json.dumps(msg)) - 1)
+    msg["raw"] = "P" + "a" * (pad - 1) if pad else ""
+    line = ("EMSTAT:" + json.dumps(msg) + "\n").encode()
+    n = max(1, int(mb * 1e6) // len(line))
+    return line * n, n
+
+
+def run_case(blob, make_reader, method):
+    a, b = socket.socketpair()
+    b.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    reader = make_reader(b)
+    read = getattr(reader, method)
+
+    def writer():
+        mv = memoryview(blob)
+        for off in range(0, len(blob), 1 << 16):
+            a.sendall(mv[off : off + (1 << 16)])
+        a.shutdown(socket.SHUT_WR)
+
+    th = threading.Thread(target=writer, daemon=True)
+    count = 0
+    t0 = time.perf_counter()
+    th.start()
+    while True:
+        lines = read()
+        if lines is None:
+            break
+        count += len(lines)
+    dt = time.perf_counter() - t0
+    th.join()
+    a.close()
+    b.close()
+    return count, dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=float, default=64.0)
+    ap.add_argument("--line-bytes", type=int, default=90)
+    args = ap.parse_args()
+    blob, n = make_blob(args.mb, args.line_bytes)
+    print(f"{len(blob) / 1e6:.1f} MB, {n} líneas de {len(blob) // n} B")
+    print(f"{'lector':<14}{'MB/s':>9}{'klíneas/s':>12}{'ok':>5}")
+    cases = (
+        ("previo", lambda s: LegacyReader(s), "read_lines"),
+        ("previo 64K", lambda s: LegacyReader(s, recv_size=65536), "read_lines"),
+        ("framer", LineBufferedSocketReader, "read_lines"),
+        ("framer bytes", LineBufferedSocketReader, "read_raw_lines"),
+    )
+    for name, make_reader, method in cases:
+        count, dt = run_case(blob, make_reader, method)
+        print(f"{name:<14}{len(blob) / 1e6 / dt:>9.1f}{count / dt / 1e3:>12.0f}"
+              f"{'sí' if count == n else 'NO':>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Tiempo por frame del plot en vivo de EventPlotter: draw completo por tick
+(camino "full") vs BlitRenderer (blitting + decimación min/max por columna).
+
+Misma figura que EventPlotter (600x250 px, dpi 100, layout compressed, estilo
+seaborn darkgrid) sobre el canvas Agg (sin Tk). Pre-carga una CV de N puntos
+repartida en `lines` trazas (como varios ciclos o corridas retenidas) y mide
+`ticks` frames seguidos en los que llegan `per_tick` puntos nuevos a la traza
+activa, como el loop de 80 ms. El canvas Agg no copia a pantalla: en TkAgg se suma
+la copia del bbox a la imagen Tk (la figura entera en "full", solo el eje en blit).
+
+    PYTHONPATH=. python test/bench_live_plot.py [N ...]
+"""
+import math
+import statistics
+import sys
+import time
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from Drivers.EmstatRunStore import XYLineBuffer
+from ui.BlitRenderer import BlitRenderer, decimate_minmax
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 17:20 $"
+
+DPI = 100
+LINES = 4
+TICKS = 120
+PER_TICK = 40  # ~500 pts/s a 80 ms por tick
+
+
+def cv_points(n, n_cycles, seed=1):
+    """CV sintética (E, I) de n puntos en n_cycles barridos de ida y vuelta."""
+    rnd = np.random.default_rng(seed)
+    per = n // n_cycles
+    k = np.arange(per)
+    half = per // 2
+    e = np.where(k < half, k / half, (per - k) / half) * 0.8 - 0.2
+    i = 2e-6 * np.tanh(5 * (e - 0.2))
+    out = []
+    for c in range(n_cycles):
+        out.append((e.copy(), i + 1e-7 * c + rnd.normal(0, 2e-9, per)))
+    return out
+
+
+def make_axes():
+    plt.style.use("seaborn-v0_8-darkgrid")
+    fig = Figure(figsize=(600 / DPI, 250 / DPI), dpi=DPI, layout="compressed")
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_title("CV")
+    ax.set_xlabel("E (V)")
+    ax.set_ylabel("I (A)")
+    return fig, canvas, ax
+
+
+def setup(n):
+    fig, canvas, ax = make_axes()
+    cycles = cv_points(n, LINES)
+    bufs, lines = [], []
+    for m, (e, i) in enumerate(cycles):
+        buf = XYLineBuffer(0)
+        # La última traza es la activa: arranca sin los puntos que llegarán en vivo.
+        cut = len(e) - TICKS * PER_TICK if m == LINES - 1 else len(e)
+        buf.append(e[:cut], i[:cut])
+        (line,) = ax.plot([], [], linestyle="-", linewidth=4.5, marker="+", markersize=3)
+        bufs.append(buf)
+        lines.append(line)
+    live = cycles[-1]
+    start = len(live[0]) - TICKS * PER_TICK
+    return fig, canvas, ax, bufs, lines, live, start
+
+
+def legend(ax, lines):
+    ax.legend(lines, [f"R1c{m}" for m in range(len(lines))], loc="best", fontsize="small")
+
+
+def run_full(n):
+    """Camino previo: set_data de todas, relim/autoscale, leyenda y draw por tick."""
+    fig, canvas, ax, bufs, lines, live, start = setup(n)
+    for line, buf in zip(lines, bufs):
+        line.set_data(*buf.view())
+    canvas.draw()
+    times = []
+    for t in range(TICKS):
+        lo = start + t * PER_TICK
+        bufs[-1].append(live[0][lo : lo + PER_TICK], live[1][lo : lo + PER_TICK])
+        t0 = time.perf_counter()
+        for line, buf in zip(lines, bufs):
+            line.set_data(*buf.view())
+        ax.relim()
+        ax.autoscale_view()
+        legend(ax, lines)
+        canvas.draw()
+        times.append(time.perf_counter() - t0)
+    return times, TICKS
+
+
+def run_blit(n):
+    fig, canvas, ax, bufs, lines, live, start = setup(n)
+    legend(ax, lines)
+    renderer = BlitRenderer(canvas, ax)
+    renderer.begin(lines)
+    renderer.frame({line: buf.view() for line, buf in zip(lines, bufs)})
+    renderer.full_draws = 0
+    times = []
+    for t in range(TICKS):
+        lo = start + t * PER_TICK
+        bufs[-1].append(live[0][lo : lo + PER_TICK], live[1][lo : lo + PER_TICK])
+        t0 = time.perf_counter()
+        renderer.frame({lines[-1]: bufs[-1].view()})
+        times.append(time.perf_counter() - t0)
+    return times, renderer.full_draws
+
+
+def check_decimation():
+    """El trazo decimado cubre las mismas columnas/rangos de píxel que el original."""
+    e, i = cv_points(200_000, 1)[0]
+    width = 560
+    keep = decimate_minmax(e, i, e.min(), e.max(), width)
+    cols = ((e - e.min()) * (width / (e.max() - e.min()))).astype(int)
+    ok = keep is not None and keep[0] == 0 and keep[-1] == len(e) - 1
+    for sel in (slice(None), slice(0, len(e) // 2)):
+        full = {c: (i[sel][cols[sel] == c].min(), i[sel][cols[sel] == c].max())
+                for c in np.unique(cols[sel])}
+        k = keep[(keep >= (sel.start or 0)) & (keep < (sel.stop or len(e)))]
+        dec = {c: (i[k][cols[k] == c].min(), i[k][cols[k] == c].max()) for c in np.unique(cols[k])}
+        ok &= full == dec
+    return ok, len(e), len(keep)
+
+
+def pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, math.ceil(q * len(xs)) - 1)]
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000, 200_000]
+    ok, n_in, n_out = check_decimation()
+    print("=" * 78)
+    print(f"decimación min/max: {n_in} -> {n_out} puntos, columnas idénticas: "
+          f"{'OK' if ok else 'FAIL'}")
+    print(f"{'N':>9} {'render':<7}{'med ms':>9}{'p95 ms':>9}{'fps':>8}{'draws':>8}")
+    for n in sizes:
+        for name, fn in (("full", run_full), ("blit", run_blit)):
+            times, draws = fn(n)
+            med = statistics.median(times) * 1e3
+            print(f"{n:>9} {name:<7}{med:>9.2f}{pct(times, 0.95) * 1e3:>9.2f}"
+                  f"{1e3 / med:>8.0f}{draws:>8}")
+    print("=" * 78)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Lazo PI de PCR: sleep relativo (camino previo) vs DeadlineClock + PIDController.
+
+Camino previo: cada iteración calcula el PI integrando `error * WINDOW` y luego
+duerme WINDOW; el periodo real es WINDOW + cálculo + latencia del wait, y la
+deriva se acumula. Camino nuevo: PhaseControlLoop despierta en deadlines
+monotónicos e integra el dt real. Ambos corren sobre un heater "fake" y una
+temperatura constante, sin carga y con un hilo que retiene el GIL en ráfagas.
+Se mide: iteraciones por segundo, error medio del periodo, deriva acumulada
+(tiempo real - iteraciones·WINDOW) y overruns.
+
+    PYTHONPATH=. python test/bench_pcr_control_loop.py [segundos]
+"""
+import sys
+import threading
+import time
+
+from Drivers.DriverHeater import make_heater
+from Drivers.PcrControlLoop import PhaseControlLoop
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 20:50 $"
+
+WINDOW = 0.05  # win_h_high de resources/settings.json
+PARAMS = {"KP": 0.1, "KI": 0.01, "I_MAX": 20.0, "TEMP_BAND": 0.1, "WINDOW": WINDOW}
+SETPOINT = 95.0
+TEMP = 93.0
+
+
+def control_work():
+    """Lo que cuesta leer la muestra y el scheduling difuso en Python."""
+    acc = 0.0
+    for k in range(400):
+        acc += (k % 7) * 1e-3
+    return acc
+
+
+def gil_load(stop, burst_s=0.004, pause_s=0.006):
+    while not stop.is_set():
+        end = time.perf_counter() + burst_s
+        while time.perf_counter() < end:
+            sum(range(200))
+        time.sleep(pause_s)
+
+
+def run_legacy(seconds, heater, stop):
+    """El hold_temperature previo: PI a mano y stop.wait(WINDOW) relativo."""
+    integral = 0.0
+    wakes = []
+    start = time.monotonic()
+    while time.monotonic() - start <= seconds and not stop.is_set():
+        wakes.append(time.monotonic())
+        control_work()
+        error = SETPOINT - TEMP
+        integral += error * WINDOW
+        integral = max(-PARAMS["I_MAX"], min(PARAMS["I_MAX"], integral))
+        power = PARAMS["KP"] * error + PARAMS["KI"] * integral
+        heater.set_duty(max(0.0, min(1.0, power)), period=WINDOW)
+        stop.wait(WINDOW)
+    return wakes, 0
+
+
+def run_deadline(seconds, heater, stop):
+    wakes = []
+
+    def read_sample():
+        wakes.append(time.monotonic())
+        control_work()
+        return TEMP, 0.0
+
+    loop = PhaseControlLoop(heater, PARAMS, stop, read_sample, max_age=lambda _e: 1.0)
+    stats = loop.run(SETPOINT, lambda _temp, elapsed: elapsed > seconds)
+    return wakes[:-1], stats.overruns  # la última lectura solo cierra la fase
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print("=" * 80)
+    print(f"WINDOW {WINDOW * 1e3:.0f} ms, {seconds:g} s por caso")
+    print(f"{'carga':<9}{'camino':<10}{'it/s':>8}{'dt med ms':>11}{'|err| med ms':>14}"
+          f"{'deriva ms':>11}{'overruns':>10}")
+    for load in (False, True):
+        for name, fn in (("previo", run_legacy), ("deadline", run_deadline)):
+            stop = threading.Event()
+            load_stop = threading.Event()
+            loader = None
+            if load:
+                loader = threading.Thread(target=gil_load, args=(load_stop,), daemon=True)
+                loader.start()
+            heater = make_heater(0, backend="fake", period=WINDOW)
+            wakes, overruns = fn(seconds, heater, stop)
+            heater.close()
+            load_stop.set()
+            if loader is not None:
+                loader.join()
+            dts = [b - a for a, b in zip(wakes, wakes[1:])]
+            span = wakes[-1] - wakes[0]
+            drift = span - len(dts) * WINDOW
+            err = sum(abs(d - WINDOW) for d in dts) / len(dts)
+            print(f"{'GIL' if load else 'ninguna':<9}{name:<10}{len(dts) / span:>8.2f}"
+                  f"{span / len(dts) * 1e3:>11.3f}{err * 1e3:>14.3f}"
+                  f"{drift * 1e3:>11.1f}{overruns:>10}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Fluorescencia del PCR: ventana OFF/ON/OFF (camino previo) vs lock-in.
+
+Corre en tiempo virtual contra el VirtualAds del disco virtual con una señal
+fija (0.02 V con el LED encendido) y repite la lectura N veces por escenario:
+  - white: solo ruido blanco (0.002 V por conversión a 64 SPS, crece con sqrt(sps)),
+  - drift: + paseo aleatorio de la línea base (0.002 V/√s),
+  - mains: + captación de red de 50 Hz (5 mV) con la fase de arranque al azar.
+"window" replica PcrRunner.read_fluorescence: 0.5 s OFF, 2.0 s ON, 0.5 s OFF,
+una lectura cada 0.1 s con averages=4 (4 conversiones de 1/128 s tras el comando
+I²C); delta = media(ON) − media(primer OFF). El paso de 0.1 s se pacea con
+time.sleep, que se pasa de largo SLEEP_OVERSHOOT_S en promedio: el instante de
+cada lectura corre respecto de la red y la captación no queda en fase fija (con
+un paso exacto de 0.1 s cada lectura caería en el mismo punto de los 50 Hz y la
+captación se cancelaría en ON − OFF). "lock-in" es LockInReader a 860 SPS, 5 Hz, con 0.3 ms de I²C
+por muestra; cada transacción I²C tiene además un desvío de 0.2 ms. Reporta
+duración, sesgo y desvío del delta entre repeticiones, y el tiempo de CPU de
+demodulate().
+
+    PYTHONPATH=. python test/bench_pcr_lockin.py [repeticiones]
+"""
+import math
+import random
+import sys
+import time
+
+from Drivers.DriverHeater import RecordingPin
+from Drivers.PcrLockIn import LockInReader
+from Drivers.VirtualDisc import VirtualAds
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 01:30 $"
+
+SIGNAL = 0.02  # VirtualAds con amplitude=0: ON suma 0.02 V
+I2C_S = 0.0003
+I2C_JITTER_S = 0.0002  # desvío de cada transacción (bus compartido, scheduler)
+SLEEP_OVERSHOOT_S = 0.0008  # exceso medio de time.sleep (exponencial) en la Pi
+SCENARIOS = (
+    ("white", {}),
+    ("drift", {"drift": 0.002}),
+    ("mains", {"mains": 0.005}),
+)
+
+
+class _Clock:
+    t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, s):
+        if s > 0:
+            self.t += s
+
+
+def _i2c(rnd):
+    return max(0.0, rnd.gauss(I2C_S, I2C_JITTER_S))
+
+
+class _TimedAds:
+    """VirtualAds cuyo read_stream consume una transacción I²C de tiempo virtual."""
+
+    def __init__(self, ads, clock, rnd):
+        self.ads = ads
+        self.clock = clock
+        self.rnd = rnd
+
+    def start_stream(self, p=0, n=None, sps=860):
+        self.ads.start_stream(p, n, sps)
+
+    def read_stream(self):
+        self.clock.t += _i2c(self.rnd)
+        return self.ads.read_stream()
+
+    def stop_stream(self):
+        self.ads.stop_stream()
+
+
+def read_window(ads, pin, clock, rnd, averages=4, sample_dt=0.1):
+    samples = []
+    t0 = clock()
+    for light_on, duration in ((0, 0.5), (1, 2.0), (0, 0.5)):
+        pin.write(bool(light_on))
+        t_end = clock() + duration
+        while clock() < t_end:
+            t_iter = clock()
+            clock.t += _i2c(rnd)  # comando de conversión
+            v = ads.read_voltage(0, averages=averages)
+            clock.t += averages / 128.0 + _i2c(rnd)
+            samples.append((t_iter - t0, light_on, v))
+            elapsed = clock() - t_iter
+            if elapsed < sample_dt:
+                clock.sleep(sample_dt - elapsed + rnd.expovariate(1.0 / SLEEP_OVERSHOOT_S))
+    pin.write(False)
+    base = [v for (t, on, v) in samples if on == 0 and t < 0.5]
+    light = [v for (_t, on, v) in samples if on == 1]
+    return sum(light) / len(light) - sum(base) / len(base), clock() - t0
+
+
+def _stats(vals):
+    n = len(vals)
+    mean = sum(vals) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in vals) / (n - 1))
+    return mean, std
+
+
+def run(kind, kw, reps, seed, duration=1.0):
+    rnd = random.Random(seed)
+    clock = _Clock()
+    pin = RecordingPin(clock=clock)
+    ads = VirtualAds(pin, amplitude=0.0, seed=seed, clock=clock, **kw)
+    deltas, spans, demod_s = [], [], []
+    for _ in range(reps):
+        clock.t += 5.0 + rnd.random()  # resto del ciclo: fase de red al azar
+        if kind == "window":
+            delta, span = read_window(ads, pin, clock, rnd)
+        else:
+            reader = LockInReader(
+                _TimedAds(ads, clock, rnd), pin, freq=5.0, duration=duration, sps=860,
+                clock=clock, sleep=clock.sleep,
+            )
+            t0 = clock()
+            reader.acquire()
+            span = clock() - t0
+            c0 = time.perf_counter()
+            delta, _stderr, _n = reader.demodulate()
+            demod_s.append(time.perf_counter() - c0)
+        deltas.append(delta)
+        spans.append(span)
+    mean, std = _stats(deltas)
+    demod_us = sum(demod_s) / len(demod_s) * 1e6 if demod_s else math.nan
+    return sum(spans) / len(spans), mean - SIGNAL, std, demod_us
+
+
+def main():
+    reps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("=" * 78)
+    print(f"señal {SIGNAL} V, {reps} lecturas por caso (tiempo virtual)")
+    print(f"{'escenario':<10}{'lectura':<14}{'dur. s':>8}{'sesgo mV':>10}{'desvío mV':>11}"
+          f"{'SNR':>8}{'demod µs':>10}")
+    for name, kw in SCENARIOS:
+        cases = (("window", 1.0), ("lock-in 0.5s", 0.5), ("lock-in 1s", 1.0), ("lock-in 1.5s", 1.5),
+                 ("lock-in 2s", 2.0))
+        for label, duration in cases:
+            kind = "window" if label == "window" else "lockin"
+            span, bias, std, demod_us = run(kind, kw, reps, seed=7, duration=duration)
+            print(f"{name:<10}{label:<14}{span:>8.2f}{bias * 1e3:>10.3f}{std * 1e3:>11.3f}"
+                  f"{SIGNAL / std:>8.1f}{demod_us:>10.1f}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
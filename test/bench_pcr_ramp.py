@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Rampa PCR: feed-forward + PI vs PredictiveRamp sobre la planta simulada.
+
+Corre en tiempo virtual (PcrAutoTune.simulate_phase): la planta es el FOPDT del
+disco virtual, las muestras llegan cada 80 ms con su edad real y se aplica la
+misma política de muestra vieja que la app. Para cada transición de la receta
+compara:
+  - pi:        rampa y hold con las ganancias de resources/settings.json,
+  - pi tuned:  ff_frac + PI propuestos por el auto-tuner (tune_phase),
+  - pred:      PredictiveRamp con el modelo exacto y el hold de settings.json,
+  - pred tuned: PredictiveRamp con el hold del auto-tuner,
+  - pred g±20% / L±50%: PredictiveRamp con un modelo mal identificado (hold tuned).
+Reporta el tiempo de rampa (entrada a ±0.5 °C), el asentamiento (desde el que ya
+no sale de la banda hasta el fin del hold) y el sobreimpulso.
+
+    PYTHONPATH=. python test/bench_pcr_ramp.py [hold_s]
+"""
+import sys
+
+from Drivers.PcrAutoTune import PlantModel, simulate_phase, tune_phase
+from Drivers.PcrControlLoop import load_phase_pid
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 23:10 $"
+
+PLANT = PlantModel(gain=200.0, tau=40.0, dead_time=0.9, t_amb=25.0)  # VirtualDisc
+TS = 0.1  # ts_pcr: umbral de muestra vieja del hold
+PHASES = (
+    # (rampa, hold, desde, hasta)
+    ("high", "h_high", 68.0, 94.0),
+    ("ext", "h_ext", 55.0, 68.0),
+    ("denat", "h_denat", 25.0, 94.0),
+)
+MODEL_ERRORS = (("g-20%", 0.8, 1.0), ("g+20%", 1.2, 1.0), ("L-50%", 1.0, 0.5), ("L+50%", 1.0, 1.5))
+
+
+def main():
+    hold_s = float(sys.argv[1]) if len(sys.argv) > 1 else 15.0
+    print("=" * 72)
+    print(f"planta {PLANT}, hold {hold_s:g} s")
+    print(f"{'fase':<7}{'estrategia':<13}{'rampa s':>10}{'asent. s':>10}{'sobreimp. °C':>14}")
+    for phase, hold_phase, start, sp in PHASES:
+        reach = load_phase_pid(phase, TS)
+        hold = load_phase_pid(hold_phase, TS)
+        tuned = tune_phase(
+            PLANT, start, sp, ages=(reach["MAX_AGE_MIN"], reach["MAX_AGE_MAX"]), hold_max_age=TS
+        )
+        cases = [
+            ("pi", reach, hold, None),
+            ("pi tuned", tuned["reach"], tuned["hold"], None),
+            ("pred", reach, hold, PLANT),
+            ("pred tuned", reach, tuned["hold"], PLANT),
+        ]
+        for name, g, l in MODEL_ERRORS:
+            model = PlantModel(PLANT.gain * g, PLANT.tau, PLANT.dead_time * l, PLANT.t_amb)
+            cases.append((f"pred {name}", reach, tuned["hold"], model))
+        for name, r, h, model in cases:
+            settle, over, t_ramp = simulate_phase(
+                PLANT, r, h, start, sp, hold_s, hold_max_age=TS, predictive_model=model
+            )
+            print(f"{phase:<7}{name:<13}{t_ramp:>10.2f}{settle:>10.2f}{over:>14.2f}")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""Receta PCR completa contra el disco virtual, sin UI ni hardware.
+
+Corre la secuencia de la app, Drivers/PcrRunner.py (la misma que
+PCRFrame.experiment_pcr), sobre el disco virtual: datagramas
+`UDP:t_amb:t_obj:t_tc` reales (VirtualDisc -> UdpClient), temperatura estimada
+como update_displayed_temperature (--estimator: EMA o Kalman,
+Drivers/PcrTempEstimator.py), DriverStepperSys por el pseudo-tty del disco y la
+lectura de fluorescencia sobre el fotodetector virtual. Las ganancias, la
+estrategia de rampa y los parámetros del lock-in salen de resources/settings.json
+como en la app; las opciones de la corrida se fijan por línea de comandos:
+  --fluor     "seq" (lectura tras el hold de extensión), "overlap" (en la cola
+              del hold, Drivers/PcrPipeline.py) o "gated" (overlap con el
+              calefactor apagado mientras el LED de excitación está encendido).
+  --lockin    lectura por Drivers/PcrLockIn.py; si no, la ventana OFF/ON/OFF.
+  --homing    fin de cada giro de enfriamiento: "each" (spinMotorRPM_ramped de
+              siempre) o "deferred" (paro confirmado por STAT, go_zero esperado
+              antes de la lectura).
+  --prespin   giro arrancado durante la cola del hold high (PreSpin).
+Reporta el tiempo total de la corrida y, por fase (límites de runner.phase_log):
+  - asentamiento: desde el inicio de la rampa hasta que la T real de la cámara entra a
+    ±BAND °C del setpoint y ya no sale hasta el fin del hold,
+  - sobreimpulso: máximo exceso sobre el setpoint en el sentido de la rampa,
+  - error RMS durante el hold.
+Además, por ciclo, el enfriamiento desde el fin del hold high (runner.cooling_log)
+y el fin de giro en el camino crítico: del paro pedido por stop_func al retorno
+de spinMotorRPM_ramped, más la espera de wait_homed.
+
+Los holds se escalan con --hold-scale (default 0.2) para que la corrida dure
+minutos; las rampas son las de la planta, sin escalar.
+
+    PYTHONPATH=. python test/bench_pcr_sim.py [--project Default] [--hold-scale 0.2]
+        [--cycles N] [--loss 0.0] [--jitter 0.004] [--port 5005] [--estimator ema]
+        [--fluor seq|overlap|gated] [--lockin] [--homing each|deferred] [--prespin]
+"""
+import argparse
+import math
+import threading
+import time
+
+from Drivers.ClientUDP import UdpClient
+from Drivers.DriverStepperSys import DriverStepperSys, spinMotorRPM_ramped
+from Drivers.PcrRunner import REACH_TOLERANCE, PcrRunner
+from Drivers.PcrTempEstimator import make_estimator
+from Drivers.PcrTempMonitor import TempMonitor
+from Drivers.VirtualDisc import VirtualDisc
+from templates import pcr_projects as pcrp
+from templates.utils import get_setting
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 21:40 $"
+
+BAND = REACH_TOLERANCE  # misma tolerancia que las rampas del runner
+TC_IDX = 2  # termocupla: fuente primaria por defecto
+OBJ_IDX = 1  # IR de objeto: secundario del par
+
+# Fase del runner -> (fase del reporte, clave del setpoint en la receta).
+PHASES = {
+    "Denaturation": ("denat", "denat_temp"),
+    "Denaturation Hold": ("denat", "denat_temp"),
+    "Reach High temp": ("high", "high_temp"),
+    "Hold High temp": ("high", "high_temp"),
+    "Cooling": ("low", "low_temp"),
+    "LOW temp Hold": ("low", "low_temp"),
+    "Reach ext temp": ("ext", "ext_temp"),
+    "extension temp Hold ": ("ext", "ext_temp"),
+    "Reading Fluorescence": ("ext", "ext_temp"),
+    "Extension": ("final ext", "ext_temp"),
+}
+
+
+class BenchMotor(DriverStepperSys):
+    """DriverStepperSys que suma la espera de wait_homed (go_zero diferido)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_s = 0.0
+
+    def wait_homed(self, timeout=15.0, quiet_s=1.0, stop_event=None):
+        t0 = time.time()
+        try:
+            return super().wait_homed(timeout, quiet_s, stop_event)
+        finally:
+            self.wait_s += time.time() - t0
+
+
+class SimSource:
+    """Lo que PcrRunner lee de PCRFrame: temp, temp_ts, estimador y monitor,
+    actualizados por el callback UDP como update_displayed_temperature."""
+
+    def __init__(self, disc, port, estimator="ema"):
+        self.disc = disc
+        self.temp = disc.plant.t_amb
+        self.temp_ts = 0.0
+        self.temp_estimator = make_estimator(estimator, TC_IDX, OBJ_IDX, temp=self.temp)
+        self.temp_monitor = TempMonitor()
+        self.t0 = time.time()
+        self.samples = []  # (t_rel, T real de la planta)
+        self.spin_wait_s = 0.0
+        self.client = UdpClient(port=port, on_message=self._on_message, save_data=False)
+
+    def _on_message(self, _text, _addr, temps):
+        # Como update_displayed_temperature: sin dato fresco no avanza temp_ts.
+        if not self.temp_estimator.update(temps[TC_IDX], temps[OBJ_IDX], temps[3]):
+            return
+        self.temp = self.temp_estimator.temp
+        self.temp_ts = temps[3]
+        # Métricas sobre la T real de la cámara en el datagrama (no la estimada):
+        # así se comparan estimadores con la misma vara.
+        self.samples.append((temps[3] - self.t0, self.disc.plant.temp))
+        self.temp_monitor.publish(self.temp, self.temp_ts)
+
+    def timed_spin(self, *args, stop_func, **kwargs):
+        """spinMotorRPM_ramped midiendo desde que stop_func pide el paro hasta
+        que el giro retorna (desaceleración + homing o paro confirmado)."""
+        t_stop = []
+
+        def stop():
+            hit = stop_func()
+            if hit and not t_stop:
+                t_stop.append(time.time())
+            return hit
+
+        try:
+            return spinMotorRPM_ramped(*args, stop_func=stop, **kwargs)
+        finally:
+            if t_stop:
+                self.spin_wait_s += time.time() - t_stop[0]
+
+    def tail_min(self, t_end, span=2.5):
+        # Mínima T real en los últimos span s antes de t_end (lo que dura el pre-spin).
+        t_end -= self.t0
+        tail = [v for t, v in self.samples if t_end - span <= t <= t_end]
+        return min(tail) if tail else float("nan")
+
+    def phase_metrics(self, setpoint, t_start, t_end):
+        seg = [(t, v) for t, v in self.samples if t_start <= t <= t_end]
+        if not seg:
+            return None
+        settled = t_start
+        for t, v in seg:
+            if abs(v - setpoint) > BAND:
+                settled = t
+        rising = seg[0][1] < setpoint
+        over = max((v - setpoint if rising else setpoint - v) for _t, v in seg)
+        hold = [v for t, v in seg if t >= settled]
+        rms = math.sqrt(sum((v - setpoint) ** 2 for v in hold) / len(hold)) if hold else float("nan")
+        return settled - t_start, max(0.0, over), rms, t_end - t_start
+
+
+def phase_spans(phase_log, recipe, t0):
+    """Agrupa los cambios de fase del runner en (nombre, setpoint, t_ini, t_fin)."""
+    spans = []
+    for k, (t, idx, text) in enumerate(phase_log[:-1]):
+        if text not in PHASES:
+            continue
+        group, key = PHASES[text]
+        name = group if group in ("denat", "final ext") else f"c{idx} {group}"
+        t_next = phase_log[k + 1][0] - t0
+        if spans and spans[-1][0] == name:
+            spans[-1][3] = t_next
+        else:
+            spans.append([name, recipe[key], t - t0, t_next])
+    return spans
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--project", default=pcrp.DEFAULT_PROJECT_NAME)
+    ap.add_argument("--hold-scale", type=float, default=0.2)
+    ap.add_argument("--cycles", type=int, default=None)
+    ap.add_argument("--loss", type=float, default=0.0)
+    ap.add_argument("--jitter", type=float, default=0.004)
+    ap.add_argument("--port", type=int, default=5005)
+    ap.add_argument("--estimator", choices=("ema", "kalman"), default="ema")
+    ap.add_argument("--fluor", choices=("seq", "overlap", "gated"), default="seq")
+    ap.add_argument("--lockin", action="store_true")
+    ap.add_argument("--homing", choices=("each", "deferred"), default="each")
+    ap.add_argument("--prespin", action="store_true")
+    args = ap.parse_args()
+
+    values = pcrp.get_project(args.project) or pcrp.default_project()
+    r = {k: float(v) for k, v in values.items()}
+    for k in ("time_high", "time_low", "denat_time", "ext_time", "ext_time_final"):
+        r[k] *= args.hold_scale
+    if args.cycles is not None:
+        r["cycles"] = args.cycles
+    pid = get_setting("pidControllerRPM", {})
+    ts = float(pid.get("ts_pcr", 0.02))
+    accel = float(pid.get("acceleration_spin", 200.0))
+
+    with VirtualDisc(port=args.port, jitter=args.jitter, loss=args.loss, seed=7) as disc:
+        src = SimSource(disc, args.port, args.estimator)
+        motor = BenchMotor(uart_port=disc.tty_path)
+        stop = threading.Event()
+        deltas = []
+        runner = PcrRunner(
+            src, stop, threading.Event(), on_fluorescence=lambda d, _s: deltas.append(d)
+        ).configure()
+        runner.fluor_overlap = args.fluor in ("overlap", "gated")
+        runner.fluor_gate_heater = args.fluor == "gated"
+        runner.lockin = (runner.lockin or {}) if args.lockin else None
+        runner.refresh_fluor_window()
+        runner.cool_home_deferred = args.homing == "deferred"
+        runner.cool_prespin = args.prespin
+        runner.heater = disc.heater
+        runner.led_pin = disc.fluorescence_pin
+        runner.ads = disc.ads
+        runner.motor = motor
+        runner.spin = src.timed_spin
+        try:
+            src.client.start()
+            if not src.temp_monitor.wait_for(lambda: src.samples, timeout=10.0):
+                raise SystemExit(f"No datagram from the virtual disc on UDP :{args.port}")
+            t_start = time.time()
+            runner.run(r, ts, accel)
+            total = time.time() - t_start
+        finally:
+            stop.set()
+            src.client.stop()
+            motor.stop()
+            motor.close()
+        sent, dropped = disc.sent, disc.dropped
+
+    print("=" * 78)
+    print(f"receta '{args.project}' (holds ×{args.hold_scale:g}), {int(r['cycles'])} ciclos, "
+          f"pérdida UDP {args.loss:.0%}, jitter {args.jitter * 1e3:.1f} ms, "
+          f"estimador {args.estimator}, fluorescencia {args.fluor}"
+          f"{' lock-in' if args.lockin else ''}, homing {args.homing}"
+          f"{', pre-spin' if args.prespin else ''}")
+    print(f"{'fase':<12}{'setpoint':>9}{'asent. s':>10}{'sobreimp. °C':>14}"
+          f"{'RMS hold °C':>13}{'duración s':>12}")
+    for name, sp, t0, t1 in phase_spans(runner.phase_log, r, src.t0):
+        m = src.phase_metrics(sp, t0, t1)
+        if m is None:
+            continue
+        settle, over, rms, dur = m
+        print(f"{name:<12}{sp:>9.1f}{settle:>10.2f}{over:>14.2f}{rms:>13.3f}{dur:>12.1f}")
+    print(f"tiempo total: {total:.1f} s; datagramas {sent} (perdidos {dropped}); "
+          f"overruns del lazo: {runner.control_overruns}")
+    print(f"fin de giro en el camino crítico: {src.spin_wait_s + motor.wait_s:.1f} s")
+    for idx, t_high_end, t_cooled, prespun in runner.cooling_log:
+        print(f"c{idx}: enfriamiento desde el fin del hold high {t_cooled - t_high_end:.2f} s; "
+              f"T mín. en los últimos 2.5 s del hold {src.tail_min(t_high_end):.1f} °C"
+              f"{' (pre-spin)' if prespun else ''}")
+    if args.prespin and runner.spin_model is not None:
+        print(f"lag del modelo de arranque al final: {runner.spin_model.lag_s:.2f} s")
+    print("deltas de fluorescencia: " + ", ".join(f"{d:.4f}" for d in deltas))
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Estimador de temperatura del PCR: EMA (alpha 0.3) vs Kalman, contra la verdad.
+
+Corre en tiempo virtual sobre la ThermalPlant del disco virtual un perfil tipo
+ciclo (calentar a 94 °C, hold, enfriar girando a 60 °C, hold, calentar a 72 °C,
+hold). El "firmware" manda cada 80 ms (±4 ms) la termocupla (primario: sigue a
+T con tc_tau, ruido 0.25 °C y cuantización 0.25 °C) y el IR de objeto
+(secundario: T + sesgo 1.5 °C, ruido 0.2 °C). El primario se cae al azar el 2%
+de los datagramas y en dos ventanas de 3 s (termocupla abierta).
+El lazo consulta cada 50 ms, entre datagramas: se compara lo que le llega
+(EMA: el último valor; Kalman: estimate(now)) con la T real de la cámara en ese
+instante. Reporta error medio (retraso en rampas), RMS y máximo por tramo.
+
+    PYTHONPATH=. python test/bench_pcr_temp_estimator.py [seed]
+"""
+import math
+import random
+import sys
+
+from Drivers.PcrTempEstimator import EmaEstimator, make_estimator
+from Drivers.VirtualDisc import ThermalPlant
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 23:55 $"
+
+PERIOD = 0.08
+JITTER = 0.004
+TICK = 0.05
+IR_BIAS = 1.5
+DROP_P = 0.02
+DROP_WINDOWS = ((30.0, 33.0), (52.0, 55.0))  # termocupla abierta (s)
+# (setpoint, hold_s, rpm de enfriamiento)
+PROFILE = ((94.0, 10.0, 0.0), (60.0, 8.0, 700.0), (72.0, 10.0, 0.0))
+
+
+class _Clock:
+    t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _quant(v, step=0.25):
+    return round(v / step) * step
+
+
+def run(seed):
+    rnd = random.Random(seed)
+    clock = _Clock()
+    plant = ThermalPlant(noise=0.0, clock=clock, seed=seed)
+    ema = EmaEstimator(temp=plant.t_amb)
+    kal = make_estimator("kalman", primary_idx=2, secondary_idx=1, temp=plant.t_amb)
+    rows = []  # (tramo, err_ema, err_kalman)
+    next_rx = PERIOD
+    last_ema = ema.temp
+    segment = "ramp"
+    for setpoint, hold_s, rpm in PROFILE:
+        hold_end = None
+        heating = setpoint > plant.temp
+        while hold_end is None or clock.t < hold_end:
+            clock.t = round(clock.t + TICK, 6)
+            # Datagramas recibidos desde el tick anterior.
+            while next_rx <= clock.t:
+                saved = clock.t
+                clock.t = next_rx
+                _amb, t_obj, t_tc = plant.read()
+                clock.t = saved
+                primary = _quant(t_tc + rnd.gauss(0.0, 0.25))
+                if rnd.random() < DROP_P or any(a <= next_rx < b for a, b in DROP_WINDOWS):
+                    primary = None
+                secondary = t_obj + IR_BIAS + rnd.gauss(0.0, 0.2)
+                ema.update(primary, secondary, next_rx)
+                last_ema = ema.temp
+                kal.update(primary, secondary, next_rx)
+                next_rx += PERIOD + rnd.uniform(-JITTER, JITTER)
+            plant.read()  # avanza la planta a clock.t
+            truth = plant.temp
+            dropped = any(a <= clock.t < b for a, b in DROP_WINDOWS)
+            rows.append((
+                "dropout" if dropped else segment,
+                last_ema - truth,
+                kal.estimate(clock.t)[0] - truth,
+            ))
+            # Control de referencia sobre la T real: bang-bang hasta el setpoint
+            # y luego el duty de régimen (el estimador no cierra el lazo).
+            if hold_end is None:
+                if (plant.temp >= setpoint) if heating else (plant.temp <= setpoint):
+                    hold_end = clock.t + hold_s
+                    segment = "hold"
+                    plant.set_rpm(0.0)
+                    plant.set_duty((setpoint - plant.t_amb) / plant.gain)
+                else:
+                    segment = "ramp"
+                    plant.set_duty(1.0 if heating else 0.0)
+                    plant.set_rpm(0.0 if heating else rpm)
+    return rows, kal
+
+
+def _stats(errs):
+    n = len(errs)
+    mean = sum(errs) / n
+    rms = math.sqrt(sum(e * e for e in errs) / n)
+    return mean, rms, max(abs(e) for e in errs)
+
+
+def main():
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    rows, kal = run(seed)
+    print("=" * 74)
+    print(f"perfil {PROFILE}, semilla {seed}, {len(rows)} consultas del lazo")
+    print(f"{'tramo':<9}{'estimador':<10}{'n':>6}{'media °C':>11}{'RMS °C':>10}{'máx °C':>10}")
+    for seg in ("ramp", "hold", "dropout"):
+        for name, col in (("ema", 1), ("kalman", 2)):
+            errs = [r[col] for r in rows if r[0] == seg]
+            if not errs:
+                continue
+            mean, rms, mx = _stats(errs)
+            print(f"{seg:<9}{name:<10}{len(errs):>6}{mean:>11.3f}{rms:>10.3f}{mx:>10.3f}")
+    print(f"kalman: sesgo IR estimado {kal.bias:.2f} °C (real {IR_BIAS}), "
+          f"medidas descartadas por gate {kal.rejected}")
+    print("=" * 74)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Curva de temperatura PCR: tres listas de Python (camino previo) vs PcrTraceStore.
+
+Simula una corrida de H horas a la cadencia del disco (80 ms, con jitter y algún
+stall del broadcast) y mide, para cada camino:
+  - append: lo que hace update_displayed_temperature por muestra (hilo UDP),
+  - ventana: el tick del plot (cada ~2.5 s) armando la ventana de windows_pcr
+    muestras que recibe set_xdata/set_ydata, mediana y peor tick,
+  - resumen: _cadence_summary al guardar (el previo ordena todos los deltas),
+  - csv: las filas del archivo de temperatura,
+  - MB ret.: memoria retenida al final (tracemalloc, en una segunda pasada).
+Exige el mismo CSV (filas) y el mismo resumen salvo dt_p95, que en el store sale
+de un histograma: se verifica que su error relativo sea < 1.2% (un bin).
+
+    PYTHONPATH=. python test/bench_pcr_trace.py [horas ...]
+"""
+import csv
+import io
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from Drivers.PcrTraceStore import PcrTraceStore
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 18:40 $"
+
+DT = 0.08
+WINDOW = 1500  # windows_pcr de resources/settings.json
+TICK = 31  # muestras entre ticks del plot (2.5 s / 80 ms)
+
+
+def samples(hours, seed=3):
+    """(primario, secundario, t_s) sintéticos: rampas de ciclo PCR + ruido."""
+    rnd = np.random.default_rng(seed)
+    n = int(hours * 3600 / DT)
+    dt = DT + rnd.normal(0, 0.004, n)
+    dt[rnd.random(n) < 0.002] += 0.5  # datagramas perdidos / stalls cortos
+    t = np.cumsum(np.clip(dt, 0.0, None))
+    temp = 75 + 20 * np.sin(t / 30.0) + rnd.normal(0, 0.1, n)
+    return temp.tolist(), (temp - 3).tolist(), t.tolist()
+
+
+class ListTrace:
+    """Camino previo: tres listas, slice por tick y sort de deltas al guardar."""
+
+    def __init__(self):
+        self.p, self.s, self.t = [], [], []
+
+    def append(self, p, s, t):
+        self.p.append(p)
+        self.s.append(s)
+        self.t.append(t)
+
+    def window(self, w):
+        n = len(self.p)
+        start = max(0, n - w)
+        y, x = self.p[start:n], self.t[start:n]
+        return y, self.s[start:n], x
+
+    def summary(self):
+        t = self.t
+        if len(t) < 2:
+            return f"-n: {len(t)}"
+        deltas = sorted(t[i + 1] - t[i] for i in range(len(t) - 1))
+        dt_mean = (t[-1] - t[0]) / (len(t) - 1)
+        p95 = deltas[min(len(deltas) - 1, int(0.95 * len(deltas)))]
+        return (
+            f"-dt_mean: {dt_mean:.4f}-dt_p95: {p95:.4f}-dt_max: {deltas[-1]:.4f}"
+            f"-n: {len(t)}-span: {t[-1] - t[0]:.1f}"
+        )
+
+    def csv(self, w):
+        for p, s, t in zip(self.p, self.s, self.t):
+            w.writerow([p, s, f"{t:.4f}"])
+
+
+def store_summary(store):
+    return store.stats.summary()
+
+
+def store_csv(store, w):
+    for block in store.iter_chunks():
+        p_col, s_col, t_col = block[:3].tolist()
+        w.writerows([p, s, f"{t:.4f}"] for p, s, t in zip(p_col, s_col, t_col))
+
+
+def ingest(trace, data):
+    """Anexa la corrida; cada TICK muestras arma la ventana (como el poll de Tk)."""
+    ps, ss, ts = data
+    append, window = trace.append, trace.window
+    ticks = []
+    t0 = time.perf_counter()
+    for i in range(len(ps)):
+        append(ps[i], ss[i], ts[i])
+        if i % TICK == 0:
+            k0 = time.perf_counter()
+            y, _, x = window(WINDOW)
+            np.asarray(x, dtype=float)  # lo que hace set_xdata con la ventana
+            np.asarray(y, dtype=float)
+            ticks.append(time.perf_counter() - k0)
+    total = time.perf_counter() - t0
+    return total - sum(ticks), ticks
+
+
+def run(name, data):
+    trace = ListTrace() if name == "listas" else PcrTraceStore(WINDOW)
+    append_s, ticks = ingest(trace, data)
+    t0 = time.perf_counter()
+    summary = trace.summary() if name == "listas" else store_summary(trace)
+    summary_s = time.perf_counter() - t0
+    buf = io.StringIO()
+    t0 = time.perf_counter()
+    w = csv.writer(buf)
+    trace.csv(w) if name == "listas" else store_csv(trace, w)
+    csv_s = time.perf_counter() - t0
+    # Memoria retenida: segunda pasada solo con el ingest. `+ 0.0` crea un float
+    # nuevo por muestra, como el EMA y la resta del origen en el camino real.
+    tracemalloc.start()
+    kept = ListTrace() if name == "listas" else PcrTraceStore(WINDOW)
+    ps, ss, ts = data
+    for i in range(len(ps)):
+        kept.append(ps[i] + 0.0, ss[i] + 0.0, ts[i] + 0.0)
+    mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    return {
+        "append_us": append_s / len(ps) * 1e6,
+        "tick_med_ms": statistics.median(ticks) * 1e3,
+        "tick_max_ms": max(ticks) * 1e3,
+        "summary_s": summary_s,
+        "csv_s": csv_s,
+        "mb": mb,
+        "summary": summary,
+        "csv": buf.getvalue(),
+    }
+
+
+def p95_of(summary):
+    return float(re.search(r"dt_p95: ([0-9.]+)", summary).group(1))
+
+
+def main():
+    hours = [float(a) for a in sys.argv[1:]] or [0.5, 4.0]
+    ok = True
+    print("=" * 96)
+    print(f"{'horas':>6} {'N':>8} {'camino':<8}{'append µs':>10}{'tick med ms':>12}"
+          f"{'tick max ms':>12}{'resumen s':>11}{'csv s':>8}{'MB ret.':>9}")
+    for h in hours:
+        data = samples(h)
+        res = {}
+        for name in ("listas", "store"):
+            r = res[name] = run(name, data)
+            print(f"{h:>6g} {len(data[0]):>8} {name:<8}{r['append_us']:>10.2f}"
+                  f"{r['tick_med_ms']:>12.3f}{r['tick_max_ms']:>12.3f}"
+                  f"{r['summary_s']:>11.4f}{r['csv_s']:>8.2f}{r['mb']:>9.1f}")
+        a, b = res["listas"], res["store"]
+        same_csv = a["csv"] == b["csv"]
+        strip = lambda s: re.sub(r"-dt_p95: [0-9.]+", "", s)  # noqa: E731
+        same_summary = strip(a["summary"]) == strip(b["summary"])
+        err = abs(p95_of(b["summary"]) - p95_of(a["summary"])) / p95_of(a["summary"])
+        ok &= same_csv and same_summary and err < 0.012
+        print(f"       csv idéntico: {'OK' if same_csv else 'FAIL'}; resumen "
+              f"{'OK' if same_summary else 'FAIL'}; p95 {p95_of(a['summary']):.4f} vs "
+              f"{p95_of(b['summary']):.4f} (err {err:.2%})")
+    print("=" * 96)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
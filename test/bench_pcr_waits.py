@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Esperas del PCR: sondeo (camino previo) vs TempMonitor (Condition).
+
+Un hilo "UDP" publica una temperatura que baja 0.4 °C por datagrama cada 80 ms
+(un enfriamiento a ~5 °C/s) y un hilo "Tk" hace un tick cada 20 ms con un poco de
+trabajo. El hilo del experimento espera a que la temperatura cruce el objetivo:
+  - sleep 1 ms: el while de enfriamiento de _run_cycle,
+  - sleep 50 ms: el start-gate,
+  - monitor: TempMonitor.wait_for, despertado por cada publish.
+Se mide la CPU del hilo que espera (time.thread_time), sus despertares por
+segundo, el retraso entre el datagrama que cumple la condición y el despertar, y
+el atraso p99 de los ticks de los otros dos hilos (lo que el sondeo les roba).
+
+    PYTHONPATH=. python test/bench_pcr_waits.py [segundos]
+"""
+import sys
+import threading
+import time
+
+from Drivers.PcrTempMonitor import TempMonitor
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 00:45 $"
+
+PERIOD = 0.08
+TK_PERIOD = 0.02
+STEP = 0.4
+
+
+def _busy(us):
+    end = time.perf_counter() + us * 1e-6
+    while time.perf_counter() < end:
+        pass
+
+
+def _ticker(period, work_us, stop, late, on_tick=None):
+    nxt = time.perf_counter()
+    while not stop.is_set():
+        nxt += period
+        remaining = nxt - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+        late.append(time.perf_counter() - nxt)
+        _busy(work_us)
+        if on_tick is not None:
+            on_tick()
+
+
+def run(mode, seconds):
+    state = {"temp": 95.0, "t_cross": None}
+    monitor = TempMonitor()
+    stop = threading.Event()
+    target = 95.0 - STEP * (seconds / PERIOD)
+
+    def publish():
+        state["temp"] -= STEP
+        if state["temp"] <= target and state["t_cross"] is None:
+            state["t_cross"] = time.perf_counter()
+        monitor.publish(state["temp"], time.time())
+
+    udp_late, tk_late = [], []
+    threads = [
+        threading.Thread(target=_ticker, args=(PERIOD, 150, stop, udp_late, publish)),
+        threading.Thread(target=_ticker, args=(TK_PERIOD, 2000, stop, tk_late)),
+    ]
+    for th in threads:
+        th.start()
+    wakes = 0
+    cpu0 = time.thread_time()
+    t0 = time.perf_counter()
+    if mode == "monitor":
+        count = {"n": 0}
+
+        def pred():
+            count["n"] += 1
+            return state["temp"] <= target
+
+        monitor.wait_for(pred, stop_event=stop)
+        wakes = count["n"]
+    else:
+        nap = 0.001 if mode == "sleep 1 ms" else 0.05
+        while state["temp"] > target:
+            time.sleep(nap)
+            wakes += 1
+    t_wake = time.perf_counter()
+    cpu = time.thread_time() - cpu0
+    stop.set()
+    for th in threads:
+        th.join()
+    span = t_wake - t0
+
+    def p99(v):
+        v = sorted(v)
+        return v[int(0.99 * (len(v) - 1))] * 1e3
+
+    return {
+        "cpu_ms_s": cpu / span * 1e3,
+        "wakes_s": wakes / span,
+        "lat_ms": (t_wake - state["t_cross"]) * 1e3,
+        "udp_p99": p99(udp_late),
+        "tk_p99": p99(tk_late),
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print("=" * 80)
+    print(f"enfriamiento simulado de {seconds:g} s, datagrama cada {PERIOD * 1e3:.0f} ms")
+    print(f"{'espera':<13}{'CPU ms/s':>10}{'desp./s':>10}{'retraso ms':>12}"
+          f"{'UDP p99 ms':>12}{'Tk p99 ms':>11}")
+    for mode in ("sleep 1 ms", "sleep 50 ms", "monitor"):
+        r = run(mode, seconds)
+        print(f"{mode:<13}{r['cpu_ms_s']:>10.2f}{r['wakes_s']:>10.1f}{r['lat_ms']:>12.2f}"
+              f"{r['udp_p99']:>12.3f}{r['tk_p99']:>11.3f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
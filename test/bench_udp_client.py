@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Benchmark de CPU del UdpClient: loop "poll" (legado) vs "select".
+
+Un proceso aparte emite ``UDP:t_amb:t_obj:t_tc`` cada 80 ms (cadencia del disco) a
+127.0.0.1; el proceso principal solo escucha, así que su process_time es el costo
+del receptor. Correr desde la raíz del repo:
+
+    PYTHONPATH=. python test/bench_udp_client.py [segundos]
+"""
+import multiprocessing
+import socket
+import sys
+import time
+
+from Drivers.ClientUDP import UdpClient
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 10:12 $"
+
+BENCH_PORT = 15005  # no choca con el 5005 real
+PERIOD_S = 0.080
+
+
+def _sender(stop_evt, port, period):
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    n = 0
+    next_t = time.monotonic()
+    while not stop_evt.is_set():
+        t = 25.0 + (n % 100) * 0.1
+        s.sendto(f"UDP:{t - 2:.2f}:{t - 1:.2f}:{t:.2f}".encode(), ("127.0.0.1", port))
+        n += 1
+        next_t += period
+        time.sleep(max(0.0, next_t - time.monotonic()))
+    s.close()
+
+
+def run_case(wait_mode, recv_timeout_sec, duration):
+    received = [0]
+
+    def on_msg(_text, _addr, _temps):
+        received[0] += 1
+
+    client = UdpClient(
+        port=BENCH_PORT,
+        recv_timeout_sec=recv_timeout_sec,
+        on_message=on_msg,
+        save_data=False,
+        wait_mode=wait_mode,
+    )
+    client.start()
+    time.sleep(0.3)  # deja estabilizar el hilo
+    received[0] = 0
+    cpu0, wall0 = time.process_time(), time.monotonic()
+    time.sleep(duration)
+    cpu, wall = time.process_time() - cpu0, time.monotonic() - wall0
+    n = received[0]
+    client.stop()
+    return cpu, wall, n
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    stop_evt = multiprocessing.Event()
+    proc = multiprocessing.Process(
+        target=_sender, args=(stop_evt, BENCH_PORT, PERIOD_S), daemon=True
+    )
+    proc.start()
+    rows = []
+    try:
+        for mode in ("poll", "select"):
+            for tmo in (None, 0.1):
+                cpu, wall, n = run_case(mode, tmo, duration)
+                rows.append((mode, tmo, cpu, wall, n))
+    finally:
+        stop_evt.set()
+        proc.join(timeout=2.0)
+
+    expected = duration / PERIOD_S
+    print("=" * 64)
+    print(f"UdpClient CPU — broadcast sintético cada {PERIOD_S * 1000:.0f} ms, {duration:.0f} s")
+    print(f"{'mode':<8}{'timeout':>9}{'CPU s':>9}{'CPU %':>8}{'msgs':>7}{'esperados':>11}")
+    for mode, tmo, cpu, wall, n in rows:
+        print(
+            f"{mode:<8}{str(tmo):>9}{cpu:>9.3f}{100 * cpu / wall:>7.1f}%"
+            f"{n:>7}{expected:>11.0f}"
+        )
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Streams sintéticos del EmStat (líneas crudas, como las reenvía el Pico en "raw").
+
+Formato de cada sub-paquete: <var 2 chars><7 hex con offset 0x8000000><unidad>
+[,<meta>...] (ver EmstatStreamParser._parse_packet). Los usan los scripts de
+conformidad y benchmarks de test/; no requieren hardware.
+"""
+import math
+import random
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 11:05 $"
+
+_UNITS = ((1e-18, "a"), (1e-15, "f"), (1e-12, "p"), (1e-9, "n"), (1e-6, "u"),
+          (1e-3, "m"), (1.0, " "), (1e3, "k"), (1e6, "M"), (1e9, "G"), (1e12, "T"))
+
+
+def encode_value(value: float) -> tuple[str, str]:
+    """Valor SI -> (7 hex con offset, unidad) eligiendo el prefijo que lo deja en
+    el rango de 27 bits con la mayor resolución, como hace el EmStat."""
+    unit_val, unit = _UNITS[0]
+    for scale, u in _UNITS:
+        if abs(value) / scale < 0x7FFFFFF:
+            unit_val, unit = scale, u
+            break
+    raw = int(round(value / unit_val)) + 0x8000000
+    return f"{raw:07X}", unit
+
+
+def field(var: str, value: float, status: int | None = None, rng: int | None = None,
+          unit: str | None = None) -> str:
+    hx, u = encode_value(value)
+    if unit is not None:
+        u = unit
+    meta = ""
+    if status is not None:
+        meta += f",1{status:X}"
+    if rng is not None:
+        meta += f",2{rng:X}"
+    return f"{var}{hx}{u}{meta}"
+
+
+def cv_stream(n_points=400, n_cycles=2, seed=1):
+    rnd = random.Random(seed)
+    lines = ["e", "M0002"]
+    half = n_points // 2
+    for c in range(n_cycles):
+        lines.append(f"C{c:04X}")
+        for i in range(n_points):
+            k = i if i < half else n_points - i
+            e = -0.2 + 0.8 * k / half
+            cur = 2e-6 * math.tanh(5 * (e - 0.2)) + rnd.gauss(0, 2e-9)
+            lines.append("P" + ";".join([
+                field("da", e),
+                field("ba", cur, status=rnd.choice((0, 0, 0, 4)), rng=0x20B),
+            ]))
+            if i == half:
+                lines.append("-")
+    lines += ["*", ""]
+    return lines
+
+
+def swv_stream(n_points=600, seed=2):
+    rnd = random.Random(seed)
+    lines = ["e", "M0007"]
+    for i in range(n_points):
+        e = -0.5 + i * 0.002
+        i_f = 3e-7 * math.exp(-((e - 0.1) / 0.05) ** 2) + rnd.gauss(0, 1e-10)
+        i_r = -2e-7 * math.exp(-((e - 0.1) / 0.05) ** 2) + rnd.gauss(0, 1e-10)
+        lines.append("P" + ";".join([
+            field("da", e),
+            field("ba", i_f - i_r, status=0, rng=0x14),
+            field("ba", i_f, status=0, rng=0x14),
+            field("ba", i_r, status=0, rng=0x14),
+        ]))
+    lines += ["*", ""]
+    return lines
+
+
+def eis_stream(n_points=60, seed=3):
+    rnd = random.Random(seed)
+    lines = ["e", "M000D", "Pda8000000 ;ba8000010p,10,20B"]  # acondicionamiento
+    for i in range(n_points):
+        f = 1e5 * 10 ** (-i * 5 / n_points)
+        w = 2 * math.pi * f
+        zr = 100 + 1000 / (1 + (w * 1e-3) ** 2)
+        zi = -1000 * w * 1e-3 / (1 + (w * 1e-3) ** 2)
+        lines.append("P" + ";".join([
+            field("dc", f),
+            field("cc", zr + rnd.gauss(0, 0.1)),
+            field("cd", zi + rnd.gauss(0, 0.1), status=0),
+        ]))
+    lines += ["*", ""]
+    return lines
+
+
+def eis_edc_stream(n_potentials=5, n_freq=20, seed=5):
+    """EIS E_dc Scan + freq Scan: cada paquete trae el potencial DC (da) -> el host
+    agrupa espectros por cambio de potencial (eis_group_by_potential)."""
+    rnd = random.Random(seed)
+    lines = ["e", "M000D"]
+    for p in range(n_potentials):
+        e = -0.2 + 0.1 * p
+        for i in range(n_freq):
+            f = 1e4 * 10 ** (-i * 3 / n_freq)
+            lines.append("P" + ";".join([
+                field("da", e),
+                field("dc", f),
+                field("cc", 200 + rnd.gauss(0, 1)),
+                field("cd", -50 + rnd.gauss(0, 1), status=0),
+            ]))
+        lines.append("+")
+    lines += ["*", ""]
+    return lines
+
+
+def ca_stream(n_equil=10, n_points=500, seed=4):
+    rnd = random.Random(seed)
+    lines = ["e", "M0000"]
+    for _ in range(n_equil):
+        lines.append("P" + ";".join([field("da", 0.3), field("ba", 1e-9, status=0, rng=0x20B)]))
+    lines.append("*")
+    for i in range(n_points):
+        cur = 5e-6 / math.sqrt(1 + i) + rnd.gauss(0, 1e-9)
+        lines.append("P" + ";".join([field("da", 0.3), field("ba", cur, status=0, rng=0x20B)]))
+    lines += ["*", ""]
+    return lines
+
+
+def edge_lines():
+    """Casos límite del framing: unidad ' ' perdida por el strip(), metadata repetida
+    o vacía, unidad fuera de tabla, hex inválido y marcadores de texto."""
+    return [
+        "Pda8000000",                     # unidad ' ' implícita (cierra la línea)
+        "Peb80003E8 ;da8000000",         # dos campos sin unidad explícita al final
+        "Pda7FCF2C0m;ba7F77482p,14,20B",
+        "Pda7FCF2C0m;ba7F77482p,,14",    # metadata vacía
+        "Pda7FCF2C0m;ba7F77482p,14,15",  # status repetido -> JSON
+        "Pda7FCF2C0m;ba7F77482p,2FFFF",  # range 0xFFFF (reservado) -> JSON
+        "Pda7FCF2C0x",                    # unidad fuera de tabla -> JSON
+        "PdaZZZZZZZm",                    # hex inválido: el parser lo descarta
+        "Pda8000000 ;da8000010m",        # var repetida -> da_1
+        "Pba7FCF2C0m;da7F77482p,14,20B",  # misma longitud/separadores, otras vars
+        "Pda7FCF2C0m;ba7F77482p,3A,20B",  # id de metadata desconocido (se ignora)
+        "-", "C0001", "M000D", "*", "+",
+        "e!4001: unknown command",
+    ]
+
+
+STREAMS = {
+    "cv": cv_stream,
+    "sqwv": swv_stream,
+    "eis": eis_stream,
+    "ca": ca_stream,
+}
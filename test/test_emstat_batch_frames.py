@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""Conformidad y costo de las tramas coalescidas (emstat_batch / b1 concatenadas).
+
+Por cada stream sintético (CV/SWV/EIS/CA + casos límite) arma lo que emitiría el
+Pico con una línea por paquete (JSON y b1) y con tramas de hasta N paquetes
+(pico_wire copia las reglas de _batch_add/_flush_batch del firmware, sin el
+deadline). Lo pasa por el camino del host (split 'EMSTAT:' -> json.loads |
+decode_binary_frames -> unpack_emstat_batch) y exige, seq por seq, los mismos
+eventos del parser que el JSON de una línea por paquete. Reporta líneas (= writes
+del UART_LINK = datagramas UDP), bytes, y el costo en CPython de armar la trama
+(proxy del Pico) y de decodificar + parsear con feed_many (host). Correr desde la
+raíz del repo:
+
+    PYTHONPATH=. python test/test_emstat_batch_frames.py [--batch 8]
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import groupby
+
+from Drivers.EmstatUtils import (
+    EmstatStreamParser,
+    decode_binary_frames,
+    encode_binary_batch,
+    encode_binary_frame,
+    unpack_emstat_batch,
+)
+from emstat_streams import STREAMS, edge_lines
+
+__author__ = "Edisson Naula"
+__date__ = "$ 18/10/2026 at 04:10 $"
+
+HDR = "EMSTAT:"
+BATCH_MAX_CHARS = 1200  # igual que el firmware
+
+
+def _single(seq, raw, fmt):
+    if fmt == "b1":
+        frame = encode_binary_frame(seq, raw)
+        if frame is not None:
+            return HDR + frame
+    return HDR + json.dumps({"type": "emstat_data", "raw": raw.strip(), "seq": seq})
+
+
+def pico_wire(lines, fmt, batch):
+    """Líneas EMSTAT que emitiría el Pico para lines (seq desde 1)."""
+    out = []
+    pend = []  # (seq, raw)
+    chars = 0
+
+    def flush():
+        nonlocal pend
+        if not pend:
+            return
+        if fmt == "b1":
+            out.append(HDR + encode_binary_batch(pend[0][0], [r for _, r in pend]))
+        else:
+            raws = [r.strip() for _, r in pend]
+            out.append(HDR + json.dumps({"type": "emstat_batch", "seq": pend[0][0], "raw": raws}))
+        pend = []
+
+    for i, raw in enumerate(lines):
+        seq = i + 1
+        if batch <= 1:
+            out.append(_single(seq, raw, fmt))
+            continue
+        if fmt == "b1":
+            frame = encode_binary_frame(seq, raw)
+            if frame is None:  # no encaja: lo pendiente sale y este va solo en JSON
+                flush()
+                out.append(_single(seq, raw, "json"))
+                continue
+            size = len(frame) - 1
+        else:
+            size = len(raw.strip()) + 4
+        if pend and chars + size > BATCH_MAX_CHARS:
+            flush()
+        if not pend:
+            chars = 0
+        pend.append((seq, raw))
+        chars += size
+        if len(pend) >= batch:
+            flush()
+    flush()
+    return out
+
+
+def host_msgs(wire):
+    """Camino del host (EventPlotter._emstat_msgs + _handle_emstat_lines) sin la
+    UI: lista de (seq, raw | None, pkt | None) en orden del stream."""
+    out = []
+    for line in wire:
+        for seg in line.split(HDR):
+            seg = seg.strip()
+            if not seg:
+                continue
+            if seg.startswith("#"):
+                frames = decode_binary_frames(seg)
+                assert frames is not None, f"trama corrupta: {seg[:60]}"
+                out.extend((m["seq"], m.get("raw"), m.get("pkt")) for m in frames)
+                continue
+            msg = json.loads(seg)
+            if msg.get("type") == "emstat_batch":
+                raws, seqs = unpack_emstat_batch(msg)
+                out.extend((s, r, None) for s, r in zip(seqs, raws))
+            else:
+                out.append((msg["seq"], msg.get("raw", ""), None))
+    return out
+
+
+def parser_events(experiment, msgs):
+    parser = EmstatStreamParser(experiment, ca_t_interval=0.1, ca_has_equil=True)
+    return [
+        (seq, parser.feed_parsed(pkt) if pkt is not None else parser.feed_raw(raw))
+        for seq, raw, pkt in msgs
+    ]
+
+
+def host_cost(experiment, wire):
+    """Lo que paga el procesador: decodificar y parsear los raw consecutivos con
+    feed_many (un lote por drenado) y los pkt con feed_parsed."""
+    parser = EmstatStreamParser(experiment, ca_t_interval=0.1, ca_has_equil=True)
+    t0 = time.perf_counter()
+    msgs = host_msgs(wire)
+    for has_pkt, grp in groupby(msgs, key=lambda m: m[2] is not None):
+        grp = list(grp)
+        if has_pkt:
+            for _, _, pkt in grp:
+                parser.feed_parsed(pkt)
+        else:
+            parser.feed_many([r for _, r, _ in grp], [s for s, _, _ in grp])
+    return time.perf_counter() - t0
+
+
+def check(name, experiment, lines, batch):
+    ref = parser_events(experiment, host_msgs(pico_wire(lines, "json", 1)))
+    ok = True
+    rows = []
+    for fmt in ("json", "b1"):
+        for n in (1, batch):
+            t0 = time.perf_counter()
+            wire = pico_wire(lines, fmt, n)
+            t_pico = time.perf_counter() - t0
+            events = parser_events(experiment, host_msgs(wire))
+            same = events == ref
+            ok &= same
+            t_host = host_cost(experiment, wire)
+            rows.append((f"{fmt} x{n}", len(wire), sum(len(w) + 1 for w in wire),
+                         t_pico, t_host, same))
+    base_bytes = rows[0][2]
+    for mode, nlines, nbytes, t_pico, t_host, same in rows:
+        # b1 coalescido: el modelo codifica cada trama dos veces (tamaño + batch).
+        pico = "—" if mode.startswith("b1") and not mode.endswith("x1") else f"{1e6 * t_pico / len(lines):.2f}"
+        print(
+            f"{name:<9}{mode:<9}{nlines:>7}{nbytes:>9}{nbytes / len(lines):>8.1f}"
+            f"{100 * (1 - nbytes / base_bytes):>7.1f}%"
+            f"{pico:>9}{1e6 * t_host / len(lines):>9.2f}"
+            f"  {'OK' if same else 'FAIL'}"
+        )
+    return ok
+
+
+def check_corrupt():
+    """Una trama b1 coalescida truncada o alterada se descarta entera."""
+    seg = encode_binary_batch(5, ["Pda7FCF2C0m;ba7F77482p,14,20B", "*", "Pda7FCF2C0m"])
+    msgs = decode_binary_frames(seg)
+    good = msgs is not None and [m["seq"] for m in msgs] == [5, 6, 7]
+    bad = [seg[:-4], seg[:20], seg + "AAAA"]
+    return good and all(decode_binary_frames(b) is None for b in bad)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=8)
+    args = ap.parse_args()
+    print("=" * 80)
+    print(f"{'stream':<9}{'modo':<9}{'líneas':>7}{'bytes':>9}{'B/pkt':>8}{'ahorro':>8}"
+          f"{'us Pico':>9}{'us host':>9}")
+    ok = True
+    for exp, gen in STREAMS.items():
+        ok &= check(exp, exp, gen(), args.batch)
+    for exp in ("cv", "eis"):
+        ok &= check(f"edge-{exp}", exp, edge_lines(), args.batch)
+    corrupt_ok = check_corrupt()
+    print(f"tramas coalescidas corruptas rechazadas: {'OK' if corrupt_ok else 'FAIL'}")
+    print("(us = por paquete, CPython; 'us Pico' solo es un proxy del costo en el Pico)")
+    print("=" * 80)
+    sys.exit(0 if ok and corrupt_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Conformidad de la trama binaria "b1" contra el camino JSON legado.
+
+Por cada stream sintético (CV/SWV/EIS/CA + casos límite) arma los mensajes EMSTAT
+que emitiría el Pico en ambos formatos, los pasa por el mismo camino del host
+(split 'EMSTAT:' -> json.loads | decode_binary_frame -> feed_raw | feed_parsed) con
+un parser nuevo por formato, y exige eventos idénticos. Reporta bytes por el
+UART_LINK y tiempo de decodificación. Correr desde la raíz del repo:
+
+    PYTHONPATH=. python test/test_emstat_binary_frames.py
+"""
+import json
+import sys
+import time
+
+from Drivers.EmstatUtils import (
+    EmstatStreamParser,
+    decode_binary_frame,
+    encode_binary_frame,
+)
+from emstat_streams import STREAMS, edge_lines
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 11:20 $"
+
+HDR = "EMSTAT:"
+
+
+def wire_json(lines):
+    return [HDR + json.dumps({"type": "emstat_data", "raw": ln.strip(), "seq": i + 1})
+            for i, ln in enumerate(lines)]
+
+
+def wire_b1(lines):
+    out = []
+    for i, ln in enumerate(lines):
+        frame = encode_binary_frame(i + 1, ln)
+        if frame is None:  # fallback del Pico
+            frame = json.dumps({"type": "emstat_data", "raw": ln.strip(), "seq": i + 1})
+        out.append(HDR + frame)
+    return out
+
+
+def decode_wire(wire):
+    """Camino del host (EventPlotter._emstat_msgs) sin la UI."""
+    msgs = []
+    for line in wire:
+        for seg in line.split(HDR):
+            seg = seg.strip()
+            if not seg:
+                continue
+            msg = decode_binary_frame(seg) if seg.startswith("#") else json.loads(seg)
+            assert msg is not None, f"trama corrupta: {seg[:60]}"
+            msgs.append(msg)
+    return msgs
+
+
+def run_parser(experiment, msgs):
+    parser = EmstatStreamParser(experiment, ca_t_interval=0.1, ca_has_equil=True)
+    events = []
+    for msg in msgs:
+        pkt = msg.get("pkt")
+        ev = parser.feed_parsed(pkt) if pkt is not None else parser.feed_raw(msg.get("raw", ""))
+        events.append((msg["seq"], ev))
+    return events
+
+
+def check(name, experiment, lines):
+    w_json, w_b1 = wire_json(lines), wire_b1(lines)
+    # Tiempo = decodificar el transporte + parsear (lo que paga el hilo procesador).
+    t0 = time.perf_counter()
+    ev_json = run_parser(experiment, decode_wire(w_json))
+    t1 = time.perf_counter()
+    ev_b1 = run_parser(experiment, decode_wire(w_b1))
+    t2 = time.perf_counter()
+    mismatches = [(a, b) for a, b in zip(ev_json, ev_b1) if a != b]
+    fallback = sum(1 for ln in w_b1 if not ln.startswith(HDR + "#"))
+    bytes_json = sum(len(ln) + 1 for ln in w_json)
+    bytes_b1 = sum(len(ln) + 1 for ln in w_b1)
+    ok = not mismatches and len(ev_json) == len(ev_b1)
+    print(
+        f"{name:<6}{len(lines):>6}{fallback:>9}{bytes_json:>10}{bytes_b1:>10}"
+        f"{100 * (1 - bytes_b1 / bytes_json):>7.1f}%"
+        f"{1e6 * (t1 - t0) / len(lines):>9.2f}{1e6 * (t2 - t1) / len(lines):>9.2f}"
+        f"  {'OK' if ok else 'FAIL'}"
+    )
+    for a, b in mismatches[:5]:
+        print(f"    json={a}\n    b1  ={b}")
+    return ok
+
+
+def check_corrupt():
+    """Tramas truncadas/alteradas -> None (el host las descarta y el UDP rellena)."""
+    frame = encode_binary_frame(7, "Pda7FCF2C0m;ba7F77482p,14,20B")
+    bad = [frame[:-4], frame[:10], "#", "#@@@@", frame + "AAAA"]
+    return all(decode_binary_frame(b) is None for b in bad)
+
+
+def main():
+    print("=" * 78)
+    print(f"{'stream':<6}{'lines':>6}{'fallback':>9}{'B json':>10}{'B b1':>10}"
+          f"{'ahorro':>8}{'us/ln j':>9}{'us/ln b':>9}")
+    ok = True
+    for exp, gen in STREAMS.items():
+        ok &= check(exp, exp, gen())
+    for exp in ("cv", "eis"):
+        ok &= check(f"edge-{exp}", exp, edge_lines())
+    corrupt_ok = check_corrupt()
+    print(f"tramas corruptas rechazadas: {'OK' if corrupt_ok else 'FAIL'}")
+    print("=" * 78)
+    sys.exit(0 if ok and corrupt_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Render en vivo con blitting + decimación min/max por columna de píxel.
+
+El loop de EventPlotter (cada ~80 ms) hacía set_data de todas las trazas completas,
+relim/autoscale y un draw completo de la figura (ejes, ticks, grilla, leyenda) en
+cada tick. Aquí solo se redibujan los artistas de datos sobre un fondo cacheado:
+  - decimate_minmax reduce cada traza a lo que cabe en el ancho en píxeles del eje;
+  - BlitRenderer restaura el fondo, dibuja las líneas y blitea el bbox del eje. Solo
+    hace un draw completo cuando los datos se salen de los límites actuales (con
+    holgura, para no redibujar en cada tick mientras el barrido avanza).
+Ver docs/emstat_live_render.md.
+"""
+import numpy as np
+
+__author__ = "Edisson Naula"
+__date__ = "$ 17/10/2026 at 16:40 $"
+
+
+def decimate_minmax(xs, ys, x_lo, x_hi, width_px):
+    """Índices de los puntos a dibujar de una traza (xs, ys).
+
+    Agrupa los puntos CONSECUTIVOS que caen en la misma columna de píxel (según
+    x_lo..x_hi en width_px columnas) y de cada grupo conserva el primero, el último y
+    los de y mínima/máxima, en orden. Para x monótona es la decimación min/max por
+    columna clásica (<= 4 puntos por columna); para trazas que van y vuelven en x
+    (CV, Nyquist) también sirve, porque cada pasada por una columna es su propio
+    grupo. El trazo resultante es idéntico al original a resolución de píxel.
+    Devuelve None si decimar no ahorra nada."""
+    n = len(xs)
+    if n <= 4 * width_px or x_hi <= x_lo:
+        return None
+    cols = ((xs - x_lo) * (width_px / (x_hi - x_lo))).astype(np.int64)
+    starts = np.flatnonzero(np.diff(cols)) + 1
+    if 4 * (len(starts) + 1) >= n:
+        return None
+    starts = np.concatenate(([0], starts))
+    ends = np.concatenate((starts[1:], [n])) - 1
+    idx = np.arange(n)
+    lengths = np.diff(np.concatenate((starts, [n])))
+    # Primer índice con el mínimo/máximo de cada grupo (reduceat sobre índices
+    # enmascarados por "y == extremo del grupo").
+    y_min = np.repeat(np.minimum.reduceat(ys, starts), lengths)
+    y_max = np.repeat(np.maximum.reduceat(ys, starts), lengths)
+    i_min = np.minimum.reduceat(np.where(ys == y_min, idx, n), starts)
+    i_max = np.minimum.reduceat(np.where(ys == y_max, idx, n), starts)
+    keep = np.zeros(n, dtype=bool)
+    keep[starts] = True
+    keep[ends] = True
+    keep[i_min[i_min < n]] = True
+    keep[i_max[i_max < n]] = True
+    return np.flatnonzero(keep)
+
+
+class BlitRenderer:
+    """Blitting de las líneas en vivo de un eje.
+
+    Las líneas que reciben datos se marcan animated=True: el draw completo no las
+    pinta y su resultado queda como fondo. Cada frame restaura ese fondo, dibuja solo
+    esas líneas y repone encima el recuadro de la leyenda (copiado del fondo, sin
+    volver a maquetar su texto). Una línea que deja de recibir datos (ciclo o
+    espectro terminado) se "hornea" en el fondo tras BAKE_AFTER frames, así el costo
+    por frame es el de la traza activa y no el de todo lo graficado. Al terminar
+    (end()) todas vuelven a ser artistas normales, con las trazas sin decimar."""
+
+    # Holgura al ampliar límites: fracción del rango agregada del lado que creció.
+    GROW = 0.25
+    MARGIN = 0.05
+    BAKE_AFTER = 25  # frames sin datos (~2 s a 80 ms) antes de pasar al fondo
+
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = []  # animadas (se dibujan cada frame)
+        self.active = False
+        self.full_draws = 0  # draws completos (diagnóstico / benchmark)
+        self._bg = None
+        self._data = {}  # línea -> (xs, ys) completos de lo último asignado
+        self._idle = {}  # línea animada -> frames seguidos sin datos
+        self._fresh = False
+        self._cid = canvas.mpl_connect("draw_event", self._on_draw)
+
+    @staticmethod
+    def supported(canvas):
+        return bool(getattr(canvas, "supports_blit", False))
+
+    def begin(self, lines=()):
+        self.active = True
+        self.lines = []
+        self._data = {}
+        self._idle = {}
+        for line in lines:
+            self.add_line(line)
+        self._bg = None
+        # El primer frame con datos fija los límites desde cero (unión con lo que ya
+        # esté graficado: corridas retenidas, CSV cargados), sin arrastrar el (0, 1)
+        # de unos ejes vacíos.
+        self.ax.relim(visible_only=True)
+        self._fresh = True
+
+    def add_line(self, line):
+        if line not in self.lines:
+            line.set_animated(self.active)
+            self.lines.append(line)
+        self._idle[line] = 0
+
+    def end(self, full_data=None):
+        """Fin de la corrida: las líneas vuelven a ser artistas normales.
+        full_data: {line: (xs, ys)} para reponer las trazas completas (sin decimar)."""
+        self.active = False
+        for line in set(self.lines) | set(self._data):
+            line.set_animated(False)
+            if full_data and line in full_data:
+                line.set_data(*full_data[line])
+        self.lines = []
+        self._data = {}
+        self._idle = {}
+        self._bg = None
+        self.ax.set_autoscale_on(True)  # set_xlim/set_ylim lo habían apagado
+
+    def _on_draw(self, event):
+        # Tras cualquier draw completo (límites nuevos, leyenda, resize, toolbar):
+        # el fondo cambió -> recapturarlo y pintar las líneas encima.
+        if not self.active:
+            return
+        self._bg = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines:
+            self.ax.draw_artist(line)
+        legend = self.ax.get_legend()
+        if legend is not None and self._bg is not None:
+            # La leyenda ya está en el fondo: se repone su recuadro por encima de las
+            # líneas. restore_region usa coordenadas con origen arriba (como
+            # get_extents de la región) y xy = esquina de la región original.
+            box = legend.get_window_extent().padded(2)
+            h = self.canvas.figure.bbox.height
+            x0, y0 = self._bg.get_extents()[:2]
+            self.canvas.restore_region(
+                self._bg, bbox=(box.x0, h - box.y1, box.x1, h - box.y0), xy=(x0, y0)
+            )
+
+    def _grown_limits(self, lo, hi, cur):
+        """Límites nuevos si [lo, hi] se sale de cur (None si cabe). cur=None: desde
+        cero, solo con margen."""
+        span = max(hi - lo, abs(hi) * 1e-9, 1e-30)
+        if cur is None:
+            return lo - self.MARGIN * span, hi + self.MARGIN * span
+        c_lo, c_hi = cur
+        if c_lo <= lo and hi <= c_hi:
+            return None
+        new_lo = lo - self.MARGIN * span
+        new_hi = hi + self.MARGIN * span
+        if lo < c_lo:
+            new_lo -= self.GROW * span
+        else:
+            new_lo = min(new_lo, c_lo)
+        if hi > c_hi:
+            new_hi += self.GROW * span
+        else:
+            new_hi = max(new_hi, c_hi)
+        return new_lo, new_hi
+
+    def frame(self, traces):
+        """Dibuja un frame. traces: {line: (xs, ys)} con los datos completos de cada
+        línea que cambió; las demás conservan lo último asignado."""
+        self._data.update(traces)
+        redraw = self._bg is None
+        # Líneas que vuelven a recibir datos (p.ej. un relleno del otro transporte en
+        # un ciclo ya horneado) salen del fondo; las que llevan BAKE_AFTER frames sin
+        # datos entran. Ambos cambios piden un draw completo.
+        for line in traces:
+            if line not in self.lines:
+                self.add_line(line)
+                redraw = True
+            self._idle[line] = 0
+        for line in list(self.lines):
+            if line in traces:
+                continue
+            self._idle[line] += 1
+            if self._idle[line] >= self.BAKE_AFTER:
+                self.lines.remove(line)
+                del self._idle[line]
+                line.set_animated(False)
+                redraw = True
+        bounds = [
+            (xs.min(), xs.max(), ys.min(), ys.max()) for xs, ys in traces.values() if len(xs)
+        ]
+        if bounds:
+            b = np.array(bounds)
+            x_b = [b[:, 0].min(), b[:, 1].max()]
+            y_b = [b[:, 2].min(), b[:, 3].max()]
+            cur_x, cur_y = self.ax.get_xlim(), self.ax.get_ylim()
+            if self._fresh:
+                self._fresh = False
+                cur_x = cur_y = None
+                lim = self.ax.dataLim.get_points()
+                if np.isfinite(lim).all():
+                    x_b = [min(x_b[0], lim[0, 0]), max(x_b[1], lim[1, 0])]
+                    y_b = [min(y_b[0], lim[0, 1]), max(y_b[1], lim[1, 1])]
+            new_x = self._grown_limits(*x_b, cur_x)
+            new_y = self._grown_limits(*y_b, cur_y)
+            if new_x is not None:
+                self.ax.set_xlim(*new_x)
+                redraw = True
+            if new_y is not None:
+                self.ax.set_ylim(*new_y)
+                redraw = True
+        # Con límites nuevos cambia la columna de cada punto: se re-deciman todas.
+        x_lo, x_hi = self.ax.get_xlim()
+        width = max(int(self.ax.bbox.width), 1)
+        for line, (xs, ys) in (self._data if redraw else traces).items():
+            keep = decimate_minmax(xs, ys, x_lo, x_hi, width)
+            if keep is None:
+                line.set_data(xs, ys)
+            else:
+                line.set_data(xs[keep], ys[keep])
+        if redraw:
+            # Draw completo: _on_draw recaptura el fondo y pinta las líneas.
+            self.full_draws += 1
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._bg)
+        self._draw_lines()
+        self.canvas.blit(self.ax.bbox)
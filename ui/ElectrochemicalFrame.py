@@ -72,7 +72,7 @@ class ElectrochemicalFrame(ttk.Frame):
 
         self.current_test_frame: "ttk.Frame | ttk.Label | None" = None  # Track current frame
         # Cache de frames por metodo: se construyen una vez (lazy) y se ocultan con
-        # grid_forget en vez de destruirse, para no perder total_data ni el plot al
+        # grid_forget en vez de destruirse, para no perder run_store ni el plot al
         # cambiar de metodo. Memoria acotada (~150 MB los 4) -> trivial en la Pi 5.
         self.frame_cache: "dict[str, ttk.Frame | ttk.Label]" = {}
         # Metodo activo: se usa para revertir el combobox si se bloquea el cambio
@@ -152,7 +152,7 @@ class ElectrochemicalFrame(ttk.Frame):
             return
         print(f"Selected test: {selected_test}")
         ip_sender = self.callback_ip() if self.callback_ip else "localhost"
-        # Ocultar el frame saliente sin destruirlo (conserva total_data y el plot).
+        # Ocultar el frame saliente sin destruirlo (conserva run_store y el plot).
         if self.current_test_frame is not None:
             self.current_test_frame.grid_forget()
         # Reusar del cache (lazy) o construir la primera vez.
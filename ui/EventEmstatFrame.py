@@ -1,22 +1,37 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import csv
 import json
 import os
 import queue
 import re
-import socket
 import threading
 import time
+import traceback
 from collections import deque
 from typing import Callable
 
 import matplotlib
+import numpy as np
 from matplotlib.figure import Figure
 
+from Drivers.ClientUDP import get_udp_hub
+from Drivers.EmstatEngine import get_emstat_engine
+from Drivers.EmstatLink import get_relay_link
+from Drivers.EmstatRecovery import NackTracker
+from Drivers.EmstatRunStore import (
+    EmstatRunStore,
+    SeqMergeBuffer,
+    XYLineBuffer,
+    rows_from_events,
+)
 from Drivers.EmstatUtils import (
+    BATCH_PHASES,
     EmstatStreamParser,
-    LineBufferedSocketReader,
+    decode_binary_frame,
+    decode_binary_frames,
     decode_methodscript_error,
+    unpack_emstat_batch,
 )
 
 matplotlib.use("TkAgg")  # backend para Tk
@@ -27,7 +42,8 @@ import matplotlib.pyplot as plt
 import ttkbootstrap as ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 
-from templates.utils import experiment_dir
+from templates.utils import experiment_dir, read_settings_from_file
+from ui.BlitRenderer import BlitRenderer
 
 
 class EventPlotter(ttk.Frame):
@@ -102,22 +118,39 @@ class EventPlotter(ttk.Frame):
         self.x_label = x_label
         self.y_label = y_label
         # --- Estado de ejecución ---
+        # Bloques (xs, ys, ms, seqs) de puntos a graficar; uno por lote colocado.
         self.q_points = queue.Queue(maxsize=20000)  # grande, pero finita
-        self.q_tcp_lines = queue.Queue(maxsize=20000)  # grande, pero finita
-        self.q_udp_lines = queue.Queue(maxsize=20000)  # tap UDP paralelo
-        self.storage_dict = {}  # registro parcial de informacion
-        self.total_data = []  # registro total de informacion
+        # Líneas TCP de la corrida: las agrega y las consume el loop del EmstatEngine
+        # (un solo hilo, sin locks). Tope como el de q_points: grande, pero finita.
+        self.tcp_lines = deque()
+        self.tcp_lines_max = 20000
+        self.tcp_dropped = 0
+        # Registro total de informacion (todas las corridas retenidas), columnar:
+        # filas BATCH_DTYPE + run/source (docs/emstat_run_store.md).
+        self.run_store = EmstatRunStore()
         self.loaded_lines = []  # Line2D agregadas desde archivos CSV cargados
         self.filename_meta = {}  # metadatos (motor, etc.) para incluir en el nombre del CSV
         self.stop_event = threading.Event()
-        self._send_lock = threading.Lock()  # serializa sock.sendall entre hilos
-        self.reader_th = None
-        self.processor_th = None
-        self.sock = None
+        # Avisos del loop del motor al hilo de Tk: ("status", texto) y ("end", run).
+        # Tk no es thread-safe; el tick de _update_plot los drena (_drain_ui_events).
+        self._ui_events = queue.SimpleQueue()
+        # Procesador de la corrida: tarea del loop asyncio compartido (Future de
+        # concurrent). _rx_event la despierta con datos TCP/UDP, EOF o stop; el
+        # watchdog es un timer del loop (docs/emstat_async_engine.md).
+        self._engine = None
+        self.processor_task = None
+        self._rx_event = asyncio.Event()
+        self._watchdog = None
+        # Turno de esta corrida sobre la sesión TCP compartida con el Wemos
+        # (Drivers/EmstatLink.py): el lector y el keepalive son del RelayLink.
+        self.link_run = None
         # --- Tap UDP (recuperación de paquetes perdidos en TCP) ---
+        # Suscripción "emstat" al hub UDP compartido del proceso (un solo socket en
+        # :5005 junto con los lectores de temperatura). El procesador drena su ring;
+        # no hay hilo lector UDP propio: el hub despierta al procesador con un Wakeup.
         self.udp_port = udp_port
-        self.udp_sock = None
-        self.udp_reader_th = None
+        self.udp_sub = None
+        self.udp_ring_size = 20000  # grande, pero finita (igual que tcp_lines)
         # Selector de transporte que alimenta la gráfica/CSV (default TCP).
         self.transport_var = tk.StringVar(value="TCP")
         # Retención de datos entre corridas (checkbox). OFF (default): cada Start limpia
@@ -126,16 +159,32 @@ class EventPlotter(ttk.Frame):
         # Copia plana del transporte elegido, fijada en start() (hilo UI) y leída por
         # el hilo procesador: evita acceso cross-thread al StringVar de Tk.
         self._plot_source = "tcp"
-        # Cobertura por transporte: set de 'seq' de paquetes emstat_data vistos.
-        self.seq_seen = {"tcp": set(), "udp": set()}
+        # Cobertura por transporte: set de 'seq' de paquetes emstat_data vistos
+        # ("rtx": recuperados por NACK).
+        self.seq_seen = {"tcp": set(), "udp": set(), "rtx": set()}
+        # Retransmisión selectiva (docs/emstat_nack.md): con "emstat_nack" el payload
+        # lleva "rtx"; si el Pico lo confirma en emstat_start, el timer _nack_tick
+        # pide los seq que faltan en ambos transportes. Tras el terminal la corrida
+        # espera hasta rtx_grace_s a que se resuelvan los huecos de la cola.
+        self.nack = NackTracker()
+        self.nack_tick_s = 0.1
+        self.rtx_grace_s = 1.0
+        self._rtx_on = False
+        self._rtx_parser = None
+        self._rtx_close_at = None
+        self._nack_timer = None
+        # Tramas coalescidas del Pico ("emstat_relay_batch", docs/emstat_batch_frames.md):
+        # demora máxima de un paquete en la trama a medias.
+        self.relay_batch_ms = 10
         # Diagnóstico: últimas líneas EMSTAT crudas recibidas (cualquier transporte);
         # se vuelca al cerrar para ver CÓMO terminó el stream (p.ej. si tras el último
         # '*' llegó la blank/terminal o la corrida murió por watchdog).
         self._raw_tail = deque(maxlen=20)
-        # Merge (Fase 2): seq -> evento data (primer transporte que lo trae gana).
-        # Al cerrar se reconstruye la unión ordenada por seq (rellena lo que el
-        # transporte primario perdió con lo que trajo el otro).
-        self.merged_by_seq = {}
+        # Merge (Fase 2): filas data por seq (primer transporte que lo trae gana).
+        # Reconcilia en vivo: los huecos del transporte graficado se rellenan con lo
+        # que trajo el otro apenas el primario los deja atrás (docs/emstat_live_merge.md).
+        self.merge_buf = SeqMergeBuffer()
+        self._tcp_eof = False  # el lector TCP terminó (el Wemos cerró el control)
         # Watchdog de inactividad total (s) para cerrar si nadie manda terminal.
         # Bajo el idle de 16s del Pico, con margen sobre huecos legítimos entre paquetes.
         self.watchdog_timeout = 10.0
@@ -237,11 +286,19 @@ class EventPlotter(ttk.Frame):
         self.toolbar = NavigationToolbar2Tk(self.canvas, self, pack_toolbar=False)
         self.toolbar.pack(side=ttk.TOP, fill=ttk.X)
 
-        # Por medición (m): deques y Line2D
+        # Render en vivo (docs/emstat_live_render.md): "blit" redibuja solo las líneas
+        # (decimadas al ancho en píxeles) sobre un fondo cacheado; "full" es el draw
+        # completo por tick de antes. Sin soporte de blit en el backend -> "full".
+        self._renderer = None
+        if read_settings_from_file().get("emstat_plot_renderer", "blit") == "blit":
+            if BlitRenderer.supported(self.canvas):
+                self._renderer = BlitRenderer(self.canvas, self.ax)
+        self._legend_sig = None  # membresía de líneas de la última leyenda armada
+
+        # Por medición (m): buffer x/y y Line2D
         self.x_key = x_key
         self.y_key = y_key
-        self.x_by_m = {}
-        self.y_by_m = {}
+        self.xy_by_m = {}
         self.lines_by_m = {}
         # Retención entre corridas: clave de línea -> (run, cycle) para etiquetas
         # adaptativas, desplazamiento de clave por corrida e índice de corrida.
@@ -255,7 +312,7 @@ class EventPlotter(ttk.Frame):
         self.cycle_label_values = {}  # clave de línea -> valor para la leyenda
         self.plot_run_offset = 0
         self.run_index = 0
-        self._run_td_start = 0  # offset en total_data donde empieza la corrida actual
+        self._run_td_start = 0  # offset en run_store donde empieza la corrida actual
         self._style_cycle = self._build_style_cycle()
 
         # self.pack(fill=ttk.BOTH, expand=True)
@@ -263,6 +320,7 @@ class EventPlotter(ttk.Frame):
     def on_close(self):
         """Limpia y detiene hilo lector."""
         self.stop()
+        self._cancel_update()
         # self.clear_plot()
         self.destroy()
 
@@ -288,20 +346,32 @@ class EventPlotter(ttk.Frame):
     # API pública
     # ---------------------------
     def start(self):
-        """Crea socket, lanza hilo TCP productor y procesador."""
+        """Toma la sesión TCP con el relay, envía el payload y lanza el procesador."""
         print("Starting TCP reader")
         if self.running:
             self._set_status("Already running.")
             return
+        if self.processor_task is not None:
+            # El procesador de la corrida anterior aún no avisó su fin.
+            self._set_status("Stopping previous run…")
+            return
 
+        t_start = time.perf_counter()
+        self._engine = get_emstat_engine()
+        self._drain_ui_events(apply=False)  # avisos viejos de una corrida anterior
+        # Antes de open_run: desde ahí el lector agrega las líneas de esta corrida.
+        self.tcp_lines.clear()
+        self.tcp_dropped = 0
         try:
             print(self.ip_sender, self.tcp_port)
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect((self.ip_sender, self.tcp_port))
-
-            # TCP streaming robusto
-            self.sock.settimeout(None)  # TCP en modo bloqueante
-            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Sesión compartida entre corridas y frames con "emstat_tcp_pool"; si no,
+            # una conexión por corrida como antes (docs/emstat_tcp_link.md).
+            link = get_relay_link(
+                self.ip_sender,
+                self.tcp_port,
+                persistent=bool(read_settings_from_file().get("emstat_tcp_pool", False)),
+            )
+            self.link_run = link.open_run(self._on_tcp_line, self._on_tcp_eof)
             self.hide_frames(flag=True)
         except OSError as e:
             self._set_status(f"Socket Error: {e}")
@@ -313,9 +383,12 @@ class EventPlotter(ttk.Frame):
         self.running = True
 
         # Reset cobertura/estado del tap para esta corrida
-        self.seq_seen = {"tcp": set(), "udp": set()}
+        self.seq_seen = {"tcp": set(), "udp": set(), "rtx": set()}
+        self.nack.reset()
+        self._rtx_on = False
+        self._rtx_close_at = None
         self._raw_tail.clear()
-        self.merged_by_seq = {}
+        self._tcp_eof = False
         self._last_rx = None
         self._run_start_ts = time.time()  # para el watchdog de "nunca arranco"
         self._run_started = False
@@ -324,10 +397,7 @@ class EventPlotter(ttk.Frame):
         self._acq_t0 = None  # ancla del contador de fase (se fija en emstat_start)
         self._sweep_t0 = None  # marca de inicio del barrido (primer paquete 'sweep')
         self._plot_source = self.transport_var.get().lower()  # fija el transporte a graficar
-        with self.q_udp_lines.mutex:
-            self.q_udp_lines.queue.clear()
-        with self.q_tcp_lines.mutex:
-            self.q_tcp_lines.queue.clear()
+        self.merge_buf.clear(primary=self._plot_source)
 
         # Retención entre corridas. OFF: limpia la corrida anterior (conserva las líneas
         # cargadas de CSV); la nueva arranca con offset 0. ON: apila la nueva corrida
@@ -338,28 +408,26 @@ class EventPlotter(ttk.Frame):
         else:
             self.plot_run_offset = (max(self.lines_by_m) + 1) if self.lines_by_m else 0
         self.run_index += 1
-        self._run_td_start = len(self.total_data)
+        self._run_td_start = len(self.run_store)
+        if self._renderer is not None:
+            self._renderer.begin()
 
-        # Socket UDP del tap (broadcast 5005, paralelo al control TCP). Si falla el
-        # bind (p.ej. dev/Windows sin red), degrada a TCP-only sin abortar la corrida.
-        self.udp_sock = self._create_udp_tap()
+        # Tap UDP (broadcast 5005, paralelo al control TCP) vía el hub compartido. Si
+        # falla el bind (p.ej. dev/Windows sin red), degrada a TCP-only sin abortar.
+        self.udp_sub = self._create_udp_tap()
 
-        # Lanza hilo productor (solo lectura TCP)
-        self.reader_th = threading.Thread(target=self._tcp_reader, daemon=True, name="TCPReader")
-        self.reader_th.start()
-
-        # Lanza hilo lector UDP del tap (si hay socket)
-        if self.udp_sock is not None:
-            self.udp_reader_th = threading.Thread(
-                target=self._udp_reader, daemon=True, name="UDPReader"
-            )
-            self.udp_reader_th.start()
-
-        # Lanza hilo consumidor unificado (parsea ambos transportes y aplica la lógica)
-        self.processor_th = threading.Thread(
-            target=self._processor, daemon=True, name="EmstatProcessor"
+        # Payload del experimento por la sesión; las líneas las entrega el RelayLink.
+        if not self._send_payload():
+            self.stop(send_abort=False)
+            return
+        print(
+            f"Run {self.link_run.run_id} started in {(time.perf_counter() - t_start) * 1e3:.1f} ms "
+            f"({'pooled session' if self.link_run.reused else 'new connection'})"
         )
-        self.processor_th.start()
+
+        # Procesador unificado (parsea ambos transportes y aplica la lógica) como
+        # tarea del loop del motor; arranca con lo que el lector ya haya encolado.
+        self.processor_task = self._engine.submit(self._processor())
         if self.callback_motor is not None:
             self.thread_motor = self.callback_motor()
         # UI
@@ -367,7 +435,7 @@ class EventPlotter(ttk.Frame):
         self.btn_stop.configure(state=ttk.NORMAL)
         self.cmb_transport.configure(state=ttk.DISABLED)
         self.chk_keep.configure(state=ttk.DISABLED)
-        tap = "TCP+UDP" if self.udp_sock is not None else "TCP-only"
+        tap = "TCP+UDP" if self.udp_sub is not None else "TCP-only"
         self._set_status(
             f"{tap} | plot={self.transport_var.get()} | {self.ip_sender}:{self.tcp_port}"
         )
@@ -388,59 +456,34 @@ class EventPlotter(ttk.Frame):
             return
         print("Stopping …")
         # Aborto en caliente del experimento (solo si lo pide el usuario y sigue vivo)
-        if send_abort and self.sock is not None:
+        link_run, self.link_run = self.link_run, None
+        if send_abort and link_run is not None:
             try:
-                with self._send_lock:
-                    self.sock.sendall(b'{"cmd":"ABORT"}\n')
+                link_run.send_raw(b'{"cmd":"ABORT"}\n')
                 print("ABORT enviado al Pico")
             except Exception as e:
                 print(f"No se pudo enviar ABORT: {e}")
-        self.total_data.append(self.storage_dict.copy())
-        self.storage_dict.clear()
         self.stop_event.set()
-        try:
-            if self.sock:
-                self.sock.close()
-        except Exception:
-            pass
-        self.sock = None
-        try:
-            if self.udp_sock:
-                self.udp_sock.close()
-        except Exception:
-            pass
-        self.udp_sock = None
-
-        # Esperar hilos (rápido gracias al timeout de los sockets)
-        try:
-            if self.reader_th and self.reader_th.is_alive():
-                self.reader_th.join(timeout=0.5)
-        except Exception:
-            pass
-        try:
-            if self.udp_reader_th and self.udp_reader_th.is_alive():
-                self.udp_reader_th.join(timeout=0.5)
-        except Exception:
-            pass
-        try:
-            if self.processor_th and self.processor_th.is_alive():
-                self.processor_th.join(timeout=0.5)
-        except Exception:
-            pass
+        if link_run is not None:
+            link_run.close()  # libera el turno; la sesión sigue si es persistente
+        udp_sub, self.udp_sub = self.udp_sub, None
+        if udp_sub is not None:
+            if udp_sub.dropped:
+                print(f"UDP tap: {udp_sub.dropped} frame(s) descartados por ring lleno")
+            udp_sub.close()
+        if self.tcp_dropped:
+            print(f"TCP: {self.tcp_dropped} línea(s) descartadas por cola llena")
+
+        # Solo despierta al procesador: sale en el próximo lote y avisa ("end") por
+        # _ui_events. No se espera aquí: el hilo de Tk no se bloquea y el loop del
+        # motor no se congela. El cierre que lee su estado corre en _finish_run.
+        if self.processor_task is not None and self._engine is not None:
+            self._engine.call_soon(self._rx_event.set)
         self.running = False
         self.flag_recording = False
-        self._print_coverage()  # resumen de cobertura TCP vs UDP (Fase 0)
-        # Fase 2: reconcilia TCP+UDP por seq y redibuja en el hilo UI (matplotlib/Tk
-        # no son thread-safe; stop() puede venir del hilo procesador).
-        try:
-            self.after(0, self._reconcile_merge)
-        except Exception:
-            pass
-        self.btn_start.configure(state=ttk.NORMAL)
         self.btn_stop.configure(state=ttk.DISABLED)
-        self.cmb_transport.configure(state="readonly")
-        self.chk_keep.configure(state=ttk.NORMAL)
-        self._cancel_update()
+        if self.processor_task is None:
+            self._finish_run()
         # No pisar el estado final ya publicado por un terminal/watchdog
         # (end/error/aborted/maxtime/timeout); solo el stop manual reporta aquí.
         if not self._terminated:
@@ -450,12 +493,11 @@ class EventPlotter(ttk.Frame):
 
     def clear_plot(self):
         """Limpia datos y resetea el gráfico (wipe total: incluye líneas cargadas)."""
-        self.storage_dict.clear()
-        self.total_data.clear()
-        self.merged_by_seq.clear()
-        self.x_by_m.clear()
-        self.y_by_m.clear()
+        self.run_store.clear()
+        self.merge_buf.clear()
+        self.xy_by_m.clear()
         self.lines_by_m.clear()
+        self._forget_live_lines()
         self.loaded_lines.clear()
         self.key_meta.clear()
         self.cycle_label_values.clear()
@@ -482,12 +524,12 @@ class EventPlotter(ttk.Frame):
             except Exception:
                 pass
         self.lines_by_m.clear()
-        self.x_by_m.clear()
-        self.y_by_m.clear()
+        self.xy_by_m.clear()
+        self._forget_live_lines()
         self.key_meta.clear()
         self.cycle_label_values.clear()
-        self.total_data.clear()
-        self.merged_by_seq.clear()
+        self.run_store.clear()
+        self.merge_buf.clear()
         with self.q_points.mutex:
             self.q_points.queue.clear()
         self.plot_run_offset = 0
@@ -497,10 +539,10 @@ class EventPlotter(ttk.Frame):
         """
         Create CSV from data stored
         """
-        if self.running:
+        if self.running or self.processor_task is not None:
             self._set_status("Stop aquisition before saving data.")
             return
-        if not self.total_data:
+        if not len(self.run_store):
             self._set_status("No data to save.")
             return
         print("Saving data …")
@@ -523,23 +565,28 @@ class EventPlotter(ttk.Frame):
         # Columnas extra TRAILING (Load solo lee las 5 primeras, así que no rompen
         # la recarga): campos EIS presentes en los eventos que no sean ya x/y, mas la
         # fase SWV ("pretreatment"/"sweep") para distinguir el pre-tratamiento conservado.
+        rows = self.run_store.rows()
         extra_keys = [
             k
             for k in ("freq_Hz", "E_V", "t_s", "Z_mod", "phase")
-            if k not in (self.x_key, self.y_key) and any(k in ev for ev in self.total_data)
+            if k not in (self.x_key, self.y_key) and self.run_store.has_values(k)
         ]
+        # Columna -> lista de textos (ausente/NaN -> ''), como event.get(k, '') antes.
+        def _text_col(name):
+            if name == "phase":
+                return [BATCH_PHASES[p] for p in rows["phase"].tolist()]
+            if rows[name].dtype.kind == "f":
+                return ["" if v != v else f"{v}" for v in rows[name].tolist()]
+            return [f"{v}" for v in rows[name].tolist()]
+
         try:
+            cols = [_text_col(k) for k in (self.x_key, self.y_key, "cycle", "run", *extra_keys)]
             with open(filename, "w") as f:
                 header = f"sample,{self.x_key}, {self.y_key}, cycle, run"
                 header += "".join(f", {k}" for k in extra_keys)
                 f.write(header + "\n")
-                for index, event in enumerate(self.total_data):
-                    row = (
-                        f"{index}, {event.get(self.x_key)}, {event.get(self.y_key)},"
-                        f" {event.get('cycle')}, {event.get('run', 1)}"
-                    )
-                    row += "".join(f", {event.get(k, '')}" for k in extra_keys)
-                    f.write(row + "\n")
+                for index, values in enumerate(zip(*cols)):
+                    f.write(f"{index}, " + ", ".join(values) + "\n")
             self._set_status(f"Data saved to file: {os.path.basename(filename)}")
         except Exception as e:
             self._set_status(f"Error saving data: {e}")
@@ -676,170 +723,252 @@ class EventPlotter(ttk.Frame):
     # ---------------------------
     # Hilo lector TCP (control + datos) y tap UDP paralelo
     # ---------------------------
-    def _tcp_reader(self):
+    def _send_payload(self):
+        """Envía el payload del experimento por la sesión TCP. False si falló (la
+        sesión se cayó entre open_run y el envío)."""
         print(f"starting tcp on port {self.tcp_port} and address {self.ip_sender} …")
-        self.flag_recording = False
-        if self.sock is None:
-            print("First create a socket")
+        payload = dict(self.payload_exp or {})
+        # Formato del relay (docs/emstat_binary_frames.md): "b1" pide tramas binarias;
+        # un Pico viejo ignora la clave y sigue en JSON, el host decodifica ambos.
+        settings = read_settings_from_file()
+        relay_fmt = settings.get("emstat_relay_format", "json")
+        if relay_fmt != "json":
+            payload["fmt"] = relay_fmt
+        # Retransmisión a pedido (docs/emstat_nack.md): un Pico viejo ignora la clave
+        # y no la confirma en emstat_start, así que nunca recibe un NACK.
+        if settings.get("emstat_nack", False):
+            payload["rtx"] = 1
+        # Tramas coalescidas (docs/emstat_batch_frames.md): hasta N paquetes por línea.
+        batch = int(settings.get("emstat_relay_batch", 0) or 0)
+        if batch > 1:
+            payload["batch"] = batch
+            payload["batch_ms"] = self.relay_batch_ms
+        try:
+            self.link_run.send(payload)
+        except OSError as e:
+            self._terminated = True
+            self._set_status(f"Socket Error: {e}")
+            return False
+        return True
+
+    def _on_tcp_line(self, line):
+        """Línea TCP de esta corrida (loop del motor) -> cola del procesador."""
+        if len(self.tcp_lines) >= self.tcp_lines_max:
+            self.tcp_dropped += 1  # si la cola se llena, descarta (mejor que bloquear el lector)
             return
-        with self._send_lock:
-            self.sock.sendall((json.dumps(self.payload_exp) + "\n").encode())
-        self.flag_recording = True
-        reader = LineBufferedSocketReader(self.sock)
-        start_time = time.time()
-        while not self.stop_event.is_set():
-            # Keepalive SOLO para mantener control TCP
-            if time.time() - start_time > 120:
-                try:
-                    with self._send_lock:
-                        self.sock.sendall(b'{"type":"keepalive"}\n')
-                    start_time = time.time()
-                except Exception:
-                    pass  # si falla, TCP ya murió y no es crítico
-            lines = reader.read_lines()
-            if lines is None:
-                print("TCP closed by server (expected for long runs)")
-                break
-            for line in lines:
-                try:
-                    self.q_tcp_lines.put_nowait(line)
-                except Exception:
-                    # si la cola se llena, descarta (mejor que bloquear TCP)
-                    pass
+        self.tcp_lines.append(line)
+        self._rx_event.set()
+
+    def _on_tcp_eof(self):
+        # IMPORTANTE: el cierre de TCP NO termina la corrida: el tap UDP sigue vivo
+        # para recuperar paquetes/terminal perdidos en TCP. La corrida la cierra un
+        # terminal (cualquier transporte), Stop o el watchdog de inactividad. El
+        # RelayLink reconecta en segundo plano si la sesión es persistente.
+        print("TCP closed by server (expected for long runs); the UDP tap stays alive.")
         self.flag_recording = False
-        # IMPORTANTE: el cierre de TCP NO termina la corrida. Antes aquí se hacía
-        # stop_event.set(), lo que mataba el tap UDP justo cuando se necesita para
-        # recuperar paquetes/terminal perdidos en TCP. Ahora solo muere el lector
-        # TCP; la corrida la cierra un terminal (cualquier transporte), Stop o el
-        # watchdog de inactividad del procesador. El socket lo cierra stop().
-        print("TCP reader detenido (control TCP cerrado; el tap UDP sigue vivo).")
-        self.reader_th = None
+        self._tcp_eof = True
+        self._rx_event.set()  # el procesador libera el merge tras drenar lo que llegó
 
     def _create_udp_tap(self):
-        """Crea el socket UDP del tap (broadcast 5005, paralelo al control TCP).
-
-        SO_REUSEADDR + (SO_REUSEPORT donde exista) para convivir con el UdpClient de
-        temperatura en el mismo puerto; SO_BROADCAST para recibir los broadcasts del
-        Wemos; RCVBUF grande para no perder paquetes en ráfagas. Devuelve None y
-        degrada a TCP-only si el bind falla (p.ej. dev/Windows sin red)."""
+        """Suscribe el tap EMSTAT al hub UDP compartido (broadcast 5005, paralelo al
+        control TCP). El hub ya filtra por 'EMSTAT:' (descarta temperatura/beacons y
+        tolera prefijos basura) y entrega cada línea en un ring acotado que drena el
+        procesador; el hilo del hub lo despierta con un Wakeup (uno por ráfaga).
+        Devuelve None y degrada a TCP-only si el bind falla (p.ej. dev/Windows sin
+        red)."""
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            if hasattr(socket, "SO_REUSEPORT"):
-                try:
-                    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-                except OSError:
-                    pass
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            try:
-                s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
-            except OSError:
-                pass
-            s.bind(("", self.udp_port))
-            s.settimeout(0.2)
-            print(f"UDP tap escuchando en :{self.udp_port}")
-            return s
+            sub = get_udp_hub(self.udp_port).subscribe(
+                kinds=("emstat",),
+                maxlen=self.udp_ring_size,
+                notify=self._engine.wakeup(self._rx_event.set).set,
+            )
+            print(f"UDP tap escuchando en :{self.udp_port} (hub compartido)")
+            return sub
         except OSError as e:
             print(f"UDP tap no disponible ({e}); sigo en TCP-only")
             return None
 
-    def _udp_reader(self):
-        """Lee el broadcast UDP y encola las líneas EMSTAT: (descarta temperatura/beacons).
-        1 datagrama = 1 mensaje; tolera prefijos basura buscando 'EMSTAT:' por substring."""
-        sock = self.udp_sock
-        if sock is None:
-            return
-        while not self.stop_event.is_set():
-            try:
-                data, _addr = sock.recvfrom(2048)
-            except socket.timeout:
-                continue
-            except OSError:
-                break
-            text = data.decode("utf-8", errors="replace")
-            idx = text.find("EMSTAT:")
-            if idx < 0:
-                continue  # temperatura (UDP:...) / beacon (CD_DISCOVERY:...) / ruido
-            try:
-                self.q_udp_lines.put_nowait(text[idx:].strip())
-            except Exception:
-                pass
-        print("UDP reader detenido.")
-        self.udp_reader_th = None
-
-    def _processor(self):
+    async def _processor(self):
         """Consumidor unificado: drena ambas colas (TCP y UDP), cada una con su propio
         parser (stateful), aplica la lógica y mantiene la cobertura por transporte.
         La corrida termina por: primer terminal de cualquier transporte (Fase 1),
-        Stop, o watchdog de inactividad total."""
+        Stop, o watchdog de inactividad total. Sin datos espera _rx_event (no
+        sondea)."""
         parsers = {
             "tcp": EmstatStreamParser(experiment=self.method, **self.parser_kwargs),
             "udp": EmstatStreamParser(experiment=self.method, **self.parser_kwargs),
         }
-        while not self.stop_event.is_set():
-            got = False
-            for _ in range(256):
-                try:
-                    line = self.q_tcp_lines.get_nowait()
-                except queue.Empty:
-                    break
-                got = True
-                self._handle_emstat_line(line, "tcp", parsers["tcp"])
+        udp_sub = self.udp_sub
+        run = self.run_index
+        self._arm_watchdog()
+        try:
+            while not self.stop_event.is_set():
+                # Se limpia ANTES de drenar: un set() posterior no se pierde.
+                self._rx_event.clear()
+                # Lotes de hasta 256 líneas por transporte: los emstat_data consecutivos
+                # se decodifican juntos con parser.feed_many (docs/emstat_feed_many.md).
+                tcp_lines = []
+                while self.tcp_lines and len(tcp_lines) < 256:
+                    tcp_lines.append(self.tcp_lines.popleft())
+                if tcp_lines:
+                    self._handle_emstat_lines(tcp_lines, "tcp", parsers["tcp"])
+                elif (
+                    self._tcp_eof
+                    and self._plot_source == "tcp"
+                    and not self.merge_buf.released
+                ):
+                    # El TCP graficado se cortó (y ya se drenó lo que trajo): el resto de la
+                    # corrida llega solo por UDP, que pasa a colocarse directo en vivo.
+                    self._place_rows(self.merge_buf.release())
+                udp_frames = udp_sub.drain(256) if udp_sub is not None else []
+                if udp_frames and not self.stop_event.is_set():
+                    self._handle_emstat_lines([f.text for f in udp_frames], "udp", parsers["udp"])
                 if self.stop_event.is_set():
                     break
-            for _ in range(256):
+                if tcp_lines or udp_frames:
+                    await asyncio.sleep(0)  # cede el loop al lector TCP entre lotes
+                else:
+                    await self._rx_event.wait()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            for name in ("_watchdog", "_nack_timer"):
+                timer = getattr(self, name)
+                setattr(self, name, None)
+                if timer is not None:
+                    timer.cancel()
+        print("Processor detenido.")
+        # El cierre toca widgets: lo hace el hilo de Tk al drenar el aviso.
+        self._ui_events.put(("end", run))
+
+    def _end_run(self, run):
+        # El procesador de run ya salió: desde aquí solo el hilo de Tk toca
+        # merge_buf y la cobertura. Un aviso de otra corrida no se toca.
+        if run != self.run_index or self.processor_task is None:
+            return
+        self.processor_task = None
+        if self.running:
+            self.stop(send_abort=False)  # terminal/watchdog: el procesador cerró primero
+        else:
+            self._finish_run()
+
+    def _finish_run(self):
+        """Cierre de la corrida con el procesador ya detenido (hilo de Tk)."""
+        self._cancel_update()
+        self._print_coverage()  # resumen de cobertura TCP vs UDP (Fase 0)
+        # Fase 2: reconcilia TCP+UDP por seq y redibuja (fuera de este callback).
+        try:
+            self.after(0, self._reconcile_merge)
+        except Exception:
+            pass
+        self.btn_start.configure(state=ttk.NORMAL)
+        self.cmb_transport.configure(state="readonly")
+        self.chk_keep.configure(state=ttk.NORMAL)
+
+    def _arm_watchdog(self):
+        """Timer del loop: revisa los watchdogs a su vencimiento y se reprograma
+        para el próximo (cada mensaje solo actualiza _last_rx)."""
+        self._watchdog = None
+        if self.stop_event.is_set() or self._terminated:
+            return
+        now = time.time()
+        if self._run_started:
+            # Watchdog: si arrancó la corrida y nadie manda nada por un rato,
+            # cerramos (red de seguridad ante un terminal perdido en ambos).
+            due = (self._last_rx or now) + self.watchdog_timeout
+            if now >= due:
+                self._terminated = True
+                print(f"WATCHDOG: sin paquetes por {self.watchdog_timeout}s; cierro corrida")
+                self._post_status("Watchdog: total inactivity, run closed.")
+                self.stop_event.set()
+                self._rx_event.set()
+                return
+        else:
+            # Watchdog de arranque: conecto el TCP, mando el payload, pero el Pico
+            # nunca respondio (ni emstat_start ni JSON_PARSE) -> el comando se perdio
+            # corrupto/entero en el UART_LINK. Sin esto la corrida se cuelga para
+            # siempre tras "starting tcp". Doblamos el timeout normal como margen.
+            due = self._run_start_ts + 2 * self.watchdog_timeout
+            if now >= due:
+                self._terminated = True
+                print("WATCHDOG: el experimento nunca arranco; cierro corrida")
+                self._post_status("Watchdog: Pico did not respond (lost command?); retry.")
+                self.stop_event.set()
+                self._rx_event.set()
+                return
+        self._watchdog = asyncio.get_running_loop().call_later(
+            max(0.05, due - now), self._arm_watchdog
+        )
+
+    def _nack_tick(self):
+        """Timer del loop (rtx confirmado por el Pico): pide los huecos vencidos por
+        la sesión TCP y, tras el terminal, cierra la corrida apenas se resolvieron o
+        al vencer rtx_grace_s. Sin TCP no hay por dónde pedir: cierra en el acto."""
+        if self._nack_timer is not None:
+            self._nack_timer.cancel()
+        self._nack_timer = None
+        if self.stop_event.is_set():
+            return
+        link_run = self.link_run
+        usable = link_run is not None and not self._tcp_eof
+        if usable:
+            ranges = self.nack.due()
+            if ranges:
                 try:
-                    line = self.q_udp_lines.get_nowait()
-                except queue.Empty:
-                    break
-                got = True
-                self._handle_emstat_line(line, "udp", parsers["udp"])
+                    link_run.send({"cmd": "NACK", "r": ranges})
+                except OSError:
+                    usable = False
+        if self._rtx_close_at is not None and (
+            not usable or not self.nack.pending() or time.monotonic() >= self._rtx_close_at
+        ):
+            if self.nack.pending():
+                print(f"NACK: cierro con {self.nack.pending()} hueco(s) sin resolver")
+            self.stop_event.set()
+            self._rx_event.set()
+            return
+        self._nack_timer = asyncio.get_running_loop().call_later(self.nack_tick_s, self._nack_tick)
+
+    def _handle_emstat_lines(self, lines, source, parser):
+        """Procesa un lote drenado de líneas EMSTAT de un transporte, en orden. Los
+        emstat_data crudos consecutivos se acumulan y se decodifican juntos
+        (_handle_data_batch), junto con los de las tramas coalescidas (emstat_batch);
+        cualquier otro mensaje vacía el acumulado antes de aplicarse, así el orden
+        relativo se conserva."""
+        raws, seqs = [], []
+        for line in lines:
+            for msg in self._emstat_msgs(line, source):
+                mtype = msg.get("type")
+                if mtype == "emstat_data" and "pkt" not in msg:
+                    raws.append(msg.get("raw", ""))
+                    seqs.append(msg.get("seq"))
+                    continue
+                if mtype == "emstat_batch":
+                    # Trama coalescida: sus paquetes se suman al mismo lote.
+                    batch = unpack_emstat_batch(msg)
+                    if batch is not None:
+                        raws.extend(batch[0])
+                        seqs.extend(batch[1])
+                        continue
+                if raws:
+                    self._handle_data_batch(raws, seqs, source, parser)
+                    raws, seqs = [], []
                 if self.stop_event.is_set():
-                    break
-            if self.stop_event.is_set():
-                break
-            if not got:
-                # Watchdog: si arrancó la corrida y nadie manda nada por un rato,
-                # cerramos (red de seguridad ante un terminal perdido en ambos).
-                if (
-                    self._run_started
-                    and self._last_rx is not None
-                    and (time.time() - self._last_rx) > self.watchdog_timeout
-                    and not self._terminated
-                ):
-                    self._terminated = True
-                    print(f"WATCHDOG: sin paquetes por {self.watchdog_timeout}s; cierro corrida")
-                    self._set_status("Watchdog: total inactivity, run closed.")
-                    self.stop_event.set()
-                    break
-                # Watchdog de arranque: conecto el TCP, mando el payload, pero el Pico
-                # nunca respondio (ni emstat_start ni JSON_PARSE) -> el comando se perdio
-                # corrupto/entero en el UART_LINK. Sin esto la corrida se cuelga para
-                # siempre tras "starting tcp". Doblamos el timeout normal como margen.
-                if (
-                    not self._run_started
-                    and not self._terminated
-                    and (time.time() - self._run_start_ts) > (2 * self.watchdog_timeout)
-                ):
-                    self._terminated = True
-                    print("WATCHDOG: el experimento nunca arranco; cierro corrida")
-                    self._set_status("Watchdog: Pico did not respond (lost command?); retry.")
-                    self.stop_event.set()
-                    break
-                time.sleep(0.01)
-        print("Processor detenido.")
-        self.processor_th = None
-        self.stop(send_abort=False)
+                    return
+                self._handle_emstat_msg(msg, source, parser)
+            if self.stop_event.is_set() and not raws:
+                return
+        if raws:
+            self._handle_data_batch(raws, seqs, source, parser)
 
-    def _handle_emstat_line(self, line, source, parser):
-        """Procesa una "línea" EMSTAT de un transporte. Una línea puede traer VARIOS
+    def _emstat_msgs(self, line, source):
+        """Mensajes (dicts) de una "línea" EMSTAT de un transporte. Una línea puede traer VARIOS
         mensajes pegados: si el buffer RX del UART del Wemos se desborda en un mensaje
         largo (p.ej. emstat_start, que lleva todos los params) se pierde el '\\n' y el
         siguiente mensaje queda concatenado. Partimos por el marcador 'EMSTAT:' y
         procesamos cada segmento por separado, así un segmento truncado no se traga al
         mensaje válido que viene pegado."""
         if "EMSTAT:" not in line:
-            return
+            return []
         # Guard temporal (hardcode): un error de MethodSCRIPT (e!####:) en CUALQUIER
         # parte del payload se maneja como fatal, aunque venga en un mensaje truncado/
         # pegado que no parsea como JSON. Independiente del framing; el split de abajo
@@ -847,11 +976,21 @@ class EventPlotter(ttk.Frame):
         m = re.search(r'e!\d{3,}:[^"}]*', line)
         if m:
             self._handle_methodscript_error(m.group(0), source)
-            return
+            return []
+        msgs = []
         for seg in line.split("EMSTAT:"):
             seg = seg.strip()
             if not seg:
                 continue
+            if seg.startswith("#"):
+                # Trama binaria "b1" (base64): emstat_data compacto del Pico v2.0+; con
+                # tramas coalescidas trae varios paquetes.
+                frames = decode_binary_frames(seg)
+                if frames is None:
+                    print(f"Trama binaria corrupta descartada [{source}]: {seg[:80]}")
+                else:
+                    msgs.extend(frames)
+                continue
             try:
                 msg = json.loads(seg)
             except Exception:
@@ -863,21 +1002,26 @@ class EventPlotter(ttk.Frame):
                     print(f"JSON parcial/corrupto descartado [{source}]: {seg[:80]}")
                 continue
             if isinstance(msg, dict):
-                self._handle_emstat_msg(msg, source, parser)
+                msgs.append(msg)
+        return msgs
 
     def _handle_emstat_msg(self, msg, source, parser):
-        """Aplica la lógica de un mensaje EMSTAT ya parseado. Cuenta cobertura por 'seq'
-        (ambos transportes) pero solo grafica/almacena el transporte seleccionado
-        (Fase 0). Cierra con el primer terminal/error de cualquier transporte (Fase 1)."""
+        """Aplica la lógica de un mensaje EMSTAT ya parseado, de cualquier transporte.
+        Cuenta cobertura por 'seq' y lo anota para el NACK. Las filas de datos de
+        ambos transportes van a merge_buf (_apply_data_rows): el transporte elegido
+        se coloca en vivo y el otro solo rellena los seq que a aquel le faltan, en
+        su lugar (_place_rows). Cierra con el primer terminal/error de cualquier
+        transporte (Fase 1)."""
         self._last_rx = time.time()
         mtype = msg.get("type")
         seq = msg.get("seq")
-        selected = source == self._plot_source
+        if self._rtx_on and isinstance(seq, int):
+            self.nack.observe(seq)
 
         # Cola de diagnóstico (se imprime al cerrar): datos con su raw recortado,
         # el resto solo con su type — suficiente para ver cómo terminó el stream.
         if mtype == "emstat_data":
-            self._raw_tail.append(f"{source} seq={seq} {str(msg.get('raw', ''))[:70]}")
+            self._raw_tail.append(f"{source} seq={seq} {str(msg.get('raw', '<b1>'))[:70]}")
         else:
             self._raw_tail.append(f"{source} seq={seq} <{mtype}>")
 
@@ -893,14 +1037,42 @@ class EventPlotter(ttk.Frame):
                 self._terminated = True
                 detail = f"Pico rechazo el comando ({err}); reintenta (via {source.upper()})."
                 print(f"PICO ERROR [{source}]: {msg}")
-                self._set_status(detail)
+                self._post_status(detail)
                 self.stop_event.set()
             return
 
         if mtype == "emstat_start":
+            if source == self._plot_source and msg.get("fmt"):
+                print(f"Relay EMSTAT en formato {msg.get('fmt')!r} (confirmado por el Pico)")
             self._run_started = True
             if self._acq_t0 is None:
                 self._acq_t0 = time.time()  # ancla del contador de fase del pre-tratamiento
+            if source == self._plot_source and msg.get("batch"):
+                print(f"Relay EMSTAT en tramas de hasta {msg.get('batch')} paquetes (confirmado por el Pico)")
+            if msg.get("rtx") and not self._rtx_on:
+                # El Pico guarda los últimos emstat_data: desde aquí se piden los huecos.
+                print(f"NACK activo (ring de {msg.get('rtx')} paquetes en el Pico)")
+                self._rtx_on = True
+                kwargs = dict(self.parser_kwargs, ca_has_equil=False)
+                self._rtx_parser = EmstatStreamParser(experiment=self.method, **kwargs)
+                self._nack_tick()
+            return
+
+        if mtype == "emstat_batch":
+            # Trama coalescida fuera del lote de _handle_emstat_lines (p.ej. inválida).
+            batch = unpack_emstat_batch(msg)
+            if batch is None:
+                print(f"Trama coalescida inválida descartada [{source}]: {str(msg)[:80]}")
+                return
+            self._handle_data_batch(*batch, source, parser)
+            return
+
+        if mtype == "emstat_rtx":
+            self._apply_rtx(msg)
+            return
+
+        if mtype == "emstat_rtx_miss":
+            self.nack.give_up(msg.get("seqs") or [])
             return
 
         if mtype == "script_dbg":
@@ -916,75 +1088,22 @@ class EventPlotter(ttk.Frame):
             return
 
         if mtype == "emstat_data":
+            # Camino escalar: trama binaria con paquete ya parseado ("pkt"). Los raw
+            # llegan en lote por _handle_data_batch.
             self._run_started = True
             if seq is not None:
                 self.seq_seen[source].add(seq)
             raw = msg.get("raw", "")
-            event = parser.feed_raw(raw)
+            pkt = msg.get("pkt")
+            event = parser.feed_parsed(pkt) if pkt is not None else parser.feed_raw(raw)
             if not event:
                 return
             etype = event.get("type")
-            if etype == "error":
-                # Error de MethodSCRIPT (e!####) embebido en un emstat_data: el EmStat
-                # rechazó el script. Fatal -> mostrar y cerrar la corrida.
-                self._handle_methodscript_error(event.get("raw", raw), source)
-                return
             if etype == "data":
-                if self._acq_t0 is None:
-                    self._acq_t0 = time.time()  # fallback si se perdió emstat_start
-                # Inicio real del barrido = primer paquete cuya fase != "pretreatment".
-                # Marca _sweep_t0 (corta el contador de fase) y dispara la red de
-                # seguridad del motor (el pre-tratamiento TAMBIEN emite datos, así que el
-                # 1er emstat_data NO es el barrido). One-shot, desde cualquier transporte;
-                # los handlers solo deben tocar cosas thread-safe.
-                if self._sweep_t0 is None and event.get("phase") != "pretreatment":
-                    self._sweep_t0 = time.time()
-                    if self.pretreatment_phases:
-                        self._set_status("Sweep — acquiring…")
-                    if self.on_first_data is not None:
-                        cb = self.on_first_data
-                        self.on_first_data = None
-                        try:
-                            cb()
-                        except Exception as e:
-                            print(f"on_first_data hook error: {e}")
-                # Fase 2: guarda el evento por seq (ambos transportes; el primero que
-                # llega gana). Al cerrar se reconstruye la unión ordenada -> rellena lo
-                # que el primario perdió con lo que trajo el otro.
-                if seq is not None:
-                    event["seq"] = seq
-                    event["source"] = source
-                    self.merged_by_seq.setdefault(seq, event)
-                if selected:  # el transporte elegido alimenta la gráfica en vivo
-                    event["run"] = self.run_index
-                    # El pre-tratamiento SWV (phase="pretreatment") se CONSERVA en
-                    # total_data (CSV) pero NO se grafica: solo aporta ruido (clusters a
-                    # E constante). Solo los puntos del barrido alimentan la gráfica.
-                    self.total_data.append(event)
-                    if event.get("phase") != "pretreatment":
-                        # Clave de línea desplazada por corrida (retención): cycle crudo se
-                        # conserva en el evento; run etiqueta la corrida para leyenda/CSV.
-                        cyc = event.get("cycle", 0)
-                        m = self.plot_run_offset + cyc
-                        self.key_meta.setdefault(m, (self.run_index, cyc))
-                        self._capture_cycle_label(m, event)
-                        try:
-                            self.q_points.put_nowait(
-                                (
-                                    event.get(self.x_key, 0.0),
-                                    event.get(self.y_key, 0.0),
-                                    m,
-                                )
-                            )
-                        except Exception:
-                            pass
-            elif "method" in etype and selected:
-                if etype == "method":
-                    name = event.get("method_name", "")
-                    self._set_status(f"Method: {name} (id {event['method_id']})")
-                    print("Method:", event["method_id"], name)
-                elif etype == "method_end":
-                    self._set_status(f"Method: {etype}")
+                event["seq"] = seq
+                self._apply_data_rows(rows_from_events([event]), source)
+            else:
+                self._apply_parser_event(event, raw, source)
             return
 
         if mtype in (
@@ -1006,9 +1125,175 @@ class EventPlotter(ttk.Frame):
             else:
                 status = f"{self._format_terminal_status(msg)} (via {source.upper()})"
             print(f"TERMINAL [{source}]: {status}")
-            self._set_status(status)
+            self._post_status(status)
+            if self._rtx_on and isinstance(seq, int):
+                self.nack.end(seq)
+                if self.nack.pending():
+                    # Huecos de la cola: se piden ya y la corrida espera a que
+                    # lleguen (o a rtx_grace_s) antes de cerrar.
+                    self._rtx_close_at = time.monotonic() + self.rtx_grace_s
+                    self._nack_tick()
+                    return
             self.stop_event.set()
 
+    def _handle_data_batch(self, raws, seqs, source, parser):
+        """emstat_data crudos consecutivos de un transporte -> parser.feed_many. Las
+        filas y los eventos (marcadores/errores) se aplican intercalados en el orden
+        del stream, igual que mensaje a mensaje."""
+        self._last_rx = time.time()
+        self._run_started = True
+        seen = self.seq_seen[source]
+        seen.update(s for s in seqs if s is not None)
+        if self._rtx_on:
+            for s in seqs:
+                if s is not None:
+                    self.nack.observe(s)
+        tail = self._raw_tail.maxlen
+        for seq, raw in zip(seqs[-tail:], raws[-tail:]):
+            self._raw_tail.append(f"{source} seq={seq} {str(raw)[:70]}")
+        data, events = parser.feed_many(raws, seqs)
+        row = 0
+        for event in events:
+            self._apply_data_rows(data[row : event["row"]], source)
+            row = event["row"]
+            if self._apply_parser_event(event, event.get("raw", ""), source):
+                return
+        self._apply_data_rows(data[row:], source)
+
+    def _apply_rtx(self, msg):
+        """emstat_rtx: un emstat_data reenviado por el Pico a pedido (NACK). Llega por
+        ambos transportes; cuenta el primero y solo si ningún transporte trajo ese
+        seq. El paquete se decodifica con un parser aparte (el de la corrida ya pasó
+        ese punto) y toma cycle/direction -- y t_s en CA -- de sus vecinos en el
+        merge. Marcadores reenviados (M/C/'*') no reconstruyen el contexto: se
+        ignoran."""
+        seq = msg.get("seq")
+        if not isinstance(seq, int) or any(seq in seen for seen in self.seq_seen.values()):
+            return
+        inner = str(msg.get("msg", ""))
+        if inner.startswith("#"):
+            data = decode_binary_frame(inner)
+        else:
+            try:
+                data = json.loads(inner)
+            except Exception:
+                data = None
+        if not isinstance(data, dict) or data.get("type") != "emstat_data":
+            return
+        pkt = data.get("pkt")
+        raw = data.get("raw", "")
+        if pkt is None and not str(raw).strip().startswith("P"):
+            return
+        event = self._rtx_parser.feed_parsed(pkt) if pkt is not None else self._rtx_parser.feed_raw(raw)
+        if not event or event.get("type") != "data":
+            return
+        event["seq"] = seq
+        rows = rows_from_events([event])
+        ca = self.method == "ca"
+        self.merge_buf.fill_context(rows, interp=("t_s",) if ca else ())
+        if ca and np.isnan(rows["t_s"][0]):
+            return  # sin vecinos a ambos lados (equilibrio o cola): t_s desconocido
+        self.seq_seen["rtx"].add(seq)
+        self._place_rows(self.merge_buf.add(rows, "rtx"))
+
+    def _apply_parser_event(self, event, raw, source):
+        """Evento no-dato del parser (marcador o error). True si cerró la corrida."""
+        etype = event.get("type")
+        if etype == "error":
+            # Error de MethodSCRIPT (e!####) embebido en un emstat_data: el EmStat
+            # rechazó el script. Fatal -> mostrar y cerrar la corrida.
+            self._handle_methodscript_error(event.get("raw", raw), source)
+            return True
+        if "method" in etype and source == self._plot_source:
+            if etype == "method":
+                name = event.get("method_name", "")
+                self._post_status(f"Method: {name} (id {event['method_id']})")
+                print("Method:", event["method_id"], name)
+            elif etype == "method_end":
+                self._post_status(f"Method: {etype}")
+        return False
+
+    def _apply_data_rows(self, rows, source):
+        """Filas data (BATCH_DTYPE) de un transporte: merge por seq (ambos) y
+        colocación en run_store (CSV) + plot de lo que el merge libera."""
+        if not len(rows):
+            return
+        if self._acq_t0 is None:
+            self._acq_t0 = time.time()  # fallback si se perdió emstat_start
+        # Inicio real del barrido = primer paquete cuya fase != "pretreatment".
+        # Marca _sweep_t0 (corta el contador de fase) y dispara la red de
+        # seguridad del motor (el pre-tratamiento TAMBIEN emite datos, así que el
+        # 1er emstat_data NO es el barrido). One-shot, desde cualquier transporte;
+        # los handlers solo deben tocar cosas thread-safe.
+        pre = rows["phase"] == BATCH_PHASES.index("pretreatment")
+        if self._sweep_t0 is None and not pre.all():
+            self._sweep_t0 = time.time()
+            if self.pretreatment_phases:
+                self._post_status("Sweep — acquiring…")
+            if self.on_first_data is not None:
+                cb = self.on_first_data
+                self.on_first_data = None
+                try:
+                    cb()
+                except Exception as e:
+                    print(f"on_first_data hook error: {e}")
+        # Fase 2: guarda las filas por seq (ambos transportes; el primero que llega
+        # gana) y coloca ya las que correspondan: las del transporte graficado y los
+        # rellenos de sus huecos con lo que trajo el otro.
+        self._place_rows(self.merge_buf.add(rows, source))
+        if source == self._plot_source:
+            # Firmware sin seq: no hay merge posible, se anexa tal cual llega.
+            noseq = rows[rows["seq"] < 0]
+            if len(noseq):
+                self.run_store.append(noseq, self.run_index, source)
+                self._queue_points(noseq)
+
+    def _place_rows(self, rows):
+        """Filas reconciliadas (STORE_DTYPE, ordenadas por seq) -> run_store (CSV) en
+        su lugar por seq + puntos a graficar. El pre-tratamiento SWV
+        (phase="pretreatment") se CONSERVA en run_store pero NO se grafica: solo aporta
+        ruido (clusters a E constante)."""
+        if not len(rows):
+            return
+        rows["run"] = self.run_index
+        self.run_store.insert_sorted(self._run_td_start, rows)
+        self._queue_points(rows)
+
+    def _queue_points(self, rows):
+        plot = rows[rows["phase"] != BATCH_PHASES.index("pretreatment")]
+        if not len(plot):
+            return
+        # Clave de línea desplazada por corrida (retención): cycle crudo se conserva
+        # en la fila; run etiqueta la corrida para leyenda/CSV.
+        ms = self.plot_run_offset + plot["cycle"].astype(np.int64)
+        self._register_lines(plot, ms)
+        try:
+            self.q_points.put_nowait(
+                (
+                    self._plot_col(plot, self.x_key),
+                    self._plot_col(plot, self.y_key),
+                    ms,
+                    plot["seq"].astype(np.int64),
+                )
+            )
+        except Exception:
+            pass
+
+    @staticmethod
+    def _plot_col(rows, key):
+        """Columna a graficar; ausente (NaN) -> 0.0, como event.get(key, 0.0)."""
+        col = rows[key]
+        return np.where(np.isnan(col), 0.0, col)
+
+    def _register_lines(self, rows, ms):
+        """key_meta y etiqueta de leyenda para las claves de línea nuevas del bloque."""
+        for m in np.unique(ms).tolist():
+            if m in self.key_meta and (self.cycle_legend is None or m in self.cycle_label_values):
+                continue
+            sel = rows[ms == m]
+            self.key_meta.setdefault(m, (self.run_index, int(sel["cycle"][0])))
+            self._capture_cycle_label(m, sel)
+
     def _handle_methodscript_error(self, raw, source):
         """Surface + cierre ante un error de MethodSCRIPT (e!####) del EmStat. Es fatal:
         el script fue rechazado y no vendrán datos. NO se manda ABORT (ante un error de
@@ -1027,7 +1312,7 @@ class EventPlotter(ttk.Frame):
         if self._terminated:
             return
         self._terminated = True
-        self._set_status(f"MethodSCRIPT error: {detail} (via {source.upper()})")
+        self._post_status(f"MethodSCRIPT error: {detail} (via {source.upper()})")
         self.stop_event.set()
 
     def _print_coverage(self):
@@ -1046,9 +1331,10 @@ class EventPlotter(ttk.Frame):
                 print("   ", entry)
         tcp = self.seq_seen["tcp"]
         udp = self.seq_seen["udp"]
+        rtx = self.seq_seen["rtx"]
         only_udp = sorted(udp - tcp)
         only_tcp = sorted(tcp - udp)
-        union = tcp | udp
+        union = tcp | udp | rtx
         cap = 60
 
         def _fmt(xs):
@@ -1064,6 +1350,13 @@ class EventPlotter(ttk.Frame):
         print(f"  TCP={len(tcp)}  UDP={len(udp)}  union={len(union)}")
         print(f"  solo-UDP (perdidos en TCP): {len(only_udp)} -> {_fmt(only_udp)}")
         print(f"  solo-TCP (perdidos en UDP): {len(only_tcp)} -> {_fmt(only_tcp)}")
+        if self._rtx_on:
+            st = self.nack.stats
+            rejected = f" descartados={st['rejected']}" if st["rejected"] else ""
+            print(
+                f"  NACK: huecos={st['gaps']} pedidos={st['nacked']} "
+                f"recuperados(rtx)={len(rtx)} abandonados={st['given_up']}{rejected}"
+            )
         print(f"  perdidos por AMBOS (huecos en la unión): {len(lost_both)} -> {_fmt(lost_both)}")
         if union:
             print(
@@ -1077,59 +1370,41 @@ class EventPlotter(ttk.Frame):
         print("=" * 56)
 
     def _reconcile_merge(self):
-        """Fase 2 (al cerrar): fusiona TCP+UDP por 'seq'. El transporte primario ya
-        graficó en vivo; aquí se reconstruye la UNIÓN ordenada por seq -> rellena los
-        seq que el primario perdió con los que trajo el otro transporte, reordena, redibuja
-        el dataset completo y lo deja en total_data para Save. Corre en el hilo UI."""
-        if not self.merged_by_seq:
+        """Fase 2 (al cerrar): el merge TCP+UDP por 'seq' ya se hizo en vivo
+        (_place_rows); aquí solo se colocan los huecos de la cola que el primario nunca
+        alcanzó, y se vuelcan los últimos bloques al plot. O(huecos), sin reordenar
+        ni redibujar la corrida. Corre en el hilo UI."""
+        merged = len(self.merge_buf) > 0
+        if merged:
+            self._place_rows(self.merge_buf.flush())
+            filled = self.merge_buf.recovered()
+            if self.merge_buf.rejected:
+                print(f"MERGE: {self.merge_buf.rejected} fila(s) con seq fuera de rango descartadas")
+            self.merge_buf.clear()  # la unión ya vive en run_store; libera la copia
+        # stop() ya canceló el loop de _update_plot: vuelca lo que quedó en la cola.
+        touched = self._drain_points()
+        for m in touched:
+            self.lines_by_m[m].set_data(*self.xy_by_m[m].view())
+        if self._renderer is not None and self._renderer.active:
+            # Fin del blitting: las trazas vuelven a ser artistas normales y sin
+            # decimar (zoom del toolbar con detalle completo).
+            self._renderer.end(
+                {self.lines_by_m[m]: buf.view() for m, buf in self.xy_by_m.items()}
+            )
+            touched = touched or set(self.xy_by_m)
+        if touched:
+            self.ax.relim()
+            self.ax.autoscale_view()
+            self._update_legends()
+            self.canvas.draw_idle()
+        if not merged:
             return
-        primary = self.seq_seen.get(self._plot_source, set())
-        ordered_seq = sorted(self.merged_by_seq)
-        filled = sum(1 for s in ordered_seq if s not in primary)
-        ordered = [self.merged_by_seq[s] for s in ordered_seq]
-        for ev in ordered:
-            ev["run"] = self.run_index
-
-        # Reemplaza SOLO la porción de esta corrida en total_data (para Save) — con
-        # retención ON conserva las corridas anteriores ya almacenadas.
-        self.total_data[self._run_td_start :] = ordered
-
-        # Limpia/reconstruye SOLO las líneas de esta corrida (claves >= offset); las
-        # corridas anteriores (claves < offset) quedan intactas en el gráfico.
-        for m in [k for k in list(self.lines_by_m) if k >= self.plot_run_offset]:
-            try:
-                self.lines_by_m[m].remove()
-            except Exception:
-                pass
-            self.lines_by_m.pop(m, None)
-            self.x_by_m.pop(m, None)
-            self.y_by_m.pop(m, None)
-            self.key_meta.pop(m, None)
-            self.cycle_label_values.pop(m, None)
-
-        for ev in ordered:
-            # El pre-tratamiento SWV queda en total_data (CSV) pero fuera del plot,
-            # igual que en vivo (ver _handle_emstat_msg).
-            if ev.get("phase") == "pretreatment":
-                continue
-            cyc = ev.get("cycle", 0)
-            m = self.plot_run_offset + cyc
-            self.key_meta.setdefault(m, (self.run_index, cyc))
-            self._capture_cycle_label(m, ev)
-            self._get_or_create_line(m)  # crea deque + Line2D para esta corrida/ciclo
-            self.x_by_m[m].append(ev.get(self.x_key, 0.0))
-            self.y_by_m[m].append(ev.get(self.y_key, 0.0))
-        for m, line in self.lines_by_m.items():
-            line.set_data(self.x_by_m[m], self.y_by_m[m])
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self._update_legends()
-        self.canvas.draw_idle()
-        print(f"MERGE: dataset={len(ordered)} puntos; recuperados del otro transporte: {filled}")
+        total = len(self.run_store) - self._run_td_start
+        print(f"MERGE: dataset={total} puntos; recuperados del otro transporte: {filled}")
         # Anexa el resumen al estado terminal en vez de reemplazarlo, p.ej.
         # "End of experiment (via TCP). Merge: 250 pts (+3 recovered)".
         self._set_status(
-            f"{self.lbl_status.cget('text')} Merge: {len(ordered)} pts (+{filled} recovered)"
+            f"{self.lbl_status.cget('text')} Merge: {total} pts (+{filled} recovered)"
         )
 
     @staticmethod
@@ -1164,37 +1439,55 @@ class EventPlotter(ttk.Frame):
                 pass
             self.after_id = None
 
-    def _update_plot(self):
-        """Drena la cola y actualiza las líneas; reprograma con after()."""
-        drained = 0
+    def _drain_points(self):
+        """Vuelca los bloques de q_points en los buffers de línea. Retorna las claves
+        de línea tocadas."""
+        touched = set()
         while True:
             try:
-                v, i, m = self.q_points.get_nowait()
+                xs, ys, ms, seqs = self.q_points.get_nowait()
             except queue.Empty:
                 break
-            line = self._get_or_create_line(m)
-            self.x_by_m[m].append(v)
-            self.y_by_m[m].append(i)
-            drained += 1
-
-        if drained > 0:
-            for m, line in self.lines_by_m.items():
-                xs = self.x_by_m[m]
-                ys_ = self.y_by_m[m]
-                if len(xs) > 0:
-                    line.set_data(xs, ys_)
-            self.ax.relim()
-            self.ax.autoscale_view()
-            # Actualiza leyenda por si hay nuevas líneas
+            # Un bloque suele ser de una sola línea; si cruza un cambio de ciclo se
+            # reparte por clave conservando el orden. Un relleno del otro transporte
+            # se inserta en su lugar por seq (XYLineBuffer.append).
+            for m in np.unique(ms).tolist():
+                sel = ms == m
+                self._get_or_create_line(m)
+                self.xy_by_m[m].append(xs[sel], ys[sel], seqs[sel])
+                touched.add(m)
+        return touched
 
-            self._update_legends()
+    def _update_plot(self):
+        """Drena la cola y actualiza las líneas; reprograma con after()."""
+        touched = self._drain_points()
+        if touched:
+            # La leyenda solo se rearma si cambió la membresía de líneas (antes se
+            # reconstruía y forzaba un draw completo en cada tick).
+            sig = (tuple(self.lines_by_m), len(self.cycle_label_values))
+            if sig != self._legend_sig:
+                self._legend_sig = sig
+                self._update_legends()
+            # Solo las líneas que recibieron puntos (o rellenos) se re-asignan.
+            if self._renderer is not None and self._renderer.active:
+                self._renderer.frame(
+                    {self.lines_by_m[m]: self.xy_by_m[m].view() for m in touched}
+                )
+            else:
+                for m in touched:
+                    self.lines_by_m[m].set_data(*self.xy_by_m[m].view())
+                self.ax.relim()
+                self.ax.autoscale_view()
+                self.canvas.draw_idle()
 
         # Indicador de fase del pre-tratamiento (el plot no cambia ahí; evita parecer
         # congelado). Se ejecuta en el mismo loop UI, sin timer aparte.
         self._refresh_phase_status()
+        # Estado y fin de corrida publicados desde el loop del motor.
+        self._drain_ui_events()
 
-        # Reprogramar si seguimos corriendo
-        if self.running:
+        # Reprogramar si seguimos corriendo o si el procesador aún no avisó su fin
+        if self.running or self.processor_task is not None:
             self._schedule_update()
 
     def _refresh_phase_status(self):
@@ -1218,14 +1511,20 @@ class EventPlotter(ttk.Frame):
     # ---------------------------
     # Utilidades de plotting
     # ---------------------------
-    def _capture_cycle_label(self, m, event):
+    def _capture_cycle_label(self, m, rows):
         """Captura (una vez por línea) el valor de leyenda configurado en
-        cycle_legend, p.ej. el potencial E_V del primer paquete de cada espectro EIS."""
+        cycle_legend, p.ej. el potencial E_V del primer paquete de cada espectro EIS.
+        rows: filas de esa línea; se toma el primer valor presente (no NaN)."""
         if self.cycle_legend is None or m in self.cycle_label_values:
             return
-        val = event.get(self.cycle_legend[0])
-        if val is not None:
-            self.cycle_label_values[m] = val
+        key = self.cycle_legend[0]
+        if key not in rows.dtype.names:
+            return
+        col = rows[key]
+        if col.dtype.kind == "f":
+            col = col[~np.isnan(col)]
+        if len(col):
+            self.cycle_label_values[m] = col[0].item()
 
     def _update_legends(self):
         """Actualiza las leyendas del gráfico según las líneas actuales."""
@@ -1286,12 +1585,18 @@ class EventPlotter(ttk.Frame):
                 styles.append((c, ls))
         return styles
 
+    def _forget_live_lines(self):
+        """Las líneas en vivo se borraron (clear/reset): el renderer no debe seguir
+        dibujándolas."""
+        if self._renderer is not None and self._renderer.active:
+            self._renderer.begin()
+        self._legend_sig = None
+
     def _get_or_create_line(self, m):
         if m in self.lines_by_m:
             return self.lines_by_m[m]
 
-        self.x_by_m[m] = deque(maxlen=self.max_points)
-        self.y_by_m[m] = deque(maxlen=self.max_points)
+        self.xy_by_m[m] = XYLineBuffer(self.max_points)
 
         idx = (m - 1) % len(self._style_cycle)
         c, ls = self._style_cycle[idx]
@@ -1301,6 +1606,8 @@ class EventPlotter(ttk.Frame):
 
         # Si el color es muy claro, mejora visibilidad del marcador:
         line.set_markeredgecolor("0.3")
+        if self._renderer is not None and self._renderer.active:
+            self._renderer.add_line(line)
 
         self.lines_by_m[m] = line
         return line
@@ -1308,6 +1615,23 @@ class EventPlotter(ttk.Frame):
     def _set_status(self, msg):
         self.lbl_status.configure(text=msg)
 
+    def _post_status(self, msg):
+        """_set_status desde el loop del motor: lo aplica el próximo tick de Tk."""
+        self._ui_events.put(("status", msg))
+
+    def _drain_ui_events(self, apply=True):
+        while True:
+            try:
+                kind, value = self._ui_events.get_nowait()
+            except queue.Empty:
+                return
+            if not apply:
+                continue
+            if kind == "status":
+                self._set_status(value)
+            elif kind == "end":
+                self._end_run(value)
+
 
 class LegendManagerWindow(ttk.Toplevel):
     """
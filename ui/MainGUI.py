@@ -4,7 +4,7 @@ __author__ = "Edisson A. Naula"
 __date__ = "$ 08/10/2025  at 09:35 a.m. $"
 
 from ui.PcrFrame import PCRFrame
-from Drivers.ClientUDP import UdpClient
+from Drivers.ClientUDP import SharedUdpClient
 from templates.constants import font_buttons_small, font_footer, font_options, font_text
 from ui.ConfigFrame import ConfigFrame
 from ui.TemperatureFrame import TemperatureFrame
@@ -337,14 +337,9 @@ class MainGUI(ttk.Window):
             self.client_tester.stop()
             self.client_tester = None
             return
-        self.client_tester = UdpClient(
+        self.client_tester = SharedUdpClient(
             port=5005,
-            buffer_size=512,
-            allow_broadcast=True,  # Important for broadcast payloads
-            local_ip="",  # "" listens on all interfaces (wlan0, eth0, etc.)
-            recv_timeout_sec=1.0,  # lets loop check stop flag periodically
             on_message=lambda t, a, t_d: self.on_message_tester(t, a, t_d),
-            parse_float=True,  # Arduino sends a numeric string
             auto_stop_after_sec=5.0,  # solo para test de conexión: se cierra si no llega broadcast
             on_timeout=self.on_test_timeout,
         )
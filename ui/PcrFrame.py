@@ -11,7 +11,12 @@ import ttkbootstrap as ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from ttkbootstrap.scrolled import ScrolledFrame
 
-from Drivers.ClientUDP import UdpClient
+from Drivers.ClientUDP import SharedUdpClient
+from Drivers.DriverHeater import HeaterActuator, make_heater
+from Drivers.PcrRunner import PcrRunner, skip_phase
+from Drivers.PcrTempEstimator import make_estimator
+from Drivers.PcrTempMonitor import TempMonitor
+from Drivers.PcrTraceStore import PcrTraceStore
 from templates import pcr_projects as pcrp
 from templates.constants import (
     chip_rasp,
@@ -22,6 +27,9 @@ from templates.constants import (
 )
 from templates.utils import (
     experiment_dir,
+    get_setting,
+    get_setting_bool,
+    get_setting_int,
     read_settings_from_file,
     read_temp_source,
     temp_source_index,
@@ -46,16 +54,6 @@ thread_motor = None
 ads = None
 thread_lock = threading.Lock()
 
-# Duración de la lectura de fluorescencia (fuente única de verdad).
-# Usadas como defaults de _read_fluorescence, en los sleeps previos a cada
-# lectura y en la estimación de tiempo restante del experimento.
-FLUOR_PRE_SLEEP_S = 0.5  # espera tras el hold de extensión, antes de muestrear
-FLUOR_BASELINE_S = 0.5  # ventana de línea base (luz OFF)
-FLUOR_LIGHT_S = 2.0  # ventana de excitación (luz ON)
-FLUOR_POST_S = 0.5  # ventana de decaimiento (luz OFF)
-# Tiempo total que consume una lectura completa (sleep previo + 3 ventanas).
-FLUOR_READ_TOTAL_S = FLUOR_PRE_SLEEP_S + FLUOR_BASELINE_S + FLUOR_LIGHT_S + FLUOR_POST_S
-
 # Fuentes de temperatura válidas en PCR: IR Ambient queda fuera (no es la
 # temperatura de la muestra, solo referencia). El primario regula el PID y el
 # secundario capturado/ploteado es el complemento del par {IR Object, Termocupla}.
@@ -78,18 +76,6 @@ def check_temp_higher(temp, target_temp):
     return temp >= target_temp
 
 
-def _skip(t):
-    """True si una fase debe omitirse: su tiempo es <= 0 (o no numérico).
-
-    Cuando una fase se omite se salta tanto la rampa de alcance como el hold,
-    para no calentar hacia un setpoint que luego no se sostiene.
-    """
-    try:
-        return float(t) <= 0
-    except (TypeError, ValueError):
-        return False
-
-
 def _project_slug(name):
     """Slug seguro para nombre de archivo a partir del proyecto PCR activo.
 
@@ -105,52 +91,6 @@ def _project_slug(name):
     return slug or "last_run"
 
 
-def _fuzzy_gains(error: float, base_kp: float, base_ki: float) -> tuple:
-    """Escala KP/KI dinámicamente según la magnitud del error (fuzzy gain scheduling).
-
-    Tres zonas con interpolación lineal para transiciones suaves:
-      |e| >= 15°C  → agresivo (kp×2.0, ki×0.2): rampas largas sin windup
-      5 <= |e| < 15 → intermedio: transición suave
-      |e| < 5°C    → preciso  (kp×0.5, ki×1.3): regulación cerca del setpoint
-
-    Los factores de escala operan sobre las ganancias base leídas de settings.json,
-    por lo que el punto de operación nominal sigue siendo configurable allí.
-    """
-    abs_error = abs(error)
-    if abs_error >= 5.0:
-        kp_s, ki_s = 2.0, 0.2
-    elif abs_error >= 2.0:
-        t = (abs_error - 5.0) / 10.0  # 0..1 de 3°C a 7°C
-        kp_s = 1.0 + t * 1.0  # 1.0 → 2.0
-        ki_s = 1.0 - t * 0.8  # 0.2 → 1.0
-    else:
-        t = abs_error / 5.0  # 0..1 de 0°C a 3°C
-        kp_s = 0.5 + t * 0.5  # 0.5 → 1.0
-        ki_s = 1.3 - t * 0.3  # 1.0 → 1.3
-    return base_kp * kp_s, base_ki * ki_s
-
-
-def _fuzzy_max_age(error: float, m_age_min: float, m_age_max: float) -> float:
-    """Escala dinámicamente la edad máxima de temperatura confiable (freshness).
-
-    Reutiliza los mismos umbrales de |error| que `_fuzzy_gains` (2°C y 5°C):
-      |e| >= 5°C   → m_age_max (plano): rampa dura, tolera lecturas UDP añejas
-      2 <= |e| < 5 → interpolación lineal m_age_min → m_age_max
-      |e| < 2°C    → m_age_min (plano): cerca del setpoint, exige frescura
-
-    Monótona: mayor error ⇒ mayor m_age. Solo se usa en la rampa (reach);
-    el hold conserva su umbral estricto. Los límites vienen de settings.json
-    por fase (m_age_min_<phase> / m_age_max_<phase>).
-    """
-    abs_error = abs(error)
-    if abs_error >= 5.0:
-        return m_age_max
-    if abs_error < 2.0:
-        return m_age_min
-    t = (abs_error - 2.0) / 3.0  # 0..1 de 2°C a 5°C
-    return m_age_min + t * (m_age_max - m_age_min)
-
-
 def create_widgets_pcr(parent):
     entries = []
 
@@ -241,8 +181,12 @@ class PCRFrame(ttk.Frame):
         ttk.Frame.__init__(self, parent)
         self.parent = parent
         self.running_experiment = False
-        self.pin_heating = None
+        # Actuador del LED calefactor (Drivers/DriverHeater.py): el lazo PI solo
+        # fija el duty; la modulación la hace el backend (lgpio/pigpio/software).
+        self.heater: "HeaterActuator | None" = None
         self.pin_pcr = None
+        # Disco simulado (Drivers/VirtualDisc.py) cuando "pcr_simulator" está activo.
+        self.virtual_disc = None
         self.temp = 0.0
         self.temp_ts = time.time()
         # Últimas tres temperaturas crudas del disco por índice del payload UDP
@@ -264,7 +208,12 @@ class PCRFrame(ttk.Frame):
         # junto al primario. Seed 20° (aparece solo si nunca llegó lectura);
         # ante sensor caído sostiene el último valor (igual que el primario).
         self.temp_secondary = 20.0
-        self.data_temperature_secondary: list = []
+        # Estimador de la temperatura de control ("temp_estimator": EMA o Kalman,
+        # ver docs/pcr_temp_estimator.md). Se rearma al inicio de cada corrida.
+        self.temp_estimator = self._make_temp_estimator()
+        # Esperas por temperatura del hilo del experimento: las despierta cada
+        # datagrama (publish en update_displayed_temperature), sin sondeo.
+        self.temp_monitor = TempMonitor()
         # Visibilidad de la curva secundaria: SOLO vista. El canal se sigue
         # leyendo, suavizando y escribiendo en la columna 1 del CSV aunque esté
         # oculto (el lector del análisis lee esa columna por posición). Arranca
@@ -278,23 +227,16 @@ class PCRFrame(ttk.Frame):
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         self.ads = ads_reader
-        self.fase = "Initial"
+        # Secuencia de la corrida (Drivers/PcrRunner.py): fase, ciclos completos,
+        # duración media y log de enfriamiento. Se rearma en cada corrida; la UI
+        # lee de aquí el estado y la estimación del tiempo restante.
+        self.runner = PcrRunner(self)
         self.ts_display = 0.5
         self.last_display = time.time()
         self.start_pcr_time = time.time()
-        self.cycles_complete = 0
-        self.start_cycle_time = time.time()
-        self.time_end_cycle = time.time()
         self.total_cycles = 0
         self.teorical_time_pcr = 0
-        self.last_cycle_duration = 0.0
-        self.avg_cycle_duration = 0.0
         self.ext_time_final = 0.0
-        # Marca del arranque de la extensión final (0.0 = aún no empieza; el reloj
-        # de pared nunca es 0). La estimación la usa para contar hacia abajo el
-        # segmento final en vez de caer al tiempo teórico ya agotado por el error
-        # acumulado entre ciclos.
-        self.start_final_ext_time = 0.0
         self.stop_event_motor = None
         self.stop_udp_listenner = None
         self.thread_experiment = None
@@ -350,12 +292,13 @@ class PCRFrame(ttk.Frame):
         self.toolbar: "NavigationToolbar2Tk | None" = None
         self.line: "plt.Line2D | None" = None
         self.line_secondary: "plt.Line2D | None" = None
+        # Banda ±2σ de la estimación del primario (solo con el estimador Kalman).
+        self.band_temp = None
         self.callback_generate_profile()  # Generar el gráfico inicial
-        self.data_temperature = []
-        # Eje temporal real de la curva: segundos transcurridos desde el inicio de
-        # la corrida, uno por muestra (ver docs/pcr_eje_tiempo.md). Se anexa en
-        # lockstep con las dos curvas de temperatura.
-        self.data_time: list = []
+        # Curva de temperatura: primario, secundario y eje temporal real (segundos
+        # desde el inicio de la corrida, ver docs/pcr_eje_tiempo.md), una fila por
+        # muestra en un store preasignado (ver docs/pcr_trace_store.md).
+        self.trace = PcrTraceStore(self._window_setting())
         self.data_photodetector = []
         self.data_photodetector_series = []
 
@@ -794,7 +737,7 @@ class PCRFrame(ttk.Frame):
             current_time += initial_spin_time
 
             # Rampa + hold de denaturation (omitible)
-            if not _skip(denat_time):
+            if not skip_phase(denat_time):
                 ramp_denat = transition_time_up(current_temp, denat_temp)
                 phase_segments.append(
                     (
@@ -827,7 +770,7 @@ class PCRFrame(ttk.Frame):
             n_display = min(5, cycles)
             for _ in range(n_display):
                 # Rampa + hold High (omitible)
-                if not _skip(time_high):
+                if not skip_phase(time_high):
                     ramp_high = transition_time_up(current_temp, high_temp)
                     phase_segments.append(
                         (
@@ -851,8 +794,8 @@ class PCRFrame(ttk.Frame):
                 # omite). Solo si hay algo más frío hacia lo que enfriar.
                 cool_target = (
                     low_temp
-                    if not _skip(time_low)
-                    else (ext_temp if not _skip(ext_time) else None)
+                    if not skip_phase(time_low)
+                    else (ext_temp if not skip_phase(ext_time) else None)
                 )
                 if cool_target is not None and current_temp > cool_target:
                     phase_segments.append(
@@ -869,7 +812,7 @@ class PCRFrame(ttk.Frame):
                     current_temp = cool_target
 
                 # Hold Low (omitible)
-                if not _skip(time_low):
+                if not skip_phase(time_low):
                     phase_segments.append(
                         (current_time, current_time + time_low, low_temp, low_temp, "Low", "blue")
                     )
@@ -877,7 +820,7 @@ class PCRFrame(ttk.Frame):
                     current_temp = low_temp
 
                 # Rampa + hold Extension (omitible)
-                if not _skip(ext_time):
+                if not skip_phase(ext_time):
                     ramp_ext = transition_time_up(current_temp, ext_temp)
                     phase_segments.append(
                         (
@@ -905,7 +848,7 @@ class PCRFrame(ttk.Frame):
                     current_temp = ext_temp
 
             # Extensión final (omitible; recortable si es muy larga)
-            if not _skip(ext_time_final):
+            if not skip_phase(ext_time_final):
                 disp_ext_final, real_ext_final, clipped_ext_final = clip_hold(ext_time_final)
                 phase_segments.append(
                     (
@@ -1000,22 +943,32 @@ class PCRFrame(ttk.Frame):
             self._chan_last_good[i] = now
             return f
 
+        # El tiempo sale de temps_list[3] —que estampa ClientUDP al recibir— y NO
+        # de self.temp_ts: cuando no hay dato fresco, temp_ts se fija abajo en 0.8
+        # como centinela de "lectura antiquísima" para que el PID desconfíe, y
+        # usarlo para la curva mandaría ese punto a 1970.
+        try:
+            t_rx = float(temps_list[3])
+        except (IndexError, TypeError, ValueError):
+            t_rx = time.time()
+
         p_idx = self.temp_source_idx
         p_val = _valid(p_idx)
-        if p_val is None:
-            lf = self.temp
-            self.temp_ts = 0.8
-            self.temp_source_bad = True
-        else:
-            lf = p_val
-            self.temp_ts = temps_list[3]
-            self.temp_source_bad = False
+        self.temp_source_bad = p_val is None
 
         # Secundario: float válido o sostener último valor (seed 20°, solo aparece
         # si nunca llegó lectura de ese canal).
         s_val = _valid(self._secondary_idx())
         s_lf = self.temp_secondary if s_val is None else s_val
 
+        # Temperatura de control. EMA: fresca solo con el primario. Kalman: también
+        # con el secundario solo, corregido por el sesgo estimado del par.
+        if self.temp_estimator.update(p_val, s_val, t_rx):
+            self.temp_ts = t_rx
+        else:
+            self.temp_ts = 0.8
+        self.temp = self.temp_estimator.temp
+
         if p_val is not None or s_val is not None:
             self._temp_ever_valid = True
 
@@ -1026,22 +979,17 @@ class PCRFrame(ttk.Frame):
         except (IndexError, TypeError):
             pass
         alpha = 0.3
-        self.temp = alpha * lf + (1 - alpha) * self.temp
         self.temp_secondary = alpha * s_lf + (1 - alpha) * self.temp_secondary
-        # Anexados alineados por índice (misma longitud): primario, secundario y
-        # el instante de recepción del datagrama.
-        #
-        # El tiempo sale de temps_list[3] —que estampa ClientUDP al recibir— y NO
-        # de self.temp_ts: cuando el sensor primario falla, temp_ts se fija arriba
-        # en 0.8 como centinela de "lectura antiquísima" para que el PID desconfíe,
-        # y usarlo aquí mandaría ese punto a 1970.
-        try:
-            t_rx = float(temps_list[3])
-        except (IndexError, TypeError, ValueError):
-            t_rx = time.time()
-        self.data_temperature.append(self.temp)
-        self.data_temperature_secondary.append(self.temp_secondary)
-        self.data_time.append(t_rx - self.start_pcr_time)
+        # Una fila por muestra: primario, secundario, el instante de recepción del
+        # datagrama y el desvío de la estimación (el store publica la fila entera
+        # de una vez).
+        self.trace.append(
+            self.temp,
+            self.temp_secondary,
+            t_rx - self.start_pcr_time,
+            self.temp_estimator.std,
+        )
+        self.temp_monitor.publish(self.temp, self.temp_ts)
 
     def _check_temp_watchdog(self):
         """Detiene el experimento si ni el primario ni el secundario del par
@@ -1065,13 +1013,14 @@ class PCRFrame(ttk.Frame):
         )
         if time.time() - last_fresh > PCR_TEMP_DEAD_S:
             self._temp_abort_triggered = True
-            self.fase = "Aborted: both temp sensors unavailable"
+            self.runner.fase = "Aborted: both temp sensors unavailable"
             print(
                 f"Aborting PCR: both pair sensors stale > {PCR_TEMP_DEAD_S}s "
                 "— stopping experiment"
             )
             if self.stop_udp_listenner is not None:
                 self.stop_udp_listenner.set()
+                self.temp_monitor.interrupt()
             if self.stop_event_motor is not None:
                 self.stop_event_motor.set()
 
@@ -1083,7 +1032,7 @@ class PCRFrame(ttk.Frame):
         mins_elapsed = int(elapsed_pcr_time / 60)
         msg_elapsed_time = (
             f"Time passed: {mins_elapsed} m {elapsed_pcr_time % 60:.1f} s "
-            f"-- cycles: {self.cycles_complete}/{self.total_cycles}"
+            f"-- cycles: {self.runner.cycles_complete}/{self.total_cycles}"
         )
         remaining = self._estimate_remaining_time(elapsed_pcr_time)
         msg_elapsed_time += f" -- Estimated finish: {int(remaining / 60)}m {remaining % 60:.1f}s"
@@ -1119,7 +1068,7 @@ class PCRFrame(ttk.Frame):
         # viejas dejaban de sobreescribirse y el label crecía sin límite.
         self.svar_status.set(
             f"Temperature: {self.temp:.2f} °C [{src_label}]{extras}{warn}\n"
-            f"State: {self.fase}\n"
+            f"State: {self.runner.fase}\n"
             f"{msg_elapsed_time}"
         )
 
@@ -1144,17 +1093,18 @@ class PCRFrame(ttk.Frame):
         # tiempo teórico restante. Tras un ciclo, proyecta los ciclos pendientes
         # con la duración promedio medida y descuenta lo ya transcurrido del
         # ciclo actual. Suma la extensión final si aún quedan ciclos.
-        if self.cycles_complete == 0 or self.avg_cycle_duration <= 0:
+        run = self.runner
+        if run.cycles_complete == 0 or run.avg_cycle_duration <= 0:
             return max(0.0, self.teorical_time_pcr - elapsed_pcr_time)
 
-        cycles_left = max(0, self.total_cycles - self.cycles_complete)
+        cycles_left = max(0, self.total_cycles - run.cycles_complete)
         if cycles_left > 0:
-            elapsed_current = max(0.0, time.time() - self.start_cycle_time)
+            elapsed_current = max(0.0, time.time() - run.start_cycle_time)
             remaining = (
-                self.avg_cycle_duration * cycles_left
+                run.avg_cycle_duration * cycles_left
                 - elapsed_current
                 + self.ext_time_final
-                + FLUOR_READ_TOTAL_S  # lectura de fluorescencia final pendiente
+                + run.fluor_extra_s(self.ext_time_final)  # lectura final pendiente
             )
         else:
             # Ya pasaron todos los ciclos: solo queda el segmento final (hold de
@@ -1167,17 +1117,17 @@ class PCRFrame(ttk.Frame):
             # deja solo la lectura final. start_final_ext_time puede ser 0.0 (no
             # fijado) en la ventana mínima entre el fin de los ciclos y el arranque
             # del segmento; ahí se muestra el total sin descontar.
-            total_final = max(0.0, self.ext_time_final) + FLUOR_READ_TOTAL_S
-            if self.start_final_ext_time > 0.0:
-                remaining = total_final - (time.time() - self.start_final_ext_time)
+            total_final = max(0.0, self.ext_time_final) + run.fluor_extra_s(self.ext_time_final)
+            if run.start_final_ext_time > 0.0:
+                remaining = total_final - (time.time() - run.start_final_ext_time)
             else:
                 remaining = total_final
         return max(0.0, remaining)
 
     def init_temperature_graph(self):
-        self.data_temperature = []  # Datos acumulados
-        self.data_temperature_secondary = []
-        self.data_time = []
+        # Store nuevo (no clear): un on_message rezagado de la corrida anterior
+        # escribe en el viejo, como pasaba con las listas.
+        self.trace = PcrTraceStore(self._window_setting())
         self.data_photodetector = []
         self.data_photodetector_series = []
         # Reset del estado de captura/watchdog del par para la nueva corrida.
@@ -1206,6 +1156,7 @@ class PCRFrame(ttk.Frame):
         # Las Line2D se recrean en cada corrida: hay que re-aplicarles el estado
         # del checkbox o la secundaria reaparecería al pulsar Start.
         self.line_secondary.set_visible(self.show_secondary.get())
+        self.band_temp = None
         self.ax.set_title("Temperature (°C)")
         self.ax.set_xlabel("Time (s)")
         self.ax.set_ylabel("°C")
@@ -1222,32 +1173,20 @@ class PCRFrame(ttk.Frame):
 
     def update_graph_temperature(self, window_size=None):
         if window_size is None:
-            settings = read_settings_from_file()
-            windows_pcr = settings.get("windows_pcr", 2500)
-            window_size = int(windows_pcr)
+            window_size = self._window_setting()
         # self.line es None mientras esté montada la preview del perfil (que no
         # tiene curvas de datos): regenerarla a media corrida no debe reventar
         # el poll de la gráfica.
         if self.canvas is None or self.line is None:
             return
 
-        n = len(self.data_temperature)
-        if n == 0:
-            return
-
-        # Índice inicial de la ventana. La ventana sigue contándose en MUESTRAS:
+        # Ventana de las últimas window_size muestras. Sigue contándose en MUESTRAS:
         # windows_pcr es un tope de puntos dibujados (costo de render), no una
-        # duración. Lo único que cambia respecto al eje por índice es la escala.
-        start = max(0, n - window_size)
-
-        # Datos visibles. data_time se anexa junto a las curvas, pero el paro puede
-        # caer entre appends: se recorta al mínimo común en vez de asumir igualdad.
-        y = self.data_temperature[start:n]
-        x = self.data_time[start:n]
-        m = min(len(x), len(y))
-        if m == 0:
+        # duración. Son vistas del anillo del store (sin copiar la corrida); las
+        # tres columnas salen alineadas porque el store publica filas completas.
+        y, ys, x = self.trace.window(window_size)
+        if len(x) == 0:
             return
-        x, y = x[:m], y[:m]
 
         self.line.set_xdata(x)
         self.line.set_ydata(y)
@@ -1256,10 +1195,21 @@ class PCRFrame(ttk.Frame):
         # Se le siguen poniendo datos aunque esté oculta: así el checkbox la
         # devuelve al instante, sin esperar a la siguiente muestra.
         if self.line_secondary is not None:
-            ys = self.data_temperature_secondary[start:n][:m]
-            self.line_secondary.set_xdata(x[: len(ys)])
+            self.line_secondary.set_xdata(x)
             self.line_secondary.set_ydata(ys)
 
+        # Banda ±2σ del estimador: fill_between no tiene set_data, se reemplaza la
+        # colección en cada tick (una sola PolyCollection por ventana).
+        if self.temp_estimator.name != "ema":
+            if self.band_temp is not None:
+                self.band_temp.remove()
+            # El escritor pudo publicar una muestra más desde window(): se recorta
+            # al largo de x (el desvío cambia poco de una muestra a la siguiente).
+            band = 2.0 * self.trace.window_std(window_size)[-len(x) :]
+            self.band_temp = self.ax.fill_between(
+                x, y - band, y + band, color=self.line.get_color(), alpha=0.2, linewidth=0
+            )
+
         # Ventana deslizante en X: extremos de tiempo REAL del tramo visible. El
         # guard evita el warning de matplotlib con límites idénticos (1 muestra, o
         # dos datagramas fechados en el mismo instante).
@@ -1277,6 +1227,13 @@ class PCRFrame(ttk.Frame):
 
         self.canvas.draw_idle()
 
+    def _on_fluorescence(self, delta, samples):
+        # Callback de PcrRunner (hilo del experimento) en cada lectura:
+        # acumulación para el plot por ciclo y el CSV (fuente única de verdad).
+        self.data_photodetector.append(delta)
+        self.data_photodetector_series.append(samples)
+        self.after(1, lambda: self.update_graph_photodetector())
+
     def update_graph_photodetector(self):
         if self.canvas is None or not hasattr(self, "line_photo"):
             return
@@ -1293,6 +1250,10 @@ class PCRFrame(ttk.Frame):
         self.ax_photo.set_ylim(ymin - margin, ymax + margin)
         self.canvas.draw_idle()
 
+    def _window_setting(self):
+        """Tope de muestras dibujadas de la curva de temperatura (windows_pcr)."""
+        return get_setting_int("windows_pcr", 2500)
+
     def _cadence_summary(self):
         """Resumen de la cadencia real de muestreo, para la fila de metadata.
 
@@ -1302,21 +1263,15 @@ class PCRFrame(ttk.Frame):
         Se mide de la propia serie y se archiva pegada al dato para no volver a
         suponerla. dt_max es el que delata stalls largos: si sale en segundos,
         hay huecos reales en la curva y toca revisar el buffer de recepción.
+
+        La estadística se acumula muestra a muestra en el store (CadenceStats): no
+        se ordenan los deltas al guardar. p95 sale de un histograma logarítmico
+        (cota superior, error relativo < 1.2%); media, máximo, n y span son exactos.
         """
-        t = self.data_time
-        if len(t) < 2:
-            return f"-n: {len(t)}"
-        deltas = sorted(t[i + 1] - t[i] for i in range(len(t) - 1))
-        dt_mean = (t[-1] - t[0]) / (len(t) - 1)
-        p95 = deltas[min(len(deltas) - 1, int(0.95 * len(deltas)))]
-        return (
-            f"-dt_mean: {dt_mean:.4f}-dt_p95: {p95:.4f}-dt_max: {deltas[-1]:.4f}"
-            f"-n: {len(t)}-span: {t[-1] - t[0]:.1f}"
-        )
+        return self.trace.stats.summary()
 
     def save_data_temps_file(self):
         import csv
-        from itertools import zip_longest
 
         timestamp = datetime.now()
         # Prefijo con el nombre del protocolo (proyecto PCR activo) saneado.
@@ -1331,19 +1286,22 @@ class PCRFrame(ttk.Frame):
             # El loader del análisis la salta y lee por posición, así que crecer la
             # fila de metadata y agregar columnas al final es seguro.
             writer.writerow([self.prefix_row + self._cadence_summary()])
-            # Tres columnas alineadas por muestra: [primario, secundario, t_s]. Se
-            # anexan juntas en update_displayed_temperature; zip_longest cubre un
-            # desfase de a lo más una muestra si el paro cayó entre los append.
-            for p, s, t in zip_longest(
-                self.data_temperature, self.data_temperature_secondary, self.data_time
-            ):
-                writer.writerow(
-                    [
-                        p if p is not None else "",
-                        s if s is not None else "",
-                        f"{t:.4f}" if t is not None else "",
-                    ]
-                )
+            # Tres columnas alineadas por muestra: [primario, secundario, t_s]. El
+            # store publica filas completas, así que ya no hay desfase entre columnas
+            # que rellenar. Se escribe bloque a bloque (tolist da floats de Python:
+            # mismo texto que con las listas).
+            with_std = self.temp_estimator.name != "ema"
+            for block in self.trace.iter_chunks():
+                p_col, s_col, t_col, std_col = block.tolist()
+                if with_std:
+                    writer.writerows(
+                        [p, s, f"{t:.4f}", f"{d:.3f}"]
+                        for p, s, t, d in zip(p_col, s_col, t_col, std_col)
+                    )
+                else:
+                    writer.writerows(
+                        [p, s, f"{t:.4f}"] for p, s, t in zip(p_col, s_col, t_col)
+                    )
         print(f"Data saved to {filename}")
         filename_photo = f"{save_dir}/{slug}_photodetector_data_{ts}.csv"
         with open(filename_photo, "w", newline="") as file:
@@ -1361,8 +1319,8 @@ class PCRFrame(ttk.Frame):
                     writer.writerow([cycle, f"{t_rel:.3f}", light_on, f"{voltage}"])
 
     def _ensure_ads(self) -> bool:
-        if self.ads is not None:
-            return True
+        if self.ads is not None or get_setting_bool("pcr_simulator", False):
+            return True  # en simulación el fotodetector lo pone el disco virtual
         from templates.constants import secrets
 
         if secrets.get("environment", "") == "dev":
@@ -1454,343 +1412,13 @@ class PCRFrame(ttk.Frame):
         )
         self.thread_experiment.start()  # pyrefly: ignore
 
-    def hold_temperature(
-        self,
-        temp_setpoint,
-        time_hold,
-        ts,
-        stop_func,
-        pin_heating,
-        KI,
-        I_MAX,
-        KP_HOLD,
-        TEMP_BAND,
-        WINDOW,
-    ):
-        MAX_TEMP_AGE = ts  # si es más vieja → no confiar
-        integral = 0.0
-        start_time = time.time()
-        while time.time() - start_time <= time_hold and not stop_func.is_set():
-            # Verificar edad de la temperatura
-            temp_age = time.time() - self.temp_ts
-            if temp_age > MAX_TEMP_AGE:
-                # Temperatura vieja → apagar por seguridad
-                pin_heating.write(False)
-                time.sleep(WINDOW / 2)
-                continue
-            temp = self.temp
-            # Banda muerta mínima para evitar chatter
-            error = temp_setpoint - temp
-            kp_dyn, ki_dyn = _fuzzy_gains(error, KP_HOLD, KI)
-            integral += error * WINDOW
-            integral = max(-I_MAX, min(I_MAX, integral))
-            if abs(error) < TEMP_BAND:
-                power = 0.0
-            else:
-                power = kp_dyn * error + ki_dyn * integral
-            # Saturar potencia
-            power = max(0.0, min(1.0, power))
-            on_time = power * WINDOW
-            off_time = WINDOW - on_time
-            if on_time > 0:
-                pin_heating.write(True)
-                end_on = time.time() + on_time
-                while time.time() < end_on:
-                    if stop_func.is_set():
-                        break
-                    time.sleep(WINDOW / 10)
-            pin_heating.write(False)
-            # Tiempo OFF (permite disipar energía)
-            end_off = time.time() + off_time
-            while time.time() < end_off:
-                if stop_func.is_set():
-                    break
-                time.sleep(WINDOW / 10)
-
-    def _load_phase_pid(self, phase, ts):
-        # Lee parámetros de la fase desde settings.json en cada llamada,
-        # para que ediciones de ganancias durante el experimento tomen efecto.
-        settings = read_settings_from_file()
-        pid = settings.get("pidControllerRPM", {})
-        return {
-            "KP": pid.get(f"KP_{phase}", 0.15),
-            "KI": pid.get(f"KI_{phase}", 0.5),
-            "I_MAX": pid.get(f"imax_{phase}", 0.5),
-            "TEMP_BAND": pid.get(f"tband_{phase}", 0.05),
-            "WINDOW": pid.get(f"win_{phase}", ts * 0.9),
-            "MAX_AGE": pid.get(f"m_age_{phase}", 0.09),
-            # Límites de la edad-máxima dinámica (fuzzy) usada solo en la rampa.
-            # m_age_max cae al viejo m_age_<phase> si no hay clave nueva.
-            "MAX_AGE_MIN": pid.get(f"m_age_min_{phase}", 0.02),
-            "MAX_AGE_MAX": pid.get(f"m_age_max_{phase}", pid.get(f"m_age_{phase}", 0.2)),
-            # Fracción del setpoint hasta la que se hace feed-forward a potencia
-            # plena antes de entregar el control al PI. 0.0 = sin pre-rampa.
-            "FF_FRAC": pid.get(f"ff_frac_{phase}", 0.0),
-        }
-
-    def _reach_temperature_pi(
-        self, setpoint, params, stop_event, break_if_below=False, tolerance=0.5
-    ):
-        # Rampa PI hacia setpoint con anti-windup y descarte de temperatura vieja.
-        # El heater debe estar pre-armado por el caller; este método modula on/off.
-        KP = params["KP"]
-        KI = params["KI"]
-        I_MAX = params["I_MAX"]
-        TEMP_BAND = params["TEMP_BAND"]
-        WINDOW = params["WINDOW"]
-        MAX_AGE_MIN = params["MAX_AGE_MIN"]
-        MAX_AGE_MAX = params["MAX_AGE_MAX"]
-        FF_FRAC = params.get("FF_FRAC", 0.0)
-
-        # ----- Pre-rampa feed-forward (mismo principio que la desnaturalización):
-        # calienta a potencia plena hasta FF_FRAC*setpoint y luego entrega el
-        # control al PI para asentar sin sobreimpulso. Se omite cuando venimos
-        # ya calientes (break_if_below, p. ej. ciclo 0 tras el hold de denat).
-        # A diferencia de la rampa de denaturación, aquí el blast también
-        # descarta temperatura vieja: si la lectura UDP envejece, apaga el
-        # heater y re-arma en cada lectura fresca para evitar runaway térmico.
-        if FF_FRAC > 0.0 and not break_if_below:
-            ceiling = setpoint * FF_FRAC
-            while self.temp < ceiling and not stop_event.is_set():
-                age = time.time() - self.temp_ts
-                max_age = _fuzzy_max_age(setpoint - self.temp, MAX_AGE_MIN, MAX_AGE_MAX)
-                if age > max_age:
-                    # Temperatura vieja → no confiar; corta y reintenta.
-                    self.pin_heating.write(False)  # pyrefly: ignore
-                    continue
-                self.pin_heating.write(True)  # pyrefly: ignore
-
-        integral = 0.0
-        while tolerance < abs(setpoint - self.temp) and not stop_event.is_set():
-            if break_if_below and self.temp < setpoint:
-                break
-            age = time.time() - self.temp_ts
-            error = setpoint - self.temp
-            if age > _fuzzy_max_age(error, MAX_AGE_MIN, MAX_AGE_MAX):
-                # Temperatura vieja → no confiar
-                self.pin_heating.write(False)  # pyrefly: ignore
-                continue
-            kp_dyn, ki_dyn = _fuzzy_gains(error, KP, KI)
-            integral += error * WINDOW
-            integral = max(-I_MAX, min(I_MAX, integral))
-            if abs(error) < TEMP_BAND:
-                power = 0.0
-            else:
-                power = kp_dyn * error + ki_dyn * integral
-            power = max(0.0, min(1.0, power))
-            on_time = power * WINDOW
-            if on_time > 0:
-                self.pin_heating.write(True)  # pyrefly: ignore
-                time.sleep(on_time)
-            self.pin_heating.write(False)  # pyrefly: ignore
-            time.sleep(WINDOW - on_time)
-
-    def _hold_phase(self, phase, setpoint, duration, ts):
-        params = self._load_phase_pid(phase, ts)
-        self.hold_temperature(
-            setpoint,
-            duration,
-            ts,
-            self.stop_udp_listenner,
-            self.pin_heating,
-            params["KI"],
-            params["I_MAX"],
-            params["KP"],
-            params["TEMP_BAND"],
-            params["WINDOW"],
+    def _make_temp_estimator(self):
+        return make_estimator(
+            get_setting("temp_estimator", "ema"),
+            self.temp_source_idx,
+            self._secondary_idx(),
+            temp=self.temp,
         )
-        self.pin_heating.write(False)  # pyrefly: ignore
-
-    def _read_fluorescence(
-        self,
-        ads,
-        baseline_s=FLUOR_BASELINE_S,
-        light_s=FLUOR_LIGHT_S,
-        post_s=FLUOR_POST_S,
-        sample_dt=0.1,
-        averages=4,
-    ):
-        # Muestreo continuo del fotodetector mientras se modula la luz (pin_pcr):
-        #   baseline_s  -> luz OFF (línea base oscura)
-        #   light_s     -> luz ON  (excitación)
-        #   post_s      -> luz OFF (decaimiento)
-        # Acumula la serie temporal cruda y agrega el escalar
-        #   delta = media(ventana con luz) - media(ventana baseline)
-        # a data_photodetector (plot por-ciclo). Soporta lectura diferencial.
-        settings = read_settings_from_file()
-        use_diff = settings.get("photoreceptor", {}).get("use_diff", False)
-
-        # (t_rel, light_on, voltage) por muestra
-        samples = []
-
-        def read_one():
-            if use_diff:
-                return ads.read_voltage_diff(0, 1, averages=averages)
-            return ads.read_voltage(0, averages=averages)
-
-        def sample_window(duration, light_on, t0):
-            # Muestrea durante `duration` segundos a ~sample_dt, paceando por
-            # tiempo transcurrido. Devuelve True si se abortó (stop).
-            t_end = time.time() + duration
-            while time.time() < t_end:
-                if self.stop_udp_listenner is not None and self.stop_udp_listenner.is_set():
-                    return True
-                t_iter = time.time()
-                v = read_one()
-                samples.append((t_iter - t0, light_on, v))
-                elapsed = time.time() - t_iter
-                if elapsed < sample_dt:
-                    time.sleep(sample_dt - elapsed)
-            return False
-
-        t0 = time.time()
-        try:
-            self.pin_pcr.write(False)  # pyrefly: ignore
-            aborted = sample_window(baseline_s, 0, t0)
-            if not aborted:
-                self.pin_pcr.write(True)  # pyrefly: ignore
-                aborted = sample_window(light_s, 1, t0)
-            if not aborted:
-                self.pin_pcr.write(False)  # pyrefly: ignore
-                sample_window(post_s, 0, t0)
-        finally:
-            self.pin_pcr.write(False)  # pyrefly: ignore
-
-        baseline_vals = [v for (_, light_on, v) in samples if light_on == 0 and _ < baseline_s]
-        light_vals = [v for (_, light_on, v) in samples if light_on == 1]
-        mean_baseline = sum(baseline_vals) / len(baseline_vals) if baseline_vals else 0.0
-        mean_light = sum(light_vals) / len(light_vals) if light_vals else 0.0
-        delta = mean_light - mean_baseline
-
-        # Acumulación (fuente única de verdad)
-        self.data_photodetector.append(delta)
-        self.data_photodetector_series.append(samples)
-        self.after(1, lambda: self.update_graph_photodetector())
-        return delta
-
-    def _run_cycle(
-        self,
-        idx,
-        high_temp,
-        low_temp,
-        time_high,
-        time_low,
-        rpm,
-        direction,
-        acceleration,
-        ts,
-        ext_time,
-        ext_temp,
-        ads,
-        denat_skipped=False,
-    ):
-        global sistemaMotor
-        from Drivers.DriverStepperSys import spinMotorRPM_ramped
-
-        if self.stop_udp_listenner is None:
-            self.stop_udp_listenner = threading.Event()
-        self.start_cycle_time = time.time()
-
-        # Reach High temp: feed-forward a potencia plena hasta ff_frac_high*setpoint
-        # y luego PI (tolerancia 0.5). En el ciclo 0 (break_if_below) se omite el
-        # blast porque venimos del hold de denaturación ya en temperatura, salvo
-        # que la desnaturalización se haya omitido (denat_skipped): en ese caso
-        # arrancamos en frío y hay que alcanzar High de verdad.
-        if not _skip(time_high):
-            self.fase = "Reach High temp"
-            self.pin_heating.write(True)  # pyrefly: ignore
-            self._reach_temperature_pi(
-                high_temp,
-                self._load_phase_pid("high", ts),
-                self.stop_udp_listenner,
-                break_if_below=(idx == 0 and not denat_skipped),
-                tolerance=0.5,
-            )
-            print(f"Temperature reached: {self.temp} °C")
-
-            # Hold High
-            self.fase = "Hold High temp"
-            print(f"Holding temperature for {time_high} seconds")
-            self._hold_phase("h_high", high_temp, time_high, ts)
-        else:
-            print("Skipping High phase: time <= 0")
-
-        # Cool down con giro del motor hacia la siguiente fase activa del ciclo.
-        # Si Low se omite (time_low <= 0) se enfría hacia la extensión; si ambas
-        # se omiten no hay nada que enfriar (la próxima fase es calentamiento).
-        cool_target = (
-            low_temp
-            if not _skip(time_low)
-            else (ext_temp if not _skip(ext_time) else None)
-        )
-        if cool_target is not None and self.temp > cool_target + 0.5:
-            print(f"Cooling down to {cool_target} °C with motor spin")
-            self.fase = "Cooling"
-            self.stop_event_motor.clear()  # pyrefly: ignore
-            spinMotorRPM_ramped(
-                direction,
-                rpm,
-                ts,
-                acceleration,
-                900.0,
-                True,
-                sistemaMotor,
-                None,
-                stop_func=lambda: self.stop_udp_listenner.is_set()  # pyrefly: ignore
-                or self.temp <= cool_target
-                or self.temp < cool_target + 9.5,
-                stop_event=self.stop_event_motor,
-            )
-
-            print(self.temp, "cool target....dis")
-            while (
-                self.temp > cool_target + 0.5 and not self.stop_udp_listenner.is_set()
-            ):  # pyrefly: ignore
-                time.sleep(0.001)
-            print(f"Temperature reached: {self.temp} °C")
-
-        # Hold Low
-        if not _skip(time_low):
-            self.fase = "LOW temp Hold"
-            print(f"Holding LOW temperature for {time_low} seconds")
-            self._hold_phase("h_low", low_temp, time_low, ts)
-        else:
-            print("Skipping Low phase: time <= 0")
-
-        # Reach Ext temp (PI, tolerancia 0.5) + Hold Ext
-        if not _skip(ext_time):
-            self.fase = "Reach ext temp"
-            self.pin_heating.write(True)  # pyrefly: ignore
-            self._reach_temperature_pi(
-                ext_temp,
-                self._load_phase_pid("ext", ts),
-                self.stop_udp_listenner,
-                break_if_below=(idx == 0),
-                tolerance=0.5,
-            )
-            print(f"Temperature reached: {self.temp} °C")
-
-            # Hold Ext
-            self.fase = "extension temp Hold "
-            print(f"Holding extension temperature for {ext_time} seconds")
-            self._hold_phase("h_ext", ext_temp, ext_time, ts)
-            print(f"Hold ext complete, end of cycle {idx}")
-        else:
-            print("Skipping Extension phase: time <= 0")
-
-        # Lectura de fluorescencia
-        time.sleep(FLUOR_PRE_SLEEP_S)
-        self.fase = "Reading Fluorescence"
-        print("Reading fluorescence...")
-        v_fluo = self._read_fluorescence(ads)
-        print(f"fluorescence delta voltage: {v_fluo}")
-        self.time_end_cycle = time.time()
-        # Estadísticas para la estimación del tiempo restante
-        self.last_cycle_duration = self.time_end_cycle - self.start_cycle_time
-        self.cycles_complete = idx + 1
-        self.avg_cycle_duration = (
-            self.avg_cycle_duration * (self.cycles_complete - 1) + self.last_cycle_duration
-        ) / self.cycles_complete
 
     def experiment_pcr(
         self,
@@ -1813,20 +1441,28 @@ class PCRFrame(ttk.Frame):
         self.stop_udp_listenner = (
             threading.Event() if self.stop_udp_listenner is None else self.stop_udp_listenner
         )
+        recipe = {
+            "high_temp": high_temp,
+            "low_temp": low_temp,
+            "time_high": time_high,
+            "time_low": time_low,
+            "cycles": cycles,
+            "rpm_cooling": rpm,
+            "denat_time": denat_time,
+            "denat_temp": denat_temp,
+            "ext_time": ext_time,
+            "ext_temp": ext_temp,
+            "ext_time_final": ext_time_final,
+            "initial_spin": initial_spin_time,
+        }
+        # La secuencia corre en PcrRunner (Drivers/PcrRunner.py); aquí solo se arma
+        # el hardware. Runner nuevo por corrida: la UI lee de él fase y progreso.
+        self.runner = PcrRunner(
+            self, self.stop_udp_listenner, on_fluorescence=self._on_fluorescence
+        ).configure()
         self.total_cycles = cycles
-        self.cycles_complete = 0
-        self.last_cycle_duration = 0.0
-        self.avg_cycle_duration = 0.0
         self.ext_time_final = ext_time_final
-        # Reset para esta corrida: se fija al iniciar la extensión final (más abajo).
-        self.start_final_ext_time = 0.0
-        self.teorical_time_pcr = (
-            (time_high + time_low + ext_time) * 1.2 * cycles
-            + denat_time
-            + ext_time_final
-            + FLUOR_READ_TOTAL_S * cycles  # lectura de fluorescencia por ciclo
-            + FLUOR_READ_TOTAL_S  # lectura de fluorescencia final
-        )
+        self.teorical_time_pcr = self.runner.theoretical_time_s(recipe)
 
         settings = read_settings_from_file()
         pidGains = settings.get("pidControllerRPM", {})
@@ -1858,21 +1494,25 @@ class PCRFrame(ttk.Frame):
             f"-cols: {primary_label}|{secondary_label}|t_s"
         )
         self.temp = 20.0
-        self.client_temperature = UdpClient(
+        self.temp_estimator = self._make_temp_estimator()
+        if self.temp_estimator.name != "ema":
+            # Columna extra al final: desvío de la estimación del primario.
+            prefix_col += f"|std-temp_estimator: {self.temp_estimator.name}"
+        # Disco virtual (docs/virtual_disc.md): planta térmica, motor por pty y
+        # fotodetector simulados. Arranca antes que el cliente UDP para que el
+        # start-gate vea temperatura.
+        if get_setting_bool("pcr_simulator", False):
+            from Drivers.VirtualDisc import VirtualDisc
+
+            self.virtual_disc = VirtualDisc(port=5005).start()
+            ads = self.virtual_disc.ads
+        self.client_temperature = SharedUdpClient(
             port=5005,
-            buffer_size=512,
-            allow_broadcast=True,  # Important for broadcast payloads
-            local_ip="",  # "" listens on all interfaces (wlan0, eth0, etc.)
-            recv_timeout_sec=0.1,  # lets loop check stop flag periodically
             on_message=lambda t, a, t_d: self.update_displayed_temperature(t, a, t_d),
-            parse_float=True,  # Arduino sends a numeric string,
             stop_event=self.stop_udp_listenner,
-            prefixCol=prefix_col,
-            save_data=False,
         )
         self.prefix_row = prefix_col
         self.client_temperature.start()
-        self.fase = "Initial"
         from Drivers.DriverStepperSys import DriverStepperSys, spinMotorRPM_ramped
 
         # start_pcr_time NO se fija aquí: lo hace callback_start_experiment antes
@@ -1884,13 +1524,15 @@ class PCRFrame(ttk.Frame):
             # El cliente UDP ya corre; esperamos a _temp_ever_valid (lo marca
             # update_displayed_temperature en la primera lectura buena). Al retornar
             # aquí, el finally desmonta el hardware y _ui_poll_loop restaura la UI.
-            gate_deadline = time.time() + PCR_TEMP_START_WAIT_S
-            while not self._temp_ever_valid and time.time() < gate_deadline:
-                if self.stop_udp_listenner.is_set():
-                    return
-                time.sleep(0.05)
+            self.temp_monitor.wait_for(
+                lambda: self._temp_ever_valid,
+                timeout=PCR_TEMP_START_WAIT_S,
+                stop_event=self.stop_udp_listenner,
+            )
+            if self.stop_udp_listenner.is_set():
+                return
             if not self._temp_ever_valid:
-                self.fase = "Aborted: temp sensors unavailable at start"
+                self.runner.fase = "Aborted: temp sensors unavailable at start"
                 print("PCR not started: both pair sensors unavailable at start")
                 return
 
@@ -1898,9 +1540,12 @@ class PCRFrame(ttk.Frame):
             direction = "CW"
             if sistemaMotor is None:
                 print("Creating new driver instance")
-                sistemaMotor = DriverStepperSys(
-                    en_pin=12, enable_active_high=False, uart_port=serial_port_encoder
-                )
+                if self.virtual_disc is not None:
+                    sistemaMotor = DriverStepperSys(uart_port=self.virtual_disc.tty_path)
+                else:
+                    sistemaMotor = DriverStepperSys(
+                        en_pin=12, enable_active_high=False, uart_port=serial_port_encoder
+                    )
 
             self.stop_event_motor = (
                 threading.Event() if self.stop_event_motor is None else self.stop_event_motor
@@ -1919,85 +1564,34 @@ class PCRFrame(ttk.Frame):
                 stop_func=lambda: self.stop_event_motor.is_set(),
                 stop_event=self.stop_event_motor,
             )
-            from Drivers.DriverGPIO import GPIOPin
-
-            self.pin_heating = GPIOPin(
-                led_heatin_pin,
-                chip=chip_rasp,
-                consumer="led-heating-ui",
-                active_low=False,
-            )
-            self.pin_pcr = GPIOPin(
-                led_fluorescence_pin,
-                chip=chip_rasp,
-                consumer="test_pcr",
-                active_low=False,
-            )
-            self.pin_pcr.set_output(initial_high=False)
-
-            # ----- Denaturación: mismo principio que "Reach High temp":
-            # feed-forward a potencia plena hasta ff_frac_denat*setpoint y luego PI
-            # (ganancias difusas + anti-windup + descarte de temperatura vieja).
-            # Si denat_time <= 0 se omite por completo (arrancamos en frío); en ese
-            # caso el primer ciclo debe alcanzar High de verdad (denat_skipped).
-            denat_skipped = _skip(denat_time)
-            if not denat_skipped:
-                self.fase = "Denaturation"
-                self.pin_heating.write(True)  # pyrefly: ignore
-                self._reach_temperature_pi(
-                    denat_temp,
-                    self._load_phase_pid("denat", ts),
-                    self.stop_udp_listenner,
-                    break_if_below=False,
-                    tolerance=0.5,
-                )
-
-                # ----- Denaturation Hold
-                self.fase = "Denaturation Hold"
-                self._hold_phase("h_denat", denat_temp, denat_time, ts)
-                print(f"Denaturation complete, temperature: {self.temp} °C")
+            if self.virtual_disc is not None:
+                self.heater = self.virtual_disc.heater
+                self.pin_pcr = self.virtual_disc.fluorescence_pin
             else:
-                print("Skipping Denaturation phase: time <= 0")
-
-            # ----- Ciclos PCR
-            for idx in range(cycles):
-                if self.stop_udp_listenner.is_set():
-                    break
-                print(f"start cycle {idx}")
-                self._run_cycle(
-                    idx,
-                    high_temp,
-                    low_temp,
-                    time_high,
-                    time_low,
-                    rpm,
-                    direction,
-                    acceleration,
-                    ts,
-                    ext_time,
-                    ext_temp,
-                    ads,
-                    denat_skipped=denat_skipped,
+                from Drivers.DriverGPIO import GPIOPin
+
+                self.heater = make_heater(
+                    led_heatin_pin,
+                    chip=chip_rasp,
+                    backend=get_setting("heater_backend", "lgpio"),
+                    consumer="led-heating-ui",
+                    fallback=get_setting("heater_software_fallback", False),
+                )
+                self.pin_pcr = GPIOPin(
+                    led_fluorescence_pin,
+                    chip=chip_rasp,
+                    consumer="test_pcr",
+                    active_low=False,
                 )
+                self.pin_pcr.set_output(initial_high=False)
 
-            # ----- Extensión final + lectura de fluorescencia (solo si no se detuvo).
-            # El hold final se omite si ext_time_final <= 0, pero la lectura de
-            # fluorescencia final SIEMPRE se realiza (la medición no se salta).
-            if not self.stop_udp_listenner.is_set():
-                print("PCR cycles complete, reading fluorescence")
-                self.fase = "Extension"
-                # Ancla del cronómetro del segmento final (hold + lectura final).
-                # Se pone siempre, incluso si el hold se omite (ext_time_final<=0),
-                # para que la lectura final igual cuente hacia abajo.
-                self.start_final_ext_time = time.time()
-                if not _skip(ext_time_final):
-                    self._hold_phase("h_ext", ext_temp, ext_time_final, ts)
-                else:
-                    print("Skipping Final Extension hold: time <= 0")
-                time.sleep(FLUOR_PRE_SLEEP_S)
-                v_fluo_final = self._read_fluorescence(ads)
-                print(f"Final fluorescence delta voltage: {v_fluo_final}")
-                self.fase = "Final"
+            runner = self.runner
+            runner.motor = sistemaMotor
+            runner.motor_stop_event = self.stop_event_motor
+            runner.heater = self.heater
+            runner.led_pin = self.pin_pcr
+            runner.ads = ads
+            runner.run(recipe, ts, acceleration, direction)
 
             self.save_data_temps_file()
 
@@ -2025,13 +1619,12 @@ class PCRFrame(ttk.Frame):
                 self.client_temperature.stop()
             except Exception as e:
                 print(f"error stopping udp client: {e}")
-        if self.pin_heating is not None:
+        if self.heater is not None:
             try:
-                self.pin_heating.write(False)  # pyrefly: ignore
-                self.pin_heating.close()
+                self.heater.close()
             except Exception as e:
-                print(f"error closing pin_heating: {e}")
-            self.pin_heating = None
+                print(f"error closing heater: {e}")
+            self.heater = None
         if self.pin_pcr is not None:
             try:
                 self.pin_pcr.write(False)  # pyrefly: ignore
@@ -2039,6 +1632,9 @@ class PCRFrame(ttk.Frame):
             except Exception as e:
                 print(f"error closing pin_pcr: {e}")
             self.pin_pcr = None
+        if self.virtual_disc is not None:
+            self.virtual_disc.close()
+            self.virtual_disc = None
         # No se toca _ui_poll_active aquí: dejamos que _ui_poll_loop detecte el fin
         # (running_experiment=False) y restaure los inputs en el hilo principal.
         self.running_experiment = False
@@ -2063,6 +1659,7 @@ class PCRFrame(ttk.Frame):
             return
         self.stop_event_motor.set()
         self.stop_udp_listenner.set()
+        self.temp_monitor.interrupt()
         if self.thread_experiment is not None:
             self.thread_experiment.join(timeout=3.0)
             if self.thread_experiment.is_alive():
@@ -11,7 +11,7 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from ttkbootstrap.scrolled import ScrolledFrame
 
 from templates.constants import font_entry
-from templates.utils import read_settings_from_file
+from templates.utils import get_setting_bool
 from ui.KeyboardFrame import NumericKeyboard
 
 __author__ = "Edisson A. Naula"
@@ -162,8 +162,7 @@ class PhotoreceptorFrame(ttk.Frame):
     def adquirir_dato(self):
         if not self.running:
             return
-        settings = read_settings_from_file()
-        if settings["photoreceptor"]["use_diff"]:
+        if get_setting_bool("photoreceptor.use_diff", False):
             intensidad = self.ads.read_voltage_diff(0, 1, averages=8)
         else:
             intensidad = self.ads.read_voltage(0, averages=8)
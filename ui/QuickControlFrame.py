@@ -30,7 +30,7 @@ import ttkbootstrap as ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from ttkbootstrap.scrolled import ScrolledFrame
 
-from Drivers.ClientUDP import UdpClient
+from Drivers.ClientUDP import SharedUdpClient
 from templates.constants import (
     chip_rasp,
     font_entry,
@@ -40,6 +40,7 @@ from templates.constants import (
     serial_port_encoder,
 )
 from templates.utils import (
+    get_setting_bool,
     read_settings_from_file,
     read_temp_source,
     temp_source_index,
@@ -95,7 +96,7 @@ class QuickControlFrame(ttk.Frame):
         self.runs: list[dict] = []  # [{"signal", "t", "v", "run", "meta"}]
         self.run_index = 0
         self.start_time = 0.0
-        self.udp_client: Optional[UdpClient] = None
+        self.udp_client: Optional[SharedUdpClient] = None
         self.latest_temp = 20.0
         # Últimas tres temperaturas del disco (IR amb, IR obj, termocupla) + fuente
         # elegida. Cada canal tiene su propio promedio móvil de 4 muestras
@@ -586,14 +587,9 @@ class QuickControlFrame(ttk.Frame):
                 self._set_status("ADS1115 not available.")
                 return
         else:
-            self.udp_client = UdpClient(
+            self.udp_client = SharedUdpClient(
                 port=5005,
-                buffer_size=512,
-                allow_broadcast=True,
-                local_ip="",
-                recv_timeout_sec=0.1,
                 on_message=lambda t, a, t_d: self._on_udp_message(t, a, t_d),
-                parse_float=True,
             )
             self.udp_client.start()
             # Reinicia el promedio móvil de los 3 canales al último valor conocido
@@ -667,8 +663,7 @@ class QuickControlFrame(ttk.Frame):
             if self.reading_signal == "temp":
                 row = self._read_all_temps() if self.temp_all_mode else [self._thermocouple_reader()]
             else:
-                settings = read_settings_from_file()
-                if settings.get("photoreceptor", {}).get("use_diff", False):
+                if get_setting_bool("photoreceptor.use_diff", False):
                     v = self.ads.read_voltage_diff(0, 1, averages=8)
                 else:
                     v = self.ads.read_voltage(0, averages=8)
@@ -706,7 +701,7 @@ class QuickControlFrame(ttk.Frame):
         write_temp_source(self.temp_source)
 
     def _on_udp_message(self, text, address, temps_list):
-        """Callback del UdpClient (en su hilo) con el broadcast del Arduino.
+        """Callback del hub UDP compartido (en su hilo) con el broadcast del Arduino.
 
         Guarda las tres temperaturas del disco (IR amb, IR obj, termocupla),
         conservando el último valor válido por campo y marcando los ausentes."""
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from Drivers.ClientUDP import UdpClient
+from Drivers.ClientUDP import SharedUdpClient
 
 __author__ = "Edisson A. Naula"
 __date__ = "$ 09/12/2025 at 01:07 p.m. $"
@@ -165,14 +165,10 @@ class TemperatureFrame(ttk.Frame):
         if self.running:
             print("Already reading")
             return
-        self.client = UdpClient(
+        # Suscriptor del hub UDP compartido (un solo socket en :5005 por proceso).
+        self.client = SharedUdpClient(
             port=5005,
-            buffer_size=512,
-            allow_broadcast=True,  # Important for broadcast payloads
-            local_ip="",  # "" listens on all interfaces (wlan0, eth0, etc.)
-            recv_timeout_sec=0.1,  # lets loop check stop flag periodically
             on_message=lambda t, a, t_d: self._on_udp_message(t, a, t_d),
-            parse_float=True,  # Arduino sends a numeric string
         )
         try:
             intervalo = int(self.interval_entry.get())
@@ -321,7 +317,7 @@ class TemperatureFrame(ttk.Frame):
         self.actualizar_grafico()
 
     def _on_udp_message(self, text, address, temps_list):
-        """Callback invocado por UdpClient en su hilo cuando llega un broadcast UDP válido.
+        """Callback invocado por el hub UDP compartido en su hilo cuando llega un broadcast UDP válido.
 
         Guarda las tres temperaturas (IR amb, IR obj, termocupla); conserva el
         último valor válido por campo y marca cuáles vinieron ausentes (None)."""
@@ -105,7 +105,7 @@ class EISAnalysisFrame(ttk.Frame):
         self._build_ui()
         # Siembra desde la corrida EIS en memoria (datos ricos: freq+Z completos).
         if plotter is not None and getattr(plotter, "method", "") == "eis":
-            self._seed_from_total_data(getattr(plotter, "total_data", []))
+            self._seed_from_run_store(getattr(plotter, "run_store", None))
 
     # ------------------------------------------------------------------
     # UI
@@ -330,25 +330,27 @@ class EISAnalysisFrame(ttk.Frame):
         self._add_experiment(base, groups, e_by_group)
         self._set_status(f"Loaded '{base}' with {len(groups)} spectrum(s).")
 
-    def _seed_from_total_data(self, total_data):
-        """Siembra la pestaña con los eventos de la corrida EIS en memoria
-        (total_data): cada evento trae freq_Hz/Z_real/Z_imag/Z_mod/E_V/t_s según el
-        modo. Agrupa por (run, cycle) igual que el CSV."""
-        if not total_data:
+    def _seed_from_run_store(self, run_store):
+        """Siembra la pestaña con las filas de la corrida EIS en memoria (run_store
+        del plotter): columnas freq_Hz/Z_real/Z_imag/Z_mod/E_V/t_s, NaN donde el modo
+        no trae la magnitud. Agrupa por (run, cycle) igual que el CSV."""
+        if run_store is None or not len(run_store):
             return
+        rows = run_store.rows()
         groups = {}
         e_by_group = {}
-        for ev in total_data:
-            if not isinstance(ev, dict):
-                continue
-            run = int(ev.get("run", 1) or 1)
-            cyc = int(ev.get("cycle", 0) or 0)
+        keys = np.stack([rows["run"], rows["cycle"]], axis=1)
+        for run, cyc in np.unique(keys, axis=0).tolist():
+            sel = rows[(rows["run"] == run) & (rows["cycle"] == cyc)]
             bucket = groups.setdefault((run, cyc), {})
             for k in EIS_KEYS:
-                if k in ev and ev[k] is not None:
-                    bucket.setdefault(k, []).append(float(ev[k]))
-            if "E_V" in ev and ev["E_V"] is not None:
-                e_by_group.setdefault((run, cyc), float(ev["E_V"]))
+                col = sel[k]
+                col = col[~np.isnan(col)]
+                if len(col):
+                    bucket[k] = col.tolist()
+            e_vals = bucket.get("E_V")
+            if e_vals:
+                e_by_group[(run, cyc)] = e_vals[0]
         if not groups:
             return
         self._add_experiment("current run", groups, e_by_group)
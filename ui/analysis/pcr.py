@@ -161,7 +161,7 @@ class PcrAnalysisFrame(ttk.Frame):
 
         self._build_ui()
         self.dt_var.set(f"{self._default_dt():.9g}")
-        # Siembra: corrida PCR en memoria (data_temperature / data_photodetector).
+        # Siembra: corrida PCR en memoria (trace / data_photodetector).
         # pcr_frame es None cuando la ventana se abre desde electroquímica.
         if pcr_frame is not None:
             self._seed_from_pcr(pcr_frame)
@@ -463,15 +463,17 @@ class PcrAnalysisFrame(ttk.Frame):
     def _seed_from_pcr(self, pcr):
         """Siembra la corrida PCR en memoria como un experimento (decisión Q3)."""
         try:
-            temps = list(getattr(pcr, "data_temperature", []) or [])
-            temps2 = list(getattr(pcr, "data_temperature_secondary", []) or [])
+            # Curva en vivo (primario, secundario, eje temporal real) desde el store
+            # de PcrFrame: copia de las filas publicadas, alineadas por construcción.
+            trace = getattr(pcr, "trace", None)
+            if trace is not None:
+                temps, temps2, times = trace.columns()
+            else:
+                temps, temps2, times = [], [], []
             photo = list(getattr(pcr, "data_photodetector", []) or [])
-            # Eje temporal real de la corrida en vivo. Se recorta a la longitud de la
-            # curva: la ventana puede abrirse justo entre dos append.
-            times = list(getattr(pcr, "data_time", []) or [])[: len(temps)]
         except Exception:
             return
-        if not temps and not photo:
+        if not len(temps) and not photo:
             return
         base = getattr(pcr, "active_project_name", None) or "last_run"
         name = self._unique_name(f"{base} (live)")
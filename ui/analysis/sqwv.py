@@ -10,6 +10,7 @@ import ttkbootstrap as ttk
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
 
+from Drivers.EmstatUtils import BATCH_PHASES
 from templates.utils import experiment_dir
 from ui.analysis.common import CycleCurve, Experiment, _apply_filter, plt
 
@@ -118,7 +119,7 @@ class SqwvAnalysisFrame(ttk.Frame):
         self._pick_cid: int | None = None
 
         self._build_ui()
-        # Siembra: corrida SWV en memoria (total_data, sin pre-tratamiento) + curvas CSV
+        # Siembra: corrida SWV en memoria (run_store, sin pre-tratamiento) + curvas CSV
         # ya cargadas en el plotter (loaded_lines). Solo para un plotter SWV.
         if plotter is not None and getattr(plotter, "method", "") == "sqwv":
             self._seed_from_plotter(plotter)
@@ -325,26 +326,20 @@ class SqwvAnalysisFrame(ttk.Frame):
 
     # ------------------------------------------------------ Siembra / estado
     def _seed_from_plotter(self, plotter):
-        """Corrida SWV en memoria (total_data, sin pre-tratamiento) + curvas CSV ya
+        """Corrida SWV en memoria (run_store, sin pre-tratamiento) + curvas CSV ya
         cargadas en el plotter. La corrida en vivo se agrupa por 'run'; el barrido es
         un único ciclo por run, así que el ítem es la corrida."""
         xk = getattr(plotter, "x_key", "E_V") or "E_V"
         yk = getattr(plotter, "y_key", "I_A") or "I_A"
         groups = {}  # run → ([xs], [ys])
-        for ev in getattr(plotter, "total_data", []):
-            if ev.get("phase") == "pretreatment":
-                continue
-            x, y = ev.get(xk), ev.get(yk)
-            if x is None or y is None:
-                continue
-            try:
-                x, y = float(x), float(y)
-            except (TypeError, ValueError):
-                continue
-            run = ev.get("run", 1)
-            groups.setdefault(run, ([], []))
-            groups[run][0].append(x)
-            groups[run][1].append(y)
+        run_store = getattr(plotter, "run_store", None)
+        rows = run_store.rows() if run_store is not None else None
+        if rows is not None and len(rows) and xk in rows.dtype.names and yk in rows.dtype.names:
+            rows = rows[rows["phase"] != BATCH_PHASES.index("pretreatment")]
+            rows = rows[~np.isnan(rows[xk]) & ~np.isnan(rows[yk])]
+            for run in np.unique(rows["run"]).tolist():
+                sel = rows[rows["run"] == run]
+                groups[run] = (sel[xk].tolist(), sel[yk].tolist())
         if groups:
             exp = Experiment(name="SWV run")
             for run in sorted(groups.keys(), key=lambda r: (r is None, r)):
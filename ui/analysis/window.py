@@ -38,7 +38,7 @@ class AnalysisWindow(ttk.Toplevel):
             self.notebook.select(self.eis)
         elif method == "sqwv":
             self.notebook.select(self.sqwv)
-        elif pcr_frame is not None and len(getattr(pcr_frame, "data_temperature", []) or []):
+        elif pcr_frame is not None and len(getattr(pcr_frame, "trace", ())):
             # Abierta desde el shell general con una corrida PCR en memoria.
             self.notebook.select(self.pcr)
 